@@ -0,0 +1,229 @@
+"""
+Throughput y espera en cola del control de admisión ante una ráfaga de
+inicios de transcripción.
+
+    python -m benchmarks.bench_admision --envios 1000 --usuarios 20 --capacidad 100
+
+Simula con reloj virtual: los envíos entran por la ruta real de inicio de
+transcribir, el scheduler (drainQueue) corre cada --tick segundos y un
+Transcribe simulado rechaza con LimitExceededException pasado el tope (con
+admisión, un envío con tokens se inicia directo y sólo se encola si choca
+con el tope o si el usuario se quedó sin tokens). Se
+compara el reparto justo (token buckets + ronda) con una cola FIFO y con
+iniciar directo sin admisión.
+"""
+import argparse
+import hashlib
+import io
+import json
+import logging
+import random
+from types import SimpleNamespace
+
+from botocore.exceptions import ClientError
+
+from tests.unit.lambda_loader import load_lambda
+
+transcribir = load_lambda("transcribir")
+
+import admission  # noqa: E402
+from comun import estado  # noqa: E402
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def time(self):
+        return self.now
+
+
+class SimSQS:
+    """Queue en orden de llegada con visibilidad sobre el reloj virtual."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.messages = []
+        self._receipts = 0
+
+    def send_message(self, QueueUrl, MessageBody):
+        self.messages.append({"Body": MessageBody, "visible_at": 0.0, "ReceiptHandle": None})
+
+    def receive_message(self, QueueUrl, MaxNumberOfMessages, VisibilityTimeout, WaitTimeSeconds):
+        batch = []
+        for message in self.messages:
+            if len(batch) == MaxNumberOfMessages:
+                break
+            if message["visible_at"] <= self.clock.now:
+                self._receipts += 1
+                message["ReceiptHandle"] = str(self._receipts)
+                message["visible_at"] = self.clock.now + VisibilityTimeout
+                batch.append(dict(message))
+        return {"Messages": batch}
+
+    def _by_receipt(self, entries):
+        receipts = {entry["ReceiptHandle"]: entry for entry in entries}
+        return [(m, receipts[m["ReceiptHandle"]]) for m in self.messages if m["ReceiptHandle"] in receipts]
+
+    def delete_message_batch(self, QueueUrl, Entries):
+        gone = {id(m) for m, _ in self._by_receipt(Entries)}
+        self.messages = [m for m in self.messages if id(m) not in gone]
+
+    def change_message_visibility_batch(self, QueueUrl, Entries):
+        for message, entry in self._by_receipt(Entries):
+            message["visible_at"] = self.clock.now + entry["VisibilityTimeout"]
+
+
+class SimTranscribe:
+    def __init__(self, clock, capacity, durations):
+        self.clock = clock
+        self.capacity = capacity
+        self.durations = durations
+        self.jobs = {}  # nombre -> (inicio, fin)
+        self.rejected = 0
+        self.peak = 0
+
+    def _running(self):
+        return [name for name, (_, end) in self.jobs.items() if end > self.clock.now]
+
+    def start_transcription_job(self, TranscriptionJobName, **kwargs):
+        if TranscriptionJobName in self.jobs:
+            raise ClientError({"Error": {"Code": "ConflictException", "Message": ""}}, "StartTranscriptionJob")
+        if len(self._running()) >= self.capacity:
+            self.rejected += 1
+            raise ClientError({"Error": {"Code": "LimitExceededException", "Message": ""}}, "StartTranscriptionJob")
+        now = self.clock.now
+        self.jobs[TranscriptionJobName] = (now, now + self.durations[kwargs["Media"]["MediaFileUri"]])
+        self.peak = max(self.peak, len(self._running()))
+
+    def get_transcription_job(self, TranscriptionJobName):
+        _, end = self.jobs[TranscriptionJobName]
+        status = "IN_PROGRESS" if end > self.clock.now else "COMPLETED"
+        return {"TranscriptionJob": {"TranscriptionJobStatus": status}}
+
+    def list_transcription_jobs(self, Status, MaxResults, NextToken=None):
+        running = self._running()
+        start = int(NextToken or 0)
+        page = running[start:start + MaxResults]
+        response = {"TranscriptionJobSummaries": [{"TranscriptionJobName": n} for n in page]}
+        if start + MaxResults < len(running):
+            response["NextToken"] = str(start + MaxResults)
+        return response
+
+
+class SimS3:
+    def __init__(self):
+        self.objects = {}
+
+    def head_object(self, Bucket, Key):
+        return {"ETag": f'"{hashlib.md5(Key.encode()).hexdigest()}"'}
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": ""}}, "GetObject")
+        return {"Body": io.BytesIO(self.objects[Key])}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[Key] = Body
+
+
+def _fifo(self, pending, slots, now, identity=None, exempt=None):
+    return pending[:max(slots, 0)]
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] if values else 0.0
+
+
+def simulate(submissions=1000, users=20, heavy_share=0.5, capacity=100, job_seconds=(120, 600),
+             burst_seconds=60, tick=10, mode="fair", seed=7):
+    """
+    Corre la simulación y devuelve un dict con throughput, esperas en cola
+    (global, usuario pesado y livianos) y el pico de jobs en paralelo.
+    `mode`: "fair", "fifo" o "direct" (sin admisión).
+    """
+    rng = random.Random(seed)
+    clock = Clock()
+    arrivals = []
+    for n in range(submissions):
+        user = "user-0" if rng.random() < heavy_share else f"user-{rng.randrange(1, users)}"
+        key = f"audios/{user}/audio-{n}.mp3"
+        arrivals.append((rng.uniform(0, burst_seconds), user, key))
+    arrivals.sort()
+    durations = {f"s3://bucket/{key}": rng.uniform(*job_seconds) for _, _, key in arrivals}
+
+    sqs, transcribe = SimSQS(clock), SimTranscribe(clock, capacity, durations)
+    patches = {
+        "sqs_client": sqs, "transcribe_client": transcribe, "s3_client": SimS3(),
+        "job_state": estado.MemoryJobStateStore(), "time": SimpleNamespace(time=clock.time),
+        "ADMISSION_QUEUE_URL": None if mode == "direct" else "sim://cola",
+        "TRANSCRIBE_MAX_CONCURRENT": capacity,
+    }
+    saved = {name: getattr(transcribir, name) for name in patches}
+    saved_select = admission.FairShare.select
+    for name, value in patches.items():
+        setattr(transcribir, name, value)
+    if mode == "fifo":
+        admission.FairShare.select = _fifo
+
+    submitted, rejected = {}, 0
+    try:
+        pending_arrivals = list(arrivals)
+        while pending_arrivals or sqs.messages or transcribe._running():
+            while pending_arrivals and pending_arrivals[0][0] <= clock.now:
+                at, user, key = pending_arrivals.pop(0)
+                body = {"s3": {"bucketName": "bucket", "key": key},
+                        "transcribe": {"languageCode": "es-ES", "maxSpeakers": 2}}
+                response = transcribir.lambda_handler({"body": json.dumps(body)}, None)
+                if response["statusCode"] >= 300:
+                    rejected += 1
+                else:
+                    submitted[json.loads(response["body"])["jobName"]] = (at, user)
+            if mode != "direct":
+                transcribir._drain_queue(now=clock.now)
+            clock.now += tick
+    finally:
+        for name, value in saved.items():
+            setattr(transcribir, name, value)
+        admission.FairShare.select = saved_select
+
+    waits = {"all": [], "heavy": [], "light": []}
+    for job_name, (at, user) in submitted.items():
+        if job_name in transcribe.jobs:
+            wait = transcribe.jobs[job_name][0] - at
+            waits["all"].append(wait)
+            waits["heavy" if user == "user-0" else "light"].append(wait)
+    makespan = max((end for _, end in transcribe.jobs.values()), default=0.0)
+    return {
+        "started": len(transcribe.jobs),
+        "rejected": rejected,
+        "peak": transcribe.peak,
+        "throughput_per_min": len(transcribe.jobs) / makespan * 60 if makespan else 0.0,
+        "makespan": makespan,
+        **{f"{group}_p{p}": _percentile(values, p) for group, values in waits.items() for p in (50, 95, 99)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--envios", type=int, default=1000)
+    parser.add_argument("--usuarios", type=int, default=20)
+    parser.add_argument("--pesado", type=float, default=0.5, help="fracción de envíos de un único usuario")
+    parser.add_argument("--capacidad", type=int, default=100, help="tope de jobs de Transcribe en paralelo")
+    parser.add_argument("--tick", type=float, default=10.0, help="segundos entre pasadas del scheduler")
+    args = parser.parse_args()
+    # El modo directo loguea cada LimitExceededException
+    logging.getLogger().setLevel(logging.CRITICAL)
+
+    print(f"{'modo':>7} {'iniciados':>10} {'rechazados':>11} {'pico':>5} {'jobs/min':>9} "
+          f"{'p50':>7} {'p95':>7} {'p99':>7} {'livianos p95':>13} {'pesado p95':>11}")
+    for mode in ("direct", "fifo", "fair"):
+        r = simulate(args.envios, args.usuarios, args.pesado, args.capacidad, tick=args.tick, mode=mode)
+        print(f"{mode:>7} {r['started']:>10} {r['rejected']:>11} {r['peak']:>5} {r['throughput_per_min']:>9.1f} "
+              f"{r['all_p50']:>7.0f} {r['all_p95']:>7.0f} {r['all_p99']:>7.0f} "
+              f"{r['light_p95']:>13.0f} {r['heavy_p95']:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
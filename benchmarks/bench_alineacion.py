@@ -0,0 +1,68 @@
+"""
+Throughput de la asignación de hablantes: diccionario por `start_time`
+(implementación original) contra `SpeakerAligner`.
+
+    python -m benchmarks.bench_alineacion --palabras 1000000
+"""
+import argparse
+import random
+import time
+
+from tests.unit.lambda_loader import load_lambda
+
+load_lambda("formatear")
+
+from comun.speaker_alignment import SpeakerAligner  # noqa: E402
+
+
+def build(words, words_per_turn=25, jitter=0.0, seed=7):
+    rng = random.Random(seed)
+    segments, items = [], []
+    for turn_start in range(0, words, words_per_turn):
+        turn = range(turn_start, min(turn_start + words_per_turn, words))
+        speaker = f"spk_{rng.randrange(4)}"
+        segments.append({
+            "start_time": f"{turn_start * 0.4:.3f}",
+            "end_time": f"{turn[-1] * 0.4 + 0.3:.3f}",
+            "speaker_label": speaker,
+            "items": [{"start_time": f"{w * 0.4:.3f}", "speaker_label": speaker} for w in turn],
+        })
+    for w in range(words):
+        offset = rng.uniform(-jitter, jitter)
+        items.append({"start_time": f"{w * 0.4 + offset:.3f}", "end_time": f"{w * 0.4 + offset + 0.3:.3f}"})
+    return segments, items
+
+
+def legacy(segments, items):
+    speaker_map = {}
+    for segment in segments:
+        for item in segment["items"]:
+            speaker_map[item["start_time"]] = segment["speaker_label"]
+    return [speaker_map.get(item["start_time"]) for item in items]
+
+
+def aligned(segments, items):
+    aligner = SpeakerAligner()
+    for segment in segments:
+        aligner.add(segment)
+    return [aligner.speaker_for_item(item) for item in items]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--palabras", type=int, default=300000)
+    parser.add_argument("--jitter", type=float, default=0.02,
+                        help="desfase máximo (s) entre items y segmentos")
+    args = parser.parse_args()
+
+    segments, items = build(args.palabras, jitter=args.jitter)
+    print(f"{'impl':>10} {'palabras/s':>12} {'sin hablante':>13}")
+    for name, fn in (("original", legacy), ("intervalos", aligned)):
+        start = time.perf_counter()
+        speakers = fn(segments, items)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>10} {len(items) / elapsed:>12,.0f} {speakers.count(None):>13}")
+
+
+if __name__ == "__main__":
+    main()
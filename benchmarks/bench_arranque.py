@@ -0,0 +1,119 @@
+"""
+Cold start de cada handler: tiempo de import y del primer request, en un
+intérprete nuevo por medición.
+
+    python -m benchmarks.bench_arranque --repeticiones 5
+    python -m benchmarks.bench_arranque --max-import-ms 400   # falla si alguno se pasa
+    python -m benchmarks.bench_arranque --detalle             # módulos que más tardan en importarse
+
+El primer request usa una ruta que no llama a AWS (clave inválida, record
+ignorado o evento vacío), así se mide el costo propio del handler. "perezoso" es el modo
+normal; "inicializado" simula SnapStart/provisioned concurrency
+(AWS_LAMBDA_INITIALIZATION_TYPE), donde `clientes.prepare` crea los clientes
+al importar, como hacían antes los handlers.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+EVENTS = {
+    "transcribir": {"body": json.dumps({"s3": {"bucketName": "b", "key": "otra/carpeta.wav"},
+                                        "transcribe": {"languageCode": "es-ES", "maxSpeakers": 2}})},
+    "formatear": {"Records": [{"s3": {"bucket": {"name": "b"}, "object": {"key": "otra/carpeta.txt"}}}]},
+    # resumir no filtra claves (lo hace la notificación de S3): evento sin records
+    "resumir": {"Records": []},
+}
+
+_PROBE = """
+import json, logging, sys, time
+t0 = time.perf_counter()
+from tests.unit.lambda_loader import load_lambda
+module = load_lambda(sys.argv[1])
+t1 = time.perf_counter()
+logging.getLogger().setLevel(logging.WARNING)
+module.lambda_handler(json.loads(sys.argv[2]), None)
+t2 = time.perf_counter()
+from comun import clientes
+created = clientes.created()
+t3 = time.perf_counter()
+clientes.client("s3")
+t4 = time.perf_counter()
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "request_ms": (t2 - t1) * 1000,
+                  "first_client_ms": (t4 - t3) * 1000, "created": created}))
+"""
+
+
+def _env(initialized):
+    env = dict(os.environ)
+    # Credenciales falsas: sin ellas botocore consulta el metadata service al crear un cliente
+    env.update({"AWS_ACCESS_KEY_ID": "test", "AWS_SECRET_ACCESS_KEY": "test", "AWS_REGION": "us-east-1",
+                "AWS_DEFAULT_REGION": "us-east-1", "BUCKET": "bucket-de-pruebas",
+                "JOBS_TABLE": "tabla-de-pruebas"})
+    env.pop("AWS_LAMBDA_INITIALIZATION_TYPE", None)
+    if initialized:
+        env["AWS_LAMBDA_INITIALIZATION_TYPE"] = "provisioned-concurrency"
+    return env
+
+
+def measure(handler, initialized=False):
+    """Una medición en un proceso nuevo: import_ms, request_ms, first_client_ms y clientes creados."""
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE, handler, json.dumps(EVENTS[handler])],
+        cwd=ROOT, env=_env(initialized), capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def import_detail(handler, top=10):
+    """Módulos con mayor tiempo acumulado de import según `python -X importtime`."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c",
+         f"from tests.unit.lambda_loader import load_lambda; load_lambda({handler!r})"],
+        cwd=ROOT, env=_env(False), capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--max-import-ms", type=float, help="umbral de regresión del import (modo perezoso)")
+    parser.add_argument("--detalle", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{'handler':>12} {'modo':>13} {'import ms':>10} {'request ms':>11} {'1er cliente ms':>15} clientes al arrancar")
+    exceeded = []
+    for handler in EVENTS:
+        for initialized in (False, True):
+            runs = [measure(handler, initialized) for _ in range(args.repeticiones)]
+            import_ms = statistics.median(r["import_ms"] for r in runs)
+            request_ms = statistics.median(r["request_ms"] for r in runs)
+            client_ms = statistics.median(r["first_client_ms"] for r in runs)
+            mode = "inicializado" if initialized else "perezoso"
+            print(f"{handler:>12} {mode:>13} {import_ms:>10.1f} {request_ms:>11.1f} {client_ms:>15.1f} "
+                  f"{', '.join(runs[0]['created']) or '-'}")
+            if not initialized and args.max_import_ms and import_ms > args.max_import_ms:
+                exceeded.append(f"{handler}: {import_ms:.0f} ms")
+        if args.detalle:
+            for cumulative, name in import_detail(handler):
+                print(f"{'':>14}{cumulative / 1000:>9.1f} ms  {name}")
+
+    if exceeded:
+        print(f"Import por encima de {args.max_import_ms:.0f} ms: {'; '.join(exceeded)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,639 @@
+"""
+Throughput del pipeline completo (transcribir -> formatear -> resumir) con
+N jobs concurrentes, sin AWS.
+
+    python -m benchmarks.bench_carga --jobs 50 --minutos 5 30
+    python -m benchmarks.bench_carga --modo fusionado --bedrock-rps 1 --guardar base.json
+    python -m benchmarks.bench_carga --jobs 50 --comparar base.json
+
+Los handlers reales corren contra un S3, un Transcribe y un Bedrock
+locales. Cada objeto escrito en el S3 local dispara las notificaciones que
+arma el stack (ROUTES): las de formatear y resumir pasan por un queue con
+el batchSize, la ventana, el maxConcurrency y el maxReceiveCount del stack
+(STAGE_QUEUES) y las de los segmentos van directo a transcribir. El
+generador sube N grabaciones sintéticas (duración al azar entre --minutos)
+y pide cada transcripción por la ruta de la API, repartidas en --rampa-s.
+
+Los tiempos de infraestructura (latencia de S3 y Bedrock, duración de
+Transcribe, ventanas de batching, visibilidad de los queues, demora de las
+notificaciones) se dan en valores reales y se multiplican por --escala
+para que una corrida dure segundos; el cómputo de los handlers corre a
+velocidad real y los backoffs de reintento de resumir no se escalan. Los
+números sirven para comparar corridas con la misma configuración
+(--guardar / --comparar), no como tiempos de producción.
+
+Reporta jobs por minuto, p50/p95/p99 de cada fase de la línea de tiempo de
+los jobs (instrumentacion.timeline) y de cada invocación, throttles, DLQ y
+memoria pico: RSS del proceso y, con --tracemalloc, el heap de Python.
+"""
+import argparse
+import hashlib
+import io
+import json
+import logging
+import random
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import ExitStack, redirect_stdout
+from datetime import datetime, timezone
+from urllib.parse import quote_plus
+
+from botocore.exceptions import ClientError
+
+from benchmarks.bench_formatear_salida import build_transcript
+from benchmarks.bench_modo_pipeline import _patched
+from tests.unit.lambda_loader import load_lambda
+
+transcribir = load_lambda("transcribir")
+formatear = load_lambda("formatear")
+resumir = load_lambda("resumir")
+
+from comun import estado, instrumentacion, registros  # noqa: E402
+from retries import RateLimiter  # noqa: E402
+
+BUCKET = transcribir.output_bucket
+
+# Notificaciones del bucket por modo: (prefijo, sufijo, etapa). Las etapas con
+# queue reciben por SQS y el resto directo. Iguales a las del stack (lo
+# verifica el test del stack)
+ROUTES = {
+    "dos-etapas": (
+        ("transcripciones/", ".json", "formatear"),
+        ("transcripciones-segmentos/", ".json", "transcribir"),
+        ("transcripciones-formateadas/", ".txt", "resumir"),
+    ),
+    "fusionado": (
+        ("transcripciones/", ".json", "resumir"),
+        ("transcripciones-segmentos/", ".json", "transcribir"),
+    ),
+}
+
+# colas_etapas_default del stack y timeout de las funciones (la visibilidad es 6 veces el timeout)
+STAGE_QUEUES = {
+    "formatear": {"batchSize": 10, "batchingWindowSeconds": 5, "maxConcurrency": 10, "maxReceiveCount": 3},
+    "resumir": {"batchSize": 4, "batchingWindowSeconds": 10, "maxConcurrency": 2, "maxReceiveCount": 5},
+}
+FUNCTION_TIMEOUT_SECONDS = 300
+
+WORDS_PER_MINUTE = 150
+PERCENTILES = (50, 95, 99)
+
+
+def _client_error(code, operation):
+    return ClientError({"Error": {"Code": code, "Message": code}}, operation)
+
+
+def percentiles(values):
+    values = sorted(values)
+    return {f"p{p}": values[min(len(values) - 1, int(p / 100 * len(values)))] if values else None
+            for p in PERCENTILES}
+
+
+def _headers(kwargs):
+    """Lo que S3 guarda con el objeto y devuelve en GET/HEAD (Content-Encoding de ARTIFACT_ENCODING)."""
+    return {name: kwargs[name] for name in ("ContentEncoding", "Metadata") if name in kwargs}
+
+
+class LocalS3:
+    """S3 en memoria con latencia por request y ancho de banda; cada objeto creado llama a `on_created`."""
+
+    def __init__(self, request_ms=25, mbps=80, scale=1.0, on_created=None):
+        self.objects = {}  # key -> (body, LastModified, ETag, {ContentEncoding, Metadata})
+        self.on_created = on_created
+        self.requests = 0
+        self._request_s = request_ms / 1000 * scale
+        self._bytes_per_s = mbps * 1e6 / scale
+        self._uploads = {}
+        self._lock = threading.Lock()
+
+    def _wait(self, size=0):
+        with self._lock:
+            self.requests += 1
+        time.sleep(self._request_s + size / self._bytes_per_s)
+
+    def store(self, key, body, headers=None):
+        """Escritura sin latencia (la hace otro servicio, p. ej. Transcribe) que también notifica."""
+        body = body.encode("utf-8") if isinstance(body, str) else bytes(body)
+        with self._lock:
+            self.objects[key] = (body, datetime.now(timezone.utc), f'"{hashlib.md5(body).hexdigest()}"', headers or {})
+        if self.on_created is not None:
+            self.on_created(key)
+
+    def raw(self, key):
+        return self.objects[key][0]
+
+    def head_object(self, Bucket, Key):
+        self._wait()
+        if Key not in self.objects:
+            raise _client_error("404", "HeadObject")
+        body, modified, etag, headers = self.objects[Key]
+        return {"ContentLength": len(body), "LastModified": modified, "ETag": etag, **headers}
+
+    def get_object(self, Bucket, Key, Range=None):
+        if Key not in self.objects:
+            self._wait()
+            raise _client_error("NoSuchKey", "GetObject")
+        body, modified, etag, headers = self.objects[Key]
+        if Range:
+            start, end = Range[len("bytes="):].split("-")
+            body = body[int(start):int(end) + 1]
+        self._wait(len(body))
+        return {"Body": io.BytesIO(body), "ContentLength": len(body), "LastModified": modified, "ETag": etag,
+                **headers}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self._wait(len(Body))
+        self.store(Key, Body, _headers(kwargs))
+
+    def delete_object(self, Bucket, Key):
+        self._wait()
+        with self._lock:
+            self.objects.pop(Key, None)
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        self._wait()
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self._uploads[upload_id] = ({}, _headers(kwargs))
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self._wait(len(Body))
+        with self._lock:
+            self._uploads[UploadId][0][PartNumber] = bytes(Body)
+        return {"ETag": f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self._wait()
+        with self._lock:
+            parts, headers = self._uploads.pop(UploadId)
+        self.store(Key, b"".join(parts[p["PartNumber"]] for p in MultipartUpload["Parts"]), headers)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self._wait()
+        with self._lock:
+            self._uploads.pop(UploadId, None)
+
+
+class LocalTranscribe:
+    """
+    Transcribe local: cada job tarda `startup_s` más la duración del audio por
+    `realtime_factor` y al terminar escribe su JSON en el S3 local. Pasado
+    `max_concurrent` jobs en curso rechaza con LimitExceededException.
+    """
+
+    def __init__(self, s3, realtime_factor=0.3, startup_s=15, max_concurrent=100, scale=1.0):
+        self.s3 = s3
+        self.realtime_factor = realtime_factor
+        self.startup_s = startup_s
+        self.max_concurrent = max_concurrent
+        self.scale = scale
+        self.jobs = {}  # nombre -> status
+        self.running = 0
+        self.peak = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def start_transcription_job(self, TranscriptionJobName, Media, OutputKey, **kwargs):
+        with self._lock:
+            if TranscriptionJobName in self.jobs:
+                raise _client_error("ConflictException", "StartTranscriptionJob")
+            if self.running >= self.max_concurrent:
+                self.rejected += 1
+                raise _client_error("LimitExceededException", "StartTranscriptionJob")
+            self.jobs[TranscriptionJobName] = "IN_PROGRESS"
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        # El "audio" sintético es la descripción de la grabación
+        spec = json.loads(self.s3.raw(Media["MediaFileUri"].split("/", 3)[3]))
+        seconds = (self.startup_s + spec["seconds"] * self.realtime_factor) * self.scale
+        timer = threading.Timer(seconds, self._finish, (TranscriptionJobName, OutputKey, spec["words"]))
+        timer.daemon = True
+        timer.start()
+
+    def _finish(self, job_name, output_key, words):
+        transcript = build_transcript(words)
+        with self._lock:
+            self.jobs[job_name] = "COMPLETED"
+            self.running -= 1
+        self.s3.store(output_key, transcript)
+
+    def get_transcription_job(self, TranscriptionJobName):
+        if TranscriptionJobName not in self.jobs:
+            raise _client_error("BadRequestException", "GetTranscriptionJob")
+        return {"TranscriptionJob": {"TranscriptionJobName": TranscriptionJobName,
+                                     "TranscriptionJobStatus": self.jobs[TranscriptionJobName]}}
+
+    def list_transcription_jobs(self, Status=None, JobNameContains="", MaxResults=100, NextToken=None):
+        with self._lock:
+            names = [name for name, status in self.jobs.items()
+                     if (Status is None or status == Status) and JobNameContains in name]
+        start = int(NextToken or 0)
+        response = {"TranscriptionJobSummaries": [
+            {"TranscriptionJobName": name, "TranscriptionJobStatus": self.jobs[name]}
+            for name in names[start:start + MaxResults]
+        ]}
+        if start + MaxResults < len(names):
+            response["NextToken"] = str(start + MaxResults)
+        return response
+
+
+class LocalBedrock:
+    """
+    Bedrock local: cada llamada tarda `call_ms` más un costo por token de
+    entrada y de salida. Pasada la cuota (`rps`, ráfaga `burst`) responde
+    ThrottlingException.
+    """
+
+    def __init__(self, rps=2, burst=4, call_ms=400, input_token_ms=0.2, output_tokens=300,
+                 output_token_ms=20, scale=1.0):
+        self.rate = rps / scale
+        self.burst = burst
+        self.call_ms = call_ms
+        self.input_token_ms = input_token_ms
+        self.output_tokens = output_tokens
+        self.output_token_ms = output_token_ms
+        self.scale = scale
+        self.calls = 0
+        self.throttled = 0
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                self.throttled += 1
+                return False
+            self._tokens -= 1
+            self.calls += 1
+            return True
+
+    def invoke_model(self, modelId, contentType, accept, body):
+        if not self._take():
+            raise _client_error("ThrottlingException", "InvokeModel")
+        input_tokens = len(json.loads(body)["prompt"]) // 4
+        ms = self.call_ms + input_tokens * self.input_token_ms + self.output_tokens * self.output_token_ms
+        time.sleep(ms / 1000 * self.scale)
+        generation = "- punto del resumen\n" * max(1, self.output_tokens // 5)
+        return {"body": io.BytesIO(json.dumps({"generation": generation}).encode("utf-8"))}
+
+
+class StageQueue:
+    """
+    Queue SQS con el event source mapping de una etapa: hasta
+    `maxConcurrency` invocaciones en paralelo, cada una con hasta
+    `batchSize` mensajes juntados durante la ventana de batching. Los
+    mensajes de batchItemFailures vuelven al vencer la visibilidad y,
+    agotado `maxReceiveCount`, pasan a la DLQ.
+    """
+
+    def __init__(self, invoke, config, visibility_s, scale=1.0):
+        self.invoke = invoke
+        self.batch_size = config["batchSize"]
+        self.window = config["batchingWindowSeconds"] * scale
+        self.max_receive = config["maxReceiveCount"]
+        self.visibility = visibility_s * scale
+        self.messages = []
+        self.dlq = []
+        self.batches = 0
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._workers = [threading.Thread(target=self._poll, daemon=True) for _ in range(config["maxConcurrency"])]
+        for worker in self._workers:
+            worker.start()
+
+    def send(self, body):
+        with self._cond:
+            self.messages.append({"messageId": uuid.uuid4().hex, "body": body, "receives": 0, "visibleAt": 0.0})
+            self._cond.notify_all()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        for worker in self._workers:
+            worker.join()
+
+    def _receive(self):
+        """Espera un mensaje visible y junta hasta `batch_size` o hasta que vence la ventana."""
+        first_seen = None
+        while not self._stopped:
+            now = time.monotonic()
+            visible = [m for m in self.messages if m["visibleAt"] <= now]
+            if visible and first_seen is None:
+                first_seen = now
+            if visible and (len(visible) >= self.batch_size or now >= first_seen + self.window):
+                batch = visible[:self.batch_size]
+                for message in batch:
+                    message["receives"] += 1
+                    message["visibleAt"] = now + self.visibility
+                return batch
+            if visible:
+                timeout = first_seen + self.window - now
+            else:
+                # Sin visibles: esperar un envío o que vuelva un mensaje devuelto
+                hidden = [m["visibleAt"] for m in self.messages]
+                timeout = min(hidden) - now if hidden else None
+            self._cond.wait(timeout)
+        return None
+
+    def _poll(self):
+        while True:
+            with self._cond:
+                batch = self._receive()
+            if batch is None:
+                return
+            event = {"Records": [{
+                "eventSource": "aws:sqs",
+                "messageId": message["messageId"],
+                "body": message["body"],
+                "attributes": {"ApproximateReceiveCount": str(message["receives"])},
+            } for message in batch]}
+            try:
+                response = self.invoke(event)
+                failed = {item["itemIdentifier"] for item in response.get("batchItemFailures", [])}
+            except Exception:
+                failed = {message["messageId"] for message in batch}
+            with self._cond:
+                self.batches += 1
+                for message in batch:
+                    if message["messageId"] not in failed:
+                        self.messages.remove(message)
+                    elif message["receives"] >= self.max_receive:
+                        self.messages.remove(message)
+                        self.dlq.append(message)
+                self._cond.notify_all()
+
+
+def _s3_event(key):
+    return {"Records": [{"eventSource": "aws:s3", "eventName": "ObjectCreated:Put",
+                         "s3": {"bucket": {"name": BUCKET}, "object": {"key": quote_plus(key, safe="/")}}}]}
+
+
+def _recordings(jobs, minutes, seed):
+    rng = random.Random(seed)
+    for _ in range(jobs):
+        seconds = rng.uniform(*minutes) * 60
+        yield {"seconds": round(seconds, 1), "words": max(1, int(seconds / 60 * WORDS_PER_MINUTE))}
+
+
+def _final(record, stage_after_transcribe):
+    stages = (record or {}).get("stages", {})
+    summary = stages.get(estado.RESUMIR, {}).get("status")
+    return summary in (estado.COMPLETED, estado.FAILED) or \
+        stages.get(estado.TRANSCRIBIR, {}).get("status") == estado.FAILED and stage_after_transcribe not in stages
+
+
+def simulate(jobs=20, mode="dos-etapas", minutes=(5, 30), ramp_s=0.0, users=10, scale=0.01,
+             s3_ms=25, s3_mbps=80, notification_ms=400, transcribe_factor=0.3, transcribe_startup_s=15,
+             transcribe_max=100, bedrock_rps=2, bedrock_call_ms=400, bedrock_output_tokens=300,
+             queues=None, timeout_s=300, seed=7, trace_memory=False):
+    """
+    Corre N jobs por el pipeline local y devuelve un dict con throughput,
+    percentiles por fase y por invocación, throttles, DLQ y memoria pico.
+    Las duraciones de las fases e invocaciones están en ms reales (escalados).
+    """
+    queues = {name: {**config, **(queues or {}).get(name, {})} for name, config in STAGE_QUEUES.items()}
+    invocations = {"transcribir": [], "formatear": [], "resumir": []}
+    stage_queues = {}
+
+    def invoker(name, handler):
+        def invoke(event):
+            start = time.perf_counter()
+            try:
+                return handler(event, None)
+            finally:
+                invocations[name].append((time.perf_counter() - start) * 1000)
+        return invoke
+
+    invoke = {name: invoker(name, module.lambda_handler)
+              for name, module in (("transcribir", transcribir), ("formatear", formatear), ("resumir", resumir))}
+
+    def notify(key):
+        for prefix, suffix, stage in ROUTES[mode]:
+            if key.startswith(prefix) and key.endswith(suffix):
+                event = _s3_event(key)
+                if stage in stage_queues:
+                    action, args = stage_queues[stage].send, (json.dumps(event),)
+                else:
+                    # Destino Lambda: invocación asíncrona
+                    action, args = invoke[stage], (event,)
+                timer = threading.Timer(notification_ms / 1000 * scale, action, args)
+                timer.daemon = True
+                timer.start()
+
+    s3 = LocalS3(s3_ms, s3_mbps, scale, on_created=notify)
+    transcribe = LocalTranscribe(s3, transcribe_factor, transcribe_startup_s, transcribe_max, scale)
+    bedrock = LocalBedrock(bedrock_rps, call_ms=bedrock_call_ms, output_tokens=bedrock_output_tokens, scale=scale)
+    store = estado.MemoryJobStateStore()
+    # resumir tiene el limitador configurado en la cuota (BEDROCK_MAX_RPS del deploy)
+    limiter = RateLimiter(rate=bedrock_rps / scale, burst=resumir.bedrock_limiter._burst,
+                          max_in_flight=resumir.bedrock_limiter._in_flight._initial_value)
+
+    submitted, rejected = {}, []
+    submit_lock = threading.Lock()
+
+    def submit(n, spec):
+        key = f"audios/usuario-{n % users}/grabacion-{n:05d}.mp3"
+        s3.put_object(Bucket=BUCKET, Key=key, Body=json.dumps(spec).encode("utf-8"))
+        body = {"s3": {"bucketName": BUCKET, "key": key},
+                "transcribe": {"languageCode": "es-ES", "maxSpeakers": 3}}
+        for attempt in range(8):
+            response = invoke["transcribir"]({"body": json.dumps(body)})
+            if response["statusCode"] < 300:
+                with submit_lock:
+                    submitted[json.loads(response["body"])["jobName"]] = spec
+                return
+            # Sin control de admisión Transcribe rechaza pasado el tope: el cliente reintenta con backoff
+            time.sleep(min(300, 15 * 2 ** attempt) * scale)
+        with submit_lock:
+            rejected.append(key)
+
+    with ExitStack() as stack:
+        stack.enter_context(redirect_stdout(io.StringIO()))  # líneas EMF
+        stack.enter_context(_patched(transcribir, s3_client=s3, transcribe_client=transcribe, job_state=store,
+                                     ADMISSION_QUEUE_URL=None, LONG_AUDIO_MIN_BYTES=0))
+        stack.enter_context(_patched(formatear, s3_client=s3, job_state=store))
+        stack.enter_context(_patched(resumir, s3=s3, bedrock=bedrock, job_state=store, summary_cache=None,
+                                     SUMMARY_STREAMING=False, bedrock_limiter=limiter))
+        # En el stack cada función tiene su STAGE_MAX_RECEIVE_COUNT; acá comparten registros
+        # y sólo resumir lo consulta (final_attempt)
+        stack.enter_context(_patched(registros, MAX_RECEIVE_COUNT=queues["resumir"]["maxReceiveCount"]))
+        if trace_memory:
+            tracemalloc.start()
+            stack.callback(tracemalloc.stop)
+
+        for stage in {stage for _, _, stage in ROUTES[mode]} & set(queues):
+            stage_queues[stage] = StageQueue(invoke[stage], queues[stage], 6 * FUNCTION_TIMEOUT_SECONDS, scale)
+            stack.callback(stage_queues[stage].stop)
+
+        rng = random.Random(seed)
+        start = time.monotonic()
+        senders = []
+        for n, spec in enumerate(_recordings(jobs, minutes, seed)):
+            sender = threading.Timer(rng.uniform(0, ramp_s) * scale, submit, (n, spec))
+            sender.daemon = True
+            sender.start()
+            senders.append(sender)
+        for sender in senders:
+            sender.join()
+
+        # Hasta que cada job tenga resumen (o falle) o se venza el tiempo
+        after_transcribe = estado.RESUMIR if mode == "fusionado" else estado.FORMATEAR
+        in_dlq = set()
+        deadline = start + timeout_s
+        while time.monotonic() < deadline:
+            for queue in stage_queues.values():
+                in_dlq.update(estado.job_name_from_key(json.loads(m["body"])["Records"][0]["s3"]["object"]["key"])
+                              for m in queue.dlq)
+            if all(name in in_dlq or _final(store.get(name), after_transcribe) for name in submitted):
+                break
+            time.sleep(0.02)
+        elapsed = time.monotonic() - start
+
+        peak_heap = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        dlq = {stage: len(queue.dlq) for stage, queue in stage_queues.items()}
+        batches = {stage: queue.batches for stage, queue in stage_queues.items()}
+
+    phases, end_to_end, completed, failed = {}, [], 0, 0
+    for name in submitted:
+        record = store.get(name)
+        status = ((record or {}).get("stages", {}).get(estado.RESUMIR) or {}).get("status")
+        if status == estado.COMPLETED:
+            completed += 1
+            line = instrumentacion.timeline(record)
+            for phase, ms in line["phasesMs"].items():
+                phases.setdefault(phase, []).append(ms)
+            end_to_end.append(line["totalMs"])
+        elif status == estado.FAILED or name in in_dlq or _final(record, after_transcribe):
+            failed += 1
+
+    return {
+        "mode": mode,
+        "jobs": jobs,
+        "completed": completed,
+        "failed": failed,
+        "rejected": len(rejected),
+        "unfinished": len(submitted) - completed - failed,
+        "seconds": round(elapsed, 3),
+        "jobsPerMinute": completed / elapsed * 60 if elapsed else 0.0,
+        "phasesMs": {**{phase: percentiles(values) for phase, values in phases.items()},
+                     "endToEndMs": percentiles(end_to_end)},
+        "invocationsMs": {name: {"count": len(values), **percentiles(values)}
+                          for name, values in invocations.items()},
+        "batches": batches,
+        "dlq": dlq,
+        "throttles": {"transcribe": transcribe.rejected, "bedrock": bedrock.throttled},
+        "transcribePeak": transcribe.peak,
+        "bedrockCalls": bedrock.calls,
+        "s3Requests": s3.requests,
+        # ru_maxrss está en KB en Linux; es el pico del proceso desde que arrancó
+        "peakRssMb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "peakHeapMb": peak_heap / 1024 / 1024 if peak_heap is not None else None,
+    }
+
+
+def flatten(results):
+    """Métricas numéricas comparables entre corridas: {"phasesMs.formatMs.p95": ..., ...}."""
+    flat = {}
+
+    def walk(prefix, value):
+        if isinstance(value, dict):
+            for key, inner in value.items():
+                walk(f"{prefix}.{key}" if prefix else key, inner)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[prefix] = value
+
+    walk("", results)
+    return flat
+
+
+def compare(baseline, results):
+    """(métrica, base, actual, cambio relativo) de las métricas presentes en las dos corridas."""
+    base, current = flatten(baseline), flatten(results)
+    rows = []
+    for name in sorted(base.keys() & current.keys()):
+        change = (current[name] - base[name]) / base[name] if base[name] else None
+        rows.append((name, base[name], current[name], change))
+    return rows
+
+
+def _report(results):
+    print(f"modo {results['mode']}: {results['completed']}/{results['jobs']} jobs completos en "
+          f"{results['seconds']:.1f} s -> {results['jobsPerMinute']:.1f} jobs/min "
+          f"(fallidos {results['failed']}, rechazados {results['rejected']}, sin terminar {results['unfinished']})")
+    print(f"\n{'fase':>22} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for phase, stats in results["phasesMs"].items():
+        if stats["p50"] is not None:
+            print(f"{phase:>22} {stats['p50']:>10.1f} {stats['p95']:>10.1f} {stats['p99']:>10.1f}")
+    print(f"\n{'invocación':>22} {'n':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for name, stats in results["invocationsMs"].items():
+        if stats["count"]:
+            print(f"{name:>22} {stats['count']:>6} {stats['p50']:>10.1f} {stats['p95']:>10.1f} {stats['p99']:>10.1f}")
+    print(f"\nbatches {results['batches']}, DLQ {results['dlq']}, throttles {results['throttles']}, "
+          f"pico Transcribe {results['transcribePeak']}, llamadas a Bedrock {results['bedrockCalls']}, "
+          f"requests S3 {results['s3Requests']}")
+    heap = f", heap Python pico {results['peakHeapMb']:.1f} MB" if results["peakHeapMb"] is not None else ""
+    print(f"memoria: RSS pico {results['peakRssMb']:.1f} MB{heap}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--modo", choices=tuple(ROUTES), default="dos-etapas")
+    parser.add_argument("--minutos", type=float, nargs=2, default=[5, 30], help="duración mínima y máxima del audio")
+    parser.add_argument("--rampa-s", type=float, default=0, help="segundos en los que se reparten los envíos")
+    parser.add_argument("--usuarios", type=int, default=10)
+    parser.add_argument("--escala", type=float, default=0.01, help="factor de los tiempos de infraestructura")
+    parser.add_argument("--s3-ms", type=float, default=25)
+    parser.add_argument("--s3-mbps", type=float, default=80)
+    parser.add_argument("--notificacion-ms", type=float, default=400)
+    parser.add_argument("--transcribe-factor", type=float, default=0.3, help="segundos de Transcribe por segundo de audio")
+    parser.add_argument("--transcribe-arranque-s", type=float, default=15)
+    parser.add_argument("--transcribe-max", type=int, default=100, help="jobs de Transcribe en paralelo")
+    parser.add_argument("--bedrock-rps", type=float, default=2, help="cuota de Bedrock (y del limitador de resumir)")
+    parser.add_argument("--bedrock-ms", type=float, default=400, help="latencia base por llamada")
+    parser.add_argument("--bedrock-tokens", type=int, default=300, help="tokens de salida por llamada")
+    parser.add_argument("--colas", type=json.loads, default=None, help='como el contexto stageQueues, p. ej. '
+                        '\'{"resumir": {"maxConcurrency": 4}}\'')
+    parser.add_argument("--timeout-s", type=float, default=300, help="espera máxima (real) de la corrida")
+    parser.add_argument("--semilla", type=int, default=7)
+    parser.add_argument("--tracemalloc", action="store_true", help="mide el heap de Python (más lento)")
+    parser.add_argument("--guardar", help="escribe los resultados en este JSON (línea de base)")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior contra el que comparar")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = simulate(
+        args.jobs, args.modo, tuple(args.minutos), args.rampa_s, args.usuarios, args.escala,
+        s3_ms=args.s3_ms, s3_mbps=args.s3_mbps, notification_ms=args.notificacion_ms,
+        transcribe_factor=args.transcribe_factor, transcribe_startup_s=args.transcribe_arranque_s,
+        transcribe_max=args.transcribe_max, bedrock_rps=args.bedrock_rps, bedrock_call_ms=args.bedrock_ms,
+        bedrock_output_tokens=args.bedrock_tokens, queues=args.colas, timeout_s=args.timeout_s,
+        seed=args.semilla, trace_memory=args.tracemalloc,
+    )
+    _report(results)
+
+    if args.guardar:
+        with open(args.guardar, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+    if args.comparar:
+        with open(args.comparar) as f:
+            baseline = json.load(f)["results"]
+        print(f"\n{'métrica':>40} {'base':>12} {'actual':>12} {'cambio':>8}")
+        for name, base, current, change in compare(baseline, results):
+            print(f"{name:>40} {base:>12.1f} {current:>12.1f} {'' if change is None else f'{change:+.1%}':>8}")
+    if results["unfinished"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Latencia de consultar N jobs: N llamadas a checkStatus en serie (como hace
+hoy un dashboard) contra una sola llamada a checkStatusBatch.
+
+    python -m benchmarks.bench_check_status_batch --jobs 1 10 50 100 --latencia-ms 30
+
+Los clientes de Transcribe y S3 son stubs que sólo esperan `--latencia-ms`
+por llamada; no se mide API Gateway.
+"""
+import argparse
+import json
+import time
+
+from botocore.exceptions import ClientError
+
+from tests.unit.lambda_loader import load_lambda
+
+transcribir = load_lambda("transcribir")
+
+
+class _StubTranscribe:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def get_transcription_job(self, TranscriptionJobName):
+        time.sleep(self.latency)
+        return {"TranscriptionJob": {"TranscriptionJobStatus": "COMPLETED"}}
+
+
+class _StubS3:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def head_object(self, Bucket, Key):
+        time.sleep(self.latency)
+        if Key.startswith("resumenes/"):
+            raise ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, "HeadObject")
+        return {}
+
+    def get_object(self, Bucket, Key):
+        time.sleep(self.latency)
+        raise ClientError({"Error": {"Code": "NoSuchKey", "Message": ""}}, "GetObject")
+
+
+def serial(job_names):
+    for name in job_names:
+        transcribir.lambda_handler({"checkStatus": {"job_name": name}}, None)
+
+
+def batched(job_names):
+    response = transcribir.lambda_handler({"checkStatusBatch": {"job_names": job_names}}, None)
+    assert json.loads(response["body"])["complete"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 10, 50, 100])
+    parser.add_argument("--latencia-ms", type=float, default=30.0)
+    parser.add_argument("--workers", type=int, default=transcribir.BATCH_MAX_WORKERS)
+    args = parser.parse_args()
+
+    latency = args.latencia_ms / 1000
+    transcribir.transcribe_client = _StubTranscribe(latency)
+    transcribir.s3_client = _StubS3(latency)
+    transcribir.BATCH_MAX_WORKERS = args.workers
+    transcribir.BATCH_TIMEOUT_SECONDS = 60
+
+    print(f"{'jobs':>6} {'serie (ms)':>11} {'batch (ms)':>11} {'aceleración':>12}")
+    for n in args.jobs:
+        names = [f"job-{i}" for i in range(n)]
+        timings = []
+        for fn in (serial, batched):
+            start = time.perf_counter()
+            fn(names)
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"{n:>6} {timings[0]:>11,.0f} {timings[1]:>11,.0f} {timings[0] / timings[1]:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Carga de la transcripción en columnas (.cols) contra el JSON de Transcribe,
+sobre transcripciones sintéticas de 10 minutos a 10 horas.
+
+    python -m benchmarks.bench_columnas --minutos 10 60 600
+    python -m benchmarks.bench_columnas --perfil entrevista --rondas 5
+
+Con los bytes del objeto ya en memoria (lo que devuelve get_object) mide,
+para cada formato, el tiempo y el pico de memoria asignada (tracemalloc) de
+cargarlo y de una consulta típica de una etapa posterior: el texto de un
+hablante en una ventana de 5 minutos a mitad del audio. El JSON necesita
+json.loads y alinear los items con los segmentos; las columnas son vistas
+sobre el buffer (memoryview, o NumPy si está instalado). También muestra lo
+que le agrega a formatear armar las columnas mientras formatea.
+"""
+import argparse
+import io
+import json
+import time
+import tracemalloc
+
+from benchmarks.transcribe_sintetico import PROFILES, from_profile
+from tests.unit.lambda_loader import load_lambda
+
+load_lambda("formatear")
+
+from comun import formato  # noqa: E402
+from comun.columnas import ColumnBuilder, Columns, _numpy  # noqa: E402
+from comun.speaker_alignment import SpeakerAligner  # noqa: E402
+
+SPEAKER = "spk_1"
+WINDOW_S = 300
+
+
+def json_query(raw, t0, t1):
+    results = json.loads(raw)["results"]
+    aligner = SpeakerAligner()
+    for segment in results["speaker_labels"]["segments"]:
+        aligner.add(segment)
+    words = []
+    for item in results["items"]:
+        if item["type"] == "pronunciation" and t0 <= float(item["start_time"]) < t1 \
+                and aligner.speaker_for_item(item) == SPEAKER:
+            words.append(item["alternatives"][0]["content"])
+    return len(words)
+
+
+def columns_query(data, t0, t1):
+    cols = Columns(data)
+    i, j = cols.time_range(t0, t1)
+    return sum(len(cols.span(a, b).split()) for speaker, a, b in cols.turns(i, j) if speaker == SPEAKER)
+
+
+def numpy_query(data, t0, t1):
+    cols = Columns(data)
+    arrays = cols.numpy()
+    code = cols.speakers.index(SPEAKER)
+    mask = (arrays["start"] >= t0) & (arrays["start"] < t1) & (arrays["speaker"] == code)
+    return int(mask.sum())
+
+
+def measure(fn, *args, rounds=3):
+    """(mediana ms, pico asignado MB, resultado) de `fn(*args)`."""
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = fn(*args)
+        times.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    try:
+        fn(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return sorted(times)[len(times) // 2], peak / 1024 / 1024, result
+
+
+def format_ms(raw, columns, rounds=3):
+    times = []
+    for _ in range(rounds):
+        builder = ColumnBuilder() if columns else None
+        start = time.perf_counter()
+        for _ in formato.format_transcript(io.BytesIO(raw), columns=builder):
+            pass
+        if builder is not None:
+            builder.to_bytes()
+            builder.close()
+        times.append((time.perf_counter() - start) * 1000)
+    return sorted(times)[len(times) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--minutos", type=float, nargs="+", default=[10, 60, 600])
+    parser.add_argument("--perfil", choices=tuple(PROFILES), default="reunion")
+    parser.add_argument("--rondas", type=int, default=3)
+    args = parser.parse_args()
+    try:
+        _numpy()
+        with_numpy = True
+    except RuntimeError:
+        with_numpy = False
+        print("numpy no está instalado: se mide sólo memoryview")
+
+    print(f"{'minutos':>7} {'formato':>10} {'MB':>7} {'carga ms':>9} {'carga MB':>9} "
+          f"{'consulta ms':>12} {'consulta MB':>12} {'palabras':>9}")
+    for minutes in args.minutos:
+        raw = from_profile(args.perfil, minutes)
+        builder = ColumnBuilder()
+        for _ in formato.format_transcript(io.BytesIO(raw), columns=builder):
+            pass
+        data = builder.to_bytes()
+        builder.close()
+        t0 = max(0, minutes * 60 / 2 - WINDOW_S / 2)
+        t1 = t0 + WINDOW_S
+
+        rows = [("json", raw, lambda: json.loads(raw), lambda: json_query(raw, t0, t1)),
+                ("memoryview", data, lambda: Columns(data), lambda: columns_query(data, t0, t1))]
+        if with_numpy:
+            rows.append(("numpy", data, lambda: Columns(data).numpy(), lambda: numpy_query(data, t0, t1)))
+        for name, body, load, query in rows:
+            load_ms, load_mb, _ = measure(load, rounds=args.rondas)
+            query_ms, query_mb, words = measure(query, rounds=args.rondas)
+            print(f"{minutes:>7g} {name:>10} {len(body) / 1e6:>7.2f} {load_ms:>9.2f} {load_mb:>9.2f} "
+                  f"{query_ms:>12.2f} {query_mb:>12.2f} {words:>9}")
+
+        plain, with_columns = format_ms(raw, False, args.rondas), format_ms(raw, True, args.rondas)
+        print(f"{'':>7} formatear: {plain:.0f} ms sin columnas, {with_columns:.0f} ms con columnas "
+              f"({(with_columns - plain) / plain:+.0%})")
+
+
+if __name__ == "__main__":
+    main()
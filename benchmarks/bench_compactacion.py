@@ -0,0 +1,87 @@
+"""
+Tokens de entrada y latencia estimada de Bedrock con y sin compactación.
+
+    python -m benchmarks.bench_compactacion --turnos 2000
+    python -m benchmarks.bench_compactacion --corpus ./transcripciones-formateadas
+
+La latencia se modela como un costo fijo por llamada más un costo por token
+de entrada (prefill), con los valores de --ms-llamada y --ms-token; no se
+llama a Bedrock.
+"""
+import argparse
+import random
+from pathlib import Path
+
+from tests.unit.lambda_loader import load_lambda
+
+load_lambda("resumir")
+
+from compaction import DEFAULT_STAGES, compact  # noqa: E402
+from map_reduce import chunk_turns, split_turns  # noqa: E402
+
+_FRASES = {
+    "es": [
+        "Eh, bueno, la idea es revisar el presupuesto del trimestre.",
+        "O sea, tenemos que priorizar el equipo de datos antes de fin de mes.",
+        "Mmm, yo hablaría con finanzas para ver si hay margen en viajes.",
+        "El cliente pidió la demo para el jueves y todavía falta el reporte.",
+        "Eh, no sé si llegamos, pero podemos mover la migración a la semana que viene.",
+    ],
+    "en": [
+        "Um, so the idea is to review the budget for this quarter.",
+        "I mean, we need to prioritize the data team before the end of the month.",
+        "Uh, I would talk to finance to see if there is room in travel.",
+        "The client asked for the demo on Thursday and the report is still missing.",
+        "You know, we could move the migration to next week.",
+    ],
+}
+_ASENTIMIENTOS = {"es": ["Sí.", "Claro.", "Ok.", "Mhm.", "Dale, perfecto."], "en": ["Yeah.", "Okay.", "Right.", "Mhm."]}
+
+
+def build_corpus(turns, language, speakers=3, backchannel_ratio=0.3, seed=7):
+    rng = random.Random(seed)
+    lines, speaker = [], 0
+    for _ in range(turns):
+        if rng.random() < backchannel_ratio:
+            other = (speaker + 1) % speakers
+            lines.append(f"spk_{other}: {rng.choice(_ASENTIMIENTOS[language])}")
+        else:
+            speaker = rng.randrange(speakers) if rng.random() < 0.5 else speaker
+            body = " ".join(rng.choice(_FRASES[language]) for _ in range(rng.randint(1, 3)))
+            lines.append(f"spk_{speaker}: {body}")
+    return "\n\n".join(lines)
+
+
+def modeled_latency(text, chunk_tokens, ms_call, ms_token):
+    """Latencia del map (en paralelo cuenta la llamada más larga) más un reduce."""
+    chunks = chunk_turns(split_turns(text), chunk_tokens)
+    slowest = max(len(chunk) / 4 for chunk in chunks)
+    reduce_ms = ms_call if len(chunks) > 1 else 0
+    return len(chunks), ms_call + slowest * ms_token + reduce_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turnos", type=int, default=2000)
+    parser.add_argument("--corpus", type=Path, help="directorio con .txt de formatear")
+    parser.add_argument("--chunk-tokens", type=int, default=6000)
+    parser.add_argument("--ms-llamada", type=float, default=400.0)
+    parser.add_argument("--ms-token", type=float, default=0.15)
+    args = parser.parse_args()
+
+    if args.corpus:
+        samples = [(path.name, path.read_text(encoding="utf-8"), None) for path in sorted(args.corpus.glob("*.txt"))]
+    else:
+        samples = [(f"sintético-{lang}", build_corpus(args.turnos, lang), lang) for lang in ("es", "en")]
+
+    print(f"{'muestra':>14} {'tokens':>9} {'compact.':>9} {'ahorro':>7} {'llamadas':>9} {'ms antes':>9} {'ms después':>11}")
+    for name, text, language in samples:
+        result = compact(text, stages=DEFAULT_STAGES, language=language)
+        calls, before_ms = modeled_latency(text, args.chunk_tokens, args.ms_llamada, args.ms_token)
+        _, after_ms = modeled_latency(result.text, args.chunk_tokens, args.ms_llamada, args.ms_token)
+        print(f"{name:>14} {result.tokens_before:>9,} {result.tokens_after:>9,} {result.saved_ratio:>7.1%} "
+              f"{calls:>9} {before_ms:>9,.0f} {after_ms:>11,.0f}")
+
+
+if __name__ == "__main__":
+    main()
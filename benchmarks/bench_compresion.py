@@ -0,0 +1,91 @@
+"""
+Bytes y tiempo que ahorra comprimir los artefactos intermedios
+(ARTIFACT_ENCODING) sobre transcripciones sintéticas de 10 minutos a 10 horas.
+
+    python -m benchmarks.bench_compresion --minutos 10 60 600
+    python -m benchmarks.bench_compresion --perfil entrevista --s3-mbps 40 --codificaciones gzip
+
+Por cada artefacto (el JSON unido de transcripciones/ y el .txt de
+transcripciones-formateadas/) mide el tamaño guardado, lo que tarda
+comprimir al escribir y descomprimir en streaming al leer (con el mismo
+código que las Lambdas: comun.compresion) y el ahorro neto de un viaje
+completo: el objeto se sube una vez y se baja una vez, a `--s3-mbps`.
+Un ahorro negativo quiere decir que la CPU cuesta más que la transferencia.
+"""
+import argparse
+import io
+import time
+
+from benchmarks.transcribe_sintetico import PROFILES, from_profile
+from tests.unit.lambda_loader import load_lambda
+
+load_lambda("formatear")
+
+from comun import compresion  # noqa: E402
+from comun.formato import format_transcript  # noqa: E402
+
+
+def _available():
+    encodings = [compresion.GZIP]
+    try:
+        compresion._zstd()
+        encodings.append(compresion.ZSTD)
+    except RuntimeError:
+        pass
+    return encodings
+
+
+def measure(data, encoding, rounds=3):
+    """{"bytes", "compressMs", "decompressMs"} de `data` con `encoding` (mejor de `rounds`)."""
+    compress_s = decompress_s = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        stored = compresion.compress(data, encoding)
+        compress_s = min(compress_s, time.perf_counter() - start)
+
+        response = {"Body": io.BytesIO(stored), "ContentEncoding": encoding}
+        start = time.perf_counter()
+        # Lectura de a bloques, como el parser incremental de formatear
+        stream = compresion.open_body(response)
+        while stream.read(64 * 1024):
+            pass
+        decompress_s = min(decompress_s, time.perf_counter() - start)
+    return {"bytes": len(stored), "compressMs": compress_s * 1000, "decompressMs": decompress_s * 1000}
+
+
+def artifacts(profile, minutes):
+    """{nombre: bytes} de los dos artefactos intermedios de un job."""
+    raw = from_profile(profile, minutes)
+    text = "".join(format_transcript(io.BytesIO(raw))).encode("utf-8")
+    return {"json": raw, "txt": text}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--minutos", type=float, nargs="+", default=[10, 60, 600])
+    parser.add_argument("--perfil", choices=tuple(PROFILES), default="reunion")
+    parser.add_argument("--s3-mbps", type=float, default=80, help="ancho de banda Lambda <-> S3 por stream")
+    parser.add_argument("--codificaciones", nargs="+", choices=(compresion.GZIP, compresion.ZSTD),
+                        help="default: gzip y zstd si está instalado")
+    args = parser.parse_args()
+    encodings = args.codificaciones or _available()
+    bytes_per_ms = args.s3_mbps * 1e6 / 1000
+
+    print(f"{'minutos':>7} {'artefacto':>9} {'codif.':>6} {'MB':>8} {'guardado MB':>12} {'ratio':>6} "
+          f"{'comprimir ms':>13} {'descomprimir ms':>16} {'transfer. ms':>13} {'ahorro ms':>10}")
+    for minutes in args.minutos:
+        for name, data in artifacts(args.perfil, minutes).items():
+            plain_ms = 2 * len(data) / bytes_per_ms
+            print(f"{minutes:>7g} {name:>9} {'-':>6} {len(data) / 1e6:>8.2f} {len(data) / 1e6:>12.2f} {1:>6.1f} "
+                  f"{0:>13.1f} {0:>16.1f} {plain_ms:>13.1f} {0:>10.1f}")
+            for encoding in encodings:
+                result = measure(data, encoding)
+                transfer_ms = 2 * result["bytes"] / bytes_per_ms
+                saved_ms = plain_ms - transfer_ms - result["compressMs"] - result["decompressMs"]
+                print(f"{'':>7} {'':>9} {encoding:>6} {'':>8} {result['bytes'] / 1e6:>12.2f} "
+                      f"{len(data) / result['bytes']:>6.1f} {result['compressMs']:>13.1f} "
+                      f"{result['decompressMs']:>16.1f} {transfer_ms:>13.1f} {saved_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Compara el armado del texto en formatear: la implementación original
+(json.loads + `output_text +=` + un único put_object) contra el parser
+incremental con multipart upload.
+
+    python -m benchmarks.bench_formatear_salida --palabras 100000 500000
+"""
+import argparse
+import io
+import json
+import time
+import tracemalloc
+
+from tests.unit.lambda_loader import load_lambda
+
+formatear = load_lambda("formatear")
+
+from comun.s3_multipart import MultipartWriter  # noqa: E402
+
+
+class _NullS3:
+    """Cliente S3 que descarta lo que recibe."""
+
+    def put_object(self, **kwargs):
+        pass
+
+    def create_multipart_upload(self, **kwargs):
+        return {"UploadId": "bench"}
+
+    def upload_part(self, PartNumber, **kwargs):
+        return {"ETag": f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, **kwargs):
+        pass
+
+    def abort_multipart_upload(self, **kwargs):
+        pass
+
+
+def build_transcript(words, words_per_turn=25):
+    segments = []
+    items = []
+    for turn_start in range(0, words, words_per_turn):
+        speaker = f"spk_{(turn_start // words_per_turn) % 3}"
+        turn = range(turn_start, min(turn_start + words_per_turn, words))
+        segments.append({
+            "start_time": f"{turn_start * 0.4:.3f}",
+            "end_time": f"{turn[-1] * 0.4 + 0.3:.3f}",
+            "speaker_label": speaker,
+            "items": [{"start_time": f"{w * 0.4:.3f}", "end_time": f"{w * 0.4 + 0.3:.3f}",
+                       "speaker_label": speaker} for w in turn],
+        })
+        for w in turn:
+            items.append({"start_time": f"{w * 0.4:.3f}", "end_time": f"{w * 0.4 + 0.3:.3f}",
+                          "alternatives": [{"confidence": "0.99", "content": f"palabra{w % 97}"}],
+                          "type": "pronunciation"})
+            if w % 11 == 10:
+                items.append({"alternatives": [{"confidence": "0.0", "content": "."}],
+                              "type": "punctuation"})
+    document = {"jobName": "bench", "results": {
+        "transcripts": [{"transcript": " ".join(i["alternatives"][0]["content"] for i in items)}],
+        "speaker_labels": {"speakers": 3, "segments": segments},
+        "items": items,
+    }}
+    return json.dumps(document).encode("utf-8")
+
+
+def legacy(raw, s3):
+    transcript_data = json.loads(io.BytesIO(raw).read().decode("utf-8"))
+    items = transcript_data["results"]["items"]
+    speaker_map = {}
+    for segment in transcript_data["results"]["speaker_labels"]["segments"]:
+        for item in segment["items"]:
+            speaker_map[item["start_time"]] = segment["speaker_label"]
+
+    output_text = ""
+    current_speaker = None
+    for item in items:
+        if item["type"] == "punctuation":
+            output_text += item["alternatives"][0]["content"]
+        else:
+            speaker = speaker_map.get(item.get("start_time"))
+            if speaker != current_speaker:
+                current_speaker = speaker
+                output_text += f"\n\n{speaker}: "
+            output_text += item["alternatives"][0]["content"] + " "
+    s3.put_object(Bucket="b", Key="k", Body=output_text.strip().encode("utf-8"))
+
+
+def streamed(raw, s3):
+    with MultipartWriter(s3, "b", "k") as writer:
+        for piece in formatear.format_transcript(io.BytesIO(raw)):
+            writer.write(piece)
+
+
+def measure(fn, raw):
+    s3 = _NullS3()
+    start = time.perf_counter()
+    fn(raw, s3)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    fn(raw, s3)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--palabras", type=int, nargs="+", default=[20000, 100000, 400000])
+    args = parser.parse_args()
+
+    print(f"{'palabras':>10} {'MB json':>8} {'impl':>9} {'seg':>8} {'pico MB':>8}")
+    for words in args.palabras:
+        raw = build_transcript(words)
+        for name, fn in (("original", legacy), ("stream", streamed)):
+            elapsed, peak = measure(fn, raw)
+            print(f"{words:>10} {len(raw) / 1e6:>8.1f} {name:>9} {elapsed:>8.3f} {peak / 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Costo de la instrumentación: una medición suelta (`timed`/`count`) y un job
+completo de dos etapas con las métricas EMF prendidas y apagadas.
+
+    python -m benchmarks.bench_instrumentacion --palabras 5000 50000 --jobs 30
+    python -m benchmarks.bench_instrumentacion --max-overhead 0.05   # falla si el job se encarece más de 5 %
+
+El job corre formatear y resumir reales contra el S3 y el Bedrock simulados
+de bench_modo_pipeline, sin costos virtuales: todo lo que se mide es CPU del
+handler, que es donde pesaría la instrumentación. Las líneas EMF se escriben
+en un buffer descartado para no medir la terminal.
+"""
+import argparse
+import io
+import logging
+import statistics
+import sys
+import time
+from contextlib import redirect_stdout
+
+from benchmarks.bench_formatear_salida import build_transcript
+from benchmarks.bench_modo_pipeline import run_job
+
+from comun import instrumentacion  # noqa: E402
+
+
+def per_call_us(n=100000):
+    """Microsegundos por `timed` + `count` dentro de un job activo."""
+    with redirect_stdout(io.StringIO()), instrumentacion.job("bench", "job-bench"):
+        start = time.perf_counter()
+        for _ in range(n):
+            with instrumentacion.timed("X"):
+                instrumentacion.count("Y")
+        return (time.perf_counter() - start) / n * 1e6
+
+
+def job_ms(raw, enabled, jobs):
+    """Mediana (ms) de un job de dos etapas con las métricas en `enabled`."""
+    previous = instrumentacion.ENABLED
+    instrumentacion.ENABLED = enabled
+    try:
+        with redirect_stdout(io.StringIO()):
+            runs = [run_job("dos-etapas", raw, s3_ms=0, s3_mbps=1e12, notification_ms=0) for _ in range(jobs)]
+    finally:
+        instrumentacion.ENABLED = previous
+    return statistics.median(runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--palabras", type=int, nargs="+", default=[5000, 50000])
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--max-overhead", type=float, help="umbral de regresión (fracción del job)")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"timed + count: {per_call_us():.2f} µs por medición")
+    print(f"{'palabras':>9} {'sin métricas ms':>16} {'con métricas ms':>16} {'overhead':>9}")
+    exceeded = []
+    for words in args.palabras:
+        raw = build_transcript(words)
+        # Una pasada de calentamiento para no cargarle el primer job a ningún modo
+        job_ms(raw, True, 1)
+        off = job_ms(raw, False, args.jobs)
+        on = job_ms(raw, True, args.jobs)
+        overhead = (on - off) / off
+        print(f"{words:>9} {off:>16.2f} {on:>16.2f} {overhead:>8.1%}")
+        if args.max_overhead is not None and overhead > args.max_overhead:
+            exceeded.append(f"{words} palabras: {overhead:.1%}")
+
+    if exceeded:
+        print(f"Overhead por encima de {args.max_overhead:.0%}: {'; '.join(exceeded)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
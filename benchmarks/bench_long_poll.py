@@ -0,0 +1,163 @@
+"""
+Cuántos requests se ahorra el frontend con waitStatus (long-poll) frente al
+polling de checkStatus, con muchos suscriptores a la vez.
+
+    python -m benchmarks.bench_long_poll --suscriptores 200 --intervalo 3
+
+Cada suscriptor sigue un job simulado que pasa por transcribir, formatear y
+resumir con duraciones aleatorias. El tiempo se escala (`--escala`) para que
+la simulación dure unos segundos; los requests se cuentan sobre el handler
+real de transcribir con un MemoryJobStateStore y un stub de Transcribe.
+"""
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+from tests.unit.lambda_loader import load_lambda
+
+transcribir = load_lambda("transcribir")
+
+from comun import estado  # noqa: E402
+
+
+class CountingStore(estado.MemoryJobStateStore):
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+        self._count_lock = threading.Lock()
+
+    def get(self, job_name):
+        with self._count_lock:
+            self.reads += 1
+        return super().get(job_name)
+
+    def wait_for_change(self, *args, **kwargs):
+        with self._count_lock:
+            self.reads += 1
+        return super().wait_for_change(*args, **kwargs)
+
+
+class StubTranscribe:
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get_transcription_job(self, TranscriptionJobName):
+        with self._lock:
+            self.calls += 1
+        return {"TranscriptionJob": {"TranscriptionJobStatus": "IN_PROGRESS"}}
+
+
+class StubS3:
+    """Sin resúmenes parciales: el avance del streaming no entra en la comparación."""
+
+    def get_object(self, Bucket, Key):
+        raise ClientError({"Error": {"Code": "NoSuchKey", "Message": ""}}, "GetObject")
+
+
+def simulate_job(store, job_name, durations, scale):
+    """Registra las transiciones del pipeline con las duraciones (s) dadas."""
+    transcribe_s, format_s, summary_s = durations
+    time.sleep(transcribe_s * scale)
+    store.record(job_name, estado.TRANSCRIBIR, estado.COMPLETED)
+    store.record(job_name, estado.FORMATEAR, estado.IN_PROGRESS)
+    time.sleep(format_s * scale)
+    store.record(job_name, estado.FORMATEAR, estado.COMPLETED)
+    store.record(job_name, estado.RESUMIR, estado.IN_PROGRESS)
+    time.sleep(summary_s * scale)
+    store.record(job_name, estado.RESUMIR, estado.COMPLETED)
+    return time.monotonic()
+
+
+def _call(route, params):
+    response = transcribir.lambda_handler({route: params}, None)
+    return json.loads(response["body"])
+
+
+def poll_subscriber(job_name, interval, scale):
+    """checkStatus cada `interval` segundos. Devuelve (requests, momento en que vio el resumen)."""
+    requests = 0
+    while True:
+        requests += 1
+        if _call("checkStatus", {"job_name": job_name})["summaryReady"]:
+            return requests, time.monotonic()
+        time.sleep(interval * scale)
+
+
+def long_poll_subscriber(job_name, wait_seconds, scale):
+    """waitStatus encadenado con la `version` de la respuesta anterior."""
+    requests, since = 0, None
+    while True:
+        requests += 1
+        body = _call("waitStatus", {"job_name": job_name, "since": since, "timeout": wait_seconds * scale})
+        if body["summaryReady"]:
+            return requests, time.monotonic()
+        since = body["version"]
+
+
+def run(mode, subscribers, interval, wait_seconds, scale, seed):
+    """Devuelve (requests, lecturas de la tabla, llamadas a Transcribe, demoras en ver el resumen)."""
+    rng = random.Random(seed)
+    store = CountingStore()
+    transcribe = StubTranscribe()
+    transcribir.job_state = store
+    transcribir.transcribe_client = transcribe
+    transcribir.s3_client = StubS3()
+    transcribir.WAIT_MAX_SECONDS = wait_seconds * scale
+
+    jobs = [f"job-{i}" for i in range(subscribers)]
+    durations = {job: (rng.uniform(20, 90), rng.uniform(1, 5), rng.uniform(10, 40)) for job in jobs}
+    for job in jobs:
+        store.record(job, estado.TRANSCRIBIR, estado.IN_PROGRESS)
+
+    finished, seen = {}, {}
+
+    def pipeline(job):
+        finished[job] = simulate_job(store, job, durations[job], scale)
+
+    def subscriber(job):
+        if mode == "polling":
+            seen[job] = poll_subscriber(job, interval, scale)
+        else:
+            seen[job] = long_poll_subscriber(job, wait_seconds, scale)
+
+    threads = [threading.Thread(target=pipeline, args=(job,)) for job in jobs]
+    threads += [threading.Thread(target=subscriber, args=(job,)) for job in jobs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    requests = sum(seen[job][0] for job in jobs)
+    delays = sorted((seen[job][1] - finished[job]) / scale for job in jobs)
+    return requests, store.reads, transcribe.calls, delays
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--suscriptores", type=int, default=100)
+    parser.add_argument("--intervalo", type=float, default=3.0, help="segundos entre checkStatus")
+    parser.add_argument("--espera", type=float, default=25.0, help="espera máxima de waitStatus (s)")
+    parser.add_argument("--escala", type=float, default=0.01, help="segundos reales por segundo simulado")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"{'modo':>10} {'requests':>9} {'req/job':>8} {'lecturas':>9} {'transcribe':>11} {'demora p50 (s)':>15}")
+    totals = {}
+    for mode in ("polling", "long-poll"):
+        requests, reads, transcribe_calls, delays = run(
+            mode, args.suscriptores, args.intervalo, args.espera, args.escala, seed=7
+        )
+        totals[mode] = requests
+        print(f"{mode:>10} {requests:>9,} {requests / args.suscriptores:>8.1f} {reads:>9,} "
+              f"{transcribe_calls:>11,} {delays[len(delays) // 2]:>15.2f}")
+    print(f"requests evitados: {1 - totals['long-poll'] / totals['polling']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
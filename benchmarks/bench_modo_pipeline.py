@@ -0,0 +1,185 @@
+"""
+Latencia de punta a punta desde que Transcribe escribe el .json hasta que el
+resumen está en S3, en modo "dos-etapas" (formatear -> .txt -> notificación
+-> resumir) y "fusionado" (resumir formatea y resume en la misma invocación).
+
+    python -m benchmarks.bench_modo_pipeline --palabras 5000 50000 --jobs 50
+    python -m benchmarks.bench_modo_pipeline --frio 0.2 --s3-ms 40
+
+Los handlers reales corren contra un S3 y un Bedrock simulados que cuentan
+requests y bytes; su costo se suma como tiempo virtual (`--s3-ms` por
+request, `--s3-mbps` de ancho de banda) junto con la demora de cada
+notificación de S3 (`--notificacion-ms`) y, con probabilidad `--frio`, el
+cold start de la Lambda que la recibe: import del handler medido con
+bench_arranque más `--sandbox-ms` de creación del entorno.
+"""
+import argparse
+import io
+import json
+import logging
+import random
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+
+from benchmarks.bench_arranque import measure as measure_startup
+from benchmarks.bench_formatear_salida import build_transcript
+from tests.unit.lambda_loader import load_lambda
+
+formatear = load_lambda("formatear")
+resumir = load_lambda("resumir")
+
+from comun import estado  # noqa: E402
+from comun.formato import formatted_key  # noqa: E402
+from retries import RateLimiter  # noqa: E402
+
+MODES = ("dos-etapas", "fusionado")
+
+
+class SimS3:
+    """S3 en memoria que cuenta requests y bytes transferidos."""
+
+    def __init__(self, objects):
+        self.objects = dict(objects)
+        self.requests = 0
+        self.bytes = 0
+        self._parts = {}
+        self._lock = threading.Lock()
+
+    def _count(self, size=0):
+        with self._lock:
+            self.requests += 1
+            self.bytes += size
+
+    def get_object(self, Bucket, Key):
+        body = self.objects[Key]
+        self._count(len(body))
+        return {"Body": io.BytesIO(body)}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self._count(len(Body))
+        self.objects[Key] = Body
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        self._count()
+        self._parts[Key] = {}
+        return {"UploadId": Key}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self._count(len(Body))
+        self._parts[Key][PartNumber] = Body
+        return {"ETag": f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self._count()
+        parts = self._parts.pop(Key)
+        self.objects[Key] = b"".join(parts[p["PartNumber"]] for p in MultipartUpload["Parts"])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self._count()
+        self._parts.pop(Key, None)
+
+
+class SimBedrock:
+    def invoke_model(self, modelId, contentType, accept, body):
+        return {"body": io.BytesIO(json.dumps({"generation": "- resumen"}).encode())}
+
+
+@contextmanager
+def _patched(module, **values):
+    previous = {name: getattr(module, name) for name in values}
+    for name, value in values.items():
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(module, name, value)
+
+
+def _invoke(handler, key, s3, s3_ms, s3_mbps):
+    """(ms de cómputo + ms virtuales de S3) de un record."""
+    requests, transferred = s3.requests, s3.bytes
+    start = time.perf_counter()
+    result = handler("bucket", key)
+    compute_ms = (time.perf_counter() - start) * 1000
+    if result.get("status") == "FAILED":
+        raise RuntimeError(f"{key}: {result}")
+    s3_cost = (s3.requests - requests) * s3_ms + (s3.bytes - transferred) / (s3_mbps * 1e6) * 1000
+    return compute_ms + s3_cost
+
+
+def run_job(mode, raw, s3_ms=25, s3_mbps=80, notification_ms=400, cold=(0, 0)):
+    """
+    Latencia (ms) de un job en `mode`. `cold` = (ms extra de la primera
+    Lambda, ms extra de la segunda) por cold start; 0 si estaba caliente.
+    """
+    key = "transcripciones/job-bench.json"
+    s3 = SimS3({key: raw})
+    store = estado.MemoryJobStateStore()
+    with _patched(formatear, s3_client=s3, job_state=store), \
+            _patched(resumir, s3=s3, bedrock=SimBedrock(), job_state=store, summary_cache=None,
+                     SUMMARY_STREAMING=False,
+                     # Bedrock cuesta lo mismo en los dos modos: sin cuota, así no se mide el limitador
+                     bedrock_limiter=RateLimiter(rate=1e6, burst=1000, max_in_flight=64)):
+        if mode == "fusionado":
+            return notification_ms + cold[0] + _invoke(resumir._process_record, key, s3, s3_ms, s3_mbps)
+
+        total = notification_ms + cold[0] + _invoke(formatear._process_record, key, s3, s3_ms, s3_mbps)
+        return total + notification_ms + cold[1] + _invoke(resumir._process_record, formatted_key(key), s3,
+                                                           s3_ms, s3_mbps)
+
+
+def startup_ms(sandbox_ms, repetitions=3):
+    """Cold start estimado por handler: import medido + creación del entorno."""
+    return {name: sandbox_ms + statistics.median(measure_startup(name)["import_ms"] for _ in range(repetitions))
+            for name in ("formatear", "resumir")}
+
+
+def simulate(words, jobs=20, cold_ratio=0.0, startup=None, seed=7, **costs):
+    """Percentiles de latencia por modo para transcripciones de `words` palabras."""
+    raw = build_transcript(words)
+    startup = startup or {"formatear": 0, "resumir": 0}
+    rng = random.Random(seed)
+    results = {}
+    for mode in MODES:
+        latencies = []
+        for _ in range(jobs):
+            first = startup["resumir"] if mode == "fusionado" else startup["formatear"]
+            cold = (first if rng.random() < cold_ratio else 0,
+                    startup["resumir"] if rng.random() < cold_ratio else 0)
+            latencies.append(run_job(mode, raw, cold=cold, **costs))
+        latencies.sort()
+        results[mode] = {
+            "p50": statistics.median(latencies),
+            "p95": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--palabras", type=int, nargs="+", default=[5000, 50000])
+    parser.add_argument("--jobs", type=int, default=30)
+    parser.add_argument("--frio", type=float, default=1.0, help="probabilidad de cold start por invocación")
+    parser.add_argument("--s3-ms", type=float, default=25)
+    parser.add_argument("--s3-mbps", type=float, default=80)
+    parser.add_argument("--notificacion-ms", type=float, default=400)
+    parser.add_argument("--sandbox-ms", type=float, default=250)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    startup = startup_ms(args.sandbox_ms) if args.frio > 0 else None
+    if startup:
+        print("cold start estimado: " + ", ".join(f"{name} {ms:.0f} ms" for name, ms in startup.items()))
+    print(f"{'palabras':>10} {'modo':>11} {'p50 ms':>9} {'p95 ms':>9}")
+    for words in args.palabras:
+        results = simulate(words, args.jobs, args.frio, startup, s3_ms=args.s3_ms, s3_mbps=args.s3_mbps,
+                           notification_ms=args.notificacion_ms)
+        for mode, stats in results.items():
+            print(f"{words:>10} {mode:>11} {stats['p50']:>9.0f} {stats['p95']:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Suite de pytest-benchmark de formatear: el handler completo (evento S3 ->
+format_object -> multipart) sobre transcripciones sintéticas de 10 minutos
+a 10 horas (benchmarks.transcribe_sintetico).
+
+    python -m pytest benchmarks/test_formatear_rendimiento.py
+    python -m pytest benchmarks/test_formatear_rendimiento.py --benchmark-autosave
+    python -m pytest benchmarks/test_formatear_rendimiento.py --benchmark-compare --benchmark-compare-fail=mean:15%
+
+Además del tiempo, cada caso guarda en extra_info el throughput, el pico de
+memoria asignada (tracemalloc) y el RSS pico de un proceso nuevo que
+formatea la misma entrada leyéndola en streaming. Falla si el throughput
+cae debajo de FORMATEAR_BENCH_MIN_MBPS, o si la memoria asignada o el
+crecimiento del RSS superan FORMATEAR_BENCH_MAX_ALLOC_MB /
+FORMATEAR_BENCH_MAX_RSS_MB: el formateo es en streaming, así que la
+memoria no debería crecer con el largo del audio. Contra una corrida
+guardada, `--benchmark-compare-fail` corta por regresión relativa.
+
+Sin pytest-benchmark instalado (requirements-dev.txt) la suite se saltea.
+"""
+import io
+import json
+import os
+import subprocess
+import sys
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from benchmarks.transcribe_sintetico import from_profile  # noqa: E402
+from tests.unit.lambda_loader import load_lambda  # noqa: E402
+
+formatear = load_lambda("formatear")
+
+ROOT = Path(__file__).resolve().parents[1]
+
+MIN_MBPS = float(os.environ.get("FORMATEAR_BENCH_MIN_MBPS", "2"))
+MAX_ALLOC_MB = float(os.environ.get("FORMATEAR_BENCH_MAX_ALLOC_MB", "32"))
+MAX_RSS_MB = float(os.environ.get("FORMATEAR_BENCH_MAX_RSS_MB", "64"))
+
+DURATIONS = {"10min": 10, "1h": 60, "10h": 600}
+KEY = "transcripciones/job-bench.json"
+
+_inputs = {}
+
+
+class _ReadOnlyS3:
+    """Entrega `raw` en get_object y descarta las escrituras (multipart incluido)."""
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def get_object(self, Bucket, Key):
+        body = self.raw() if callable(self.raw) else io.BytesIO(self.raw)
+        return {"Body": body, "ContentLength": len(self.raw) if isinstance(self.raw, bytes) else 0}
+
+    def put_object(self, **kwargs):
+        pass
+
+    def create_multipart_upload(self, **kwargs):
+        return {"UploadId": "bench"}
+
+    def upload_part(self, PartNumber, **kwargs):
+        return {"ETag": f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, **kwargs):
+        pass
+
+    def abort_multipart_upload(self, **kwargs):
+        pass
+
+
+EVENT = {"Records": [{"eventSource": "aws:s3", "s3": {"bucket": {"name": "bench"}, "object": {"key": KEY}}}]}
+
+# Proceso nuevo: RSS después de los imports y pico al formatear un archivo leído en streaming
+# (VmHWM y no ru_maxrss: ru_maxrss arrastra el pico del proceso que hizo el fork)
+_RSS_PROBE = """
+import json, logging, sys
+from tests.unit.lambda_loader import load_lambda
+from benchmarks.test_formatear_rendimiento import EVENT, _ReadOnlyS3
+formatear = load_lambda("formatear")
+logging.getLogger().setLevel(logging.WARNING)
+formatear.s3_client = _ReadOnlyS3(lambda: open(sys.argv[1], "rb"))
+formatear.job_state = None
+def hwm_kb():
+    with open("/proc/self/status") as status:
+        return next(int(line.split()[1]) for line in status if line.startswith("VmHWM:"))
+before = hwm_kb()
+result = formatear.lambda_handler(EVENT, None)
+assert result["status"] == "COMPLETED", result
+print(json.dumps({"before_kb": before, "peak_kb": hwm_kb()}))
+"""
+
+
+def _input(profile, minutes):
+    if (profile, minutes) not in _inputs:
+        _inputs[(profile, minutes)] = from_profile(profile, minutes)
+    return _inputs[(profile, minutes)]
+
+
+def _handle():
+    result = formatear.lambda_handler(EVENT, None)
+    assert result["status"] == "COMPLETED", result
+
+
+def _peak_rss(path):
+    output = subprocess.run([sys.executable, "-c", _RSS_PROBE, str(path)], cwd=ROOT, capture_output=True,
+                            text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("duration", list(DURATIONS))
+@pytest.mark.parametrize("profile", ["entrevista", "reunion"])
+def test_formatear_handler(benchmark, monkeypatch, tmp_path, profile, duration):
+    raw = _input(profile, DURATIONS[duration])
+    monkeypatch.setattr(formatear, "s3_client", _ReadOnlyS3(raw))
+    monkeypatch.setattr(formatear, "job_state", None)
+    results = json.loads(raw)["results"]
+    words = sum(1 for item in results["items"] if item["type"] == "pronunciation")
+
+    benchmark.pedantic(_handle, rounds=3, iterations=1, warmup_rounds=1)
+    mean = benchmark.stats.stats.mean
+
+    tracemalloc.start()
+    try:
+        _handle()
+        alloc_peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    path = tmp_path / "transcripcion.json"
+    path.write_bytes(raw)
+    rss = _peak_rss(path)
+    rss_growth_mb = (rss["peak_kb"] - rss["before_kb"]) / 1024
+
+    mbps = len(raw) / 1e6 / mean
+    benchmark.extra_info.update({
+        "inputMb": round(len(raw) / 1e6, 2),
+        "words": words,
+        "mbPerSecond": round(mbps, 2),
+        "wordsPerSecond": round(words / mean),
+        "allocPeakMb": round(alloc_peak / 1024 / 1024, 2),
+        "peakRssMb": round(rss["peak_kb"] / 1024, 1),
+        "rssGrowthMb": round(rss_growth_mb, 1),
+    })
+
+    assert mbps >= MIN_MBPS, f"{mbps:.1f} MB/s por debajo del mínimo de {MIN_MBPS} MB/s"
+    assert alloc_peak / 1024 / 1024 <= MAX_ALLOC_MB, benchmark.extra_info
+    assert rss_growth_mb <= MAX_RSS_MB, benchmark.extra_info
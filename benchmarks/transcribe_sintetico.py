@@ -0,0 +1,158 @@
+"""
+JSON de Transcribe sintéticos para probar formatear a escala.
+
+    python -m benchmarks.transcribe_sintetico --minutos 600 --perfil reunion --salida /tmp/10h.json
+    python -m benchmarks.transcribe_sintetico --minutos 30 --hablantes 3 --turnos exponencial --turno-s 4 --desfase 0.05
+
+Arma el layout que escribe Transcribe con ShowSpeakerLabels:
+`speaker_labels.segments` (un segmento por turno, con sus items) antes de
+`items` (palabras y signos de puntuación). Se ajustan la duración, la
+cantidad de hablantes, la distribución del largo de los turnos, la densidad
+de puntuación y el desfase entre los tiempos de los items y los de los
+segmentos (Transcribe no siempre repite los mismos valores en las dos
+listas). El vocabulario tiene tildes y eñes para ejercitar el UTF-8 del
+parser. Con la misma semilla la salida es idéntica byte a byte.
+"""
+import argparse
+import json
+import math
+import random
+
+VOCABULARY = (
+    "el", "la", "de", "que", "y", "en", "un", "una", "por", "con", "para", "como", "pero", "más", "también",
+    "reunión", "proyecto", "información", "análisis", "decisión", "pregunta", "equipo", "cliente", "número",
+    "año", "mañana", "señal", "diseño", "pequeño", "compañía", "después", "está", "había", "podríamos",
+    "presupuesto", "calendario", "entrega", "revisión", "propuesta", "acuerdo", "semana", "próxima", "tema",
+)
+PUNCTUATION = ((",", 0.6), (".", 0.3), ("?", 0.1))
+
+TURN_DISTRIBUTIONS = ("lognormal", "exponencial", "fijo")
+
+# Combinaciones típicas: una entrevista (turnos largos) y una reunión (muchos
+# hablantes, turnos cortos, tiempos desalineados)
+PROFILES = {
+    "entrevista": {"speakers": 2, "turn_distribution": "lognormal", "turn_seconds": 20.0, "punctuation": 0.12,
+                   "misalignment": 0.0},
+    "reunion": {"speakers": 6, "turn_distribution": "exponencial", "turn_seconds": 5.0, "punctuation": 0.18,
+                "misalignment": 0.03},
+}
+
+
+def _turn_lengths(rng, distribution, mean):
+    if distribution == "fijo":
+        while True:
+            yield mean
+    elif distribution == "exponencial":
+        while True:
+            yield rng.expovariate(1 / mean)
+    elif distribution == "lognormal":
+        # sigma fija; mu elegido para que la media sea `mean`
+        sigma = 0.75
+        mu = math.log(mean) - sigma ** 2 / 2
+        while True:
+            yield rng.lognormvariate(mu, sigma)
+    else:
+        raise ValueError(f"Distribución de turnos inválida: {distribution} ({' | '.join(TURN_DISTRIBUTIONS)})")
+
+
+def _t(seconds):
+    return f"{max(seconds, 0.0):.3f}"
+
+
+def generate(minutes=10, speakers=2, turn_distribution="lognormal", turn_seconds=8.0, punctuation=0.12,
+             misalignment=0.0, words_per_minute=150, seed=7):
+    """
+    Devuelve el JSON (bytes UTF-8) de una transcripción de `minutes` minutos.
+
+    `punctuation` es la probabilidad de un signo después de cada palabra (y
+    cada turno que no termina en signo cierra con punto si es > 0);
+    `misalignment` es el desfase máximo (s) de los tiempos de los items
+    respecto de los del segmento.
+    """
+    rng = random.Random(seed)
+    lengths = _turn_lengths(rng, turn_distribution, turn_seconds)
+    slot = 60 / words_per_minute
+    total = minutes * 60
+
+    segments, items, words = [], [], []
+    clock = 0.0
+    speaker = None
+    while clock < total:
+        speaker = rng.choice([s for s in range(speakers) if s != speaker] or [0])
+        label = f"spk_{speaker}"
+        turn_end = min(clock + max(slot, next(lengths)), total)
+        turn_start = clock
+        segment_items = []
+        closed = True
+        while clock + slot <= turn_end or not segment_items:
+            start, end = clock, clock + slot * rng.uniform(0.55, 0.95)
+            segment_items.append({"start_time": _t(start), "end_time": _t(end), "speaker_label": label})
+            offset = rng.uniform(-misalignment, misalignment) if misalignment else 0.0
+            content = rng.choice(VOCABULARY)
+            words.append(content)
+            items.append({"start_time": _t(start + offset), "end_time": _t(end + offset),
+                          "alternatives": [{"confidence": f"{rng.uniform(0.6, 1.0):.4f}", "content": content}],
+                          "type": "pronunciation"})
+            closed = False
+            if rng.random() < punctuation:
+                mark = rng.choices([p for p, _ in PUNCTUATION], [w for _, w in PUNCTUATION])[0]
+                items.append({"alternatives": [{"confidence": "0.0", "content": mark}], "type": "punctuation"})
+                words[-1] += mark
+                closed = mark != ","
+            clock += slot
+        if punctuation > 0 and not closed:
+            items.append({"alternatives": [{"confidence": "0.0", "content": "."}], "type": "punctuation"})
+            words[-1] += "."
+        segments.append({"start_time": segment_items[0]["start_time"], "end_time": segment_items[-1]["end_time"],
+                         "speaker_label": label, "items": segment_items})
+        # Silencio entre turnos
+        clock = max(clock, turn_start) + rng.uniform(0.1, 1.0)
+
+    document = {
+        "jobName": f"sintetico-{minutes:g}min-{speakers}hablantes",
+        "accountId": "000000000000",
+        "status": "COMPLETED",
+        "results": {
+            "transcripts": [{"transcript": " ".join(words)}],
+            "speaker_labels": {"speakers": speakers, "segments": segments},
+            "items": items,
+        },
+    }
+    return json.dumps(document, ensure_ascii=False).encode("utf-8")
+
+
+def from_profile(profile, minutes, seed=7, **overrides):
+    return generate(minutes, seed=seed, **{**PROFILES[profile], **overrides})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--minutos", type=float, default=10)
+    parser.add_argument("--perfil", choices=tuple(PROFILES), help="valores base; los demás flags los pisan")
+    parser.add_argument("--hablantes", type=int)
+    parser.add_argument("--turnos", choices=TURN_DISTRIBUTIONS, help="distribución del largo de los turnos")
+    parser.add_argument("--turno-s", type=float, help="largo medio de un turno en segundos")
+    parser.add_argument("--puntuacion", type=float, help="probabilidad de un signo después de cada palabra")
+    parser.add_argument("--desfase", type=float, help="desfase máximo (s) entre items y segmentos")
+    parser.add_argument("--ppm", type=int, default=150, help="palabras por minuto")
+    parser.add_argument("--semilla", type=int, default=7)
+    parser.add_argument("--salida", required=True)
+    args = parser.parse_args()
+
+    options = dict(PROFILES[args.perfil]) if args.perfil else {}
+    for name, value in (("speakers", args.hablantes), ("turn_distribution", args.turnos),
+                        ("turn_seconds", args.turno_s), ("punctuation", args.puntuacion),
+                        ("misalignment", args.desfase)):
+        if value is not None:
+            options[name] = value
+    raw = generate(args.minutos, words_per_minute=args.ppm, seed=args.semilla, **options)
+    with open(args.salida, "wb") as f:
+        f.write(raw)
+    results = json.loads(raw)["results"]
+    words = sum(1 for item in results["items"] if item["type"] == "pronunciation")
+    print(f"{args.salida}: {len(raw) / 1e6:.1f} MB, {words} palabras, "
+          f"{len(results['speaker_labels']['segments'])} turnos")
+
+
+if __name__ == "__main__":
+    main()
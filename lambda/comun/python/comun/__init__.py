@@ -0,0 +1,4 @@
+"""
+Código compartido por las Lambdas del pipeline. Se despliega como Lambda
+Layer (`lambda/comun`), por eso los módulos viven bajo `python/`.
+"""
@@ -0,0 +1,129 @@
+"""
+Clientes boto3 compartidos, creados recién cuando una ruta los usa.
+
+Crear un cliente carga el modelo JSON del servicio y resuelve credenciales:
+hacerlo al importar el handler suma decenas de ms al cold start aunque el
+request no use ese servicio (un checkStatus no necesita Transcribe si el
+estado está en la tabla). `lazy("s3")` devuelve un proxy que crea el
+cliente en el primer acceso y lo cachea para las invocaciones siguientes.
+
+Todos usan la misma `Config` base, ajustable por variables de entorno:
+keep-alive TCP, pool de conexiones (CLIENT_MAX_POOL), timeouts de conexión y
+lectura (CLIENT_CONNECT_TIMEOUT / CLIENT_READ_TIMEOUT) y reintentos
+(CLIENT_RETRY_MODE / CLIENT_MAX_ATTEMPTS). Cada cliente puede pisar valores.
+
+SnapStart / provisioned concurrency: `prepare(...)` crea los clientes
+durante la inicialización, que no la paga ningún request. Con SnapStart,
+después de restaurar el snapshot se descartan los clientes (credenciales y
+conexiones del snapshot no sirven) pero se conserva la caché de modelos, así
+que recrearlos es barato.
+"""
+import json
+import os
+import threading
+
+CONNECT_TIMEOUT = float(os.environ.get("CLIENT_CONNECT_TIMEOUT", "2"))
+READ_TIMEOUT = float(os.environ.get("CLIENT_READ_TIMEOUT", "30"))
+MAX_POOL = int(os.environ.get("CLIENT_MAX_POOL", "16"))
+RETRY_MODE = os.environ.get("CLIENT_RETRY_MODE", "standard")
+MAX_ATTEMPTS = int(os.environ.get("CLIENT_MAX_ATTEMPTS", "3"))
+
+_lock = threading.Lock()
+_session = None
+_clients = {}
+
+
+def _config(**values):
+    # botocore.config arrastra urllib3 y http.client (~150 ms): se importa al crear el primer cliente
+    from botocore.config import Config
+    return Config(**values)
+
+
+def base_config():
+    return _config(
+        connect_timeout=CONNECT_TIMEOUT,
+        read_timeout=READ_TIMEOUT,
+        max_pool_connections=MAX_POOL,
+        tcp_keepalive=True,
+        retries={"mode": RETRY_MODE, "max_attempts": MAX_ATTEMPTS},
+    )
+
+
+def _get_session():
+    global _session
+    if _session is None:
+        # boto3 también se importa recién acá: las rutas sin AWS no lo cargan
+        import boto3
+        _session = boto3.session.Session()
+    return _session
+
+
+def client(service, region_name=None, **config):
+    """Cliente cacheado de `service`; `config` pisa valores de la Config base."""
+    key = (service, region_name, json.dumps(config, sort_keys=True, default=str))
+    existing = _clients.get(key)
+    if existing is not None:
+        return existing
+    with _lock:
+        if key not in _clients:
+            merged = base_config().merge(_config(**config)) if config else base_config()
+            _clients[key] = _get_session().client(service, region_name=region_name, config=merged)
+        return _clients[key]
+
+
+class LazyClient:
+    """Proxy que crea el cliente en el primer acceso a un atributo."""
+
+    def __init__(self, service, region_name=None, **config):
+        self._service = service
+        self._region_name = region_name
+        self._config = config
+
+    def __getattr__(self, name):
+        return getattr(client(self._service, self._region_name, **self._config), name)
+
+    def __repr__(self):
+        return f"LazyClient({self._service!r})"
+
+
+def lazy(service, region_name=None, **config):
+    return LazyClient(service, region_name, **config)
+
+
+def created():
+    """Servicios con cliente ya creado (para tests y el benchmark de arranque)."""
+    return sorted(service for service, _, _ in _clients)
+
+
+def reset():
+    """
+    Descarta los clientes y la sesión (credenciales) pero reusa el loader de
+    botocore, que tiene los modelos de servicio ya parseados.
+    """
+    global _session
+    with _lock:
+        loader = _session._session.get_component("data_loader") if _session is not None else None
+        _clients.clear()
+        _session = None
+        if loader is not None:
+            _get_session()._session.register_component("data_loader", loader)
+
+
+def prepare(*clients):
+    """
+    Crea los clientes pasados (proxies de `lazy`) si la inicialización no la
+    espera un request: SnapStart o provisioned concurrency. Con SnapStart
+    registra el reset después del restore. Sin esas modalidades no hace nada.
+    """
+    init_type = os.environ.get("AWS_LAMBDA_INITIALIZATION_TYPE", "on-demand")
+    if init_type not in ("snap-start", "provisioned-concurrency"):
+        return False
+    for proxy in clients:
+        client(proxy._service, proxy._region_name, **proxy._config)
+    if init_type == "snap-start":
+        try:
+            from snapshot_restore_py import register_after_restore
+        except ImportError:
+            return True
+        register_after_restore(reset)
+    return True
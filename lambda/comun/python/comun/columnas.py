@@ -0,0 +1,298 @@
+"""
+Transcripción en columnas: los datos por palabra del JSON de Transcribe
+(tiempos, hablante, confianza y texto) en arrays contiguos, para que las
+etapas siguientes filtren por tiempo o por hablante sin volver a parsear
+JSON ni texto.
+
+Formato (.cols, little-endian):
+
+    MAGIC (8 bytes) | largo del header (uint32) | header JSON | columnas
+
+El header describe cada columna ({"offset", "type", "count"}, tipos de
+`array`: "f" float32, "B" uint8, "H" uint16, "I" uint32; el offset cuenta
+desde el fin del header alineado) y la tabla de hablantes; cada columna
+empieza alineada a 8 bytes. Las columnas son `start`, `end` y `confidence`
+(float32: menos de 4 ms de error hasta 18 horas), `speaker` (uint16, índice
+en la tabla; la versión 1 lo guardaba en uint8), `offsets`
+(uint32, palabras + 1: inicio de cada palabra en `text`) y `text` (UTF-8;
+cada palabra con su puntuación, separadas por un espacio).
+
+`Columns` lee un buffer (bytes de get_object, un mmap del archivo) sin
+copiarlo: cada columna es un `memoryview` sobre el buffer y `numpy()` las
+devuelve como arrays de NumPy, también sin copia. NumPy es opcional y se
+importa sólo al usarlo.
+"""
+import bisect
+import json
+import math
+import mmap
+import struct
+import sys
+import tempfile
+from array import array
+
+MAGIC = b"TRCOLS\x00\x01"
+VERSION = 2
+# Versiones que lee Columns: el tipo de cada columna viene en el header
+_READABLE_VERSIONS = (1, 2)
+_HEADER_LEN = struct.Struct("<I")
+_ALIGN = 8
+_NUMPY_TYPES = {"f": "<f4", "B": "u1", "H": "<u2", "I": "<u4"}
+# Palabras por bloque de ColumnBuilder y tamaño de lectura de los archivos temporales
+BLOCK_WORDS = 16384
+COPY_CHUNK = 1024 * 1024
+# Orden en el archivo
+COLUMNS = (("start", "f"), ("end", "f"), ("confidence", "f"), ("speaker", "H"), ("offsets", "I"), ("text", "B"))
+
+if array("I").itemsize != 4 or array("f").itemsize != 4 or array("H").itemsize != 2:
+    raise ImportError("columnas necesita array('I') y array('f') de 4 bytes y array('H') de 2")
+
+_ITEMSIZE = {typecode: array(typecode).itemsize for typecode in _NUMPY_TYPES}
+
+
+def _floats(values):
+    return array("f", [math.nan if value is None else float(value) for value in values])
+
+
+class ColumnBuilder:
+    """
+    Arma las columnas mientras se formatea la transcripción (ver
+    formato.format_transcript). Guarda los strings del JSON de a bloques de
+    BLOCK_WORDS palabras; al completarse un bloque lo convierte a arrays y
+    lo agrega a un archivo temporal por columna, así la memoria no crece con
+    el largo del audio. `write_to` escribe el .cols completo de a pedazos.
+    """
+
+    def __init__(self, block_words=None, spill_dir=None):
+        self._block_words = block_words or BLOCK_WORDS
+        self._spill_dir = spill_dir
+        self._start = []
+        self._end = []
+        self._confidence = []
+        self._speaker = []
+        self._tokens = []
+        self._speakers = {}
+        self._words = 0
+        # Palabras y bytes de texto ya convertidos: los bloques siguientes arrancan ahí
+        self._converted = 0
+        self._text_bytes = 0
+        self._files = None
+        self._blocks = None
+        self._finished = False
+
+    def __len__(self):
+        return self._words
+
+    def add_word(self, item, speaker):
+        if self._finished:
+            raise ValueError("El ColumnBuilder ya se escribió")
+        # El bloque anterior se guarda recién al llegar la palabra siguiente:
+        # hasta entonces todavía puede recibir puntuación
+        if len(self._tokens) >= self._block_words:
+            self._spill(self._take_block())
+        code = self._speakers.get(speaker)
+        if code is None:
+            if len(self._speakers) > 0xFFFF:
+                raise ValueError("Más de 65536 hablantes: la columna speaker es uint16")
+            code = self._speakers[speaker] = len(self._speakers)
+        alternative = item['alternatives'][0]
+        self._start.append(item.get('start_time'))
+        self._end.append(item.get('end_time'))
+        self._confidence.append(alternative.get('confidence'))
+        self._speaker.append(code)
+        self._tokens.append(alternative['content'])
+        self._words += 1
+
+    def add_punctuation(self, content):
+        # Va pegada a la palabra anterior, como en el .txt; sin palabras no hay a quién pegarla
+        if self._tokens:
+            self._tokens[-1] += content
+
+    def _take_block(self):
+        """Convierte el bloque en curso a {columna: bytes-like} y lo vacía."""
+        offsets = array("I")
+        text = bytearray()
+        position = self._text_bytes
+        for token in self._tokens:
+            # Un espacio entre palabras, también entre el final de un bloque y el siguiente
+            if self._converted:
+                text += b" "
+                position += 1
+            self._converted += 1
+            offsets.append(position)
+            encoded = token.encode("utf-8")
+            text += encoded
+            position += len(encoded)
+        self._text_bytes = position
+        block = {"start": _floats(self._start), "end": _floats(self._end),
+                 "confidence": _floats(self._confidence), "speaker": array("H", self._speaker),
+                 "offsets": offsets, "text": text}
+        if sys.byteorder != "little":
+            for name in ("start", "end", "confidence", "speaker", "offsets"):
+                block[name].byteswap()
+        self._start, self._end, self._confidence, self._speaker, self._tokens = [], [], [], [], []
+        return block
+
+    def _spill(self, block):
+        if self._files is None:
+            self._files = {name: tempfile.TemporaryFile(dir=self._spill_dir) for name, _ in COLUMNS}
+        for name, _ in COLUMNS:
+            self._files[name].write(memoryview(block[name]).cast("B"))
+
+    def _finish(self):
+        if self._finished:
+            return
+        block = self._take_block()
+        # offsets lleva una entrada más: el fin del texto
+        end = array("I", [self._text_bytes])
+        if sys.byteorder != "little":
+            end.byteswap()
+        block["offsets"] = block["offsets"] + end
+        if self._files is None:
+            self._blocks = block
+        else:
+            self._spill(block)
+            self._blocks = None
+        self._finished = True
+
+    def _chunks(self, name):
+        if self._files is None:
+            yield memoryview(self._blocks[name]).cast("B")
+            return
+        spill = self._files[name]
+        spill.seek(0)
+        for chunk in iter(lambda: spill.read(COPY_CHUNK), b""):
+            yield chunk
+
+    def write_to(self, write):
+        """
+        Escribe el .cols llamando a `write(bytes)` de a pedazos (por ejemplo
+        MultipartWriter.write_bytes). Después no se pueden agregar palabras.
+        """
+        self._finish()
+        counts = {"start": self._words, "end": self._words, "confidence": self._words, "speaker": self._words,
+                  "offsets": self._words + 1, "text": self._text_bytes}
+        # Los offsets del header son relativos al inicio de las columnas (después del header alineado)
+        header = {"version": VERSION, "words": self._words, "speakers": list(self._speakers), "columns": {}}
+        position = 0
+        for name, typecode in COLUMNS:
+            header["columns"][name] = {"offset": position, "type": typecode, "count": counts[name]}
+            position = _align(position + counts[name] * _ITEMSIZE[typecode])
+        encoded = json.dumps(header, ensure_ascii=False).encode("utf-8")
+
+        head = MAGIC + _HEADER_LEN.pack(len(encoded)) + encoded
+        written = len(head)
+        write(head)
+        base = _align(written)
+        for name, _ in COLUMNS:
+            padding = base + header["columns"][name]["offset"] - written
+            if padding:
+                write(b"\x00" * padding)
+                written += padding
+            for chunk in self._chunks(name):
+                write(bytes(chunk))
+                written += len(chunk)
+
+    def to_bytes(self):
+        out = bytearray()
+        self.write_to(out.extend)
+        return bytes(out)
+
+    def close(self):
+        """Borra los archivos temporales."""
+        for spill in (self._files or {}).values():
+            spill.close()
+        self._files = None
+        self._blocks = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _align(position):
+    return -(-position // _ALIGN) * _ALIGN
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError as e:
+        raise RuntimeError("Columns.numpy() requiere el paquete numpy") from e
+    return numpy
+
+
+class Columns:
+    """
+    Vista de solo lectura sobre un .cols. `start`, `end`, `confidence`,
+    `speaker` y `offsets` son memoryviews tipados; `text` es el buffer UTF-8.
+    """
+
+    def __init__(self, buffer):
+        view = memoryview(buffer)
+        if view[:len(MAGIC)] != MAGIC:
+            raise ValueError("No es un archivo de columnas de transcripción")
+        (header_len,) = _HEADER_LEN.unpack_from(view, len(MAGIC))
+        start = len(MAGIC) + _HEADER_LEN.size
+        header = json.loads(bytes(view[start:start + header_len]).decode("utf-8"))
+        if header["version"] not in _READABLE_VERSIONS:
+            raise ValueError(f"Versión de columnas no soportada: {header['version']}")
+        self._buffer = buffer
+        self._base = _align(start + header_len)
+        self.header = header
+        self.speakers = header["speakers"]
+        for name, spec in header["columns"].items():
+            offset = self._base + spec["offset"]
+            column = view[offset:offset + spec["count"] * _ITEMSIZE[spec["type"]]]
+            if spec["type"] != "B":
+                column = column.cast(spec["type"])
+                if sys.byteorder != "little":
+                    # Sin vista posible: copia con los bytes invertidos
+                    column = array(spec["type"], column)
+                    column.byteswap()
+            setattr(self, name, column)
+
+    def __len__(self):
+        return self.header["words"]
+
+    def token(self, i):
+        """Palabra `i` con su puntuación."""
+        return bytes(self.text[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8").rstrip(" ")
+
+    def span(self, i, j):
+        """Texto de las palabras [i, j)."""
+        return bytes(self.text[self.offsets[i]:self.offsets[j]]).decode("utf-8").rstrip(" ")
+
+    def time_range(self, t0, t1):
+        """(i, j): las palabras que empiezan en [t0, t1) (búsqueda binaria sobre `start`)."""
+        return bisect.bisect_left(self.start, t0), bisect.bisect_left(self.start, t1)
+
+    def speaker_of(self, i):
+        return self.speakers[self.speaker[i]]
+
+    def turns(self, i=0, j=None):
+        """(hablante, i, j) de cada tramo seguido del mismo hablante entre las palabras [i, j)."""
+        j = len(self) if j is None else j
+        speaker = self.speaker
+        begin = i
+        for k in range(i + 1, j + 1):
+            if k == j or speaker[k] != speaker[begin]:
+                yield self.speakers[speaker[begin]], begin, k
+                begin = k
+
+    def numpy(self):
+        """{columna: numpy.ndarray} sobre el mismo buffer (sin copia)."""
+        np = _numpy()
+        arrays = {}
+        for name, spec in self.header["columns"].items():
+            arrays[name] = np.frombuffer(self._buffer, dtype=_NUMPY_TYPES[spec["type"]], count=spec["count"],
+                                         offset=self._base + spec["offset"])
+        return arrays
+
+
+def load_file(path):
+    """Columns sobre un mmap del archivo: las páginas se leen del disco a medida que se usan."""
+    with open(path, "rb") as f:
+        return Columns(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
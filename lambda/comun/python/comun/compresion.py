@@ -0,0 +1,114 @@
+"""
+Compresión opcional de los artefactos intermedios en S3: el texto
+formateado (transcripciones-formateadas/) y el JSON unido de los audios
+largos (transcripciones/). El JSON de Transcribe lo escribe Transcribe y
+los resúmenes son chicos: quedan como están.
+
+ARTIFACT_ENCODING elige "gzip", "zstd" o "" (sin comprimir, el default).
+Las claves no cambian (.txt / .json, así los filtros de las notificaciones
+del bucket siguen coincidiendo): la codificación va en el Content-Encoding
+del objeto, que S3 devuelve en cada GET y en las descargas con URL
+prefirmada, y el tamaño sin comprimir en la metadata `uncompressed-bytes`
+cuando se conoce al escribir (con multipart la metadata se fija antes).
+
+Los objetos grandes se escriben de a bloques (s3_multipart.COMPRESS_CHUNK)
+y cada bloque es un miembro gzip o un frame zstd independiente: el objeto
+sigue siendo un .gz / .zst válido y la descompresión puede empezar en el
+inicio de cualquier bloque (las páginas de getResults lo aprovechan).
+
+Los lectores pasan la respuesta de get_object por `open_body`: con
+Content-Encoding devuelve un stream que descomprime a medida que se lee,
+así el parser incremental de formatear y las lecturas de resumir y
+transcribir no cambian. Lo que se escribió sin codificar se lee igual.
+zstd necesita el paquete `zstandard` en la layer y se importa sólo al usarlo.
+"""
+import gzip
+import os
+import zlib
+
+GZIP = "gzip"
+ZSTD = "zstd"
+ENCODINGS = ("", GZIP, ZSTD)
+
+ENCODING = os.environ.get("ARTIFACT_ENCODING", "").strip().lower()
+GZIP_LEVEL = int(os.environ.get("ARTIFACT_GZIP_LEVEL", "6"))
+ZSTD_LEVEL = int(os.environ.get("ARTIFACT_ZSTD_LEVEL", "3"))
+
+if ENCODING not in ENCODINGS:
+    raise ValueError(f"ARTIFACT_ENCODING inválido: {ENCODING} (gzip | zstd | vacío)")
+
+UNCOMPRESSED_BYTES = "uncompressed-bytes"
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise RuntimeError("Content-Encoding zstd requiere el paquete zstandard en la layer") from e
+    return zstandard
+
+
+def compressor(encoding):
+    """Compresor incremental (`compress(bytes)` / `flush()`) o None si `encoding` es ""."""
+    if not encoding:
+        return None
+    if encoding == GZIP:
+        # wbits 16 + 15: deflate con header y trailer gzip
+        return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    if encoding == ZSTD:
+        return _zstd().ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    raise ValueError(f"Codificación no soportada: {encoding}")
+
+
+def decompressor(encoding):
+    """
+    Descompresor incremental de un solo bloque: `decompress(bytes)`, y
+    `eof` / `unused_data` al terminar el miembro gzip o frame zstd.
+    """
+    if encoding == GZIP:
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if encoding == ZSTD:
+        return _zstd().ZstdDecompressor().decompressobj()
+    raise ValueError(f"Codificación no soportada: {encoding}")
+
+
+def compress(data, encoding):
+    codec = compressor(encoding)
+    return data if codec is None else codec.compress(data) + codec.flush()
+
+
+def put_args(encoding, uncompressed_bytes=None):
+    """Argumentos extra de put_object / create_multipart_upload para un objeto codificado."""
+    if not encoding:
+        return {}
+    args = {"ContentEncoding": encoding}
+    if uncompressed_bytes is not None:
+        args["Metadata"] = {UNCOMPRESSED_BYTES: str(uncompressed_bytes)}
+    return args
+
+
+def encoding_of(response):
+    """gzip, zstd o "" según el Content-Encoding de una respuesta de get_object/head_object."""
+    encoding = (response.get("ContentEncoding") or "").strip().lower()
+    return encoding if encoding in (GZIP, ZSTD) else ""
+
+
+def uncompressed_size(response):
+    """Tamaño sin comprimir según la metadata (None si no se guardó)."""
+    value = (response.get("Metadata") or {}).get(UNCOMPRESSED_BYTES)
+    return int(value) if value is not None else None
+
+
+def open_body(response):
+    """Stream con el contenido sin comprimir del Body de get_object."""
+    body = response["Body"]
+    encoding = encoding_of(response)
+    if encoding == GZIP:
+        return gzip.GzipFile(fileobj=body, mode="rb")
+    if encoding == ZSTD:
+        return _zstd().ZstdDecompressor().stream_reader(body, read_across_frames=True)
+    return body
+
+
+def read_bytes(response):
+    return open_body(response).read()
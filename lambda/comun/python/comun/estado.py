@@ -0,0 +1,384 @@
+"""
+Estado de cada job del pipeline en una tabla clave-valor.
+
+Cada etapa (transcribir, formatear, resumir) registra sus transiciones con
+`record(job_name, stage, status, **fields)`; `checkStatus` arma la respuesta
+con un único `get(job_name)` en vez de sondear S3 y Transcribe, y
+`waitStatus` espera del lado del servidor con `wait_for_change`.
+
+Un registro tiene la forma:
+
+    {
+        "jobName": "transcription-job-...",
+        "updatedAt": "2025-01-01T12:00:00.000+00:00",
+        "stages": {
+            "formatear": {"status": "COMPLETED", "updatedAt": "...", "output": "transcripciones-formateadas/..."},
+            ...
+        },
+        "history": [{"stage": "formatear", "status": "IN_PROGRESS", "at": "..."}, ...],
+    }
+
+`marks` agrega a la entrada del history momentos que no son transiciones
+de una etapa (p. ej. cuándo se subió el audio o cuándo Transcribe escribió
+el JSON, según el LastModified de S3); con ellos se arma la línea de tiempo
+del job (`instrumentacion.timeline`).
+
+Además, `claim(dedup_key, job_name)` reserva una clave de deduplicación con
+una escritura condicional: el primero que la escribe es el dueño y el resto
+recibe su job (lo usa transcribir para no repetir un mismo audio).
+
+Implementaciones: DynamoDB (la del stack), memoria y SQLite (pruebas y
+ejecución local). `store_from_env` elige según JOB_STATE_BACKEND/JOBS_TABLE.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+
+logger = logging.getLogger()
+
+TRANSCRIBIR = "transcribir"
+FORMATEAR = "formatear"
+RESUMIR = "resumir"
+
+# Esperando lugar en Transcribe (control de admisión de transcribir)
+QUEUED = "QUEUED"
+IN_PROGRESS = "IN_PROGRESS"
+COMPLETED = "COMPLETED"
+FAILED = "FAILED"
+
+# Igual que el lifecycle del bucket: el estado no sobrevive a los archivos
+TTL_DAYS = int(os.environ.get("JOBS_TTL_DAYS", "3"))
+# Cada cuánto relee la tabla `wait_for_change` en los backends sin notificaciones
+POLL_SECONDS = float(os.environ.get("JOB_STATE_POLL_SECONDS", "1"))
+
+_STAGE_PREFIX = "stage_"
+_DEDUP_PREFIX = "dedup#"
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+
+
+def iso(moment):
+    """datetime (p. ej. el LastModified de S3) -> el mismo formato que `updatedAt`."""
+    return moment.astimezone(timezone.utc).isoformat(timespec="milliseconds")
+
+
+def seconds_since(at):
+    """Segundos transcurridos desde un `updatedAt`/`at` de un registro."""
+    return (datetime.now(timezone.utc) - datetime.fromisoformat(at)).total_seconds()
+
+
+def version(record):
+    """
+    Cantidad de transiciones registradas. Crece con cada `record`, aunque dos
+    caigan en el mismo milisegundo de `updatedAt`; es lo que compara `since`.
+    """
+    return len(record["history"]) if record is not None else 0
+
+
+def job_name_from_key(key):
+    """"transcripciones/<job>.json" o "transcripciones-formateadas/<job>.txt" -> "<job>"."""
+    return os.path.splitext(os.path.basename(key))[0]
+
+
+class JobStateStore:
+    """Interfaz común: `record` agrega una transición y `get` devuelve el registro (o None)."""
+
+    def record(self, job_name, stage, status, marks=None, **fields):
+        raise NotImplementedError
+
+    def get(self, job_name):
+        raise NotImplementedError
+
+    def claim(self, dedup_key, job_name):
+        """Reserva `dedup_key` para `job_name` si está libre; devuelve el job dueño de la clave."""
+        raise NotImplementedError
+
+    def release(self, dedup_key, job_name):
+        """Libera `dedup_key` sólo si todavía pertenece a `job_name`."""
+        raise NotImplementedError
+
+    def wait_for_change(self, job_name, since, timeout, poll_interval=None,
+                        clock=time.monotonic, sleep=time.sleep):
+        """
+        Espera hasta `timeout` segundos a que la `version` del registro sea
+        distinta de `since` y devuelve el registro (cambiado o no, o None).
+        Por defecto relee cada `poll_interval` segundos.
+        """
+        poll_interval = POLL_SECONDS if poll_interval is None else poll_interval
+        deadline = clock() + timeout
+        while True:
+            record = self.get(job_name)
+            remaining = deadline - clock()
+            if version(record) != since or remaining <= 0:
+                return record
+            sleep(min(poll_interval, remaining))
+
+
+def _entry(stage, status, now, marks):
+    entry = {"stage": stage, "status": status, "at": now}
+    if marks:
+        entry["marks"] = dict(marks)
+    return entry
+
+
+def _apply(current, job_name, stage, status, fields, now, marks=None):
+    """Aplica una transición sobre un registro local (memoria o SQLite)."""
+    record = current or {"jobName": job_name, "stages": {}, "history": []}
+    record["stages"][stage] = {"status": status, "updatedAt": now, **fields}
+    record["history"].append(_entry(stage, status, now, marks))
+    record["updatedAt"] = now
+    return record
+
+
+class MemoryJobStateStore(JobStateStore):
+    """En memoria; `wait_for_change` se despierta con cada `record` sin releer."""
+
+    def __init__(self):
+        self._records = {}
+        self._claims = {}
+        self._changed = threading.Condition()
+
+    def record(self, job_name, stage, status, marks=None, **fields):
+        with self._changed:
+            self._records[job_name] = _apply(self._records.get(job_name), job_name, stage, status, fields, _now(),
+                                             marks)
+            self._changed.notify_all()
+
+    def _copy(self, job_name):
+        record = self._records.get(job_name)
+        # Copia: el que lee no ve (ni modifica) transiciones posteriores
+        return json.loads(json.dumps(record)) if record is not None else None
+
+    def get(self, job_name):
+        with self._changed:
+            return self._copy(job_name)
+
+    def claim(self, dedup_key, job_name):
+        with self._changed:
+            return self._claims.setdefault(dedup_key, job_name)
+
+    def release(self, dedup_key, job_name):
+        with self._changed:
+            if self._claims.get(dedup_key) == job_name:
+                del self._claims[dedup_key]
+
+    def wait_for_change(self, job_name, since, timeout, poll_interval=None,
+                        clock=time.monotonic, sleep=time.sleep):
+        deadline = clock() + timeout
+        with self._changed:
+            while True:
+                record = self._records.get(job_name)
+                remaining = deadline - clock()
+                if version(record) != since or remaining <= 0:
+                    return self._copy(job_name)
+                self._changed.wait(remaining)
+
+
+class SQLiteJobStateStore(JobStateStore):
+    """Un registro JSON por job; cada transición es una transacción."""
+
+    def __init__(self, path=":memory:"):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._conn.execute("CREATE TABLE IF NOT EXISTS jobs (job_name TEXT PRIMARY KEY, record TEXT NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS claims (dedup_key TEXT PRIMARY KEY, job_name TEXT NOT NULL)")
+
+    def record(self, job_name, stage, status, marks=None, **fields):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT record FROM jobs WHERE job_name = ?", (job_name,)).fetchone()
+                record = _apply(json.loads(row[0]) if row else None, job_name, stage, status, fields, _now(),
+                                marks)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO jobs (job_name, record) VALUES (?, ?)",
+                    (job_name, json.dumps(record, ensure_ascii=False)),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def get(self, job_name):
+        with self._lock:
+            row = self._conn.execute("SELECT record FROM jobs WHERE job_name = ?", (job_name,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def claim(self, dedup_key, job_name):
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO claims (dedup_key, job_name) VALUES (?, ?)", (dedup_key, job_name))
+            return self._conn.execute("SELECT job_name FROM claims WHERE dedup_key = ?", (dedup_key,)).fetchone()[0]
+
+    def release(self, dedup_key, job_name):
+        with self._lock:
+            self._conn.execute("DELETE FROM claims WHERE dedup_key = ? AND job_name = ?", (dedup_key, job_name))
+
+
+def _plain(value):
+    """Decimal (como devuelve DynamoDB los números) -> int/float, para poder serializar a JSON."""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    return value
+
+
+class DynamoDBJobStateStore(JobStateStore):
+    """
+    Tabla con partition key `jobName`. Cada etapa es un atributo map
+    (`stage_<etapa>`), así las etapas se actualizan sin pisarse entre sí, y
+    `expiresAt` es el atributo TTL de la tabla. Las claves de deduplicación
+    viven en la misma tabla como `dedup#<clave>` con el job en `target`.
+    """
+
+    def __init__(self, client, table_name, ttl_days=TTL_DAYS):
+        self._client = client
+        self._table = table_name
+        self._ttl_seconds = ttl_days * 24 * 3600
+        self._serializer = None
+        self._deserializer = None
+
+    def _types(self):
+        # boto3 se importa en el primer uso, no en el arranque de la Lambda
+        if self._serializer is None:
+            from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+            self._serializer, self._deserializer = TypeSerializer(), TypeDeserializer()
+        return self._serializer, self._deserializer
+
+    def _value(self, value):
+        return self._types()[0].serialize(value)
+
+    def record(self, job_name, stage, status, marks=None, **fields):
+        now = _now()
+        self._client.update_item(
+            TableName=self._table,
+            Key={"jobName": {"S": job_name}},
+            UpdateExpression=(
+                "SET #stage = :stage, updatedAt = :now, expiresAt = :ttl, "
+                "history = list_append(if_not_exists(history, :empty), :entry)"
+            ),
+            ExpressionAttributeNames={"#stage": f"{_STAGE_PREFIX}{stage}"},
+            ExpressionAttributeValues={
+                ":stage": self._value({"status": status, "updatedAt": now, **fields}),
+                ":now": {"S": now},
+                ":ttl": {"N": str(int(time.time()) + self._ttl_seconds)},
+                ":empty": {"L": []},
+                ":entry": self._value([_entry(stage, status, now, marks)]),
+            },
+        )
+
+    def _live_item(self, key):
+        """
+        Item vigente o None. El TTL de DynamoDB borra con hasta días de
+        demora, así que un item vencido puede seguir en la tabla.
+        """
+        item = self._client.get_item(TableName=self._table, Key=key, ConsistentRead=True).get("Item")
+        if item is None or ("expiresAt" in item and int(item["expiresAt"]["N"]) < int(time.time())):
+            return None
+        return item
+
+    def get(self, job_name):
+        item = self._live_item({"jobName": {"S": job_name}})
+        if item is None:
+            return None
+        deserializer = self._types()[1]
+        raw = {name: _plain(deserializer.deserialize(value)) for name, value in item.items()}
+        return {
+            "jobName": raw["jobName"],
+            "updatedAt": raw.get("updatedAt"),
+            "stages": {
+                name[len(_STAGE_PREFIX):]: value
+                for name, value in raw.items() if name.startswith(_STAGE_PREFIX)
+            },
+            "history": raw.get("history", []),
+        }
+
+    def claim(self, dedup_key, job_name):
+        from botocore.exceptions import ClientError
+
+        key = {"jobName": {"S": f"{_DEDUP_PREFIX}{dedup_key}"}}
+        # Si la clave vence o se libera entre el put y el get, se vuelve a intentar
+        for _ in range(3):
+            now = int(time.time())
+            try:
+                # Una clave vencida que el TTL todavía no borró se puede pisar
+                self._client.put_item(
+                    TableName=self._table,
+                    Item={
+                        **key,
+                        "target": {"S": job_name},
+                        "expiresAt": {"N": str(now + self._ttl_seconds)},
+                    },
+                    ConditionExpression="attribute_not_exists(jobName) OR expiresAt < :now",
+                    ExpressionAttributeValues={":now": {"N": str(now)}},
+                )
+                return job_name
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+            item = self._live_item(key)
+            if item is not None:
+                return item["target"]["S"]
+        raise RuntimeError(f"No se pudo reservar la clave de deduplicación {dedup_key}")
+
+    def release(self, dedup_key, job_name):
+        from botocore.exceptions import ClientError
+
+        try:
+            self._client.delete_item(
+                TableName=self._table,
+                Key={"jobName": {"S": f"{_DEDUP_PREFIX}{dedup_key}"}},
+                ConditionExpression="target = :job",
+                ExpressionAttributeValues={":job": {"S": job_name}},
+            )
+        except ClientError as e:
+            # Otro request ya la liberó o la reservó para un job nuevo
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+
+
+def store_from_env(client_factory=None):
+    """
+    Backend según JOB_STATE_BACKEND: "dynamodb" (tabla en JOBS_TABLE),
+    "memory", "sqlite" (archivo en JOB_STATE_SQLITE_PATH) o "none". Sin
+    JOB_STATE_BACKEND se usa DynamoDB si hay JOBS_TABLE y si no, ninguno.
+    """
+    table = os.environ.get("JOBS_TABLE")
+    backend = os.environ.get("JOB_STATE_BACKEND") or ("dynamodb" if table else "none")
+    if backend == "dynamodb":
+        if not table:
+            raise ValueError("JOB_STATE_BACKEND=dynamodb requiere JOBS_TABLE")
+        if client_factory is None:
+            from comun import clientes
+            client_factory = clientes.lazy
+        return DynamoDBJobStateStore(client_factory("dynamodb"), table)
+    if backend == "memory":
+        return MemoryJobStateStore()
+    if backend == "sqlite":
+        return SQLiteJobStateStore(os.environ.get("JOB_STATE_SQLITE_PATH", "/tmp/estado-jobs.sqlite3"))
+    if backend == "none":
+        return None
+    raise ValueError(f"JOB_STATE_BACKEND inválido: {backend}")
+
+
+def record_safely(store, job_name, stage, status, **fields):
+    """
+    Registra una transición sin cortar la etapa si la tabla falla: los
+    archivos en S3 siguen siendo la fuente de verdad y checkStatus vuelve a
+    sondearlos cuando no hay registro.
+    """
+    if store is None:
+        return
+    try:
+        store.record(job_name, stage, status, **fields)
+    except Exception as e:
+        logger.warning(f"No se pudo registrar {stage}={status} para {job_name}: {str(e)}")
@@ -0,0 +1,181 @@
+"""
+Formateo del JSON de Transcribe a texto por hablante.
+
+Lo usan formatear (modo en dos etapas) y resumir (modo fusionado, donde el
+mismo handler formatea y resume sin pasar el texto por S3). En los dos
+modos el .txt queda en transcripciones-formateadas/ para getResults,
+comprimido según ARTIFACT_ENCODING (ver `compresion`). Al lado, en
+transcripciones-columnas/, quedan los datos por palabra en columnas (ver
+`columnas`; COLUMNAR_ARTIFACT=false lo apaga).
+"""
+import logging
+import os
+from contextlib import nullcontext
+
+from comun import columnas, compresion, estado, instrumentacion
+from comun.s3_multipart import DEFAULT_PART_SIZE, MultipartWriter
+from comun.speaker_alignment import SpeakerAligner
+from comun.transcript_stream import SEGMENT, iter_transcript
+
+logger = logging.getLogger()
+
+PFX_TRANSCRIPCIONES = "transcripciones/"
+PFX_FORMATEADAS = "transcripciones-formateadas/"
+PFX_COLUMNAS = "transcripciones-columnas/"
+
+COLUMNAR = os.environ.get("COLUMNAR_ARTIFACT", "true").lower() == "true"
+
+
+def _format_items(items, aligner, block_size=1024, columns=None):
+    """Formatea los items y los entrega en bloques de texto de `block_size` items."""
+    current_speaker = None
+    block = []
+    for item in items:
+        content = item['alternatives'][0]['content']
+        if item['type'] == 'punctuation':
+            block.append(content)
+            if columns is not None:
+                columns.add_punctuation(content)
+        else:
+            speaker = aligner.speaker_for_item(item)
+            if columns is not None:
+                columns.add_word(item, speaker)
+            if speaker != current_speaker:
+                current_speaker = speaker
+                block.append(f"\n\n{speaker}: ")
+            block.append(content + " ")
+
+        if len(block) >= block_size:
+            yield "".join(block)
+            block = []
+    if block:
+        yield "".join(block)
+
+
+def _strip_pieces(pieces):
+    """Equivalente a `''.join(pieces).strip()` sin juntar el texto completo."""
+    pending = ""
+    started = False
+    for piece in pieces:
+        if not started:
+            piece = piece.lstrip()
+            if not piece:
+                continue
+            started = True
+        body = piece.rstrip()
+        if not body:
+            pending += piece
+            continue
+        if pending:
+            yield pending
+        yield body
+        pending = piece[len(body):]
+
+
+def format_transcript(stream, columns=None):
+    """
+    Genera el texto formateado ("\\n\\nspk_N: palabras...") a medida que se
+    parsea el JSON de Transcribe desde `stream`. Con `columns` (un
+    columnas.ColumnBuilder) también va llenando las columnas por palabra.
+
+    Transcribe escribe `speaker_labels` antes que `items`, así que los items
+    se formatean apenas llegan. Si algún JSON trajera los items primero, se
+    guardan hasta terminar de leer los segmentos.
+    """
+    aligner = SpeakerAligner()
+
+    def items():
+        early_items = []
+        for kind, value in iter_transcript(stream):
+            if kind == SEGMENT:
+                aligner.add(value)
+            elif not len(aligner):
+                early_items.append(value)
+            else:
+                if early_items:
+                    yield from early_items
+                    early_items = []
+                yield value
+        yield from early_items
+
+    return _strip_pieces(_format_items(items(), aligner, columns=columns))
+
+
+def is_transcript_key(key):
+    return key.startswith(PFX_TRANSCRIPCIONES) and key.endswith(".json")
+
+
+def formatted_key(key):
+    """transcripciones/<job>.json -> transcripciones-formateadas/<job>.txt"""
+    return PFX_FORMATEADAS + os.path.basename(key).replace(".json", ".txt")
+
+
+def columns_key(key):
+    """transcripciones/<job>.json -> transcripciones-columnas/<job>.cols"""
+    return PFX_COLUMNAS + os.path.basename(key).replace(".json", ".cols")
+
+
+def format_object(s3_client, job_state, bucket, key, part_size=DEFAULT_PART_SIZE, keep_text=False):
+    """
+    Formatea s3://bucket/key, sube el .txt con multipart y registra las
+    transiciones de transcribir y formatear en `job_state`.
+
+    Devuelve {"output", "bytes"} y, con `keep_text`, también "text" con el
+    texto completo para seguir procesándolo en el mismo handler.
+    """
+    job_name = estado.job_name_from_key(key)
+    with instrumentacion.job(estado.FORMATEAR, job_name) as metrics:
+        # Que Transcribe haya escrito el JSON implica que el job terminó bien
+        estado.record_safely(job_state, job_name, estado.TRANSCRIBIR, estado.COMPLETED, output=key)
+        estado.record_safely(job_state, job_name, estado.FORMATEAR, estado.IN_PROGRESS)
+
+        try:
+            with metrics.timer("S3GetMs"):
+                response = s3_client.get_object(Bucket=bucket, Key=key)
+            metrics.add("BytesIn", response.get("ContentLength", 0), instrumentacion.BYTES)
+            # El LastModified del JSON es el fin de Transcribe en la línea de tiempo
+            written = response.get("LastModified")
+            marks = {"transcriptWritten": estado.iso(written)} if written else None
+
+            # Guardar archivo .txt: las partes se suben a medida que se completan.
+            # FormatMs incluye el parseo del stream y la espera por partes en vuelo
+            txt_key = formatted_key(key)
+            pieces = [] if keep_text else None
+            # Los archivos temporales del builder se borran también si el formateo falla
+            with columnas.ColumnBuilder() if COLUMNAR else nullcontext() as builder:
+                with metrics.timer("FormatMs"):
+                    with MultipartWriter(s3_client, bucket, txt_key, content_type='text/plain',
+                                         part_size=part_size, content_encoding=compresion.ENCODING) as writer:
+                        for piece in format_transcript(compresion.open_body(response), columns=builder):
+                            writer.write(piece)
+                            if pieces is not None:
+                                pieces.append(piece)
+                metrics.add("BytesOut", writer.bytes_written, instrumentacion.BYTES)
+                metrics.add("TextBytes", writer.raw_bytes, instrumentacion.BYTES)
+
+                fields = {}
+                if builder is not None:
+                    # Sin comprimir: se lee sin copiar (ver columnas.Columns). Las columnas
+                    # salen de los archivos temporales del builder directo a las partes
+                    cols_key = columns_key(key)
+                    with MultipartWriter(s3_client, bucket, cols_key, content_type='application/octet-stream',
+                                         part_size=part_size) as cols_writer:
+                        builder.write_to(cols_writer.write_bytes)
+                    metrics.add("ColumnarBytes", cols_writer.bytes_written, instrumentacion.BYTES)
+                    fields["columns"] = cols_key
+
+            logger.info(f"Archivo TXT guardado en: s3://{bucket}/{txt_key}")
+            estado.record_safely(job_state, job_name, estado.FORMATEAR, estado.COMPLETED, marks=marks,
+                                 output=txt_key, bytes=writer.bytes_written, textBytes=writer.raw_bytes,
+                                 **fields)
+
+        except Exception as e:
+            logger.error(f"Error al procesar transcripción {key}: {str(e)}")
+            estado.record_safely(job_state, job_name, estado.FORMATEAR, estado.FAILED,
+                                 error=type(e).__name__, detail=str(e))
+            raise
+
+    result = {"output": txt_key, "bytes": writer.bytes_written}
+    if pieces is not None:
+        result["text"] = "".join(pieces)
+    return result
@@ -0,0 +1,268 @@
+"""
+Métricas por job en CloudWatch Embedded Metric Format (EMF) y línea de
+tiempo de punta a punta.
+
+Cada etapa abre `job(etapa, job_name)` alrededor del trabajo de un job y
+mide con `timed("S3GetMs")` / `count("BytesIn", n, BYTES)`. Al cerrar se
+escribe una sola línea JSON en stdout con todas las métricas del job:
+CloudWatch la convierte en métricas (dimensión `Stage`) y el `jobName` queda
+como propiedad para buscar el job en Logs Insights. Se escribe a stdout y
+no con `logger` porque el formato del logger de Lambda antepone campos y
+CloudWatch ya no reconoce la línea como EMF.
+
+Las métricas del job activo están en una variable por thread: las llamadas
+que corren en otros threads (pool de map-reduce, partes de un multipart) se
+envuelven con `bind` para que sumen al mismo job. Medir cuesta un
+`perf_counter` y una suma bajo lock; sin job activo no hace nada.
+
+`timeline(record)` arma la línea de tiempo del job (subida, espera en la
+admisión, Transcribe, entregas entre etapas, formateo y resumen) a partir
+del `history` del estado y de las marcas `uploaded`/`transcriptWritten`.
+
+Los eventos de entrada no se loguean completos: `log_payload` deja un
+resumen (records, claves, tamaño) y sólo una fracción LOG_EVENT_SAMPLE_RATE
+de las invocaciones loguea el payload, recortado a LOG_EVENT_MAX_CHARS.
+"""
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger()
+
+NAMESPACE = os.environ.get("METRICS_NAMESPACE", "TranscripcionConResumen")
+ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_EVENT_SAMPLE_RATE", "0.01"))
+LOG_MAX_CHARS = int(os.environ.get("LOG_EVENT_MAX_CHARS", "2000"))
+
+MILLISECONDS = "Milliseconds"
+BYTES = "Bytes"
+COUNT = "Count"
+
+# Fases de la línea de tiempo: (nombre, eventos de inicio, eventos de fin)
+PHASES = (
+    ("uploadToStartMs", ("uploaded",), ("transcribir:QUEUED", "transcribir:IN_PROGRESS")),
+    ("admissionWaitMs", ("transcribir:QUEUED",), ("transcribir:IN_PROGRESS",)),
+    ("transcribeMs", ("transcribir:IN_PROGRESS",), ("transcriptWritten",)),
+    ("deliveryToFormatMs", ("transcriptWritten",), ("formatear:IN_PROGRESS",)),
+    ("formatMs", ("formatear:IN_PROGRESS",), ("formatear:COMPLETED",)),
+    ("deliveryToSummaryMs", ("formatear:COMPLETED",), ("resumir:IN_PROGRESS",)),
+    ("summarizeMs", ("resumir:IN_PROGRESS",), ("resumir:COMPLETED",)),
+)
+
+_current = threading.local()
+_write_lock = threading.Lock()
+
+
+class JobMetrics:
+    """Métricas acumuladas de un job en una etapa; `emit` las escribe como EMF."""
+
+    def __init__(self, stage, job_name=None, **properties):
+        self.stage = stage
+        self.status = None
+        self.values = {}
+        self.properties = {"jobName": job_name, **properties}
+        self._lock = threading.Lock()
+
+    def add(self, name, value, unit=COUNT):
+        with self._lock:
+            previous = self.values.get(name)
+            self.values[name] = (value + (previous[0] if previous else 0), unit)
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - start) * 1000, MILLISECONDS)
+
+    def property(self, **properties):
+        self.properties.update(properties)
+
+    def to_emf(self, timestamp_ms=None):
+        values = {name: round(value, 3) for name, (value, _) in self.values.items()}
+        return {
+            "_aws": {
+                "Timestamp": timestamp_ms if timestamp_ms is not None else int(time.time() * 1000),
+                "CloudWatchMetrics": [{
+                    "Namespace": NAMESPACE,
+                    "Dimensions": [["Stage"]],
+                    "Metrics": [{"Name": name, "Unit": unit} for name, (_, unit) in self.values.items()],
+                }],
+            },
+            "Stage": self.stage,
+            "status": self.status,
+            **{k: v for k, v in self.properties.items() if v is not None},
+            **values,
+        }
+
+    def emit(self):
+        line = json.dumps(self.to_emf(), default=str)
+        with _write_lock:
+            sys.stdout.write(line + "\n")
+            sys.stdout.flush()
+
+
+class _NoMetrics:
+    """Sin job activo (o con METRICS_ENABLED=false): todo es no-op."""
+
+    stage = None
+    status = None
+
+    def add(self, name, value, unit=COUNT):
+        pass
+
+    @contextmanager
+    def timer(self, name):
+        yield
+
+    def property(self, **properties):
+        pass
+
+
+_NOOP = _NoMetrics()
+
+
+def current():
+    return getattr(_current, "metrics", _NOOP)
+
+
+@contextmanager
+def job(stage, job_name=None, **properties):
+    """Abre las métricas de un job; al salir agrega DurationMs y las emite."""
+    if not ENABLED:
+        yield _NOOP
+        return
+    metrics = JobMetrics(stage, job_name, **properties)
+    previous = current()
+    _current.metrics = metrics
+    start = time.perf_counter()
+    try:
+        yield metrics
+    except BaseException:
+        metrics.status = metrics.status or "FAILED"
+        raise
+    finally:
+        _current.metrics = previous
+        metrics.status = metrics.status or "COMPLETED"
+        metrics.add("DurationMs", (time.perf_counter() - start) * 1000, MILLISECONDS)
+        metrics.emit()
+
+
+def timed(name):
+    return current().timer(name)
+
+
+def count(name, value=1, unit=COUNT):
+    current().add(name, value, unit)
+
+
+def bind(fn):
+    """Envuelve `fn` para que, corra en el thread que corra, mida sobre el job actual."""
+    metrics = current()
+    if metrics is _NOOP:
+        return fn
+
+    def bound(*args, **kwargs):
+        previous = current()
+        _current.metrics = metrics
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.metrics = previous
+
+    return bound
+
+
+def _parse(at):
+    return datetime.fromisoformat(at)
+
+
+def timeline(record):
+    """
+    Línea de tiempo de un registro de estado: eventos ordenados, duración de
+    cada fase presente y total desde el primer evento hasta el resumen.
+    """
+    events = []
+    for entry in (record or {}).get("history", []):
+        events.append((f"{entry['stage']}:{entry['status']}", entry["at"]))
+        for mark, at in (entry.get("marks") or {}).items():
+            events.append((mark, at))
+    events.sort(key=lambda event: _parse(event[1]))
+
+    first, last = {}, {}
+    for name, at in events:
+        first.setdefault(name, at)
+        last[name] = at
+
+    def _between(start, end):
+        return round((_parse(end) - _parse(start)).total_seconds() * 1000, 1)
+
+    phases = {}
+    for phase, starts, ends in PHASES:
+        start = min((first[name] for name in starts if name in first), key=_parse, default=None)
+        end = min((first[name] for name in ends if name in first), key=_parse, default=None)
+        if phase in ("formatMs", "summarizeMs"):
+            # Con reintentos hay varias entregas: la fase termina en la última
+            end = last.get(ends[0])
+        if start is not None and end is not None:
+            phases[phase] = _between(start, end)
+
+    finished = last.get("resumir:COMPLETED")
+    return {
+        "events": [{"event": name, "at": at} for name, at in events],
+        "phasesMs": phases,
+        "totalMs": _between(events[0][1], finished) if events and finished else None,
+    }
+
+
+def emit_timeline(stage, job_name, record):
+    """Emite las fases de la línea de tiempo como métricas del pipeline completo."""
+    if not ENABLED or record is None:
+        return None
+    result = timeline(record)
+    metrics = JobMetrics(stage, job_name)
+    for phase, ms in result["phasesMs"].items():
+        metrics.add(phase[0].upper() + phase[1:], ms, MILLISECONDS)
+    if result["totalMs"] is not None:
+        metrics.add("EndToEndMs", result["totalMs"], MILLISECONDS)
+    metrics.status = "COMPLETED"
+    metrics.emit()
+    return result
+
+
+def _summary(payload):
+    if not isinstance(payload, dict):
+        return {"type": type(payload).__name__, "chars": len(str(payload))}
+    summary = {"keys": sorted(payload)[:10]}
+    records = payload.get("Records")
+    if isinstance(records, list):
+        summary["records"] = len(records)
+        summary["sources"] = sorted({str(r.get("eventSource")) for r in records if isinstance(r, dict)})
+    body = payload.get("body")
+    if isinstance(body, str):
+        summary["bodyChars"] = len(body)
+    return summary
+
+
+def log_payload(label, payload, sample_rate=None, rng=random.random):
+    """
+    Loguea un resumen de `payload`; una fracción `sample_rate` de las veces
+    agrega el payload recortado para poder ver ejemplos reales.
+    """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    sample_rate = LOG_SAMPLE_RATE if sample_rate is None else sample_rate
+    message = f"{label}: {json.dumps(_summary(payload), default=str)}"
+    if sample_rate > 0 and rng() < sample_rate:
+        text = json.dumps(payload, default=str)
+        if len(text) > LOG_MAX_CHARS:
+            text = text[:LOG_MAX_CHARS] + f"... (+{len(text) - LOG_MAX_CHARS} caracteres)"
+        message += f" muestra={text}"
+    logger.info(message)
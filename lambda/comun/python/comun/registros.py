@@ -0,0 +1,175 @@
+"""
+Procesamiento de todos los records S3 que llegan en un mismo evento.
+
+Cada record se procesa en un pool de threads acotado que comparte los
+clientes boto3 del módulo (los clientes son thread-safe). Un record que
+falla no corta al resto: el resultado de cada uno se informa por separado.
+
+Las notificaciones pueden llegar directo de S3 o a través de un queue SQS
+(el stack pone uno delante de cada etapa). Con SQS cada mensaje trae en el
+body el evento S3 original, y los mensajes con algún record que levantó una
+excepción (o `RetryLater`) se devuelven en `batchItemFailures` para que SQS
+los reentregue y, agotados los intentos, los mande a la DLQ. Un record que
+devuelve {"status": "FAILED"} ya informó su error y no se reintenta.
+
+Con `RetryLater` el mensaje no espera el visibility timeout del queue (6
+veces el de la función): se le cambia la visibilidad a un backoff corto que
+crece con `ApproximateReceiveCount`.
+"""
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote_plus
+
+logger = logging.getLogger()
+
+MAX_WORKERS = int(os.environ.get("MAX_WORKERS_REGISTROS", "4"))
+# maxReceiveCount de la DLQ del queue de la etapa: la última entrega no se devuelve
+MAX_RECEIVE_COUNT = int(os.environ.get("STAGE_MAX_RECEIVE_COUNT", "1"))
+
+# Backoff de RetryLater: base * 2^(entrega - 1), con tope
+RETRY_BASE_SECONDS = int(os.environ.get("STAGE_RETRY_BASE_SECONDS", "30"))
+RETRY_MAX_SECONDS = int(os.environ.get("STAGE_RETRY_MAX_SECONDS", "900"))
+
+RETRY = "RETRY"
+
+# Cliente SQS perezoso: sólo se crea si algún record pide reintento
+_sqs = None
+
+_delivery = threading.local()
+
+
+class RetryLater(Exception):
+    """Error transitorio: el mensaje SQS vuelve al queue en vez de fallar el record."""
+
+
+def final_attempt():
+    """
+    True si el record que se procesa en este thread no se va a reentregar:
+    llegó directo de S3 o es la última entrega antes de la DLQ.
+    """
+    return getattr(_delivery, "receive_count", MAX_RECEIVE_COUNT) >= MAX_RECEIVE_COUNT
+
+
+def _s3_entries(payload):
+    for record in payload.get("Records", []):
+        s3 = record.get("s3")
+        if s3 is None:
+            logger.warning(f"Ignorando record sin datos de S3: {record.get('eventSource')}")
+            continue
+        # S3 codifica la key en la notificación (espacios como '+', etc.)
+        yield s3["bucket"]["name"], unquote_plus(s3["object"]["key"])
+
+
+def s3_records(event):
+    """Genera (bucket, key) por cada record S3 del evento, con la key decodificada."""
+    for _, bucket, key in _deliveries(event):
+        yield bucket, key
+
+
+def _deliveries(event):
+    """(mensaje SQS o None, bucket, key) por cada record S3, desenvolviendo SQS."""
+    for record in event.get("Records", []):
+        if record.get("eventSource") != "aws:sqs":
+            for bucket, key in _s3_entries({"Records": [record]}):
+                yield None, bucket, key
+            continue
+        try:
+            payload = json.loads(record["body"])
+        except ValueError:
+            logger.warning(f"Ignorando mensaje SQS que no es JSON: {record.get('messageId')}")
+            continue
+        # Al configurar la notificación S3 manda un s3:TestEvent sin records
+        for bucket, key in _s3_entries(payload):
+            yield record, bucket, key
+
+
+def retry_delay(receive_count):
+    """Segundos hasta la próxima entrega de un mensaje que pidió RetryLater."""
+    return min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** max(receive_count - 1, 0))
+
+
+def _queue_url(arn):
+    # arn:aws:sqs:<región>:<cuenta>:<nombre>
+    _, _, _, region, account, name = arn.split(":", 5)
+    return f"https://sqs.{region}.amazonaws.com/{account}/{name}"
+
+
+def _delay_redelivery(message):
+    global _sqs
+    if not message.get("receiptHandle") or not message.get("eventSourceARN"):
+        return
+    if _sqs is None:
+        from comun import clientes
+        _sqs = clientes.lazy("sqs")
+    delay = retry_delay(int(message["attributes"]["ApproximateReceiveCount"]))
+    try:
+        _sqs.change_message_visibility(
+            QueueUrl=_queue_url(message["eventSourceARN"]),
+            ReceiptHandle=message["receiptHandle"],
+            VisibilityTimeout=delay,
+        )
+    except Exception as e:
+        # Sin el cambio vuelve igual, al vencer el visibility timeout del queue
+        logger.warning(f"No se pudo adelantar la reentrega de {message.get('messageId')}: {str(e)}")
+
+
+def _run(handler, message, bucket, key):
+    _delivery.receive_count = int(message["attributes"]["ApproximateReceiveCount"]) if message else MAX_RECEIVE_COUNT
+    redeliver = message is not None
+    try:
+        result = handler(bucket, key) or {}
+        redeliver = False
+    except RetryLater as e:
+        logger.warning(f"Reintento pendiente para s3://{bucket}/{key}: {str(e)}")
+        result = {"status": RETRY, "detail": str(e)}
+        if message is not None:
+            _delay_redelivery(message)
+    except Exception as e:
+        logger.exception(f"Error procesando s3://{bucket}/{key}")
+        result = {"status": "FAILED", "error": type(e).__name__, "detail": str(e)}
+    finally:
+        del _delivery.receive_count
+    return {"bucket": bucket, "key": key, "status": "COMPLETED", **result}, redeliver
+
+
+def process_records(event, handler, max_workers=None):
+    """
+    Ejecuta `handler(bucket, key)` para cada record S3 del evento.
+
+    `handler` devuelve un dict opcional que se agrega al resultado del record
+    (puede traer su propio "status"); si levanta una excepción el record queda
+    como FAILED. Devuelve {"status", "records"} con el detalle de cada uno y,
+    si el evento vino de SQS, "batchItemFailures" con los mensajes a reentregar.
+    """
+    deliveries = list(_deliveries(event))
+    workers = min(max_workers or MAX_WORKERS, len(deliveries))
+
+    if workers <= 1:
+        outcomes = [_run(handler, *delivery) for delivery in deliveries]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            outcomes = list(pool.map(lambda delivery: _run(handler, *delivery), deliveries))
+    results = [result for result, _ in outcomes]
+
+    failed = sum(1 for result in results if result["status"] in ("FAILED", RETRY))
+    if failed == 0:
+        status = "COMPLETED"
+    elif failed == len(results):
+        status = "FAILED"
+    else:
+        status = "PARTIAL"
+
+    if failed:
+        logger.warning(f"{failed} de {len(results)} records fallaron")
+    response = {"status": status, "records": results}
+
+    if any(record.get("eventSource") == "aws:sqs" for record in event.get("Records", [])):
+        retry_ids = []
+        for (message, _, _), (_, redeliver) in zip(deliveries, outcomes):
+            if redeliver and message["messageId"] not in retry_ids:
+                retry_ids.append(message["messageId"])
+        response["batchItemFailures"] = [{"itemIdentifier": message_id} for message_id in retry_ids]
+    return response
@@ -0,0 +1,176 @@
+"""
+Escritura incremental de texto a S3 con multipart upload.
+
+El texto se acumula en un buffer de una parte; cuando se llena se codifica
+y se sube en segundo plano mientras se sigue formateando. Como máximo hay
+`max_in_flight` partes subiéndose a la vez, así que la memoria queda
+acotada a unas pocas partes sin importar el largo de la transcripción.
+Si el texto entra en una sola parte se usa un `put_object` común.
+
+Con `content_encoding` ("gzip" / "zstd") cada bloque de COMPRESS_CHUNK
+caracteres se comprime como un miembro gzip (o frame zstd) independiente
+y las partes se arman con los bytes ya comprimidos (S3 pide 5 MiB de lo
+que se sube). Así la descompresión se puede retomar al inicio de cualquier
+bloque sin leer el objeto desde el principio.
+"""
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from comun import compresion, instrumentacion
+
+logger = logging.getLogger()
+
+# S3 exige al menos 5 MiB en todas las partes salvo la última
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+# Texto que se acumula antes de pasarlo al compresor
+COMPRESS_CHUNK = 1024 * 1024
+
+
+class MultipartWriter:
+    def __init__(self, client, bucket, key, content_type="text/plain",
+                 part_size=DEFAULT_PART_SIZE, max_in_flight=2, content_encoding=""):
+        self._client = client
+        self._bucket = bucket
+        self._key = key
+        self._content_type = content_type
+        self._content_encoding = content_encoding
+        # Valida la codificación antes de empezar a escribir
+        compresion.compressor(content_encoding)
+        self._part_size = max(part_size, MIN_PART_SIZE)
+        # Sin compresión cada caracter ocupa al menos un byte en UTF-8: juntar
+        # una parte de caracteres alcanza para una parte de bytes
+        self._chunk = min(self._part_size, COMPRESS_CHUNK) if content_encoding else self._part_size
+        self._buffer = io.StringIO()
+        self._buffered = 0
+        self._pending = bytearray()
+        self._upload_id = None
+        self._futures = []
+        self._max_in_flight = max_in_flight
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._executor = None
+        # Bytes subidos (comprimidos) y bytes del texto
+        self.bytes_written = 0
+        self.raw_bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def write(self, text):
+        self._buffered += self._buffer.write(text)
+        if self._buffered >= self._chunk:
+            self._encode()
+            if len(self._pending) >= self._part_size:
+                self._flush_part()
+
+    def write_bytes(self, data):
+        """
+        Como `write`, con bytes ya codificados (artefactos binarios). Con
+        `content_encoding` cada llamada se comprime como un bloque propio.
+        """
+        if self._buffered:
+            self._encode()
+        self.raw_bytes += len(data)
+        if self._content_encoding:
+            data = compresion.compress(data, self._content_encoding)
+        self._pending += data
+        if len(self._pending) >= self._part_size:
+            self._flush_part()
+
+    def _encode(self, final=False):
+        """Pasa el texto del buffer (codificado y comprimido) a los bytes de la próxima parte."""
+        data = self._buffer.getvalue().encode("utf-8")
+        self._buffer = io.StringIO()
+        self._buffered = 0
+        self.raw_bytes += len(data)
+        # Un bloque por miembro; un texto vacío igual necesita uno para ser un .gz válido
+        if self._content_encoding and (data or (final and not self.raw_bytes)):
+            data = compresion.compress(data, self._content_encoding)
+        self._pending += data
+
+    def _take_pending(self):
+        data = bytes(self._pending)
+        self._pending = bytearray()
+        return data
+
+    def _flush_part(self):
+        if self._upload_id is None:
+            response = self._client.create_multipart_upload(
+                Bucket=self._bucket, Key=self._key, ContentType=self._content_type,
+                **compresion.put_args(self._content_encoding)
+            )
+            self._upload_id = response["UploadId"]
+            self._executor = ThreadPoolExecutor(max_workers=self._max_in_flight)
+
+        data = self._take_pending()
+        part_number = len(self._futures) + 1
+        self._slots.acquire()
+        # S3PutMs suma lo que tarda cada parte, aunque se suban en paralelo
+        future = self._executor.submit(instrumentacion.bind(self._upload_part), part_number, data)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+        self.bytes_written += len(data)
+
+    def _upload_part(self, part_number, data):
+        with instrumentacion.timed("S3PutMs"):
+            response = self._client.upload_part(
+                Bucket=self._bucket,
+                Key=self._key,
+                UploadId=self._upload_id,
+                PartNumber=part_number,
+                Body=data,
+            )
+        return {"PartNumber": part_number, "ETag": response["ETag"]}
+
+    def close(self):
+        self._encode(final=True)
+        if self._upload_id is None:
+            data = self._take_pending()
+            with instrumentacion.timed("S3PutMs"):
+                self._client.put_object(
+                    Bucket=self._bucket, Key=self._key, Body=data, ContentType=self._content_type,
+                    **compresion.put_args(self._content_encoding, self.raw_bytes)
+                )
+            self.bytes_written += len(data)
+            return
+
+        try:
+            if self._pending:
+                self._flush_part()
+            parts = [future.result() for future in self._futures]
+            with instrumentacion.timed("S3PutMs"):
+                self._client.complete_multipart_upload(
+                    Bucket=self._bucket,
+                    Key=self._key,
+                    UploadId=self._upload_id,
+                    MultipartUpload={"Parts": parts},
+                )
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def abort(self):
+        self._buffer = io.StringIO()
+        self._buffered = 0
+        self._pending = bytearray()
+        if self._upload_id is None:
+            return
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        try:
+            self._client.abort_multipart_upload(
+                Bucket=self._bucket, Key=self._key, UploadId=self._upload_id
+            )
+        except Exception as e:
+            logger.error(f"No se pudo abortar el multipart upload de {self._key}: {str(e)}")
+        self._upload_id = None
@@ -0,0 +1,94 @@
+"""
+Asignación de hablantes por solapamiento de tiempo.
+
+Los segmentos de `speaker_labels` y los items de la transcripción vienen
+ordenados por tiempo, así que se recorren como dos streams ordenados: un
+puntero avanza sobre los segmentos a medida que avanzan las palabras y cada
+palabra se asigna al segmento con el que más se solapa. Si una palabra cae
+entre dos segmentos (timestamps que no coinciden exactamente) se usa el
+segmento más cercano en lugar de devolver None.
+"""
+from array import array
+from bisect import bisect_right
+
+
+class SpeakerAligner:
+    def __init__(self):
+        self.starts = array('d')
+        self.ends = array('d')
+        self.speakers = array('H')
+        self.labels = []
+        self._label_ids = {}
+        self._idx = 0
+
+    def __len__(self):
+        return len(self.starts)
+
+    def add_segment(self, start_time, end_time, label):
+        label_id = self._label_ids.get(label)
+        if label_id is None:
+            label_id = self._label_ids[label] = len(self.labels)
+            self.labels.append(label)
+
+        start, end = float(start_time), float(end_time)
+        if self.starts and start < self.starts[-1]:
+            # Fuera de orden (no pasa con Transcribe): insertar manteniendo el orden
+            pos = bisect_right(self.starts, start)
+            self.starts.insert(pos, start)
+            self.ends.insert(pos, end)
+            self.speakers.insert(pos, label_id)
+            self._idx = 0
+            return
+        self.starts.append(start)
+        self.ends.append(end)
+        self.speakers.append(label_id)
+
+    def add(self, segment):
+        """Agrega un segmento de `results.speaker_labels.segments`."""
+        self.add_segment(segment['start_time'], segment['end_time'], segment['speaker_label'])
+
+    def speaker_for(self, start, end=None):
+        """
+        Hablante para una palabra en [start, end]. Amortizado O(1) cuando las
+        palabras llegan en orden; si el tiempo retrocede se reubica con bisect.
+        """
+        count = len(self.starts)
+        if not count:
+            return None
+        if end is None or end < start:
+            end = start
+
+        starts, ends = self.starts, self.ends
+        idx = self._idx
+        if idx >= count or (idx > 0 and start < ends[idx - 1]):
+            idx = max(bisect_right(starts, start) - 1, 0)
+        # Descartar los segmentos que terminan antes de que empiece la palabra
+        while idx < count - 1 and ends[idx] < start:
+            idx += 1
+        self._idx = idx
+
+        best, best_overlap = None, -1.0
+        probe = idx
+        while probe < count and starts[probe] <= end:
+            overlap = min(end, ends[probe]) - max(start, starts[probe])
+            if overlap > best_overlap:
+                best, best_overlap = probe, overlap
+            probe += 1
+
+        if best is None or best_overlap < 0:
+            # Sin solapamiento: el segmento más cercano (anterior o siguiente)
+            best = idx
+            if idx > 0 and start - ends[idx - 1] < starts[idx] - end:
+                best = idx - 1
+        return self.labels[self.speakers[best]]
+
+    def speaker_for_item(self, item):
+        # Las salidas más nuevas de Transcribe traen el hablante en cada item
+        label = item.get('speaker_label')
+        if label is not None:
+            return label
+        start_time = item.get('start_time')
+        if start_time is None:
+            return None
+        end_time = item.get('end_time')
+        return self.speaker_for(float(start_time), float(end_time) if end_time is not None else None)
@@ -0,0 +1,204 @@
+"""
+Parser incremental del JSON de salida de Amazon Transcribe.
+
+Recorre `results.speaker_labels.segments` y `results.items` directamente
+desde el stream del Body de S3, decodificando de a un elemento por vez.
+El resto del documento (por ejemplo `results.transcripts`, que repite el
+texto completo) se saltea sin materializarlo, así que la memoria usada
+depende del tamaño de bloque y no del tamaño de la transcripción.
+"""
+import codecs
+import json
+import re
+
+CHUNK_SIZE = 64 * 1024
+
+SEGMENT = "segment"
+ITEM = "item"
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_STRUCTURE = re.compile(r'[\[\]{}"]')
+_STRING_END = re.compile(r'["\\]')
+
+
+class TranscriptStreamError(ValueError):
+    """El stream no contiene un JSON de Transcribe válido."""
+
+
+class _JsonReader:
+    """
+    Lector de JSON sobre un stream binario con un buffer acotado.
+
+    Sólo conserva lo que falta consumir del último bloque leído; cada valor
+    que se pide con `read_value` se decodifica con el decoder de `json`.
+    """
+
+    def __init__(self, stream, chunk_size=CHUNK_SIZE):
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        """Descarta lo consumido y agrega el próximo bloque. False si ya no hay datos."""
+        if self._eof:
+            return False
+        chunk = self._stream.read(self._chunk_size)
+        self._eof = not chunk
+        text = self._utf8.decode(chunk or b"", final=self._eof)
+        self._buf = self._buf[self._pos:] + text
+        self._pos = 0
+        return True
+
+    def _error(self, message):
+        return TranscriptStreamError(f"{message} (cerca de: {self._buf[self._pos:self._pos + 40]!r})")
+
+    def _skip_ws(self):
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf) or not self._fill():
+                return
+
+    def _peek(self):
+        self._skip_ws()
+        if self._pos >= len(self._buf):
+            raise self._error("Fin inesperado del JSON")
+        return self._buf[self._pos]
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise self._error(f"Se esperaba '{char}'")
+        self._pos += 1
+
+    def read_value(self):
+        """Decodifica el próximo valor completo (pensado para valores chicos)."""
+        self._skip_ws()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise self._error("JSON inválido")
+                continue
+            # Un número que termina justo en el borde del buffer puede estar cortado
+            if end == len(self._buf) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def skip_value(self):
+        """Saltea el próximo valor sin decodificarlo, bloque por bloque."""
+        char = self._peek()
+        if char == '"':
+            self._skip_string()
+            return
+        if char not in "[{":
+            self.read_value()
+            return
+
+        depth = 0
+        while True:
+            match = _STRUCTURE.search(self._buf, self._pos)
+            if match is None:
+                self._pos = len(self._buf)
+                if not self._fill():
+                    raise self._error("Fin inesperado del JSON")
+                continue
+            token = match.group()
+            if token == '"':
+                self._pos = match.start()
+                self._skip_string()
+                continue
+            self._pos = match.end()
+            depth += 1 if token in "[{" else -1
+            if depth == 0:
+                return
+
+    def _skip_string(self):
+        self._pos += 1  # comilla de apertura
+        while True:
+            match = _STRING_END.search(self._buf, self._pos)
+            if match is None:
+                self._pos = len(self._buf)
+                if not self._fill():
+                    raise self._error("String sin cerrar")
+                continue
+            if match.group() == '"':
+                self._pos = match.end()
+                return
+            # Escape: el caracter siguiente a la barra tiene que estar en el buffer
+            if match.end() >= len(self._buf):
+                self._pos = match.start()
+                if not self._fill():
+                    raise self._error("Escape incompleto")
+                continue
+            self._pos = match.end() + 1
+
+    def iter_object(self):
+        """
+        Genera las claves de un objeto. Quien consume el generador tiene que
+        leer o saltear el valor de cada clave antes de pedir la siguiente.
+        """
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.read_value()
+            if not isinstance(key, str):
+                raise self._error("Clave de objeto inválida")
+            self._expect(":")
+            yield key
+            char = self._peek()
+            self._pos += 1
+            if char == "}":
+                return
+            if char != ",":
+                raise self._error("Se esperaba ',' o '}'")
+
+    def iter_array(self):
+        """Genera los elementos de un array ya decodificados, de a uno."""
+        self._expect("[")
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self.read_value()
+            char = self._peek()
+            self._pos += 1
+            if char == "]":
+                return
+            if char != ",":
+                raise self._error("Se esperaba ',' o ']'")
+
+
+def iter_transcript(stream, chunk_size=CHUNK_SIZE):
+    """
+    Recorre la salida de Transcribe y genera tuplas `(SEGMENT, segmento)` e
+    `(ITEM, item)` en el mismo orden en que aparecen en el documento.
+
+    `stream` es cualquier objeto con `read(n)` que devuelva bytes, como el
+    `Body` de `get_object`.
+    """
+    reader = _JsonReader(stream, chunk_size)
+    for key in reader.iter_object():
+        if key != "results":
+            reader.skip_value()
+            continue
+
+        for results_key in reader.iter_object():
+            if results_key == "items":
+                for item in reader.iter_array():
+                    yield ITEM, item
+            elif results_key == "speaker_labels" and reader._peek() == "{":
+                for labels_key in reader.iter_object():
+                    if labels_key == "segments":
+                        for segment in reader.iter_array():
+                            yield SEGMENT, segment
+                    else:
+                        reader.skip_value()
+            else:
+                reader.skip_value()
@@ -1,68 +1,33 @@
-import boto3
-import json
 import logging
 import os
 
+from comun import clientes, estado, instrumentacion
+from comun.formato import format_object, format_transcript, is_transcript_key  # noqa: F401
+from comun.registros import process_records
+from comun.s3_multipart import DEFAULT_PART_SIZE
+
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-s3_client = boto3.client('s3')
+s3_client = clientes.lazy('s3')
 output_bucket = os.environ['BUCKET']
+part_size = int(os.environ.get('FORMATEAR_PART_SIZE', DEFAULT_PART_SIZE))
+job_state = estado.store_from_env()
+clientes.prepare(s3_client)
 
-def lambda_handler(event, context):
-    # Verifica que el evento contiene los datos correctamente
-    logger.info(f"Received event: {json.dumps(event)}")
-
-    # Tomar SIEMPRE el record S3
-    record = event['Records'][0]
-    bucket = record['s3']['bucket']['name']
-    key = record['s3']['object']['key']
 
-    if not key.endswith(".json") or not key.startswith("transcripciones/"):
+def _process_record(bucket, key):
+    if not is_transcript_key(key):
         logger.warning(f"Ignorando archivo no válido: {key}")
-        return
-
-    try:
-        response = s3_client.get_object(Bucket=bucket, Key=key)
-        transcript_data = json.loads(response['Body'].read().decode('utf-8'))
-
-        items = transcript_data['results']['items']
-        speaker_segments = transcript_data['results'].get('speaker_labels', {}).get('segments', [])
+        return {"status": "IGNORED"}
 
-        speaker_map = {}
-        for segment in speaker_segments:
-            speaker = segment['speaker_label']
-            for item in segment['items']:
-                speaker_map[item['start_time']] = speaker
+    result = format_object(s3_client, job_state, bucket, key, part_size)
+    return {"output": result["output"]}
 
-        output_text = ""
-        current_speaker = None
 
-        for item in items:
-            if item['type'] == 'punctuation':
-                output_text += item['alternatives'][0]['content']
-            else:
-                start_time = item.get('start_time')
-                speaker = speaker_map.get(start_time)
-
-                if speaker != current_speaker:
-                    current_speaker = speaker
-                    output_text += f"\n\n{speaker}: "
-
-                output_text += item['alternatives'][0]['content'] + " "
-
-        # Guardar archivo .txt
-        filename = os.path.basename(key).replace(".json", ".txt")
-        txt_key = f"transcripciones-formateadas/{filename}"
-        s3_client.put_object(
-            Bucket=bucket,
-            Key=txt_key,
-            Body=output_text.strip().encode('utf-8'),
-            ContentType='text/plain'
-        )
-
-        logger.info(f"Archivo TXT guardado en: s3://{bucket}/{txt_key}")
+def lambda_handler(event, context):
+    # Resumen del evento; el payload completo sólo en una muestra de invocaciones
+    instrumentacion.log_payload("Received event", event)
 
-    except Exception as e:
-        logger.error(f"Error al procesar transcripción: {str(e)}")
-        raise
+    # Cada record S3 del evento se procesa por separado (en paralelo)
+    return process_records(event, _process_record)
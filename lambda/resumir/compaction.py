@@ -0,0 +1,173 @@
+"""
+Reducción de tokens de entrada antes de resumir.
+
+Etapas (configurables por nombre):
+- "fillers": quita muletillas por idioma ("eh", "o sea", "um"...).
+- "backchannel": descarta asentimientos ("sí", "ok", "claro", "mhm"...) que
+  interrumpen el turno de otro hablante que después continúa. Un "Sí." que
+  responde a una pregunta, o que abre o cierra un turno, se conserva.
+- "merge": junta turnos consecutivos del mismo hablante (los asentimientos
+  descartados suelen partir un mismo turno en dos).
+- "labels": reemplaza "spk_N:" por etiquetas cortas ("A:", "B:"...) y usa
+  un solo salto de línea entre turnos (map_reduce.split_turns acepta ambos).
+
+El resultado informa los tokens estimados antes y después.
+"""
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+from map_reduce import estimate_tokens
+
+DEFAULT_STAGES = ("fillers", "backchannel", "merge", "labels")
+
+# Sólo muletillas que no son también palabras con significado ("este", "like"...)
+FILLERS = {
+    "es": ["eh", "ehm", "em", "emm", "mmm", "mm", "o sea"],
+    "en": ["uh", "um", "uhm", "er", "erm", "hmm", "you know", "i mean"],
+    "pt": ["hã", "hum", "né"],
+}
+
+BACKCHANNELS = {
+    "es": {"sí", "si", "ok", "okey", "claro", "ajá", "aja", "vale", "dale", "bien", "exacto", "perfecto",
+           "mhm", "mmm", "ah", "bueno", "listo", "genial", "eso"},
+    "en": {"yes", "yeah", "yep", "ok", "okay", "right", "sure", "mhm", "hmm", "uh-huh", "got", "it", "exactly",
+           "cool", "great", "alright"},
+    "pt": {"sim", "ok", "claro", "certo", "tá", "ta", "beleza", "isso", "exato", "uhum", "hum"},
+}
+
+# Palabras frecuentes para adivinar el idioma cuando no se indica
+_STOPWORDS = {
+    "es": {"que", "de", "la", "el", "y", "en", "los", "es", "lo", "por", "una", "con", "para", "pero"},
+    "en": {"the", "and", "to", "of", "is", "that", "it", "in", "you", "we", "this", "for", "but", "with"},
+    "pt": {"que", "de", "não", "o", "é", "um", "uma", "com", "para", "mas", "você", "isso", "está", "do"},
+}
+
+MAX_BACKCHANNEL_WORDS = 3
+
+_TURN = re.compile(r"^(spk_\d+|None):\s?(.*)$", re.DOTALL)
+_WORD = re.compile(r"[\wáéíóúñüãõç'-]+", re.IGNORECASE)
+
+
+@dataclass
+class CompactionResult:
+    text: str
+    tokens_before: int
+    tokens_after: int
+
+    @property
+    def saved_ratio(self):
+        if not self.tokens_before:
+            return 0.0
+        return 1 - self.tokens_after / self.tokens_before
+
+
+def detect_language(text, sample_chars=20000):
+    words = Counter(w.lower() for w in _WORD.findall(text[:sample_chars]))
+    scores = {lang: sum(words[w] for w in stopwords) for lang, stopwords in _STOPWORDS.items()}
+    return max(scores, key=scores.get)
+
+
+def _parse_turns(text):
+    turns = []
+    for block in text.split("\n\n"):
+        block = block.strip()
+        if not block:
+            continue
+        match = _TURN.match(block)
+        if match:
+            turns.append([match.group(1), match.group(2).strip()])
+        elif turns:
+            turns[-1][1] = f"{turns[-1][1]} {block}"
+        else:
+            turns.append([None, block])
+    return turns
+
+
+def _filler_pattern(language):
+    fillers = sorted(FILLERS.get(language, []), key=len, reverse=True)
+    if not fillers:
+        return None
+    alternatives = "|".join(r"\s+".join(map(re.escape, f.split())) for f in fillers)
+    # La muletilla sola, con la coma o los puntos suspensivos que la siguen
+    return re.compile(rf"(?<![\w'-])(?:{alternatives})(?![\w'-])[,.…]*\s*", re.IGNORECASE)
+
+
+def _is_backchannel(text, language):
+    words = [w.lower() for w in _WORD.findall(text)]
+    return 0 < len(words) <= MAX_BACKCHANNEL_WORDS and all(w in BACKCHANNELS.get(language, ()) for w in words)
+
+
+def _drop_backchannels(turns, language):
+    kept = []
+    for i, turn in enumerate(turns):
+        previous = kept[-1] if kept else None
+        following = turns[i + 1] if i + 1 < len(turns) else None
+        interrupts = (
+            previous is not None and following is not None
+            and previous[0] == following[0] != turn[0]
+            and not previous[1].endswith("?")
+        )
+        if not (interrupts and _is_backchannel(turn[1], language)):
+            kept.append(turn)
+    return kept
+
+
+def compact(text, stages=DEFAULT_STAGES, language=None):
+    """Aplica las etapas pedidas al texto de formatear y devuelve un CompactionResult."""
+    tokens_before = estimate_tokens(text)
+    stages = set(stages)
+    if not stages:
+        return CompactionResult(text, tokens_before, tokens_before)
+
+    language = language or detect_language(text)
+    turns = _parse_turns(text)
+
+    if "fillers" in stages:
+        pattern = _filler_pattern(language)
+        if pattern is not None:
+            for turn in turns:
+                cleaned = pattern.sub("", turn[1]).strip()
+                # Si el turno era sólo muletillas queda vacío y se descarta
+                turn[1] = cleaned[:1].upper() + cleaned[1:] if cleaned != turn[1] else cleaned
+
+    turns = [turn for turn in turns if turn[1]]
+
+    if "backchannel" in stages:
+        turns = _drop_backchannels(turns, language)
+
+    if "merge" in stages:
+        merged = []
+        for speaker, body in turns:
+            if merged and merged[-1][0] == speaker:
+                merged[-1][1] = f"{merged[-1][1]} {body}"
+            else:
+                merged.append([speaker, body])
+        turns = merged
+
+    if "labels" in stages:
+        short = {}
+        for turn in turns:
+            if turn[0] is not None and turn[0] not in short:
+                n = len(short)
+                short[turn[0]] = chr(ord("A") + n) if n < 26 else f"S{n}"
+        lines = [f"{short.get(speaker, speaker)}: {body}" if speaker else body for speaker, body in turns]
+        compacted = "\n".join(lines)
+    else:
+        compacted = "\n\n".join(f"{speaker}: {body}" if speaker else body for speaker, body in turns)
+
+    return CompactionResult(compacted, tokens_before, estimate_tokens(compacted))
+
+
+def stages_from_env(value):
+    """Interpreta SUMMARY_COMPACTION: "default", "none" o una lista separada por comas."""
+    value = (value or "default").strip().lower()
+    if value == "default":
+        return DEFAULT_STAGES
+    if value == "none":
+        return ()
+    stages = tuple(s.strip() for s in value.split(",") if s.strip())
+    unknown = set(stages) - set(DEFAULT_STAGES)
+    if unknown:
+        raise ValueError(f"Etapas de compactación desconocidas: {sorted(unknown)}")
+    return stages
@@ -1,39 +1,39 @@
 import json
-import boto3
 import os
 import logging
+import time
 from botocore.exceptions import ClientError
 
+from comun import clientes, compresion, estado, instrumentacion
+from comun.formato import format_object, is_transcript_key
+from comun.registros import RetryLater, final_attempt, process_records
+from comun.s3_multipart import DEFAULT_PART_SIZE
+from compaction import compact, stages_from_env
+from map_reduce import MAP_PROMPT, REDUCE_PROMPT, estimate_tokens, map_reduce_summary
+from retries import FATAL, TRANSIENT, RateLimiter, RetryBudgetExceeded, call_with_retries, classify
+from streaming import PartialSummaryWriter, collect_stream
+from summary_cache import CacheStats, cache_from_env, cache_key
+
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 OUTPUT_BUCKET = os.environ["BUCKET"]
 REGION = os.environ["AWS_REGION"]
 
-s3 = boto3.client("s3")
-bedrock = boto3.client(
+s3 = clientes.lazy("s3")
+bedrock = clientes.lazy(
     "bedrock-runtime",
-    region_name=REGION
+    region_name=REGION,
+    # Los reintentos los maneja call_with_retries (con backoff y limitador)
+    retries={"max_attempts": 1, "mode": "standard"},
+    # Una respuesta completa del modelo puede tardar más que el read timeout base
+    read_timeout=300,
 )
 
 MODEL_ID = "meta.llama3-70b-instruct-v1:0"
 
-
-def lambda_handler(event, context):
-    key = None
-
-    try:
-        # ---- Input desde S3 ----
-        bucket = event["Records"][0]["s3"]["bucket"]["name"]
-        key = event["Records"][0]["s3"]["object"]["key"]
-
-        logger.info(f"Procesando archivo: s3://{bucket}/{key}")
-
-        response = s3.get_object(Bucket=bucket, Key=key)
-        text = response["Body"].read().decode("utf-8")
-
-        # ---- Prompt recomendado ----
-        prompt = f"""
+# ---- Prompt recomendado ----
+PROMPT_TEMPLATE = """
 You are a professional summarization assistant.
 
 TASK:
@@ -52,70 +52,331 @@ TEXT START
 TEXT END
 """.strip()
 
-        body = {
-            "prompt": prompt,
-            "max_gen_len": 1024,
-            "temperature": 0.3,
-            "top_p": 0.9
-        }
+GENERATION_PARAMS = {
+    "max_gen_len": 1024,
+    "temperature": 0.3,
+    "top_p": 0.9
+}
 
-        # ---- Invocación a Bedrock ----
-        response = bedrock.invoke_model(
-            modelId=MODEL_ID,
-            contentType="application/json",
-            accept="application/json",
-            body=json.dumps(body)
-        )
+# ---- Map-reduce para transcripciones largas ----
+# SUMMARY_MODE: "auto" (map-reduce sólo si el texto supera CHUNK_TOKENS),
+# "single" (siempre un solo prompt) o "map_reduce" (siempre por fragmentos)
+SUMMARY_MODE = os.environ.get("SUMMARY_MODE", "auto")
+# Llama 3 tiene 8k tokens de contexto: se reserva lugar para el prompt y la respuesta
+CHUNK_TOKENS = int(os.environ.get("SUMMARY_CHUNK_TOKENS", "6000"))
+SUMMARY_MAX_WORKERS = int(os.environ.get("SUMMARY_MAX_WORKERS", "4"))
 
-        response_body = json.loads(response["body"].read())
+# ---- Reducción de tokens de entrada (muletillas, asentimientos, etiquetas) ----
+COMPACTION_STAGES = stages_from_env(os.environ.get("SUMMARY_COMPACTION"))
+# Idioma de las muletillas ("es", "en", "pt"); vacío = detectarlo del texto
+COMPACTION_LANGUAGE = os.environ.get("SUMMARY_LANGUAGE") or None
+
+# ---- Streaming: checkpoints del resumen parcial en S3 ----
+SUMMARY_STREAMING = os.environ.get("SUMMARY_STREAMING", "false").lower() == "true"
+CHECKPOINT_TOKENS = int(os.environ.get("SUMMARY_CHECKPOINT_TOKENS", "50"))
+CHECKPOINT_SECONDS = float(os.environ.get("SUMMARY_CHECKPOINT_SECONDS", "2"))
+
+# ---- Reintentos y limitación de tasa contra la cuota de Bedrock ----
+# El limitador es compartido por todos los threads del contenedor
+bedrock_limiter = RateLimiter(
+    rate=float(os.environ.get("BEDROCK_MAX_RPS", "2")),
+    burst=int(os.environ.get("BEDROCK_BURST", "4")),
+    max_in_flight=int(os.environ.get("BEDROCK_MAX_IN_FLIGHT", "4"))
+)
+BEDROCK_MAX_ATTEMPTS = int(os.environ.get("BEDROCK_MAX_ATTEMPTS", "6"))
+# Margen que se reserva para escribir el resumen o el _FAILED.json
+DEADLINE_MARGIN_SECONDS = float(os.environ.get("DEADLINE_MARGIN_SECONDS", "15"))
+
+# Reloj monotónico hasta el que se pueden programar reintentos (por invocación)
+invocation_deadline = float("inf")
+
+# ---- Modo fusionado: el .json de Transcribe llega directo a esta Lambda ----
+# Se formatea acá y el texto pasa en memoria al resumen (sin el GET del .txt)
+FORMAT_PART_SIZE = int(os.environ.get("FORMATEAR_PART_SIZE", DEFAULT_PART_SIZE))
+
+# ---- Cache de resúmenes por contenido ----
+summary_cache = cache_from_env(s3, OUTPUT_BUCKET)
+cache_stats = CacheStats()
+
+# ---- Estado de los jobs (tabla compartida con transcribir y formatear) ----
+job_state = estado.store_from_env()
+
+# Con SnapStart o provisioned concurrency los clientes se crean en la inicialización
+clientes.prepare(s3, bedrock)
+
+
+def lambda_handler(event, context):
+    global invocation_deadline
+    if context is not None:
+        remaining = context.get_remaining_time_in_millis() / 1000
+        invocation_deadline = time.monotonic() + remaining - DEADLINE_MARGIN_SECONDS
+
+    # Cada record S3 del evento se resume por separado (en paralelo)
+    return process_records(event, _process_record)
 
-        # ---- Parsing correcto ----
-        summary = response_body["generation"]
 
-        # ---- Output ----
+def _process_record(bucket, key):
+    text = None
+    if is_transcript_key(key):
+        # Un error al formatear queda en la etapa formatear, como en el modo en dos etapas
+        formatted = format_object(s3, job_state, bucket, key, FORMAT_PART_SIZE, keep_text=True)
+        key, text = formatted["output"], formatted["text"]
+
+    job_name = estado.job_name_from_key(key)
+    with instrumentacion.job(estado.RESUMIR, job_name) as metrics:
+        result = _summarize_record(bucket, key, text, metrics)
+        metrics.status = result["status"]
+
+    if result["status"] == "COMPLETED" and job_state is not None:
+        # Última etapa: la línea de tiempo del job completo va como métricas del pipeline
+        try:
+            instrumentacion.emit_timeline("pipeline", job_name, job_state.get(job_name))
+        except Exception as e:
+            logger.warning(f"No se pudo armar la línea de tiempo de {job_name}: {str(e)}")
+    return result
+
+
+def _cache_get(key_hash):
+    """Entrada de la cache o None: un error de la cache cuenta como miss, nunca falla el resumen."""
+    try:
+        return summary_cache.get(key_hash)
+    except Exception as e:
+        logger.warning(f"Error leyendo cache de resúmenes ({type(e).__name__}): {str(e)}")
+        return None
+
+
+def _cache_put(key_hash, summary):
+    try:
+        summary_cache.put(key_hash, summary)
+    except Exception as e:
+        logger.warning(f"No se pudo guardar el resumen en la cache ({type(e).__name__}): {str(e)}")
+
+
+def _summarize_record(bucket, key, text, metrics):
+    try:
+        # ---- Input desde S3 (o el texto recién formateado) ----
+        logger.info(f"Procesando archivo: s3://{bucket}/{key}")
+        estado.record_safely(job_state, estado.job_name_from_key(key), estado.RESUMIR, estado.IN_PROGRESS)
+
+        if text is None:
+            # El .txt puede estar comprimido (ARTIFACT_ENCODING de formatear): se lee descomprimido
+            with metrics.timer("S3GetMs"):
+                response = s3.get_object(Bucket=bucket, Key=key)
+                raw = compresion.read_bytes(response)
+            metrics.add("BytesIn", response.get("ContentLength", len(raw)), instrumentacion.BYTES)
+            text = raw.decode("utf-8")
+
+        with metrics.timer("CompactionMs"):
+            compaction = compact(text, COMPACTION_STAGES, COMPACTION_LANGUAGE)
+        text = compaction.text
+        metrics.add("InputTokens", compaction.tokens_before)
+        metrics.add("InputTokensCompacted", compaction.tokens_after)
+        logger.info(
+            f"Tokens de entrada estimados: {compaction.tokens_before} -> {compaction.tokens_after} "
+            f"({compaction.saved_ratio:.0%} menos)"
+        )
+
         filename = os.path.basename(key)
         summary_key = f"resumenes/{filename.replace('.txt', '_summary.txt')}"
 
-        s3.put_object(
-            Bucket=OUTPUT_BUCKET,
-            Key=summary_key,
-            Body=summary.encode("utf-8")
-        )
+        # ---- Cache: el mismo texto con el mismo modelo y prompts no se vuelve a resumir ----
+        summary = None
+        partial = None
+        if summary_cache is not None:
+            key_hash = _summary_cache_key(text)
+            summary = _cache_get(key_hash)
+            cache_stats.record(hit=summary is not None)
+
+        cache_hit = summary is not None
+        if not cache_hit:
+            if SUMMARY_STREAMING:
+                partial = PartialSummaryWriter(
+                    s3,
+                    OUTPUT_BUCKET,
+                    summary_key.replace("_summary.txt", "_summary.partial.txt"),
+                    every_tokens=CHECKPOINT_TOKENS,
+                    every_seconds=CHECKPOINT_SECONDS
+                )
+            try:
+                summary = _summarize(text, partial)
+            except Exception:
+                if partial is not None and partial.checkpoints:
+                    partial.discard()
+                raise
+
+            if summary_cache is not None:
+                _cache_put(key_hash, summary)
+
+        metrics.add("OutputTokens", estimate_tokens(summary))
+
+        # ---- Output: un único PUT publica el resumen completo ----
+        with metrics.timer("S3PutMs"):
+            s3.put_object(
+                Bucket=OUTPUT_BUCKET,
+                Key=summary_key,
+                Body=summary.encode("utf-8")
+            )
 
-        logger.info(f"Resumen generado: s3://{OUTPUT_BUCKET}/{summary_key}")
+        if partial is not None and partial.checkpoints:
+            partial.discard()
+
+        logger.info(f"Resumen generado: s3://{OUTPUT_BUCKET}/{summary_key} (cache {'HIT' if cache_hit else 'MISS'})")
+        estado.record_safely(job_state, estado.job_name_from_key(key), estado.RESUMIR, estado.COMPLETED,
+                             output=summary_key, cache="HIT" if cache_hit else "MISS")
 
         return {
             "status": "COMPLETED",
-            "output": summary_key
+            "formatted": key,
+            "output": summary_key,
+            "cache": "HIT" if cache_hit else "MISS",
+            "inputTokens": {
+                "before": compaction.tokens_before,
+                "after": compaction.tokens_after
+            }
         }
 
-    # ---- Manejo explícito de errores Bedrock ----
-    except ClientError as e:
-        error_code = e.response["Error"]["Code"]
+    except Exception as e:
+        # Se clasifica una sola vez: throttling, errores transitorios o de red y
+        # el presupuesto de reintentos agotado vuelven al queue; sólo lo FATAL
+        # (o la última entrega) escribe el _FAILED.json
+        kind = TRANSIENT if isinstance(e, RetryBudgetExceeded) else classify(e)
+        if kind != FATAL:
+            _retry_later(key, e)
+
+        error_payload = _failure_payload(e)
+        _write_failed_status(key, error_payload)
+        return error_payload
 
-        logger.error(f"Error Bedrock: {error_code} - {str(e)}")
 
-        error_payload = {
+def _failure_payload(error):
+    # ---- Reintentos agotados por el timeout de la Lambda ----
+    if isinstance(error, RetryBudgetExceeded):
+        logger.error(f"Error Bedrock: {str(error)}")
+        return {
             "status": "FAILED",
             "error": "BEDROCK_MODEL_ERROR",
-            "detail": error_code
+            "detail": "RETRY_BUDGET_EXCEEDED"
         }
 
-        _write_failed_status(key, error_payload)
-        return error_payload
+    # ---- Manejo explícito de errores Bedrock ----
+    if isinstance(error, ClientError):
+        error_code = error.response["Error"]["Code"]
+        logger.error(f"Error Bedrock: {error_code} - {str(error)}")
+        return {
+            "status": "FAILED",
+            "error": "BEDROCK_MODEL_ERROR",
+            "detail": error_code
+        }
 
     # ---- Error genérico ----
-    except Exception as e:
-        logger.exception("Error inesperado en Lambda")
+    logger.error("Error inesperado en Lambda", exc_info=error)
+    return {
+        "status": "FAILED",
+        "error": "UNEXPECTED_ERROR",
+        "detail": str(error)
+    }
 
-        error_payload = {
-            "status": "FAILED",
-            "error": "UNEXPECTED_ERROR",
-            "detail": str(e)
-        }
 
-        _write_failed_status(key, error_payload)
-        return error_payload
+def _retry_later(key, error):
+    """
+    Con el trigger por SQS, un throttling o error transitorio de Bedrock
+    devuelve el mensaje al queue (vuelve cuando vence el visibility timeout)
+    en lugar de escribir el _FAILED.json; sólo la última entrega lo escribe.
+    """
+    if final_attempt():
+        return
+    estado.record_safely(job_state, estado.job_name_from_key(key), estado.RESUMIR, estado.QUEUED,
+                         retryReason=type(error).__name__)
+    raise RetryLater(str(error)) from error
+
+
+def _with_retries(fn):
+    return call_with_retries(
+        fn,
+        bedrock_limiter,
+        invocation_deadline,
+        max_attempts=BEDROCK_MAX_ATTEMPTS
+    )
+
+
+def _invoke_model(prompt):
+    body = json.dumps({"prompt": prompt, **GENERATION_PARAMS})
+
+    def invoke():
+        # ---- Invocación a Bedrock (cada intento cuenta en BedrockMs) ----
+        instrumentacion.count("BedrockCalls")
+        with instrumentacion.timed("BedrockMs"):
+            response = bedrock.invoke_model(
+                modelId=MODEL_ID,
+                contentType="application/json",
+                accept="application/json",
+                body=body
+            )
+
+            response_body = json.loads(response["body"].read())
+
+        # ---- Parsing correcto ----
+        return response_body["generation"]
+
+    return _with_retries(invoke)
+
+
+def _summary_cache_key(text):
+    # Todo lo que puede cambiar el resumen forma parte de la clave
+    prompts = {
+        "mode": SUMMARY_MODE,
+        "compaction": [list(COMPACTION_STAGES), COMPACTION_LANGUAGE],
+        "chunk_tokens": CHUNK_TOKENS,
+        "single": PROMPT_TEMPLATE,
+        "map": MAP_PROMPT,
+        "reduce": REDUCE_PROMPT,
+    }
+    return cache_key(text, MODEL_ID, prompts, GENERATION_PARAMS)
+
+
+def _invoke_model_stream(prompt, partial):
+    body = json.dumps({"prompt": prompt, **GENERATION_PARAMS})
+
+    def invoke():
+        # Un error a mitad del stream reinicia la generación completa (y los checkpoints)
+        partial.reset()
+        instrumentacion.count("BedrockCalls")
+        start, written = time.perf_counter(), partial.write_seconds
+        try:
+            response = bedrock.invoke_model_with_response_stream(
+                modelId=MODEL_ID,
+                contentType="application/json",
+                accept="application/json",
+                body=body
+            )
+            return collect_stream(response["body"], partial.update)
+        finally:
+            # Los PUT de checkpoints van en PartialWriteMs, no en la latencia de Bedrock
+            elapsed = time.perf_counter() - start - (partial.write_seconds - written)
+            instrumentacion.count("BedrockMs", elapsed * 1000, instrumentacion.MILLISECONDS)
+
+    return _with_retries(invoke)
+
+
+def _summarize(text, partial=None):
+    # Sólo la llamada que genera el resumen final se consume en streaming
+    invoke_final = _invoke_model
+    if partial is not None:
+        invoke_final = lambda prompt: _invoke_model_stream(prompt, partial)  # noqa: E731
+
+    tokens = estimate_tokens(text)
+    if SUMMARY_MODE == "single" or (SUMMARY_MODE == "auto" and tokens <= CHUNK_TOKENS):
+        return invoke_final(PROMPT_TEMPLATE.format(text=text))
+
+    logger.info(f"Resumen map-reduce: ~{tokens} tokens en fragmentos de {CHUNK_TOKENS}")
+    # Los fragmentos se resumen en otros threads: bind para que midan sobre este job
+    return map_reduce_summary(
+        text,
+        instrumentacion.bind(_invoke_model),
+        chunk_tokens=CHUNK_TOKENS,
+        max_workers=SUMMARY_MAX_WORKERS,
+        invoke_final=instrumentacion.bind(invoke_final)
+    )
 
 
 def _write_failed_status(input_key, payload):
@@ -136,3 +397,8 @@ def _write_failed_status(input_key, payload):
     )
 
     logger.info(f"Estado FAILED escrito en s3://{OUTPUT_BUCKET}/{error_key}")
+
+    # El mismo error queda en el registro del job para checkStatus
+    fields = {k: v for k, v in payload.items() if k != "status"}
+    estado.record_safely(job_state, estado.job_name_from_key(input_key), estado.RESUMIR, estado.FAILED,
+                         failedKey=error_key, **fields)
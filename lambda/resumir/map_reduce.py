@@ -0,0 +1,154 @@
+"""
+Resumen map-reduce para transcripciones que no entran en el contexto del modelo.
+
+El texto formateado se corta en los límites de turno ("\n\nspk_N: ...") en
+fragmentos con un presupuesto de tokens; cada fragmento se resume en
+paralelo (map) y después se combinan los resúmenes parciales (reduce). Si los
+parciales tampoco entran en un solo prompt, el reduce se repite por niveles.
+
+El módulo no conoce a Bedrock: recibe `invoke(prompt) -> str`, así que se
+puede probar con un fake local.
+"""
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+# Llama 3 promedia ~4 caracteres por token en español e inglés
+CHARS_PER_TOKEN = 4
+
+MAP_PROMPT = """
+You are a professional summarization assistant.
+
+TASK:
+This is part {index} of {total} of a longer transcription.
+Summarize the key points, decisions and action items of this part.
+
+REQUIREMENTS:
+- Output ONLY the summary.
+- Use a concise bullet list.
+- Keep speaker labels when they matter.
+- Preserve the original language.
+- Do NOT add any additional comments
+
+TEXT START
+{text}
+TEXT END
+""".strip()
+
+REDUCE_PROMPT = """
+You are a professional summarization assistant.
+
+TASK:
+Below are partial summaries of consecutive parts of the same transcription.
+Merge them into one clean, well-structured summary of the whole transcription.
+
+REQUIREMENTS:
+- Output ONLY the summary.
+- Do NOT repeat the same point twice.
+- Do NOT include separators, tables, or special characters.
+- Use a concise bullet list.
+- Preserve the original language.
+- Do NOT add any additional comments
+
+PARTIAL SUMMARIES START
+{text}
+PARTIAL SUMMARIES END
+""".strip()
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_TURN_SEPARATOR = re.compile(r"\n+")
+
+
+def estimate_tokens(text):
+    """Estimación rápida de tokens (sin tokenizer en la Lambda)."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def split_turns(text):
+    """Separa el texto de formatear (o el compactado) en turnos de hablante."""
+    return [turn.strip() for turn in _TURN_SEPARATOR.split(text) if turn.strip()]
+
+
+def _split_long_turn(turn, max_tokens):
+    """Corta un turno que solo no entra en el presupuesto: por oraciones y si no por palabras."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    pieces = []
+    for sentence in _SENTENCE_END.split(turn):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if sentence:
+            pieces.append(sentence)
+
+    merged = []
+    for piece in pieces:
+        if merged and estimate_tokens(merged[-1]) + estimate_tokens(piece) + 1 <= max_tokens:
+            merged[-1] = f"{merged[-1]} {piece}"
+        else:
+            merged.append(piece)
+    return merged
+
+
+def chunk_turns(turns, max_tokens):
+    """Agrupa turnos consecutivos en fragmentos de hasta `max_tokens` tokens estimados."""
+    chunks = []
+    current, current_tokens = [], 0
+    for turn in turns:
+        tokens = estimate_tokens(turn)
+        if tokens > max_tokens:
+            parts = _split_long_turn(turn, max_tokens)
+        else:
+            parts = [turn]
+
+        for part in parts:
+            part_tokens = estimate_tokens(part)
+            if current and current_tokens + part_tokens > max_tokens:
+                chunks.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            current.append(part)
+            current_tokens += part_tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _parallel_map(fn, values, max_workers):
+    if max_workers <= 1 or len(values) <= 1:
+        return [fn(value) for value in values]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(values))) as pool:
+        return list(pool.map(fn, values))
+
+
+def map_reduce_summary(text, invoke, chunk_tokens, max_workers=4, invoke_final=None):
+    """
+    Resume `text` con map-reduce. `chunk_tokens` es el presupuesto de tokens
+    de entrada de cada llamada (sin contar el prompt) y `max_workers` cuántas
+    llamadas al modelo se hacen en paralelo. Si se pasa `invoke_final`, se usa
+    para la llamada que produce el resumen final (por ejemplo, en streaming).
+    """
+    invoke_final = invoke_final or invoke
+    chunks = chunk_turns(split_turns(text), chunk_tokens)
+    total = len(chunks)
+    map_invoke = invoke_final if total == 1 else invoke
+    partials = _parallel_map(
+        lambda indexed: map_invoke(MAP_PROMPT.format(index=indexed[0], total=total, text=indexed[1])),
+        list(enumerate(chunks, start=1)),
+        max_workers,
+    )
+    partials = [partial.strip() for partial in partials if partial and partial.strip()]
+
+    # Reduce por niveles hasta que los parciales entren en una sola llamada
+    while len(partials) > 1:
+        groups = chunk_turns(partials, chunk_tokens)
+        if len(groups) >= len(partials):
+            # Cada parcial ocupa un grupo entero: no se puede seguir agrupando
+            groups = ["\n\n".join(partials)]
+        reduce_invoke = invoke_final if len(groups) == 1 else invoke
+        partials = _parallel_map(
+            lambda group: reduce_invoke(REDUCE_PROMPT.format(text=group)).strip(),
+            groups,
+            max_workers,
+        )
+    return partials[0] if partials else ""
@@ -0,0 +1,151 @@
+"""
+Reintentos con backoff exponencial y limitación de tasa para Bedrock.
+
+Los errores se clasifican por código: los de throttling y los transitorios
+se reintentan con "full jitter" (espera aleatoria entre 0 y un tope que se
+duplica en cada intento); el resto se propaga enseguida. Los cortes de
+conexión y los timeouts de botocore (sin respuesta del servicio) cuentan
+como transitorios. Ningún reintento se programa si la espera más lo que
+tardó el último intento no entra en el tiempo que le queda a la Lambda.
+
+`RateLimiter` es un token bucket compartido entre threads que además
+limita cuántas invocaciones hay en vuelo. Ante throttling baja la tasa a la
+mitad y la recupera de a poco con cada éxito (AIMD).
+"""
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from botocore.exceptions import ClientError, ConnectTimeoutError, EndpointConnectionError, ReadTimeoutError
+
+logger = logging.getLogger()
+
+THROTTLING_ERRORS = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceQuotaExceededException",
+}
+TRANSIENT_ERRORS = {
+    "ModelNotReadyException",
+    "ModelTimeoutException",
+    "ServiceUnavailableException",
+    "InternalServerException",
+    "ModelStreamErrorException",
+}
+
+# Errores de red de botocore: el pedido no llegó o la respuesta no volvió a tiempo
+TRANSIENT_EXCEPTIONS = (ReadTimeoutError, ConnectTimeoutError, EndpointConnectionError)
+
+THROTTLED = "throttled"
+TRANSIENT = "transient"
+FATAL = "fatal"
+
+
+def classify(error):
+    if isinstance(error, ClientError):
+        code = error.response.get("Error", {}).get("Code", "")
+        # Los errores dentro del event stream llegan como "throttlingException"
+        code = code[:1].upper() + code[1:]
+        if code in THROTTLING_ERRORS:
+            return THROTTLED
+        if code in TRANSIENT_ERRORS:
+            return TRANSIENT
+    if isinstance(error, TRANSIENT_EXCEPTIONS):
+        return TRANSIENT
+    return FATAL
+
+
+class RetryBudgetExceeded(Exception):
+    """No queda tiempo de Lambda para esperar un token o un reintento."""
+
+
+class RateLimiter:
+    def __init__(self, rate, burst, max_in_flight, min_rate=0.1,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self._max_rate = rate
+        self._min_rate = min_rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self._burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, deadline):
+        """Espera un token; levanta RetryBudgetExceeded si no llega antes de `deadline`."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            if self._clock() + wait > deadline:
+                raise RetryBudgetExceeded("Sin tiempo para esperar un token de Bedrock")
+            self._sleep(wait)
+
+    @contextmanager
+    def slot(self, deadline):
+        """Token de tasa + lugar entre las invocaciones en vuelo."""
+        self.acquire(deadline)
+        timeout = None if deadline == float("inf") else max(deadline - self._clock(), 0)
+        if not self._in_flight.acquire(timeout=timeout):
+            raise RetryBudgetExceeded("Sin tiempo para esperar una invocación libre de Bedrock")
+        try:
+            yield
+        finally:
+            self._in_flight.release()
+
+    def on_throttle(self):
+        with self._lock:
+            self.rate = max(self._min_rate, self.rate / 2)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self._max_rate, self.rate + self._max_rate * 0.05)
+
+
+def call_with_retries(fn, limiter, deadline, max_attempts=6, base_delay=0.5, max_delay=20.0,
+                      clock=time.monotonic, sleep=time.sleep, rng=random.random):
+    """
+    Ejecuta `fn()` respetando el limitador y reintentando los errores
+    recuperables hasta `max_attempts` veces o hasta `deadline` (en el reloj
+    de `clock`), lo que ocurra primero. Un reintento sólo se programa si
+    la espera más la duración del intento fallido entran antes de `deadline`.
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        started = None
+        try:
+            with limiter.slot(deadline):
+                started = clock()
+                result = fn()
+        except Exception as e:
+            kind = classify(e)
+            if kind == FATAL:
+                raise
+            if kind == THROTTLED:
+                limiter.on_throttle()
+
+            now = clock()
+            last_duration = 0.0 if started is None else now - started
+            delay = rng() * min(max_delay, base_delay * 2 ** (attempt - 1))
+            if attempt >= max_attempts or deadline - now <= delay + last_duration:
+                logger.error(f"Bedrock: sin reintentos disponibles tras {attempt} intentos ({kind})")
+                raise
+            logger.warning(f"Bedrock {kind} (intento {attempt}), reintento en {delay:.2f}s: {str(e)}")
+            sleep(delay)
+            continue
+
+        limiter.on_success()
+        return result
@@ -0,0 +1,113 @@
+"""
+Consumo de `invoke_model_with_response_stream` con checkpoints en S3.
+
+Mientras el modelo genera, el texto acumulado se escribe en
+`resumenes/<job>_summary.partial.txt` cada cierta cantidad de tokens o de
+segundos, para que `checkStatus` pueda mostrar el avance. Al terminar, el
+resumen final se publica con un único PUT (atómico en S3) y el parcial se
+borra.
+"""
+import json
+import logging
+import time
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from comun import instrumentacion
+
+logger = logging.getLogger()
+
+# Eventos de error que puede traer el stream de Bedrock
+_STREAM_ERRORS = (
+    "internalServerException",
+    "modelStreamErrorException",
+    "modelTimeoutException",
+    "serviceUnavailableException",
+    "throttlingException",
+    "validationException",
+)
+
+
+class PartialSummaryWriter:
+    def __init__(self, client, bucket, partial_key, every_tokens=50, every_seconds=2.0,
+                 clock=time.monotonic):
+        self._client = client
+        self._bucket = bucket
+        self.partial_key = partial_key
+        self._every_tokens = every_tokens
+        self._every_seconds = every_seconds
+        self._clock = clock
+        self._last_tokens = 0
+        self._last_time = clock()
+        self.checkpoints = 0
+        # Tiempo en los PUT de checkpoints (se descuenta de BedrockMs)
+        self.write_seconds = 0.0
+
+    def reset(self):
+        """Al empezar un intento: el stream de un reintento vuelve a contar tokens desde cero."""
+        self._last_tokens = 0
+        self._last_time = self._clock()
+
+    def update(self, pieces, tokens):
+        """
+        Escribe un checkpoint con `pieces` (lista de fragmentos generados) si
+        pasaron suficientes tokens o segundos desde el último.
+        """
+        now = self._clock()
+        if tokens - self._last_tokens < self._every_tokens and now - self._last_time < self._every_seconds:
+            return
+        # Aunque el PUT falle se espera al próximo intervalo en lugar de
+        # reintentar en cada chunk
+        self._last_tokens = tokens
+        self._last_time = now
+        start = time.perf_counter()
+        try:
+            with instrumentacion.timed("PartialWriteMs"):
+                self._client.put_object(
+                    Bucket=self._bucket,
+                    Key=self.partial_key,
+                    Body="".join(pieces).encode("utf-8"),
+                    ContentType="text/plain",
+                    Metadata={"generated-tokens": str(tokens)},
+                )
+        except (ClientError, BotoCoreError) as e:
+            # El checkpoint es sólo para mostrar avance: el stream sigue
+            logger.warning(f"No se pudo escribir el checkpoint {self.partial_key}: {str(e)}")
+            return
+        finally:
+            self.write_seconds += time.perf_counter() - start
+        self.checkpoints += 1
+
+    def discard(self):
+        try:
+            self._client.delete_object(Bucket=self._bucket, Key=self.partial_key)
+        except ClientError as e:
+            logger.warning(f"No se pudo borrar {self.partial_key}: {str(e)}")
+
+
+def collect_stream(events, on_progress=None):
+    """
+    Junta el texto generado a partir de los eventos del stream de Llama 3.
+    `on_progress(pieces, tokens)` se llama después de cada chunk con la lista
+    de fragmentos generados hasta el momento.
+    """
+    pieces = []
+    tokens = 0
+    for event in events:
+        for error in _STREAM_ERRORS:
+            if error in event:
+                code = error[0].upper() + error[1:]
+                raise ClientError(
+                    {"Error": {"Code": code, "Message": event[error].get("message", "")}},
+                    "InvokeModelWithResponseStream",
+                )
+
+        chunk = event.get("chunk")
+        if not chunk:
+            continue
+        payload = json.loads(chunk["bytes"])
+        pieces.append(payload.get("generation", ""))
+        tokens = payload.get("generation_token_count") or tokens + 1
+        if on_progress is not None:
+            on_progress(pieces, tokens)
+    return "".join(pieces)
@@ -0,0 +1,129 @@
+"""
+Cache de resúmenes direccionada por contenido.
+
+La clave es un SHA-256 del texto formateado, el modelo, los prompts y los
+parámetros de generación: si cualquiera cambia, la entrada anterior deja
+de coincidir. Los backends son intercambiables (S3, memoria o archivos) y
+todos exponen `get(key) -> str | None` y `put(key, summary)`.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+from botocore.exceptions import ClientError
+
+from comun import instrumentacion
+
+logger = logging.getLogger()
+
+
+def cache_key(text, model_id, prompt_template, params):
+    digest = hashlib.sha256()
+    header = json.dumps(
+        {"model": model_id, "prompt": prompt_template, "params": params},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    digest.update(header.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class S3Cache:
+    """Una entrada por objeto bajo `prefix` (el lifecycle del bucket las expira)."""
+
+    def __init__(self, client, bucket, prefix="cache-resumenes/"):
+        self._client = client
+        self._bucket = bucket
+        self._prefix = prefix
+
+    def _key(self, key):
+        return f"{self._prefix}{key}.txt"
+
+    def get(self, key):
+        try:
+            response = self._client.get_object(Bucket=self._bucket, Key=self._key(key))
+        except ClientError as e:
+            # Sin s3:ListBucket, una key inexistente devuelve AccessDenied en vez de NoSuchKey
+            if e.response["Error"]["Code"] not in ("NoSuchKey", "404", "AccessDenied"):
+                logger.warning(f"Error leyendo cache de resúmenes: {str(e)}")
+            return None
+        return response["Body"].read().decode("utf-8")
+
+    def put(self, key, summary):
+        self._client.put_object(
+            Bucket=self._bucket,
+            Key=self._key(key),
+            Body=summary.encode("utf-8"),
+            ContentType="text/plain",
+        )
+
+
+class MemoryCache:
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key, summary):
+        with self._lock:
+            self._entries[key] = summary
+
+
+class FileCache:
+    def __init__(self, directory):
+        self._directory = Path(directory)
+        self._directory.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key):
+        try:
+            return (self._directory / f"{key}.txt").read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, summary):
+        # Escritura atómica: otro thread nunca ve un archivo a medio escribir
+        tmp = self._directory / f"{key}.{threading.get_ident()}.tmp"
+        tmp.write_text(summary, encoding="utf-8")
+        os.replace(tmp, self._directory / f"{key}.txt")
+
+
+def cache_from_env(s3_client, bucket):
+    """
+    Backend según SUMMARY_CACHE: "s3" (por defecto), "memory", "file"
+    (en SUMMARY_CACHE_DIR) o "none" para desactivarla.
+    """
+    backend = os.environ.get("SUMMARY_CACHE", "s3")
+    if backend == "s3":
+        return S3Cache(s3_client, bucket, os.environ.get("SUMMARY_CACHE_PREFIX", "cache-resumenes/"))
+    if backend == "memory":
+        return MemoryCache()
+    if backend == "file":
+        return FileCache(os.environ.get("SUMMARY_CACHE_DIR", "/tmp/cache-resumenes"))
+    if backend == "none":
+        return None
+    raise ValueError(f"SUMMARY_CACHE inválido: {backend}")
+
+
+class CacheStats:
+    """Contadores de hits y misses; cada uno se suma a las métricas del job (instrumentacion)."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        instrumentacion.count("SummaryCacheHit" if hit else "SummaryCacheMiss")
@@ -0,0 +1,146 @@
+"""
+Control de admisión de jobs de Transcribe.
+
+La cuenta tiene un tope de jobs de Transcribe en paralelo; pasado ese tope
+`start_transcription_job` falla. Los inicios que no entran se encolan (SQS)
+y un scheduler periódico los libera a medida que hay lugar.
+
+Reparto justo entre usuarios: cada identidad tiene un token bucket
+(ráfaga `burst`, recarga `rate` por segundo). El scheduler recorre las
+identidades en ronda y libera un job por vez a las que tienen tokens; si
+después de eso sobra capacidad, la reparte en ronda sin mirar los tokens
+(nadie más la está esperando). Así un usuario que sube 500 audios no deja
+esperando al que sube uno.
+
+Un inicio no pasa por el queue si el usuario tiene tokens y Transcribe lo
+acepta: sólo se encola sin tokens o ante LimitExceededException. Un audio
+largo gasta un token al iniciarse; sus segmentos se encolan sin gastar
+tokens, pero esperan el turno de su identidad en la ronda.
+
+El estado de los buckets se guarda como JSON entre corridas del scheduler.
+"""
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+
+# SQS entrega de a 10 mensajes y acepta lotes de 10 en delete/change_visibility
+SQS_BATCH = 10
+
+
+@dataclass
+class TokenBucket:
+    capacity: float
+    rate: float
+    tokens: float
+    updated: float
+
+    def refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def has_token(self, now):
+        self.refill(now)
+        return self.tokens >= 1
+
+    def take(self, now):
+        self.refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class FairShare:
+    """Token buckets por identidad y selección en ronda de los jobs encolados."""
+
+    def __init__(self, burst, rate, buckets=None):
+        self.burst = burst
+        self.rate = rate
+        self.buckets = buckets or {}
+
+    def bucket(self, identity, now):
+        if identity not in self.buckets:
+            self.buckets[identity] = TokenBucket(self.burst, self.rate, self.burst, now)
+        return self.buckets[identity]
+
+    def select(self, pending, slots, now, identity=lambda item: item["identity"], exempt=lambda item: False):
+        """
+        Elige hasta `slots` de `pending` (en orden de llegada). Devuelve los
+        elegidos en el orden en que conviene iniciarlos. Los items `exempt`
+        no gastan tokens pero igual esperan el turno de su identidad.
+        """
+        if slots <= 0 or not pending:
+            return []
+        queues = OrderedDict()
+        for item in pending:
+            queues.setdefault(identity(item), deque()).append(item)
+
+        selected = []
+        # Primera pasada: una por identidad y por vuelta, mientras tenga tokens
+        active = deque(queues)
+        while active and len(selected) < slots:
+            who = active.popleft()
+            if exempt(queues[who][0]) or self.bucket(who, now).take(now):
+                selected.append(queues[who].popleft())
+                if queues[who]:
+                    active.append(who)
+
+        # Segunda pasada: la capacidad que nadie con tokens reclamó se reparte igual en ronda
+        active = deque(who for who, items in queues.items() if items)
+        while active and len(selected) < slots:
+            who = active.popleft()
+            selected.append(queues[who].popleft())
+            if queues[who]:
+                active.append(who)
+        return selected
+
+    def to_dict(self, now):
+        # Un bucket lleno es igual a uno nuevo: no hace falta guardarlo
+        state = {}
+        for who, bucket in self.buckets.items():
+            bucket.refill(now)
+            if bucket.tokens < bucket.capacity:
+                state[who] = [round(bucket.tokens, 3), bucket.updated]
+        return state
+
+    @classmethod
+    def from_dict(cls, state, burst, rate):
+        buckets = {who: TokenBucket(burst, rate, tokens, updated) for who, (tokens, updated) in (state or {}).items()}
+        return cls(burst, rate, buckets)
+
+
+def receive(sqs, queue_url, max_messages, visibility_seconds):
+    """Lee hasta `max_messages` del queue (se detiene cuando SQS no devuelve más)."""
+    messages = []
+    while len(messages) < max_messages:
+        response = sqs.receive_message(
+            QueueUrl=queue_url,
+            MaxNumberOfMessages=min(SQS_BATCH, max_messages - len(messages)),
+            VisibilityTimeout=visibility_seconds,
+            WaitTimeSeconds=0,
+        )
+        batch = response.get("Messages", [])
+        if not batch:
+            break
+        messages.extend(batch)
+    return messages
+
+
+def _batches(messages):
+    for start in range(0, len(messages), SQS_BATCH):
+        yield [
+            {"Id": str(n), "ReceiptHandle": message["ReceiptHandle"]}
+            for n, message in enumerate(messages[start:start + SQS_BATCH])
+        ]
+
+
+def delete(sqs, queue_url, messages):
+    for entries in _batches(messages):
+        sqs.delete_message_batch(QueueUrl=queue_url, Entries=entries)
+
+
+def release(sqs, queue_url, messages):
+    """Devuelve los mensajes al queue para la próxima corrida (visibilidad 0)."""
+    for entries in _batches(messages):
+        entries = [dict(entry, VisibilityTimeout=0) for entry in entries]
+        sqs.change_message_visibility_batch(QueueUrl=queue_url, Entries=entries)
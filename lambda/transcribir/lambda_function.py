@@ -1,27 +1,106 @@
-import boto3
+import hashlib
 import uuid
 import logging
 import json
 import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from botocore.exceptions import ClientError
 
+import admission
+import multipart
+from comun import clientes, compresion, estado, instrumentacion
+from comun.registros import process_records
+from mp3_frames import plan_segments, scan_frames
+from results_delivery import GZIP_MEDIA_TYPE, accepts_gzip, gzip_base64, presigned_url, read_page
+from stitching import stitch
+
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-transcribe_client = boto3.client('transcribe')
-s3_client = boto3.client('s3')
+# checkStatusBatch: tope de jobs por llamada, consultas en paralelo y tiempo máximo
+BATCH_MAX_JOBS = int(os.environ.get("STATUS_BATCH_MAX_JOBS", "100"))
+BATCH_MAX_WORKERS = int(os.environ.get("STATUS_BATCH_MAX_WORKERS", "16"))
+BATCH_TIMEOUT_SECONDS = float(os.environ.get("STATUS_BATCH_TIMEOUT_SECONDS", "10"))
+BATCH_DEADLINE_MARGIN_SECONDS = 1
+
+# getResults: vigencia de las URLs prefirmadas, compresión y tamaño de página
+RESULTS_URL_TTL_SECONDS = int(os.environ.get("RESULTS_URL_TTL_SECONDS", "300"))
+GZIP_MIN_BYTES = int(os.environ.get("RESULTS_GZIP_MIN_BYTES", "1024"))
+PAGE_MIN_BYTES = 1024
+PAGE_MAX_BYTES = int(os.environ.get("RESULTS_PAGE_MAX_BYTES", str(1024 * 1024)))
+
+# Inicio idempotente: el mismo audio con la misma configuración reusa el job
+START_DEDUP = os.environ.get("START_DEDUP", "true").lower() == "true"
+
+# Audios largos: se cortan en segmentos solapados que Transcribe procesa en paralelo.
+# LONG_AUDIO_MIN_MB=0 deja el modo sólo a pedido ("longAudio": true)
+LONG_AUDIO_MIN_BYTES = int(float(os.environ.get("LONG_AUDIO_MIN_MB", "0")) * 1024 * 1024)
+SEGMENT_SECONDS = float(os.environ.get("LONG_AUDIO_SEGMENT_SECONDS", "600"))
+SEGMENT_OVERLAP_SECONDS = float(os.environ.get("LONG_AUDIO_OVERLAP_SECONDS", "15"))
+SEGMENT_MAX_WORKERS = int(os.environ.get("LONG_AUDIO_MAX_WORKERS", "8"))
+PFX_SEGMENTOS = "transcripciones-segmentos/"
+_SEGMENT_OUTPUT = re.compile(r"parte-\d{3}\.json")
+_SEGMENT_JOB = re.compile(r"(.+)-parte-\d{3}")
+
+# Subida multipart de audios: tamaño de parte, vigencia de las URLs y URLs por llamada
+UPLOAD_PART_BYTES = int(float(os.environ.get("UPLOAD_PART_MB", "16")) * 1024 * 1024)
+UPLOAD_URL_TTL_SECONDS = int(os.environ.get("UPLOAD_URL_TTL_SECONDS", "3600"))
+UPLOAD_URLS_PER_CALL = int(os.environ.get("UPLOAD_URLS_PER_CALL", "100"))
+UPLOAD_ROUTES = ("uploadInit", "uploadParts", "uploadComplete", "uploadAbort")
+
+# Control de admisión: con ADMISSION_QUEUE_URL los inicios se encolan y el
+# scheduler (drainQueue) los libera según el tope de jobs de Transcribe
+ADMISSION_QUEUE_URL = os.environ.get("ADMISSION_QUEUE_URL")
+TRANSCRIBE_MAX_CONCURRENT = int(os.environ.get("TRANSCRIBE_MAX_CONCURRENT", "100"))
+ADMISSION_USER_BURST = float(os.environ.get("ADMISSION_USER_BURST", "5"))
+ADMISSION_USER_RATE = float(os.environ.get("ADMISSION_USER_PER_MINUTE", "2")) / 60
+# Ventana de mensajes que ve cada pasada: el reparto justo sólo elige entre los que lee
+ADMISSION_RECEIVE_MAX = int(os.environ.get("ADMISSION_RECEIVE_MAX", "1000"))
+ADMISSION_VISIBILITY_SECONDS = 60
+ADMISSION_DRAIN_SECONDS = float(os.environ.get("ADMISSION_DRAIN_SECONDS", "50"))
+ADMISSION_DRAIN_INTERVAL_SECONDS = float(os.environ.get("ADMISSION_DRAIN_INTERVAL_SECONDS", "10"))
+ADMISSION_STATE_KEY = "cola-transcripciones/token-buckets.json"
+
+# checkStatus responde desde la tabla: los fallos de Transcribe llegan por
+# EventBridge y la transcripción terminada por S3 (formatear). Sólo una etapa
+# sin novedades por más de este tiempo se confirma contra Transcribe, por si
+# se perdió un evento
+STATUS_STALE_SECONDS = float(os.environ.get("STATUS_STALE_SECONDS", "900"))
+
+# waitStatus: espera máxima del lado del servidor (API Gateway corta a los 29 s)
+WAIT_MAX_SECONDS = float(os.environ.get("WAIT_STATUS_MAX_SECONDS", "25"))
+
+# Clientes perezosos: cada ruta crea sólo los que usa. Un pool de conexiones
+# por worker para que el batch no se encole en urllib3
+transcribe_client = clientes.lazy('transcribe', max_pool_connections=BATCH_MAX_WORKERS)
+s3_client = clientes.lazy('s3', max_pool_connections=BATCH_MAX_WORKERS)
+lambda_client = clientes.lazy('lambda')
+sqs_client = clientes.lazy('sqs')
 output_bucket = os.environ['BUCKET']
+job_state = estado.store_from_env()
+clientes.prepare(transcribe_client, s3_client)
 
-def _resp(status_code, payload_dict):
-    return {
+def _resp(status_code, payload_dict, gzip_ok=False):
+    body = json.dumps(payload_dict)
+    response = {
         "statusCode": status_code,
         "headers": {
             "Access-Control-Allow-Origin": "*",
             "Access-Control-Allow-Headers": "Content-Type",
             "Access-Control-Allow-Methods": "OPTIONS,POST",
         },
-        "body": json.dumps(payload_dict),
+        "body": body,
     }
+    # Sólo vale la pena comprimir respuestas grandes (transcripciones inline)
+    if gzip_ok and len(body) >= GZIP_MIN_BYTES:
+        # El JSON comprimido como archivo .gz: el cliente lo descomprime
+        response["headers"]["Content-Type"] = GZIP_MEDIA_TYPE
+        response["headers"]["Vary"] = "Accept"
+        response["body"] = gzip_base64(body)
+        response["isBase64Encoded"] = True
+    return response
 
 def _object_exists(bucket, key):
     try:
@@ -31,8 +110,780 @@ def _object_exists(bucket, key):
         # Si no existe, devolvemos False; para otros errores, también False
         return False
 
+def _read_partial_summary(bucket, key):
+    """Resumen parcial que va escribiendo resumir en modo streaming (o None)."""
+    try:
+        obj = s3_client.get_object(Bucket=bucket, Key=key)
+    except ClientError:
+        return None
+    return {
+        "text": compresion.read_bytes(obj).decode('utf-8'),
+        "tokens": int(obj.get('Metadata', {}).get('generated-tokens', 0)),
+    }
+
+def _job_keys(job_name):
+    # Claves esperadas por tu pipeline por eventos:
+    #   transcripciones/JobName.json          (lo escribe Transcribe)
+    #   transcripciones-formateadas/JobName.txt (lo escribe tu Lambda de "formatear")
+    #   resumenes/JobName_summary.txt           (lo escribe tu Lambda de "resumir")
+    #   resumenes/JobName_summary.partial.txt   (avance mientras "resumir" genera)
+    return {
+        "formatted": f"transcripciones-formateadas/{job_name}.txt",
+        "summary": f"resumenes/{job_name}_summary.txt",
+        "partial": f"resumenes/{job_name}_summary.partial.txt"
+    }
+
+def _read_text(key):
+    try:
+        obj = s3_client.get_object(Bucket=output_bucket, Key=key)
+        # Los artefactos pueden estar comprimidos (Content-Encoding): se devuelven como texto
+        return compresion.read_bytes(obj).decode('utf-8')
+    except ClientError:
+        return None
+
+def _result_urls(job_name, keys):
+    """URLs prefirmadas de lo que ya está listo (None para lo que todavía no existe)."""
+    record = job_state.get(job_name) if job_state is not None else None
+    if record is not None:
+        stages = record["stages"]
+        formatted_ready = stages.get(estado.FORMATEAR, {}).get("status") == estado.COMPLETED
+        summary_ready = stages.get(estado.RESUMIR, {}).get("status") == estado.COMPLETED
+    else:
+        formatted_ready = _object_exists(output_bucket, keys["formatted"])
+        summary_ready = _object_exists(output_bucket, keys["summary"])
+
+    return {
+        "transcriptionUrl": presigned_url(s3_client, output_bucket, keys["formatted"], RESULTS_URL_TTL_SECONDS)
+        if formatted_ready else None,
+        "summaryUrl": presigned_url(s3_client, output_bucket, keys["summary"], RESULTS_URL_TTL_SECONDS)
+        if summary_ready else None,
+        "expiresIn": RESULTS_URL_TTL_SECONDS
+    }
+
+def _job_status(job_name):
+    """Estado desde la tabla de jobs (una lectura); sin registro, sondea Transcribe y S3."""
+    record = job_state.get(job_name) if job_state is not None else None
+    if record is None:
+        return _probe_job_status(job_name)
+    return _status_from_record(job_name, record)
+
+def _status_from_record(job_name, record):
+    keys = _job_keys(job_name)
+    stages = record["stages"]
+    transcription = stages.get(estado.TRANSCRIBIR, {})
+    formatting = stages.get(estado.FORMATEAR, {})
+    summary = stages.get(estado.RESUMIR, {})
+
+    status = transcription.get("status", estado.IN_PROGRESS)
+    if status == estado.IN_PROGRESS and not formatting and _is_stale(transcription):
+        status, transcription = _confirm_transcription(job_name, transcription)
+
+    formatted_ready = formatting.get("status") == estado.COMPLETED
+    summary_ready = summary.get("status") == estado.COMPLETED
+
+    summary_progress = None
+    if formatted_ready and summary.get("status") == estado.IN_PROGRESS:
+        summary_progress = _read_partial_summary(output_bucket, keys["partial"])
+
+    failed = [
+        {"stage": stage, **{k: v for k, v in info.items() if k in ("error", "detail")}}
+        for stage, info in ((estado.TRANSCRIBIR, transcription), (estado.FORMATEAR, formatting),
+                            (estado.RESUMIR, summary))
+        if info.get("status") == estado.FAILED
+    ]
+
+    return {
+        "status": status,
+        "formattedReady": formatted_ready,
+        "summaryReady": summary_ready,
+        "summaryProgress": summary_progress,
+        "failed": failed[0] if failed else None,
+        "updatedAt": record.get("updatedAt"),
+        "version": estado.version(record),
+        "keys": keys
+    }
+
+def _is_stale(info):
+    updated = info.get("updatedAt")
+    return updated is None or estado.seconds_since(updated) > STATUS_STALE_SECONDS
+
+def _confirm_transcription(job_name, transcription):
+    """
+    Consulta a Transcribe por una transcripción IN_PROGRESS sin novedades
+    hace rato. Si sigue en curso se vuelve a registrar (con los mismos
+    campos) para que los próximos checkStatus respondan desde la tabla.
+    """
+    if transcription.get("mode") == "segments":
+        status, detail = _segments_status(job_name)
+    else:
+        try:
+            tj = transcribe_client.get_transcription_job(TranscriptionJobName=job_name)['TranscriptionJob']
+        except ClientError as e:
+            # El registro se escribe antes de start_transcription_job: el job puede no existir todavía
+            if e.response['Error']['Code'] != 'BadRequestException':
+                raise
+            tj = {'TranscriptionJobStatus': estado.IN_PROGRESS}
+        status, detail = tj['TranscriptionJobStatus'], tj.get('FailureReason', '')
+
+    if status == estado.FAILED:
+        estado.record_safely(job_state, job_name, estado.TRANSCRIBIR, estado.FAILED, detail=detail)
+        return status, {"status": status, "detail": detail}
+    if status == estado.IN_PROGRESS:
+        fields = {k: v for k, v in transcription.items() if k not in ("status", "updatedAt")}
+        estado.record_safely(job_state, job_name, estado.TRANSCRIBIR, estado.IN_PROGRESS, **fields)
+    # COMPLETED: el registro lo actualiza formatear al llegar el JSON a S3
+    return status, transcription
+
+def _on_transcribe_event(detail):
+    """
+    Cambio de estado de un job de Transcribe (regla de EventBridge): un
+    fallo queda en la tabla sin que checkStatus tenga que preguntar. La regla
+    ve todos los jobs de la cuenta: sólo se registran los que tienen registro.
+    """
+    if job_state is None or detail.get('TranscriptionJobStatus') != estado.FAILED:
+        return {"updated": False}
+    name = detail.get('TranscriptionJobName', '')
+    segment = _SEGMENT_JOB.fullmatch(name)
+    job_name = segment.group(1) if segment else name
+    record = job_state.get(job_name)
+    if record is None or record["stages"].get(estado.TRANSCRIBIR, {}).get("status") == estado.FAILED:
+        return {"updated": False}
+    # El evento no trae el motivo: una consulta por job fallido
+    reason = detail.get('FailureReason')
+    if reason is None:
+        reason = transcribe_client.get_transcription_job(
+            TranscriptionJobName=name)['TranscriptionJob'].get('FailureReason', '')
+    estado.record_safely(job_state, job_name, estado.TRANSCRIBIR, estado.FAILED,
+                         detail=f"{name}: {reason}" if segment else reason)
+    return {"updated": True, "jobName": job_name}
+
+def _owner(key):
+    """Identidad dueña del audio: audios/<identityId>/archivo.mp3."""
+    parts = key.split('/')
+    return parts[1] if len(parts) > 2 else ""
+
+def _dedup_key(bucket, key, etag, language_code, max_speakers):
+    """
+    Clave de deduplicación del inicio: contenido del audio (ETag) y
+    configuración. La carpeta del usuario (audios/<identityId>/) también
+    entra, así dos usuarios con el mismo archivo nunca comparten un job.
+    """
+    raw = json.dumps([bucket, _owner(key), etag, language_code, int(max_speakers)])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def _claim_job(dedup_key, job_name):
+    """Devuelve el job dueño de la clave; un job anterior que falló se reemplaza por `job_name`."""
+    owner = job_state.claim(dedup_key, job_name)
+    if owner != job_name:
+        record = job_state.get(owner)
+        failed = record is not None and any(
+            info.get("status") == estado.FAILED for info in record["stages"].values()
+        )
+        if failed:
+            logger.info(f"El job {owner} para este audio falló; se inicia uno nuevo")
+            job_state.release(dedup_key, owner)
+            owner = job_state.claim(dedup_key, job_name)
+    return owner
+
+def _is_final(record):
+    """True si el job ya no va a cambiar: resumen listo o alguna etapa fallida."""
+    stages = record["stages"]
+    return (stages.get(estado.RESUMIR, {}).get("status") == estado.COMPLETED
+            or any(info.get("status") == estado.FAILED for info in stages.values()))
+
+def _wait_status(job_name, since, timeout):
+    """
+    Long-poll: devuelve el estado apenas el registro del job cambia respecto
+    de `since` (la `version` de la respuesta anterior) o al vencer `timeout`.
+    """
+    if job_state is None:
+        # Sin tabla no hay de qué colgarse: se comporta como checkStatus
+        return {**_job_status(job_name), "changed": True}
+
+    record = job_state.get(job_name)
+    if record is None or _is_final(record) or estado.version(record) != since:
+        status = _status_from_record(job_name, record) if record else _probe_job_status(job_name)
+        return {**status, "changed": record is None or estado.version(record) != since}
+
+    record = job_state.wait_for_change(job_name, since, timeout)
+    return {**_status_from_record(job_name, record), "changed": estado.version(record) != since}
+
+def _wait_timeout(requested, context):
+    timeout = min(float(requested), WAIT_MAX_SECONDS) if requested is not None else WAIT_MAX_SECONDS
+    if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+        remaining = context.get_remaining_time_in_millis() / 1000 - BATCH_DEADLINE_MARGIN_SECONDS
+        timeout = min(timeout, remaining)
+    return max(timeout, 0)
+
+def _probe_job_status(job_name):
+    # Jobs anteriores a la tabla de estado (o sin tabla configurada)
+    try:
+        tj = transcribe_client.get_transcription_job(TranscriptionJobName=job_name)
+        status = tj['TranscriptionJob']['TranscriptionJobStatus']  # IN_PROGRESS | COMPLETED | FAILED
+    except ClientError as e:
+        # Los audios largos no tienen un job con ese nombre, sino uno por segmento
+        if (e.response['Error']['Code'] != 'BadRequestException'
+                or not _object_exists(output_bucket, f"{PFX_SEGMENTOS}{job_name}/manifest.json")):
+            raise
+        status, _ = _segments_status(job_name)
+
+    keys = _job_keys(job_name)
+    formatted_ready = _object_exists(output_bucket, keys["formatted"])
+    summary_ready   = _object_exists(output_bucket, keys["summary"])
+
+    # Mientras no está el resumen final, devolvemos lo generado hasta ahora
+    summary_progress = None
+    if formatted_ready and not summary_ready:
+        summary_progress = _read_partial_summary(output_bucket, keys["partial"])
+
+    return {
+        "status": status,
+        "formattedReady": formatted_ready,
+        "summaryReady": summary_ready,
+        "summaryProgress": summary_progress,
+        "keys": keys
+    }
+
+def _batch_timeout(context):
+    """Segundos para el batch: el configurado, sin pasarse del tiempo que le queda a la Lambda."""
+    timeout = BATCH_TIMEOUT_SECONDS
+    if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+        remaining = context.get_remaining_time_in_millis() / 1000 - BATCH_DEADLINE_MARGIN_SECONDS
+        timeout = min(timeout, max(remaining, 0))
+    return timeout
+
+def _batch_status(job_names, timeout):
+    """
+    Consulta varios jobs en paralelo. Los que no terminan antes de `timeout`
+    segundos vuelven con status TIMEOUT y los que fallan con status ERROR,
+    sin afectar al resto.
+    """
+    unique = list(dict.fromkeys(job_names))
+    jobs = {}
+    if unique:
+        pool = ThreadPoolExecutor(max_workers=min(BATCH_MAX_WORKERS, len(unique)))
+        futures = {pool.submit(_job_status, name): name for name in unique}
+        wait(futures, timeout=timeout)
+        # No esperamos a los que quedaron colgados; las llamadas en curso terminan solas
+        pool.shutdown(wait=False, cancel_futures=True)
+
+        for future, name in futures.items():
+            if not future.done() or future.cancelled():
+                jobs[name] = {"status": "TIMEOUT"}
+            elif future.exception() is not None:
+                error = future.exception()
+                code = error.response["Error"]["Code"] if isinstance(error, ClientError) else type(error).__name__
+                logger.warning(f"checkStatusBatch {name}: {str(error)}")
+                jobs[name] = {"status": "ERROR", "error": code}
+            else:
+                jobs[name] = future.result()
+
+    timed_out = sum(1 for job in jobs.values() if job["status"] == "TIMEOUT")
+    return {
+        "jobs": [{"jobName": name, **jobs[name]} for name in unique],
+        "complete": timed_out == 0,
+        "timedOut": timed_out
+    }
+
+def _segment_names(job_name, index):
+    """(mp3 del segmento, JSON que escribe Transcribe, nombre del job de Transcribe)."""
+    base = f"{PFX_SEGMENTOS}{job_name}/parte-{index:03d}"
+    return f"{base}.mp3", f"{base}.json", f"{job_name}-parte-{index:03d}"
+
+def _start_transcription(job_name, media_uri, language_code, max_speakers, output_key):
+    with instrumentacion.timed("TranscribeStartMs"):
+        transcribe_client.start_transcription_job(
+            TranscriptionJobName=job_name,
+            Media={'MediaFileUri': media_uri},
+            MediaFormat='mp3',
+            LanguageCode=language_code,
+            OutputBucketName=output_bucket,
+            OutputKey=output_key,
+            Settings={
+                'ShowSpeakerLabels': True,
+                'MaxSpeakerLabels': max_speakers
+            }
+        )
+
+def _segments_status(job_name):
+    """
+    Estado agregado de los jobs de los segmentos: (FAILED, motivo) si alguno
+    falló y si no IN_PROGRESS (terminados todos, falta el stitching).
+    """
+    statuses, kwargs = [], {"JobNameContains": f"{job_name}-parte-", "MaxResults": 100}
+    while True:
+        page = transcribe_client.list_transcription_jobs(**kwargs)
+        statuses.extend(page.get('TranscriptionJobSummaries', []))
+        if not page.get('NextToken'):
+            break
+        kwargs["NextToken"] = page['NextToken']
+    for summary in statuses:
+        if summary['TranscriptionJobStatus'] == estado.FAILED:
+            return estado.FAILED, f"{summary['TranscriptionJobName']}: {summary.get('FailureReason', '')}"
+    return estado.IN_PROGRESS, None
+
+def _dispatch_split(payload, context):
+    """El corte puede tardar más que API Gateway: se hace en una invocación asíncrona de esta Lambda."""
+    arn = getattr(context, "invoked_function_arn", None) if context is not None else None
+    if arn:
+        lambda_client.invoke(
+            FunctionName=arn,
+            InvocationType='Event',
+            Payload=json.dumps({"splitLongAudio": payload}).encode('utf-8')
+        )
+    else:
+        _split_long_audio(**payload)
+
+def _split_long_audio(job_name, bucket, key, language_code, max_speakers, dedup_key=None):
+    """
+    Corta el MP3 en segmentos (sin decodificar), los sube a
+    transcripciones-segmentos/<job>/, escribe el manifiesto e inicia un job
+    de Transcribe por segmento en paralelo.
+    """
+    try:
+        obj = s3_client.get_object(Bucket=bucket, Key=key)
+        plans = plan_segments(scan_frames(obj['Body']), SEGMENT_SECONDS, SEGMENT_OVERLAP_SECONDS)
+        logger.info(f"{job_name}: {len(plans)} segmentos de s3://{bucket}/{key}")
+
+        def copy(plan):
+            mp3_key, json_key, segment_job = _segment_names(job_name, plan.index)
+            data = s3_client.get_object(
+                Bucket=bucket, Key=key, Range=f"bytes={plan.start_offset}-{plan.end_offset - 1}"
+            )['Body'].read()
+            s3_client.put_object(Bucket=output_bucket, Key=mp3_key, Body=data, ContentType='audio/mpeg')
+            return {
+                "index": plan.index,
+                "startTime": plan.start_time,
+                "endTime": plan.end_time,
+                "keepFrom": plan.keep_from,
+                # JSON no tiene infinito: None = hasta el final
+                "keepUntil": None if plan.keep_until == float("inf") else plan.keep_until,
+                "media": mp3_key,
+                "output": json_key,
+                "jobName": segment_job,
+            }
+
+        with ThreadPoolExecutor(max_workers=min(SEGMENT_MAX_WORKERS, len(plans))) as pool:
+            parts = list(pool.map(copy, plans))
+
+        # El manifiesto se escribe antes de iniciar los jobs: el stitching lo necesita
+        s3_client.put_object(
+            Bucket=output_bucket,
+            Key=f"{PFX_SEGMENTOS}{job_name}/manifest.json",
+            Body=json.dumps({"jobName": job_name, "source": f"s3://{bucket}/{key}", "parts": parts}).encode('utf-8'),
+            ContentType='application/json'
+        )
+        estado.record_safely(job_state, job_name, estado.TRANSCRIBIR, estado.IN_PROGRESS, mode="segments",
+                             input=f"s3://{bucket}/{key}", output=f"transcripciones/{job_name}.json",
+                             languageCode=language_code, segments=len(parts))
+
+        def start(part):
+            media = f"s3://{output_bucket}/{part['media']}"
+            try:
+                _start_transcription(part["jobName"], media, language_code, max_speakers, part["output"])
+            except ClientError as e:
+                if not ADMISSION_QUEUE_URL or e.response['Error']['Code'] != 'LimitExceededException':
+                    raise
+                # Sin lugar en Transcribe: espera en la admisión, en la ronda de la identidad del audio
+                _enqueue_start(part["jobName"], _owner(key), media, language_code, max_speakers, part["output"],
+                               dedup_key=dedup_key, parent=job_name)
+
+        with ThreadPoolExecutor(max_workers=min(SEGMENT_MAX_WORKERS, len(parts))) as pool:
+            list(pool.map(start, parts))
+        return {"status": "STARTED", "jobName": job_name, "segments": len(parts)}
+
+    except Exception as e:
+        logger.exception(f"Error cortando el audio de {job_name}")
+        estado.record_safely(job_state, job_name, estado.TRANSCRIBIR, estado.FAILED,
+                             error=type(e).__name__, detail=str(e))
+        if dedup_key is not None and job_state is not None:
+            job_state.release(dedup_key, job_name)
+        return {"status": "FAILED", "jobName": job_name, "error": type(e).__name__, "detail": str(e)}
+
+def _process_segment_output(bucket, key):
+    """
+    Transcribe terminó un segmento. Cuando están todos, el último en llegar
+    los une en transcripciones/<job>.json, que dispara formatear como siempre.
+    """
+    relative = key[len(PFX_SEGMENTOS):].split('/') if key.startswith(PFX_SEGMENTOS) else []
+    if len(relative) != 2 or not _SEGMENT_OUTPUT.fullmatch(relative[1]):
+        logger.warning(f"Ignorando archivo no válido: {key}")
+        return {"status": "IGNORED"}
+    job_name = relative[0]
+
+    manifest = json.loads(_read_text(f"{PFX_SEGMENTOS}{job_name}/manifest.json"))
+    pending = [part for part in manifest["parts"]
+               if part["output"] != key and not _object_exists(output_bucket, part["output"])]
+    if pending:
+        return {"status": "WAITING", "pending": len(pending)}
+
+    # Dos segmentos que terminan a la vez ven todo listo: sólo uno une
+    if job_state is not None and job_state.claim(f"stitch#{job_name}", key) != key:
+        return {"status": "IGNORED"}
+
+    with instrumentacion.job(estado.TRANSCRIBIR, job_name, route="stitch") as metrics:
+        parts = []
+        with metrics.timer("S3GetMs"):
+            for part in manifest["parts"]:
+                parts.append({
+                    "start_time": part["startTime"],
+                    "end_time": part["endTime"],
+                    "keep_from": part["keepFrom"],
+                    "keep_until": float("inf") if part["keepUntil"] is None else part["keepUntil"],
+                    "transcript": json.loads(_read_text(part["output"])),
+                })
+        with metrics.timer("StitchMs"):
+            body = json.dumps(stitch(parts, job_name), ensure_ascii=False).encode('utf-8')
+            # Misma clave .json (la notificación a formatear no cambia); formato lo lee descomprimido
+            stored = compresion.compress(body, compresion.ENCODING)
+        metrics.add("Segments", len(parts))
+        metrics.add("TextBytes", len(body), instrumentacion.BYTES)
+        metrics.add("BytesOut", len(stored), instrumentacion.BYTES)
+        output_key = f"transcripciones/{job_name}.json"
+        with metrics.timer("S3PutMs"):
+            s3_client.put_object(
+                Bucket=output_bucket,
+                Key=output_key,
+                Body=stored,
+                ContentType='application/json',
+                **compresion.put_args(compresion.ENCODING, len(body))
+            )
+    logger.info(f"{job_name}: {len(parts)} segmentos unidos en s3://{output_bucket}/{output_key}")
+    return {"output": output_key}
+
+def _enqueue_start(job_name, identity, media_uri, language_code, max_speakers, output_key,
+                   dedup_key=None, parent=None):
+    """Encola el inicio de un job; `parent` es el job del audio largo al que pertenece un segmento."""
+    with instrumentacion.timed("SqsSendMs"):
+        sqs_client.send_message(
+            QueueUrl=ADMISSION_QUEUE_URL,
+            MessageBody=json.dumps({
+                "jobName": job_name,
+                "identity": identity,
+                "mediaUri": media_uri,
+                "languageCode": language_code,
+                "maxSpeakers": max_speakers,
+                "outputKey": output_key,
+                "dedupKey": dedup_key,
+                "parent": parent,
+                "enqueuedAt": time.time(),
+            })
+        )
+
+def _running_jobs():
+    """Jobs de Transcribe en curso en la cuenta (el tope es por cuenta y región)."""
+    running, kwargs = 0, {"Status": "IN_PROGRESS", "MaxResults": 100}
+    while True:
+        page = transcribe_client.list_transcription_jobs(**kwargs)
+        running += len(page.get('TranscriptionJobSummaries', []))
+        if not page.get('NextToken'):
+            return running
+        kwargs["NextToken"] = page['NextToken']
+
+def _admit(item, now):
+    """Inicia un job encolado: "started", "failed" o "limit" (sin lugar, vuelve al queue)."""
+    job_name = item["jobName"]
+    try:
+        _start_transcription(job_name, item["mediaUri"], item["languageCode"], item["maxSpeakers"],
+                             item["outputKey"])
+    except ClientError as e:
+        code = e.response['Error']['Code']
+        if code == 'LimitExceededException':
+            return "limit"
+        if code == 'ConflictException':
+            # SQS puede entregar un mensaje dos veces: el job ya existe
+            return "started"
+        error = e
+    except Exception as e:
+        error = e
+    else:
+        if item.get("parent") is None:
+            estado.record_safely(job_state, job_name, estado.TRANSCRIBIR, estado.IN_PROGRESS,
+                                 queuedSeconds=round(now - item["enqueuedAt"], 3))
+        return "started"
+
+    logger.error(f"No se pudo iniciar {job_name}: {error}")
+    failed_job = item.get("parent") or job_name
+    estado.record_safely(job_state, failed_job, estado.TRANSCRIBIR, estado.FAILED,
+                         error=type(error).__name__, detail=str(error))
+    if item.get("dedupKey") and job_state is not None:
+        job_state.release(item["dedupKey"], failed_job)
+    return "failed"
+
+def _load_share():
+    state = _read_text(ADMISSION_STATE_KEY)
+    return admission.FairShare.from_dict(json.loads(state) if state else {},
+                                         ADMISSION_USER_BURST, ADMISSION_USER_RATE)
+
+def _save_share(share, now):
+    # Lo escriben el scheduler y los inicios directos sin coordinarse: si se
+    # pisan se pierde algún token descontado. Es un reparto aproximado; el
+    # tope real lo pone LimitExceededException
+    s3_client.put_object(
+        Bucket=output_bucket,
+        Key=ADMISSION_STATE_KEY,
+        Body=json.dumps(share.to_dict(now)).encode('utf-8'),
+        ContentType='application/json'
+    )
+
+def _charge_token(identity):
+    """Descuenta un token del bucket de `identity` si le queda alguno."""
+    now = time.time()
+    share = _load_share()
+    if share.bucket(identity, now).take(now):
+        _save_share(share, now)
+
+def _drain_queue(now=None):
+    """
+    Una pasada del scheduler: lee lo encolado, elige por reparto justo tantos
+    jobs como lugares libres haya, los inicia y devuelve el resto al queue.
+    """
+    now = time.time() if now is None else now
+    slots = TRANSCRIBE_MAX_CONCURRENT - _running_jobs()
+    result = {"slots": max(slots, 0), "received": 0, "started": 0, "failed": 0}
+    if slots <= 0:
+        return result
+
+    messages = admission.receive(sqs_client, ADMISSION_QUEUE_URL, ADMISSION_RECEIVE_MAX,
+                                 ADMISSION_VISIBILITY_SECONDS)
+    result["received"] = len(messages)
+    if not messages:
+        return result
+
+    share = _load_share()
+    pending = [dict(json.loads(message["Body"]), message=message) for message in messages]
+    # Los segmentos de un audio largo no gastan tokens: el audio se cobró una vez al iniciarlo
+    selected = share.select(pending, slots, now, exempt=lambda item: item.get("parent") is not None)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(BATCH_MAX_WORKERS, len(selected)))) as pool:
+        outcomes = list(pool.map(lambda item: _admit(item, now), selected))
+
+    done = {id(item["message"]) for item, outcome in zip(selected, outcomes) if outcome != "limit"}
+    admission.delete(sqs_client, ADMISSION_QUEUE_URL, [m for m in messages if id(m) in done])
+    admission.release(sqs_client, ADMISSION_QUEUE_URL, [m for m in messages if id(m) not in done])
+    _save_share(share, now)
+
+    result["started"] = outcomes.count("started")
+    result["failed"] = outcomes.count("failed")
+    logger.info(f"Admisión: {result}")
+    return result
+
+def _drain_loop(context):
+    """El scheduler corre cada minuto; dentro de la invocación repite pasadas para bajar la espera."""
+    budget = ADMISSION_DRAIN_SECONDS
+    if context is not None:
+        budget = min(budget, context.get_remaining_time_in_millis() / 1000 - ADMISSION_DRAIN_INTERVAL_SECONDS)
+    deadline = time.monotonic() + budget
+    totals = {"passes": 0, "started": 0, "failed": 0}
+    while True:
+        with instrumentacion.job("admision", route="drainQueue") as metrics:
+            result = _drain_queue()
+            for name in ("slots", "received", "started", "failed"):
+                metrics.add(name.capitalize(), result[name])
+        totals["passes"] += 1
+        totals["started"] += result["started"]
+        totals["failed"] += result["failed"]
+        if (result["slots"] and not result["received"]) or \
+                time.monotonic() + ADMISSION_DRAIN_INTERVAL_SECONDS > deadline:
+            return totals
+        time.sleep(ADMISSION_DRAIN_INTERVAL_SECONDS)
+
+def _start_job(bucket_name, key, language_code, max_speakers, long_audio, context):
+    """Inicia (o encola) la transcripción de s3://bucket_name/key; devuelve (status HTTP, payload)."""
+    job_name = f"transcription-job-{uuid.uuid4()}"
+    with instrumentacion.job(estado.TRANSCRIBIR, job_name, route="start") as metrics:
+        status_code, payload = _start_named_job(job_name, bucket_name, key, language_code, max_speakers,
+                                                long_audio, context)
+        metrics.property(deduplicated=payload.get("deduplicated"), segmented=payload.get("segmented"))
+        return status_code, payload
+
+def _queue_start(job_name, key, media_uri, language_code, max_speakers, output_key, dedup_key, marks):
+    """Encola el inicio para el scheduler; devuelve (202, payload)."""
+    estado.record_safely(job_state, job_name, estado.TRANSCRIBIR, estado.QUEUED, marks=marks,
+                         input=media_uri, output=output_key, languageCode=language_code)
+    try:
+        _enqueue_start(job_name, _owner(key), media_uri, language_code, max_speakers, output_key,
+                       dedup_key=dedup_key)
+    except Exception as e:
+        estado.record_safely(job_state, job_name, estado.TRANSCRIBIR, estado.FAILED,
+                             error=type(e).__name__, detail=str(e))
+        if dedup_key is not None:
+            job_state.release(dedup_key, job_name)
+        raise
+    return 202, {
+        "message": "Transcripción encolada; se inicia cuando haya capacidad.",
+        "jobName": job_name,
+        "status": estado.QUEUED,
+        "outputLocation": f"s3://{output_bucket}/{output_key}",
+        "deduplicated": False,
+        "segmented": False
+    }
+
+def _start_named_job(job_name, bucket_name, key, language_code, max_speakers, long_audio, context):
+    media_uri = f"s3://{bucket_name}/{key}"
+
+    # Doble click o reintento: mismo audio y misma configuración => mismo job.
+    # La reserva es una escritura condicional, así que de dos requests
+    # simultáneos sólo uno inicia Transcribe.
+    dedup_key = None
+    head = None
+    if (START_DEDUP and job_state is not None) or LONG_AUDIO_MIN_BYTES:
+        with instrumentacion.timed("S3HeadMs"):
+            head = s3_client.head_object(Bucket=bucket_name, Key=key)
+        instrumentacion.count("BytesIn", head.get('ContentLength', 0), instrumentacion.BYTES)
+    # Inicio de la línea de tiempo del job: cuándo terminó de subirse el audio
+    marks = {"uploaded": estado.iso(head['LastModified'])} if head and head.get('LastModified') else None
+    if START_DEDUP and job_state is not None:
+        etag = head['ETag'].strip('"')
+        dedup_key = _dedup_key(bucket_name, key, etag, language_code, max_speakers)
+        existing = _claim_job(dedup_key, job_name)
+        if existing != job_name:
+            logger.info(f"Audio ya en proceso: {media_uri} -> {existing}")
+            return 200, {
+                "message": "La transcripción de este audio ya fue iniciada.",
+                "jobName": existing,
+                "outputLocation": f"s3://{output_bucket}/transcripciones/{existing}.json",
+                "deduplicated": True
+            }
+
+    output_key = f"transcripciones/{job_name}.json"
+    if long_audio is None:
+        long_audio = bool(LONG_AUDIO_MIN_BYTES) and head['ContentLength'] >= LONG_AUDIO_MIN_BYTES
+
+    if long_audio:
+        # Segmentos en paralelo: el corte sigue en segundo plano y el resultado
+        # termina en el mismo transcripciones/<job>.json
+        estado.record_safely(job_state, job_name, estado.TRANSCRIBIR, estado.IN_PROGRESS, mode="segments",
+                             marks=marks, input=media_uri, output=output_key, languageCode=language_code)
+        if ADMISSION_QUEUE_URL:
+            # El audio se cobra una vez; sus segmentos esperan lugar sin gastar tokens
+            _charge_token(_owner(key))
+        _dispatch_split({
+            "job_name": job_name,
+            "bucket": bucket_name,
+            "key": key,
+            "language_code": language_code,
+            "max_speakers": max_speakers,
+            "dedup_key": dedup_key
+        }, context)
+        return 200, {
+            "message": "Transcripción por segmentos iniciada correctamente.",
+            "jobName": job_name,
+            "outputLocation": f"s3://{output_bucket}/{output_key}",
+            "deduplicated": False,
+            "segmented": True
+        }
+
+    share = None
+    if ADMISSION_QUEUE_URL:
+        # Con token en el bucket del usuario se intenta iniciar directo; sin
+        # token, o sin lugar en Transcribe, el scheduler lo inicia después
+        now = time.time()
+        share = _load_share()
+        if not share.bucket(_owner(key), now).has_token(now):
+            return _queue_start(job_name, key, media_uri, language_code, max_speakers, output_key, dedup_key, marks)
+    else:
+        estado.record_safely(job_state, job_name, estado.TRANSCRIBIR, estado.IN_PROGRESS, marks=marks,
+                             input=media_uri, output=output_key, languageCode=language_code)
+
+    try:
+        _start_transcription(job_name, media_uri, language_code, max_speakers, output_key)
+    except Exception as e:
+        if share is not None and isinstance(e, ClientError) and \
+                e.response['Error']['Code'] == 'LimitExceededException':
+            return _queue_start(job_name, key, media_uri, language_code, max_speakers, output_key, dedup_key, marks)
+        # Sin job no hay nada que reusar: el próximo intento tiene que poder iniciarlo
+        estado.record_safely(job_state, job_name, estado.TRANSCRIBIR, estado.FAILED,
+                             error=type(e).__name__, detail=str(e))
+        if dedup_key is not None:
+            job_state.release(dedup_key, job_name)
+        raise
+    if share is not None:
+        estado.record_safely(job_state, job_name, estado.TRANSCRIBIR, estado.IN_PROGRESS, marks=marks,
+                             input=media_uri, output=output_key, languageCode=language_code, queuedSeconds=0)
+        share.bucket(_owner(key), now).take(now)
+        _save_share(share, now)
+    logger.info(f"Transcripción iniciada para: {media_uri}")
+
+    return 200, {
+        "message": "Transcripción iniciada correctamente.",
+        "jobName": job_name,
+        "outputLocation": f"s3://{output_bucket}/{output_key}",
+        "deduplicated": False,
+        "segmented": False
+    }
+
+def _valid_audio_key(key):
+    return isinstance(key, str) and key.endswith(".mp3") and key.startswith("audios/")
+
+def _caller_identity(event):
+    """
+    identityId del Identity Pool que firmó el pedido. Sólo la ruta /subidas
+    tiene auth IAM; en el resto API Gateway no informa identidad (None).
+    """
+    return ((event.get('requestContext') or {}).get('identity') or {}).get('cognitoIdentityId')
+
+def _upload_route(route, params, event, context):
+    """Rutas de la subida multipart: iniciar, pedir URLs de partes, completar y abortar."""
+    key = params.get('key')
+    if not _valid_audio_key(key):
+        return 400, {"error": "Clave S3 inválida"}
+    # Sin identidad no hay con qué comparar la carpeta: las URLs prefirmadas
+    # las firma la Lambda, así que un pedido anónimo no puede obtenerlas
+    identity = _caller_identity(event)
+    if identity is None:
+        return 401, {"error": "Las subidas requieren credenciales del Identity Pool (POST /subidas)"}
+    if _owner(key) != identity:
+        return 403, {"error": "La clave no pertenece al usuario"}
+
+    if route == 'uploadInit':
+        part_size, part_count = multipart.plan_parts(int(params['size']), UPLOAD_PART_BYTES)
+        upload_id = multipart.initiate(s3_client, output_bucket, key, params.get('contentType', 'audio/mpeg'))
+        first = range(1, min(part_count, UPLOAD_URLS_PER_CALL) + 1)
+        return 200, {
+            "uploadId": upload_id,
+            "key": key,
+            "partSize": part_size,
+            "partCount": part_count,
+            "urls": multipart.part_urls(s3_client, output_bucket, key, upload_id, first, UPLOAD_URL_TTL_SECONDS),
+            "expiresIn": UPLOAD_URL_TTL_SECONDS
+        }
+
+    upload_id = params['uploadId']
+    if route == 'uploadParts':
+        numbers = params['partNumbers']
+        if not isinstance(numbers, list) or len(numbers) > UPLOAD_URLS_PER_CALL:
+            return 400, {"error": f"partNumbers debe ser una lista de hasta {UPLOAD_URLS_PER_CALL} números"}
+        return 200, {
+            "urls": multipart.part_urls(s3_client, output_bucket, key, upload_id, numbers, UPLOAD_URL_TTL_SECONDS),
+            "expiresIn": UPLOAD_URL_TTL_SECONDS
+        }
+
+    if route == 'uploadAbort':
+        multipart.abort(s3_client, output_bucket, key, upload_id)
+        return 200, {"aborted": True, "key": key}
+
+    upload = multipart.complete(s3_client, output_bucket, key, upload_id, params.get('parts'))
+    transcribe = params.get('transcribe')
+    if not transcribe:
+        return 200, {"upload": upload, "key": key}
+    # Completar y transcribir en una sola llamada
+    status_code, payload = _start_job(output_bucket, key, transcribe['languageCode'], transcribe['maxSpeakers'],
+                                      transcribe.get('longAudio'), context)
+    return status_code, {"upload": upload, "key": key, **payload}
+
 def lambda_handler(event, context):
-    logger.info(f"Received event: {json.dumps(event)}")
+    instrumentacion.log_payload("Received event", event)
+
+    # Invocaciones que no vienen de API Gateway: salida de un segmento (S3) y corte asíncrono
+    if 'Records' in event:
+        return process_records(event, _process_segment_output)
+    if 'splitLongAudio' in event:
+        return _split_long_audio(**event['splitLongAudio'])
+    if 'drainQueue' in event:
+        return _drain_loop(context)
+    if event.get('source') == 'aws.transcribe':
+        return _on_transcribe_event(event.get('detail') or {})
 
     # Normalizamos body
     if 'body' in event:
@@ -50,8 +901,7 @@ def lambda_handler(event, context):
     else:
         body = event
 
-    logger.info(f"Request body: {body}")
-    logger.info(f"Parsed body type: {type(body)}")
+    instrumentacion.log_payload("Request body", body)
 
     # ---------------------------
     # RUTA 1: checkStatus
@@ -59,32 +909,40 @@ def lambda_handler(event, context):
     if 'checkStatus' in body:
         try:
             job_name = body['checkStatus']['job_name']
+            status = _job_status(job_name)
+            # Opcional: dónde se fue el tiempo del job, etapa por etapa
+            if body['checkStatus'].get('timeline') and job_state is not None:
+                status["timeline"] = instrumentacion.timeline(job_state.get(job_name))
+            return _resp(200, status)
+        except Exception as e:
+            logger.error(f"checkStatus error: {str(e)}")
+            return _resp(500, {"error": str(e)})
 
-            # Estado del job de Transcribe
-            tj = transcribe_client.get_transcription_job(TranscriptionJobName=job_name)
-            status = tj['TranscriptionJob']['TranscriptionJobStatus']  # IN_PROGRESS | COMPLETED | FAILED
-
-            # Claves esperadas por tu pipeline por eventos:
-            #   transcripciones/JobName.json          (lo escribe Transcribe)
-            #   transcripciones-formateadas/JobName.txt (lo escribe tu Lambda de "formatear")
-            #   resumenes/JobName_summary.txt           (lo escribe tu Lambda de "resumir")
-            formatted_key = f"transcripciones-formateadas/{job_name}.txt"
-            summary_key   = f"resumenes/{job_name}_summary.txt"
-
-            formatted_ready = _object_exists(output_bucket, formatted_key)
-            summary_ready   = _object_exists(output_bucket, summary_key)
+    # ---------------------------
+    # RUTA 1b: checkStatusBatch (varios jobs en una sola llamada)
+    # ---------------------------
+    if 'checkStatusBatch' in body:
+        try:
+            job_names = body['checkStatusBatch']['job_names']
+            if not isinstance(job_names, list) or not all(isinstance(n, str) for n in job_names):
+                return _resp(400, {"error": "job_names debe ser una lista de strings"})
+            if len(job_names) > BATCH_MAX_JOBS:
+                return _resp(400, {"error": f"Máximo {BATCH_MAX_JOBS} jobs por llamada"})
+            return _resp(200, _batch_status(job_names, _batch_timeout(context)))
+        except Exception as e:
+            logger.error(f"checkStatusBatch error: {str(e)}")
+            return _resp(500, {"error": str(e)})
 
-            return _resp(200, {
-                "status": status,
-                "formattedReady": formatted_ready,
-                "summaryReady": summary_ready,
-                "keys": {
-                    "formatted": formatted_key,
-                    "summary": summary_key
-                }
-            })
+    # ---------------------------
+    # RUTA 1c: waitStatus (long-poll: responde cuando el job cambia)
+    # ---------------------------
+    if 'waitStatus' in body:
+        try:
+            params = body['waitStatus']
+            timeout = _wait_timeout(params.get('timeout'), context)
+            return _resp(200, _wait_status(params['job_name'], params.get('since'), timeout))
         except Exception as e:
-            logger.error(f"checkStatus error: {str(e)}")
+            logger.error(f"waitStatus error: {str(e)}")
             return _resp(500, {"error": str(e)})
 
     # ---------------------------
@@ -92,34 +950,66 @@ def lambda_handler(event, context):
     # ---------------------------
     if 'getResults' in body:
         try:
-            job_name = body['getResults']['job_name']
+            params = body['getResults']
+            job_name = params['job_name']
             # bucketName viene en body pero usamos el oficial del stack por env
-            formatted_key = f"transcripciones-formateadas/{job_name}.txt"
-            summary_key   = f"resumenes/{job_name}_summary.txt"
+            keys = _job_keys(job_name)
+            delivery = params.get('delivery', 'inline')
 
-            transcription = None
-            summary = None
+            # Modo "url": el cliente baja los archivos directo de S3
+            if delivery == 'url':
+                return _resp(200, _result_urls(job_name, keys))
+            if delivery != 'inline':
+                return _resp(400, {"error": f"delivery inválido: {delivery}"})
 
-            try:
-                obj = s3_client.get_object(Bucket=output_bucket, Key=formatted_key)
-                transcription = obj['Body'].read().decode('utf-8')
-            except ClientError:
-                pass
+            gzip_ok = accepts_gzip(event.get('headers'))
 
-            try:
-                obj = s3_client.get_object(Bucket=output_bucket, Key=summary_key)
-                summary = obj['Body'].read().decode('utf-8')
-            except ClientError:
-                pass
+            # Paginado: un tramo de la transcripción (y el resumen en la primera página)
+            if 'maxBytes' in params:
+                offset = int(params.get('offset', 0))
+                max_bytes = int(params['maxBytes'])
+                if offset < 0 or not PAGE_MIN_BYTES <= max_bytes <= PAGE_MAX_BYTES:
+                    return _resp(400, {"error": f"maxBytes debe estar entre {PAGE_MIN_BYTES} y {PAGE_MAX_BYTES}"})
+                # nextCheckpoint de la página anterior (transcripciones comprimidas)
+                checkpoint = params.get('checkpoint')
+                if checkpoint is not None and not (
+                        isinstance(checkpoint, list) and len(checkpoint) == 2
+                        and all(isinstance(n, int) and n >= 0 for n in checkpoint)):
+                    return _resp(400, {"error": "checkpoint debe ser el nextCheckpoint de la página anterior"})
+
+                page = read_page(s3_client, output_bucket, keys["formatted"], offset, max_bytes, checkpoint)
+                return _resp(200, {
+                    "transcription": page["text"] if page else None,
+                    "transcriptionRange": {k: v for k, v in page.items() if k != "text"} if page else None,
+                    "summary": _read_text(keys["summary"]) if offset == 0 else None
+                }, gzip_ok)
 
             return _resp(200, {
-                "transcription": transcription,
-                "summary": summary
-            })
+                "transcription": _read_text(keys["formatted"]),
+                "summary": _read_text(keys["summary"])
+            }, gzip_ok)
         except Exception as e:
             logger.error(f"getResults error: {str(e)}")
             return _resp(500, {"error": str(e)})
 
+    # ---------------------------
+    # RUTA 2b: subida multipart de audios grandes (partes en paralelo con URLs prefirmadas)
+    # ---------------------------
+    route = next((name for name in UPLOAD_ROUTES if name in body), None)
+    if route is not None:
+        try:
+            return _resp(*_upload_route(route, body[route], event, context))
+        except multipart.UploadError as e:
+            return _resp(400, {"error": str(e)})
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'NoSuchUpload':
+                return _resp(404, {"error": "La subida no existe o ya terminó"})
+            logger.error(f"{route} error: {str(e)}")
+            return _resp(500, {"error": str(e)})
+        except Exception as e:
+            logger.error(f"{route} error: {str(e)}")
+            return _resp(500, {"error": str(e)})
+
     # ---------------------------
     # RUTA 3: iniciar transcripción (comportamiento original)
     # ---------------------------
@@ -133,29 +1023,9 @@ def lambda_handler(event, context):
             logger.warning(f"Ignorando archivo no válido: {key}")
             return _resp(400, {"error": "Clave S3 inválida"})
 
-        job_name = f"transcription-job-{uuid.uuid4()}"
-        media_uri = f"s3://{bucketName}/{key}"
-        output_key = f"transcripciones/{job_name}.json"
-
-        transcribe_client.start_transcription_job(
-            TranscriptionJobName=job_name,
-            Media={'MediaFileUri': media_uri},
-            MediaFormat='mp3',
-            LanguageCode=languageCode,
-            OutputBucketName=output_bucket,
-            OutputKey=output_key,
-            Settings={
-                'ShowSpeakerLabels': True,
-                'MaxSpeakerLabels': maxSpeakers
-            }
-        )
-        logger.info(f"Transcripción iniciada para: {media_uri}")
-
-        return _resp(200, {
-            "message": "Transcripción iniciada correctamente.",
-            "jobName": job_name,
-            "outputLocation": f"s3://{output_bucket}/{output_key}"
-        })
+        status_code, payload = _start_job(bucketName, key, languageCode, maxSpeakers,
+                                          body['transcribe'].get('longAudio'), context)
+        return _resp(status_code, payload)
     except Exception as e:
         logger.error(f"Error al iniciar transcripción: {str(e)}")
         return _resp(500, {"error": str(e)})
@@ -0,0 +1,217 @@
+"""
+Corte de MP3 en segmentos sin decodificar el audio (sin ffmpeg).
+
+Un MP3 es una sucesión de frames independientes, cada uno con un header de
+4 bytes que alcanza para calcular su largo y su duración. `scan_frames`
+recorre el archivo como stream (sin cargarlo entero) y `plan_segments`
+agrupa los frames en rangos de bytes contiguos de ~`segment_seconds`, con
+`overlap_seconds` de audio repetido entre segmentos consecutivos.
+
+Cada segmento es la concatenación de sus frames, que también es un MP3
+válido. El primer frame de un segmento puede referenciar datos del frame
+anterior (bit reservoir) y sonar mal unos milisegundos: cae dentro del
+solapamiento, que el stitcher descarta.
+"""
+from array import array
+from collections import namedtuple
+
+Frame = namedtuple("Frame", "offset size duration")
+
+SegmentPlan = namedtuple(
+    "SegmentPlan",
+    "index start_offset end_offset start_time end_time keep_from keep_until",
+)
+
+# Kbps por índice según (versión MPEG 1 o 2/2.5, layer)
+_BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_SAMPLE_RATES = {
+    0b11: [44100, 48000, 32000],  # MPEG 1
+    0b10: [22050, 24000, 16000],  # MPEG 2
+    0b00: [11025, 12000, 8000],   # MPEG 2.5
+}
+
+
+class Mp3FormatError(ValueError):
+    pass
+
+
+def parse_header(header):
+    """(largo en bytes, duración en segundos) del frame, o None si no es un header válido."""
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version_bits = (header[1] >> 3) & 0b11
+    layer_bits = (header[1] >> 1) & 0b11
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0b11
+    padding = (header[2] >> 1) & 1
+    if version_bits == 0b01 or layer_bits == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        # Versión/layer reservados, bitrate libre o inválido
+        return None
+
+    version = 1 if version_bits == 0b11 else 2
+    layer = 4 - layer_bits
+    bitrate = _BITRATES[(version, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version_bits][sample_rate_index]
+
+    if layer == 1:
+        size = (12 * bitrate // sample_rate + padding) * 4
+        samples = 384
+    elif layer == 3 and version == 2:
+        size = 72 * bitrate // sample_rate + padding
+        samples = 576
+    else:
+        size = 144 * bitrate // sample_rate + padding
+        samples = 1152
+    return size, samples / sample_rate
+
+
+def _id3v2_size(data):
+    if len(data) >= 10 and data[:3] == b"ID3":
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        footer = 10 if data[5] & 0x10 else 0
+        return 10 + size + footer
+    return 0
+
+
+def _is_info_frame(frame_bytes):
+    # Frame de metadata de encoders VBR/CBR (Xing/Info/VBRI): no es audio
+    head = bytes(frame_bytes[:64])
+    return b"Xing" in head or b"Info" in head or b"VBRI" in head
+
+
+def scan_frames(stream, chunk_size=1024 * 1024):
+    """
+    Genera los `Frame` de audio de `stream` (file-like con `read`). Saltea el
+    tag ID3v2 inicial, el frame Xing/Info y la basura entre frames; para
+    resincronizar exige dos headers válidos seguidos.
+    """
+    buffer = bytearray()
+    base = 0          # offset en el archivo de buffer[0]
+    position = 0      # offset en el archivo del próximo byte a analizar
+    eof = False
+    first = True
+    synced = False
+
+    def fill(until):
+        nonlocal eof
+        while not eof and base + len(buffer) < until:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                eof = True
+            else:
+                buffer.extend(chunk)
+
+    fill(10)
+    skip = _id3v2_size(buffer)
+    position = skip
+
+    while True:
+        fill(position + 4)
+        if position + 4 > base + len(buffer):
+            return
+        local = position - base
+        parsed = parse_header(buffer[local:local + 4])
+
+        if parsed is not None and not synced:
+            # Confirmamos con el header siguiente antes de aceptar
+            size = parsed[0]
+            fill(position + size + 4)
+            following = buffer[local + size:local + size + 4]
+            if len(following) == 4 and parse_header(following) is None:
+                parsed = None
+            elif len(following) < 4 and position + size > base + len(buffer):
+                return  # frame truncado al final del archivo
+
+        if parsed is None:
+            synced = False
+            position += 1
+        else:
+            size, duration = parsed
+            fill(position + size)
+            if position + size > base + len(buffer):
+                return
+            synced = True
+            if first and _is_info_frame(buffer[local + 4:local + size]):
+                first = False
+            else:
+                first = False
+                yield Frame(position, size, duration)
+            position += size
+
+        # Descartamos lo ya analizado para no acumular el archivo en memoria
+        consumed = position - base
+        if consumed > chunk_size:
+            del buffer[:consumed]
+            base = position
+
+
+def plan_segments(frames, segment_seconds, overlap_seconds):
+    """
+    Agrupa los frames en segmentos de ~`segment_seconds` que arrancan
+    `overlap_seconds` antes del final del anterior. `keep_from`/`keep_until`
+    marcan la ventana (mitad del solapamiento) de la que cada segmento aporta
+    palabras al stitching. Un resto final menor a un cuarto de segmento se
+    suma al último.
+    """
+    if overlap_seconds >= segment_seconds:
+        raise ValueError("El solapamiento tiene que ser menor que el segmento")
+
+    offsets, starts = array("q"), array("d")
+    elapsed = 0.0
+    end_offset = 0
+    for frame in frames:
+        offsets.append(frame.offset)
+        starts.append(elapsed)
+        elapsed += frame.duration
+        end_offset = frame.offset + frame.size
+    if not offsets:
+        raise Mp3FormatError("No se encontraron frames MP3")
+    total = elapsed
+
+    # Límites nominales de cada segmento (sin el solapamiento)
+    bounds = []
+    t = 0.0
+    while t < total:
+        bounds.append(t)
+        t += segment_seconds
+    if len(bounds) > 1 and total - bounds[-1] < segment_seconds / 4:
+        bounds.pop()
+
+    def frame_at(time):
+        # Primer frame que empieza en `time` o después (búsqueda binaria)
+        lo, hi = 0, len(starts)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if starts[mid] < time - 1e-9:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    plans = []
+    for index, nominal in enumerate(bounds):
+        first_frame = frame_at(nominal - overlap_seconds) if index else 0
+        last_frame = frame_at(bounds[index + 1]) if index + 1 < len(bounds) else len(starts)
+        start_time = starts[first_frame]
+        end_time = starts[last_frame] if last_frame < len(starts) else total
+        plans.append([
+            index,
+            offsets[first_frame],
+            offsets[last_frame] if last_frame < len(offsets) else end_offset,
+            start_time,
+            end_time,
+        ])
+
+    result = []
+    for index, plan in enumerate(plans):
+        keep_from = 0.0 if index == 0 else (plan[3] + plans[index - 1][4]) / 2
+        keep_until = float("inf") if index + 1 == len(plans) else (plans[index + 1][3] + plan[4]) / 2
+        result.append(SegmentPlan(*plan, keep_from, keep_until))
+    return result
@@ -0,0 +1,85 @@
+"""
+Subida multipart de audios grandes con URLs prefirmadas.
+
+El navegador sube las partes en paralelo (un PUT por URL) y después pide
+completar la subida. S3 exige partes de al menos 5 MiB (salvo la última) y
+como mucho 10.000 partes: `plan_parts` elige el tamaño de parte según el
+tamaño del archivo.
+
+Para completar se necesitan los ETag de cada parte; si el cliente no los
+manda (o no puede leer el header), se piden a S3 con ListParts.
+"""
+import math
+
+MIN_PART_BYTES = 5 * 1024 * 1024
+MAX_PARTS = 10000
+
+
+class UploadError(ValueError):
+    pass
+
+
+def plan_parts(size, part_bytes):
+    """(tamaño de parte, cantidad de partes) para un archivo de `size` bytes."""
+    if size <= 0:
+        raise UploadError("El tamaño del archivo tiene que ser positivo")
+    part_bytes = max(part_bytes, MIN_PART_BYTES, math.ceil(size / MAX_PARTS))
+    return part_bytes, max(1, math.ceil(size / part_bytes))
+
+
+def initiate(client, bucket, key, content_type):
+    response = client.create_multipart_upload(Bucket=bucket, Key=key, ContentType=content_type)
+    return response["UploadId"]
+
+
+def part_urls(client, bucket, key, upload_id, part_numbers, expires_in):
+    for number in part_numbers:
+        if not isinstance(number, int) or not 1 <= number <= MAX_PARTS:
+            raise UploadError(f"Número de parte inválido: {number}")
+    return [
+        {
+            "partNumber": number,
+            "url": client.generate_presigned_url(
+                "upload_part",
+                Params={"Bucket": bucket, "Key": key, "UploadId": upload_id, "PartNumber": number},
+                ExpiresIn=expires_in,
+            ),
+        }
+        for number in part_numbers
+    ]
+
+
+def uploaded_parts(client, bucket, key, upload_id):
+    """Partes ya subidas según S3, paginando ListParts."""
+    parts, kwargs = [], {"Bucket": bucket, "Key": key, "UploadId": upload_id}
+    while True:
+        page = client.list_parts(**kwargs)
+        parts.extend({"PartNumber": p["PartNumber"], "ETag": p["ETag"]} for p in page.get("Parts", []))
+        if not page.get("IsTruncated"):
+            return parts
+        kwargs["PartNumberMarker"] = page["NextPartNumberMarker"]
+
+
+def complete(client, bucket, key, upload_id, parts=None):
+    """
+    Completa la subida. `parts`: [{"partNumber", "etag"}] del cliente, o
+    None para usar las que S3 tiene registradas.
+    """
+    if parts is None:
+        parts = uploaded_parts(client, bucket, key, upload_id)
+    else:
+        parts = [{"PartNumber": int(p["partNumber"]), "ETag": p["etag"]} for p in parts]
+    if not parts:
+        raise UploadError("No hay partes subidas")
+    parts.sort(key=lambda p: p["PartNumber"])
+    if len({p["PartNumber"] for p in parts}) != len(parts):
+        raise UploadError("Hay partes repetidas")
+
+    response = client.complete_multipart_upload(
+        Bucket=bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+    )
+    return {"etag": response.get("ETag"), "parts": len(parts)}
+
+
+def abort(client, bucket, key, upload_id):
+    client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
@@ -0,0 +1,194 @@
+"""
+Formas de entregar los resultados en `getResults`.
+
+- URLs prefirmadas: el cliente baja los archivos directo de S3, sin pasar
+  por la Lambda ni por el límite de payload de API Gateway. S3 acepta el
+  header `Range` sobre esas URLs.
+- Inline comprimido: el JSON se devuelve como `application/gzip` cuando el
+  cliente lo pide con `Accept: application/gzip`. Es el único tipo binario
+  de la API: API Gateway decide por el primer tipo del Accept si convierte
+  el body en base64 a binario, y los pedidos JSON siguen llegando como texto.
+- Páginas: un rango de bytes de la transcripción, cortado en un límite de
+  línea o de carácter UTF-8, con el offset para pedir la siguiente.
+
+Si la transcripción se guardó comprimida (ARTIFACT_ENCODING), la URL
+prefirmada la sirve con su Content-Encoding y el cliente HTTP la
+descomprime solo; un `Range` sobre esa URL cuenta bytes comprimidos. Las
+páginas siguen contando offsets sobre el texto sin comprimir y devuelven
+`nextCheckpoint`, el inicio del bloque comprimido donde seguir, para que la
+página siguiente no descomprima el objeto desde el principio.
+"""
+import base64
+import gzip
+import logging
+
+from botocore.exceptions import ClientError
+
+from comun import compresion
+
+logger = logging.getLogger()
+
+# Debe coincidir con binary_media_types de la API
+GZIP_MEDIA_TYPE = "application/gzip"
+READ_CHUNK = 64 * 1024
+
+
+def accepts_gzip(headers):
+    """Si el primer tipo del header Accept es application/gzip (el que mira API Gateway)."""
+    for name, value in (headers or {}).items():
+        if name.lower() != "accept" or not value:
+            continue
+        media_type, _, params = value.split(",")[0].partition(";")
+        # "application/gzip;q=0" es un rechazo explícito
+        return media_type.strip().lower() == GZIP_MEDIA_TYPE and params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+def gzip_base64(text):
+    """Body para API Gateway con isBase64Encoded=True."""
+    return base64.b64encode(gzip.compress(text.encode("utf-8"), compresslevel=6)).decode("ascii")
+
+
+def presigned_url(client, bucket, key, expires_in):
+    return client.generate_presigned_url(
+        "get_object",
+        Params={"Bucket": bucket, "Key": key},
+        ExpiresIn=expires_in,
+    )
+
+
+def _cut(data, at_end):
+    """
+    Cuánto de `data` entregar: hasta el último salto de línea si está en la
+    segunda mitad; si no, hasta el último carácter UTF-8 completo.
+    """
+    if at_end:
+        return len(data)
+    newline = data.rfind(b"\n")
+    if newline >= len(data) // 2:
+        return newline + 1
+    end = len(data)
+    # Retrocede sobre los bytes de continuación (10xxxxxx) del último carácter
+    start = end - 1
+    while start > 0 and end - start < 4 and data[start] & 0xC0 == 0x80:
+        start -= 1
+    lead = data[start]
+    length = 1 if lead < 0x80 else 2 if lead >> 5 == 0b110 else 3 if lead >> 4 == 0b1110 else 4
+    return end if end - start >= length else start
+
+
+def read_page(client, bucket, key, offset, max_bytes, checkpoint=None):
+    """
+    Lee hasta `max_bytes` desde `offset`. Devuelve {"text", "offset",
+    "nextOffset", "totalBytes", "nextCheckpoint"} (nextOffset None en la
+    última página; nextCheckpoint sólo en objetos comprimidos) o None si el
+    objeto no existe. `checkpoint` es el nextCheckpoint de la página anterior.
+    """
+    try:
+        obj = client.get_object(Bucket=bucket, Key=key, Range=f"bytes={offset}-{offset + max_bytes - 1}")
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "InvalidRange":
+            return None
+        # Offset en el final (o más allá) de un objeto que existe; si está
+        # comprimido, el offset es del texto y puede seguir siendo válido
+        if not compresion.encoding_of(client.head_object(Bucket=bucket, Key=key)):
+            return {"text": "", "offset": offset, "nextOffset": None, "totalBytes": None, "nextCheckpoint": None}
+        return _read_encoded_page(client, bucket, key, offset, max_bytes, checkpoint)
+
+    if compresion.encoding_of(obj):
+        # El rango se aplicó sobre los bytes comprimidos: se descarta
+        obj["Body"].close()
+        return _read_encoded_page(client, bucket, key, offset, max_bytes, checkpoint)
+
+    data = obj["Body"].read()
+    total = int(obj["ContentRange"].rsplit("/", 1)[1]) if "ContentRange" in obj else offset + len(data)
+    return _page(data, offset, total)
+
+
+def _read_encoded_page(client, bucket, key, offset, max_bytes, checkpoint=None):
+    """
+    Página de un objeto comprimido. Se descomprime en streaming desde el
+    bloque de `checkpoint` ([byte comprimido, byte del texto] donde empieza
+    un miembro gzip / frame zstd, el `nextCheckpoint` de la página anterior)
+    o, sin checkpoint, desde el principio; se saltean los bytes hasta
+    `offset` y se lee uno de más para saber si es la última. Un checkpoint
+    que no cae en un inicio de bloque se descarta y se empieza de cero.
+    """
+    if checkpoint is not None and checkpoint[0] > 0 and checkpoint[1] <= offset:
+        try:
+            return _read_blocks(client, bucket, key, offset, max_bytes, *checkpoint)
+        except Exception as e:
+            logger.warning(f"Checkpoint {checkpoint} inválido para {key}, se lee desde el principio: {str(e)}")
+    try:
+        return _read_blocks(client, bucket, key, offset, max_bytes, 0, 0)
+    except ClientError:
+        return None
+
+
+def _inflate(body, encoding, compressed, position):
+    """
+    Descomprime `body` bloque por bloque. Genera ((byte comprimido, byte del
+    texto) del bloque, posición en el texto, bytes) para cada tramo.
+    """
+    decoder = compresion.decompressor(encoding)
+    block = (compressed, position)
+    for chunk in iter(lambda: body.read(READ_CHUNK), b""):
+        while chunk:
+            data = decoder.decompress(chunk)
+            if data:
+                yield block, position, data
+                position += len(data)
+            if not decoder.eof:
+                compressed += len(chunk)
+                break
+            # Fin del miembro: lo que sobra del chunk es el principio del siguiente
+            rest = decoder.unused_data
+            compressed += len(chunk) - len(rest)
+            block = (compressed, position)
+            decoder = compresion.decompressor(encoding)
+            chunk = rest
+
+
+def _read_blocks(client, bucket, key, offset, max_bytes, compressed, position):
+    args = {"Range": f"bytes={compressed}-"} if compressed else {}
+    obj = client.get_object(Bucket=bucket, Key=key, **args)
+    wanted = offset + max_bytes + 1
+    data = bytearray()
+    blocks = []
+    end = position
+    try:
+        for block, start, piece in _inflate(obj["Body"], compresion.encoding_of(obj), compressed, position):
+            if not blocks or blocks[-1] != block:
+                blocks.append(block)
+            end = start + len(piece)
+            if end > offset:
+                data += piece[max(offset - start, 0):wanted - start]
+            if end >= wanted:
+                break
+    finally:
+        obj["Body"].close()
+
+    if end <= offset:
+        return {"text": "", "offset": offset, "nextOffset": None, "totalBytes": end, "nextCheckpoint": None}
+    if len(data) > max_bytes:
+        data = data[:max_bytes]
+        total = compresion.uncompressed_size(obj)
+    else:
+        total = end
+    page = _page(bytes(data), offset, total)
+    if page["nextOffset"] is not None:
+        # El último bloque que empieza antes de la página siguiente
+        page["nextCheckpoint"] = list(max(b for b in blocks if b[1] <= page["nextOffset"]))
+    return page
+
+
+def _page(data, offset, total):
+    at_end = total is not None and offset + len(data) >= total
+    consumed = _cut(data, at_end)
+    return {
+        "text": data[:consumed].decode("utf-8"),
+        "offset": offset,
+        "nextOffset": None if at_end and consumed == len(data) else offset + consumed,
+        "totalBytes": total,
+        "nextCheckpoint": None,
+    }
@@ -0,0 +1,150 @@
+"""
+Une las transcripciones de los segmentos de un audio largo en un único JSON
+con el formato de Transcribe (el que lee formatear).
+
+- Tiempos: cada segmento empieza en 0, se les suma su `start_time`.
+- Solapamiento: cada segmento aporta sólo las palabras que empiezan dentro
+  de su ventana [`keep_from`, `keep_until`), que corta a la mitad el audio
+  repetido con los vecinos. La puntuación sigue a la palabra anterior.
+- Hablantes: Transcribe numera spk_0, spk_1... por segmento. En el audio
+  solapado los dos segmentos escucharon lo mismo, así que cada etiqueta
+  local se asigna a la etiqueta global con la que más tiempo coincide; las
+  que no coinciden con ninguna pasan a ser hablantes nuevos.
+"""
+
+
+def _seconds(value):
+    return float(value)
+
+
+def _fmt(seconds):
+    return f"{seconds:.3f}"
+
+
+def _overlap(a_start, a_end, b_start, b_end):
+    return max(0.0, min(a_end, b_end) - max(a_start, b_start))
+
+
+def _rebased_turns(results, offset):
+    """Turnos de hablante (inicio, fin, etiqueta local) en tiempo del audio completo."""
+    return [
+        (_seconds(seg["start_time"]) + offset, _seconds(seg["end_time"]) + offset, seg["speaker_label"])
+        for seg in results.get("speaker_labels", {}).get("segments", [])
+    ]
+
+
+def _match_speakers(previous_turns, turns, window, next_label):
+    """
+    Asigna etiquetas globales a las locales de un segmento. `previous_turns`
+    ya tienen etiqueta global; se compara sólo dentro de `window`.
+    """
+    w_start, w_end = window
+    shared = {}
+    for p_start, p_end, p_label in previous_turns:
+        p_start, p_end = max(p_start, w_start), min(p_end, w_end)
+        if p_end <= p_start:
+            continue
+        for start, end, label in turns:
+            common = _overlap(p_start, p_end, start, end)
+            if common > 0:
+                shared[(label, p_label)] = shared.get((label, p_label), 0.0) + common
+
+    mapping, used = {}, set()
+    for (label, global_label), _ in sorted(shared.items(), key=lambda kv: -kv[1]):
+        if label not in mapping and global_label not in used:
+            mapping[label] = global_label
+            used.add(global_label)
+
+    for _, _, label in turns:
+        if label not in mapping:
+            mapping[label] = f"spk_{next_label}"
+            next_label += 1
+    return mapping, next_label
+
+
+def stitch(parts, job_name):
+    """
+    `parts`: lista ordenada de dicts con "start_time", "end_time",
+    "keep_from", "keep_until" (segundos en el audio completo) y "transcript"
+    (el JSON de Transcribe del segmento). Devuelve el JSON unido.
+    """
+    items, segments, words = [], [], []
+    next_label = 0
+    previous_turns, previous_end = [], None
+
+    for part in parts:
+        offset = part["start_time"]
+        keep_from, keep_until = part["keep_from"], part["keep_until"]
+        results = part["transcript"]["results"]
+
+        turns = _rebased_turns(results, offset)
+        window = (offset, previous_end if previous_end is not None else offset)
+        mapping, next_label = _match_speakers(previous_turns, turns, window, next_label)
+        previous_turns = [(start, end, mapping[label]) for start, end, label in turns]
+        previous_end = part["end_time"]
+
+        kept = False
+        for item in results.get("items", []):
+            if item.get("type") == "punctuation" or "start_time" not in item:
+                if not kept:
+                    continue
+                new_item = dict(item)
+            else:
+                start = _seconds(item["start_time"]) + offset
+                kept = keep_from <= start < keep_until
+                if not kept:
+                    continue
+                new_item = dict(item, start_time=_fmt(start), end_time=_fmt(_seconds(item["end_time"]) + offset))
+            if "speaker_label" in new_item:
+                label = new_item["speaker_label"]
+                if label not in mapping:
+                    # Etiqueta que sólo aparece en los items (sin turno en speaker_labels)
+                    mapping[label] = f"spk_{next_label}"
+                    next_label += 1
+                new_item["speaker_label"] = mapping[label]
+            if "id" in new_item:
+                new_item["id"] = len(items)
+            items.append(new_item)
+
+            content = new_item["alternatives"][0]["content"]
+            if new_item.get("type") == "punctuation" and words:
+                words[-1] += content
+            else:
+                words.append(content)
+
+        for start, end, label in previous_turns:
+            start, end = max(start, keep_from), min(end, keep_until)
+            if end <= start:
+                continue
+            segments.append({
+                "start_time": _fmt(start),
+                "end_time": _fmt(end),
+                "speaker_label": label,
+                "items": [],
+            })
+
+    # Los items de cada turno se completan en una sola pasada (ambos están ordenados por tiempo)
+    timed = [item for item in items if "start_time" in item]
+    position = 0
+    for segment in segments:
+        start, end = _seconds(segment["start_time"]), _seconds(segment["end_time"])
+        while position < len(timed) and _seconds(timed[position]["start_time"]) < start:
+            position += 1
+        cursor = position
+        while cursor < len(timed) and _seconds(timed[cursor]["start_time"]) < end:
+            segment["items"].append({
+                "start_time": timed[cursor]["start_time"],
+                "end_time": timed[cursor]["end_time"],
+                "speaker_label": segment["speaker_label"],
+            })
+            cursor += 1
+
+    return {
+        "jobName": job_name,
+        "status": "COMPLETED",
+        "results": {
+            "transcripts": [{"transcript": " ".join(words)}],
+            "speaker_labels": {"speakers": next_label, "segments": segments},
+            "items": items,
+        },
+    }
@@ -0,0 +1,79 @@
+import hashlib
+import io
+import threading
+
+import pytest
+from botocore.exceptions import ClientError
+
+
+class FakeS3:
+    """
+    S3 en memoria con lo que usan las lambdas: get/put/head/delete y la
+    subida multipart. `objects` es {key: bytes} (el bucket no importa);
+    `content_types`, `metadata`, `heads`, `aborted` y `max_concurrent_parts`
+    quedan para las aserciones.
+    """
+
+    def __init__(self, objects=None):
+        self.objects = {} if objects is None else objects
+        self.content_types = {}
+        self.metadata = {}
+        self.heads = 0
+        self.uploads = {}
+        self._upload_ids = 0
+        self.aborted = []
+        self.max_concurrent_parts = 0
+        self._concurrent = 0
+        self._lock = threading.Lock()
+
+    def get_object(self, Bucket, Key, **kwargs):
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": Key}}, "GetObject")
+        return {"Body": io.BytesIO(self.objects[Key]), "Metadata": self.metadata.get(Key, {})}
+
+    def head_object(self, Bucket, Key):
+        self.heads += 1
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "404", "Message": Key}}, "HeadObject")
+        return {"ETag": f'"{hashlib.md5(self.objects[Key]).hexdigest()}"'}
+
+    def put_object(self, Bucket, Key, Body, ContentType=None, Metadata=None, **kwargs):
+        self.objects[Key] = Body
+        self.content_types[Key] = ContentType
+        self.metadata[Key] = Metadata or {}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop(Key, None)
+
+    def create_multipart_upload(self, Bucket, Key, ContentType=None, **kwargs):
+        upload_id = f"upload-{self._upload_ids}"
+        self._upload_ids += 1
+        self.uploads[upload_id] = {}
+        self.content_types[Key] = ContentType
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        with self._lock:
+            self._concurrent += 1
+            self.max_concurrent_parts = max(self.max_concurrent_parts, self._concurrent)
+        try:
+            self.uploads[UploadId][PartNumber] = Body
+            return {"ETag": f'"etag-{PartNumber}"'}
+        finally:
+            with self._lock:
+                self._concurrent -= 1
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)
+        numbers = [p["PartNumber"] for p in MultipartUpload["Parts"]]
+        assert numbers == sorted(parts)
+        self.objects[Key] = b"".join(parts[n] for n in numbers)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.aborted.append(UploadId)
+        self.uploads.pop(UploadId, None)
+
+
+@pytest.fixture
+def s3():
+    return FakeS3()
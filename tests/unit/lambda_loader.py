@@ -0,0 +1,33 @@
+import importlib.util
+import os
+import sys
+from pathlib import Path
+
+LAMBDA_DIR = Path(__file__).resolve().parents[2] / "lambda"
+
+# La Lambda Layer compartida se monta en /opt/python; en los tests va al path
+COMUN_DIR = LAMBDA_DIR / "comun" / "python"
+if str(COMUN_DIR) not in sys.path:
+    sys.path.insert(0, str(COMUN_DIR))
+
+# Variables que las Lambdas leen al importarse
+os.environ.setdefault("BUCKET", "bucket-de-pruebas")
+os.environ.setdefault("AWS_REGION", "us-east-1")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+
+def load_lambda(name):
+    """Carga lambda/<name>/lambda_function.py como un módulo independiente."""
+    module_name = f"{name}_lambda_function"
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    path = LAMBDA_DIR / name
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+    spec = importlib.util.spec_from_file_location(module_name, path / "lambda_function.py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,65 @@
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.bench_arranque import measure
+from tests.unit.lambda_loader import load_lambda
+
+load_lambda("transcribir")  # agrega la capa al sys.path
+
+from comun import clientes  # noqa: E402
+
+
+@pytest.fixture
+def fresh(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.delenv("AWS_LAMBDA_INITIALIZATION_TYPE", raising=False)
+    clientes.reset()
+    yield clientes
+    clientes.reset()
+
+
+def test_lazy_client_is_created_on_first_use_and_cached(fresh):
+    proxy = fresh.lazy("s3", region_name="us-east-1")
+    assert fresh.created() == []
+
+    assert proxy.meta.service_model.service_name == "s3"
+    assert fresh.created() == ["s3"]
+    assert fresh.client("s3", "us-east-1") is fresh.client("s3", "us-east-1")
+
+
+def test_base_config_and_per_client_overrides(fresh):
+    config = fresh.client("s3", "us-east-1").meta.config
+    assert config.connect_timeout == fresh.CONNECT_TIMEOUT and config.read_timeout == fresh.READ_TIMEOUT
+    assert config.max_pool_connections == fresh.MAX_POOL and config.tcp_keepalive
+    assert config.retries["mode"] == fresh.RETRY_MODE
+
+    bedrock = fresh.client("bedrock-runtime", "us-east-1", read_timeout=300, retries={"max_attempts": 1})
+    assert bedrock.meta.config.read_timeout == 300
+    assert bedrock.meta.config.connect_timeout == fresh.CONNECT_TIMEOUT
+
+
+def test_reset_recreates_clients(fresh):
+    before = fresh.client("s3", "us-east-1")
+    fresh.reset()
+    assert fresh.created() == []
+    assert fresh.client("s3", "us-east-1") is not before
+
+
+def test_prepare_depends_on_initialization_type(fresh, monkeypatch):
+    proxy = fresh.lazy("s3", region_name="us-east-1")
+    assert fresh.prepare(proxy) is False and fresh.created() == []
+
+    restored = []
+    monkeypatch.setitem(sys.modules, "snapshot_restore_py", SimpleNamespace(register_after_restore=restored.append))
+    monkeypatch.setenv("AWS_LAMBDA_INITIALIZATION_TYPE", "snap-start")
+    assert fresh.prepare(proxy) is True and fresh.created() == ["s3"]
+    assert restored == [fresh.reset]
+
+
+@pytest.mark.parametrize("handler", ["transcribir", "formatear", "resumir"])
+def test_handlers_create_no_clients_until_a_route_needs_them(handler):
+    assert measure(handler)["created"] == []
+    assert measure(handler, initialized=True)["created"] != []
@@ -0,0 +1,204 @@
+import io
+import json
+import math
+import tracemalloc
+
+import pytest
+
+from benchmarks.transcribe_sintetico import from_profile
+from tests.unit.lambda_loader import load_lambda
+from tests.unit.test_comun_compresion import EncodedS3
+
+formatear = load_lambda("formatear")
+
+from comun import columnas, estado, formato, s3_multipart  # noqa: E402
+from comun.columnas import ColumnBuilder, Columns  # noqa: E402
+
+RAW = from_profile("reunion", 5)
+
+
+def _build(raw=RAW):
+    builder = ColumnBuilder()
+    text = "".join(formato.format_transcript(io.BytesIO(raw), columns=builder))
+    return text, builder.to_bytes()
+
+
+def _words(raw=RAW):
+    return [i for i in json.loads(raw)["results"]["items"] if i["type"] == "pronunciation"]
+
+
+def test_columns_rebuild_the_formatted_text():
+    text, data = _build()
+    cols = Columns(data)
+
+    assert len(cols) == len(_words())
+    assert set(cols.speakers) == {f"spk_{n}" for n in range(6)}
+    # Mismos turnos y palabras; en las columnas la puntuación va pegada a la palabra ("en, una")
+    # y en el .txt detrás del espacio ("en ,una")
+    rebuilt = "\n\n".join(f"{speaker}: {cols.span(i, j)}" for speaker, i, j in cols.turns())
+    assert "".join(rebuilt.split()) == "".join(text.split())
+    assert cols.token(0) == cols.span(0, 1) and " " not in cols.token(len(cols) - 1)
+
+
+def test_times_and_confidences_match_the_json():
+    _, data = _build()
+    cols = Columns(data)
+
+    for i, word in enumerate(_words()):
+        assert abs(cols.start[i] - float(word["start_time"])) < 0.004
+        assert abs(cols.end[i] - float(word["end_time"])) < 0.004
+        assert abs(cols.confidence[i] - float(word["alternatives"][0]["confidence"])) < 1e-6
+        assert cols.token(i).startswith(word["alternatives"][0]["content"])
+
+
+def test_time_range_and_turns_slice_without_parsing():
+    _, data = _build()
+    cols = Columns(data)
+
+    i, j = cols.time_range(60, 120)
+    assert all(60 <= cols.start[k] < 120 for k in range(i, j))
+    assert cols.start[i - 1] < 60 and cols.start[j] >= 120
+    # Tramos por hablante dentro del rango: contiguos y sin dos seguidos del mismo hablante
+    turns = list(cols.turns(i, j))
+    assert turns[0][1] == i and turns[-1][2] == j
+    assert all(a[2] == b[1] and a[0] != b[0] for a, b in zip(turns, turns[1:]))
+    assert all(cols.speaker_of(k) == speaker for speaker, start, end in turns for k in range(start, end))
+
+
+def test_views_share_the_buffer(tmp_path):
+    _, data = _build()
+    cols = Columns(data)
+    assert cols.start.obj is data and cols.text.obj is data
+
+    path = tmp_path / "job.cols"
+    path.write_bytes(data)
+    mapped = columnas.load_file(path)
+    assert mapped.span(0, len(mapped)) == cols.span(0, len(cols))
+
+
+def test_numpy_arrays_are_views():
+    np = pytest.importorskip("numpy")
+    _, data = _build()
+    arrays = Columns(data).numpy()
+
+    assert not arrays["start"].flags.owndata and arrays["start"].dtype == np.float32
+    assert len(arrays["offsets"]) == len(_words()) + 1
+
+
+def test_missing_values_and_bad_input():
+    builder = ColumnBuilder()
+    builder.add_punctuation(".")  # sin palabra previa se descarta
+    builder.add_word({"alternatives": [{"content": "ñandú"}]}, None)
+    builder.add_punctuation("?")
+    cols = Columns(builder.to_bytes())
+
+    assert cols.token(0) == "ñandú?" and cols.speakers == [None]
+    assert math.isnan(cols.start[0]) and math.isnan(cols.confidence[0])
+    with pytest.raises(ValueError):
+        Columns(b"no es un .cols")
+
+
+def test_speaker_column_holds_more_than_256_speakers():
+    builder = ColumnBuilder()
+    for n in range(300):
+        builder.add_word({"start_time": str(n), "alternatives": [{"content": f"w{n}"}]}, f"spk_{n}")
+    cols = Columns(builder.to_bytes())
+
+    assert cols.header["columns"]["speaker"]["type"] == "H"
+    assert [cols.speaker_of(i) for i in (0, 255, 256, 299)] == ["spk_0", "spk_255", "spk_256", "spk_299"]
+    assert cols.token(299) == "w299"
+
+
+def test_spilled_blocks_match_a_single_block(tmp_path):
+    _, data = _build()
+    builder = ColumnBuilder(block_words=7, spill_dir=tmp_path)
+    "".join(formato.format_transcript(io.BytesIO(RAW), columns=builder))
+    assert builder._files is not None  # pasó por los archivos temporales
+
+    # Mismo archivo, también con la puntuación que llega justo después del fin de un bloque
+    assert builder.to_bytes() == data
+    builder.close()
+
+
+def _columns_peak(minutes):
+    """Pico de memoria asignada de formatear con columnas y escribir el .cols (sin guardarlo)."""
+    raw = from_profile("reunion", minutes)
+    tracemalloc.start()
+    try:
+        builder = ColumnBuilder()
+        for _ in formato.format_transcript(io.BytesIO(raw), columns=builder):
+            pass
+        written = []
+        builder.write_to(lambda chunk: written.append(len(chunk)))
+        builder.close()
+        return tracemalloc.get_traced_memory()[1], sum(written)
+    finally:
+        tracemalloc.stop()
+
+
+def test_columns_memory_does_not_grow_with_the_transcript(monkeypatch):
+    # Bloques chicos para que los dos largos pasen por los archivos temporales
+    monkeypatch.setattr(columnas, "BLOCK_WORDS", 1024)
+    short_peak, short_bytes = _columns_peak(30)
+    long_peak, long_bytes = _columns_peak(240)
+
+    assert long_bytes > 6 * short_bytes
+    # Las columnas esperan en archivos temporales: el pico es de un bloque, no del audio
+    assert long_peak < 1.5 * short_peak + 1024 * 1024
+
+
+def test_format_object_writes_the_columns_next_to_the_text(monkeypatch, s3):
+    s3.objects["transcripciones/job.json"] = RAW
+    store = estado.MemoryJobStateStore()
+
+    formato.format_object(s3, store, "bucket", "transcripciones/job.json")
+
+    data = s3.objects["transcripciones-columnas/job.cols"]
+    assert s3.content_types["transcripciones-columnas/job.cols"] == "application/octet-stream"
+    assert len(Columns(data)) == len(_words())
+    assert store.get("job")["stages"][estado.FORMATEAR]["columns"] == "transcripciones-columnas/job.cols"
+
+    monkeypatch.setattr(formato, "COLUMNAR", False)
+    s3.objects = {"transcripciones/job-2.json": RAW}
+    formato.format_object(s3, None, "bucket", "transcripciones/job-2.json")
+    assert sorted(s3.objects) == ["transcripciones-formateadas/job-2.txt", "transcripciones/job-2.json"]
+
+
+def test_failed_formatting_removes_the_spill_files(monkeypatch, s3):
+    builders = []
+
+    class TrackedBuilder(ColumnBuilder):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.spilled = []
+            builders.append(self)
+
+        def _spill(self, block):
+            super()._spill(block)
+            self.spilled = list(self._files.values())
+
+    monkeypatch.setattr(columnas, "BLOCK_WORDS", 100)
+    monkeypatch.setattr(columnas, "ColumnBuilder", TrackedBuilder)
+    # JSON cortado: el parseo falla después de haber pasado bloques a disco
+    s3.objects["transcripciones/job.json"] = RAW[:len(RAW) // 2]
+
+    with pytest.raises(Exception):
+        formato.format_object(s3, None, "bucket", "transcripciones/job.json")
+
+    assert len(builders) == 1 and builders[0].spilled
+    assert all(spill.closed for spill in builders[0].spilled)
+
+
+def test_large_columns_are_uploaded_in_parts(monkeypatch):
+    monkeypatch.setattr(s3_multipart, "MIN_PART_SIZE", 1024)
+    monkeypatch.setattr(columnas, "BLOCK_WORDS", 100)
+    s3 = EncodedS3()
+    s3.objects["transcripciones/job.json"] = RAW
+    uploads = []
+    create = s3.create_multipart_upload
+    monkeypatch.setattr(s3, "create_multipart_upload", lambda **kw: uploads.append(kw["Key"]) or create(**kw))
+
+    formato.format_object(s3, None, "bucket", "transcripciones/job.json", part_size=4096)
+
+    assert "transcripciones-columnas/job.cols" in uploads
+    assert s3.objects["transcripciones-columnas/job.cols"] == _build()[1]
@@ -0,0 +1,253 @@
+import io
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+from tests.unit.lambda_loader import load_lambda
+from tests.unit.test_resumir_map_reduce import FakeBedrock
+
+formatear = load_lambda("formatear")
+resumir = load_lambda("resumir")
+transcribir = load_lambda("transcribir")
+
+from comun import compresion, s3_multipart  # noqa: E402
+from comun.s3_multipart import MultipartWriter  # noqa: E402
+from results_delivery import read_page  # noqa: E402
+from retries import RateLimiter  # noqa: E402
+
+
+class EncodedS3:
+    """Fake de S3 que guarda el Content-Encoding y la metadata y aplica Range sobre los bytes guardados."""
+
+    def __init__(self):
+        self.objects = {}
+        self.headers = {}
+        self.uploads = {}
+
+    def put(self, key, text, encoding, metadata=True):
+        data = text.encode("utf-8")
+        args = compresion.put_args(encoding, len(data) if metadata else None)
+        self.put_object(Bucket="bucket", Key=key, Body=compresion.compress(data, encoding), **args)
+
+    def get_object(self, Bucket, Key, Range=None):
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": ""}}, "GetObject")
+        data = self.objects[Key]
+        response = dict(self.headers.get(Key, {}))
+        if Range is not None:
+            start, _, end = Range[len("bytes="):].partition("-")
+            start, end = int(start), int(end or len(data) - 1)
+            if start >= len(data):
+                raise ClientError({"Error": {"Code": "InvalidRange", "Message": ""}}, "GetObject")
+            end = min(end, len(data) - 1)
+            response["ContentRange"] = f"bytes {start}-{end}/{len(data)}"
+            data = data[start:end + 1]
+        return {**response, "Body": io.BytesIO(data), "ContentLength": len(data)}
+
+    def head_object(self, Bucket, Key):
+        return {**self.headers.get(Key, {}), "ContentLength": len(self.objects[Key])}
+
+    def put_object(self, Bucket, Key, Body, ContentType=None, **kwargs):
+        self.objects[Key] = bytes(Body)
+        self.headers[Key] = kwargs
+
+    def create_multipart_upload(self, Bucket, Key, ContentType=None, **kwargs):
+        upload_id = f"upload-{len(self.uploads)}"
+        self.uploads[upload_id] = ({}, kwargs)
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.uploads[UploadId][0][PartNumber] = Body
+        return {"ETag": f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts, kwargs = self.uploads.pop(UploadId)
+        self.put_object(Bucket, Key, b"".join(parts[p["PartNumber"]] for p in MultipartUpload["Parts"]), **kwargs)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(UploadId, None)
+
+
+@pytest.fixture(params=[compresion.GZIP, compresion.ZSTD])
+def encoding(request):
+    if request.param == compresion.ZSTD:
+        pytest.importorskip("zstandard")
+    return request.param
+
+
+TEXT = "\n\n".join(f"spk_{i % 3}: Señoría, acción número {i} — año 2025 ✓." for i in range(3000))
+
+
+def _write(s3, key, chunks, encoding, **kwargs):
+    with MultipartWriter(s3, "bucket", key, content_encoding=encoding, **kwargs) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+    return writer
+
+
+def test_small_artifact_is_one_compressed_put(encoding):
+    s3 = EncodedS3()
+    writer = _write(s3, "transcripciones-formateadas/job.txt", TEXT.splitlines(keepends=True), encoding)
+
+    stored = s3.objects["transcripciones-formateadas/job.txt"]
+    assert len(stored) < len(TEXT.encode("utf-8")) // 3
+    assert s3.headers["transcripciones-formateadas/job.txt"] == {
+        "ContentEncoding": encoding, "Metadata": {"uncompressed-bytes": str(len(TEXT.encode("utf-8")))},
+    }
+    assert (writer.bytes_written, writer.raw_bytes) == (len(stored), len(TEXT.encode("utf-8")))
+    response = s3.get_object(Bucket="bucket", Key="transcripciones-formateadas/job.txt")
+    assert compresion.read_bytes(response).decode("utf-8") == TEXT
+
+
+def test_large_artifact_is_compressed_across_parts(encoding, monkeypatch):
+    # Partes chicas para no tener que comprimir decenas de MiB
+    monkeypatch.setattr(s3_multipart, "MIN_PART_SIZE", 1024)
+    monkeypatch.setattr(s3_multipart, "COMPRESS_CHUNK", 4096)
+    s3 = EncodedS3()
+    text = TEXT * 4
+    _write(s3, "transcripciones-formateadas/job.txt", text.splitlines(keepends=True), encoding, part_size=2048)
+
+    assert not s3.uploads
+    # Con multipart el tamaño sin comprimir no se conoce al crear la subida
+    assert s3.headers["transcripciones-formateadas/job.txt"] == {"ContentEncoding": encoding}
+    response = s3.get_object(Bucket="bucket", Key="transcripciones-formateadas/job.txt")
+    assert compresion.uncompressed_size(response) is None
+    assert compresion.read_bytes(response).decode("utf-8") == text
+
+
+def test_without_encoding_nothing_changes():
+    s3 = EncodedS3()
+    _write(s3, "transcripciones-formateadas/job.txt", [TEXT], "")
+
+    assert s3.objects["transcripciones-formateadas/job.txt"] == TEXT.encode("utf-8")
+    assert s3.headers["transcripciones-formateadas/job.txt"] == {}
+    response = s3.get_object(Bucket="bucket", Key="transcripciones-formateadas/job.txt")
+    assert compresion.open_body(response) is response["Body"]
+
+
+def _transcript(words):
+    items = [{"start_time": str(i), "end_time": str(i + 0.5), "type": "pronunciation",
+              "alternatives": [{"content": word}]} for i, word in enumerate(words)]
+    segments = [{"start_time": "0", "end_time": str(len(words)), "speaker_label": "spk_0", "items": []}]
+    return json.dumps({"results": {"speaker_labels": {"segments": segments}, "items": items}})
+
+
+def test_formatear_reads_and_writes_encoded_artifacts_under_the_same_keys(encoding, monkeypatch):
+    s3 = EncodedS3()
+    s3.put("transcripciones/job.json", _transcript(["hola", "señor", "juez"]), encoding)
+    monkeypatch.setattr(formatear, "s3_client", s3)
+    monkeypatch.setattr(formatear, "job_state", None)
+    monkeypatch.setattr(compresion, "ENCODING", encoding)
+
+    event = {"Records": [{"s3": {"bucket": {"name": "bucket"}, "object": {"key": "transcripciones/job.json"}}}]}
+    assert formatear.lambda_handler(event, None)["status"] == "COMPLETED"
+
+    assert s3.headers["transcripciones-formateadas/job.txt"]["ContentEncoding"] == encoding
+    response = s3.get_object(Bucket="bucket", Key="transcripciones-formateadas/job.txt")
+    assert compresion.read_bytes(response) == "spk_0: hola señor juez".encode("utf-8")
+
+
+def test_resumir_reads_an_encoded_transcript(monkeypatch):
+    s3 = EncodedS3()
+    s3.put("transcripciones-formateadas/job.txt", "spk_0: hola, esto es una prueba con eñes.", compresion.GZIP)
+    bedrock = FakeBedrock()
+    monkeypatch.setattr(resumir, "s3", s3)
+    monkeypatch.setattr(resumir, "bedrock", bedrock)
+    monkeypatch.setattr(resumir, "summary_cache", None)
+    monkeypatch.setattr(resumir, "job_state", None)
+    monkeypatch.setattr(resumir, "bedrock_limiter", RateLimiter(rate=1000, burst=1000, max_in_flight=16))
+
+    resumir._process_record("bucket", "transcripciones-formateadas/job.txt")
+
+    assert "hola, esto es una prueba con eñes." in bedrock.prompts[0]
+    # El resumen queda sin comprimir
+    assert s3.headers["resumenes/job_summary.txt"].get("ContentEncoding") is None
+
+
+@pytest.mark.parametrize("metadata", [True, False])
+@pytest.mark.parametrize("max_bytes", [1000, 4096, 65536])
+def test_pages_of_an_encoded_transcript_count_uncompressed_bytes(metadata, max_bytes):
+    s3 = EncodedS3()
+    s3.put("transcripciones-formateadas/job.txt", TEXT, compresion.GZIP, metadata=metadata)
+
+    pages, offset = [], 0
+    while offset is not None:
+        page = read_page(s3, "bucket", "transcripciones-formateadas/job.txt", offset, max_bytes)
+        assert len(page["text"].encode("utf-8")) <= max_bytes
+        pages.append(page["text"])
+        offset = page["nextOffset"]
+    assert "".join(pages) == TEXT
+    assert page["totalBytes"] == len(TEXT.encode("utf-8"))
+
+    # Offsets más allá del .gz comprimido pero dentro del texto siguen siendo válidos
+    compressed = len(s3.objects["transcripciones-formateadas/job.txt"])
+    middle = read_page(s3, "bucket", "transcripciones-formateadas/job.txt", compressed + 10, 100)
+    assert middle["text"] and TEXT.encode("utf-8")[compressed + 10:].decode("utf-8").startswith(middle["text"])
+    past = read_page(s3, "bucket", "transcripciones-formateadas/job.txt", len(TEXT.encode("utf-8")) + 5, 100)
+    assert past["text"] == "" and past["nextOffset"] is None
+    assert read_page(s3, "bucket", "transcripciones-formateadas/otro.txt", 0, 100) is None
+
+
+class CountingS3(EncodedS3):
+    """Anota desde qué byte comprimido se lee cada GET."""
+
+    def __init__(self):
+        super().__init__()
+        self.reads = []
+
+    def get_object(self, Bucket, Key, Range=None):
+        response = super().get_object(Bucket, Key, Range)
+        self.reads.append(int(Range[len("bytes="):].split("-")[0]) if Range else 0)
+        return response
+
+
+def test_pages_resume_from_the_checkpoint_block(encoding, monkeypatch):
+    monkeypatch.setattr(s3_multipart, "MIN_PART_SIZE", 1024)
+    monkeypatch.setattr(s3_multipart, "COMPRESS_CHUNK", 4096)
+    s3 = CountingS3()
+    _write(s3, "transcripciones-formateadas/job.txt", TEXT.splitlines(keepends=True), encoding, part_size=2048)
+    stored = s3.objects["transcripciones-formateadas/job.txt"]
+    # Un bloque independiente cada ~4 KB de texto: el objeto se lee entero igual
+    assert compresion.read_bytes(s3.get_object(Bucket="bucket", Key="transcripciones-formateadas/job.txt")) \
+        == TEXT.encode("utf-8")
+
+    pages, offset, checkpoint, starts = [], 0, None, []
+    while offset is not None:
+        s3.reads.clear()
+        page = read_page(s3, "bucket", "transcripciones-formateadas/job.txt", offset, 4096, checkpoint)
+        pages.append(page["text"])
+        starts.append(s3.reads[-1])
+        offset, checkpoint = page["nextOffset"], page["nextCheckpoint"]
+        if offset is not None:
+            # El checkpoint es el inicio de un bloque anterior a la página siguiente
+            assert checkpoint[1] <= offset < checkpoint[1] + 2 * 4096 * 4
+    assert "".join(pages) == TEXT
+    # Cada página descomprime desde su bloque, no desde el byte 0
+    assert starts[0] == 0 and all(0 < start < len(stored) for start in starts[2:])
+    assert starts == sorted(starts)
+
+
+def test_bad_checkpoints_fall_back_to_the_start(encoding, monkeypatch):
+    monkeypatch.setattr(s3_multipart, "MIN_PART_SIZE", 1024)
+    monkeypatch.setattr(s3_multipart, "COMPRESS_CHUNK", 4096)
+    s3 = CountingS3()
+    _write(s3, "transcripciones-formateadas/job.txt", [TEXT], encoding, part_size=2048)
+    expected = TEXT.encode("utf-8")[50000:51000]
+
+    for checkpoint in ([7, 0], [10 ** 9, 0], [7, 60000]):
+        page = read_page(s3, "bucket", "transcripciones-formateadas/job.txt", 50000, 1000, checkpoint)
+        assert expected.startswith(page["text"].encode("utf-8")) and len(page["text"]) > 500
+
+
+def test_transcribir_reads_encoded_manifests(monkeypatch):
+    s3 = EncodedS3()
+    s3.put("transcripciones-segmentos/job/manifest.json", json.dumps({"parts": ["ñ"]}), compresion.GZIP)
+    monkeypatch.setattr(transcribir, "s3_client", s3)
+
+    assert json.loads(transcribir._read_text("transcripciones-segmentos/job/manifest.json")) == {"parts": ["ñ"]}
+
+
+def test_invalid_encoding_is_rejected():
+    with pytest.raises(ValueError):
+        compresion.compressor("brotli")
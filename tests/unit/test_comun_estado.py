@@ -0,0 +1,257 @@
+import json
+import threading
+
+import pytest
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+
+from tests.unit.lambda_loader import load_lambda
+
+from comun import estado  # noqa: E402
+
+
+class FakeDynamoDB:
+    """Soporta sólo el UpdateExpression y el GetItem que usa DynamoDBJobStateStore."""
+
+    def __init__(self):
+        self.items = {}
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def update_item(self, TableName, Key, UpdateExpression, ExpressionAttributeNames, ExpressionAttributeValues):
+        self.calls.append("update_item")
+        values = {name: TypeDeserializer().deserialize(v) for name, v in ExpressionAttributeValues.items()}
+        item = self.items.setdefault(Key["jobName"]["S"], {"jobName": Key["jobName"]})
+        item[ExpressionAttributeNames["#stage"]] = TypeSerializer().serialize(values[":stage"])
+        item["updatedAt"] = ExpressionAttributeValues[":now"]
+        item["expiresAt"] = ExpressionAttributeValues[":ttl"]
+        history = TypeDeserializer().deserialize(item.get("history", {"L": []})) + values[":entry"]
+        item["history"] = TypeSerializer().serialize(history)
+
+    def get_item(self, TableName, Key, ConsistentRead):
+        self.calls.append("get_item")
+        item = self.items.get(Key["jobName"]["S"])
+        return {"Item": item} if item else {}
+
+    def put_item(self, TableName, Item, ConditionExpression, ExpressionAttributeValues):
+        assert ConditionExpression == "attribute_not_exists(jobName) OR expiresAt < :now"
+        now = int(ExpressionAttributeValues[":now"]["N"])
+        with self.lock:
+            current = self.items.get(Item["jobName"]["S"])
+            if current is not None and int(current["expiresAt"]["N"]) >= now:
+                raise ClientError({"Error": {"Code": "ConditionalCheckFailedException"}}, "PutItem")
+            self.items[Item["jobName"]["S"]] = Item
+
+    def delete_item(self, TableName, Key, ConditionExpression, ExpressionAttributeValues):
+        item = self.items.get(Key["jobName"]["S"])
+        if item is None or item["target"] != ExpressionAttributeValues[":job"]:
+            raise ClientError({"Error": {"Code": "ConditionalCheckFailedException"}}, "DeleteItem")
+        del self.items[Key["jobName"]["S"]]
+
+
+@pytest.fixture(params=["memory", "sqlite", "dynamodb"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return estado.MemoryJobStateStore()
+    if request.param == "sqlite":
+        return estado.SQLiteJobStateStore(str(tmp_path / "estado.sqlite3"))
+    return estado.DynamoDBJobStateStore(FakeDynamoDB(), "tabla")
+
+
+def test_stores_keep_stages_and_history(store):
+    assert store.get("job") is None
+
+    store.record("job", estado.FORMATEAR, estado.IN_PROGRESS)
+    store.record("job", estado.FORMATEAR, estado.COMPLETED, output="transcripciones-formateadas/job.txt", bytes=10)
+    store.record("job", estado.RESUMIR, estado.FAILED, error="BEDROCK_MODEL_ERROR")
+
+    record = store.get("job")
+    assert record["jobName"] == "job"
+    assert record["stages"][estado.FORMATEAR]["status"] == estado.COMPLETED
+    assert record["stages"][estado.FORMATEAR]["output"] == "transcripciones-formateadas/job.txt"
+    assert record["stages"][estado.RESUMIR]["error"] == "BEDROCK_MODEL_ERROR"
+    assert [(h["stage"], h["status"]) for h in record["history"]] == [
+        (estado.FORMATEAR, estado.IN_PROGRESS),
+        (estado.FORMATEAR, estado.COMPLETED),
+        (estado.RESUMIR, estado.FAILED),
+    ]
+    assert record["updatedAt"] == record["history"][-1]["at"]
+
+
+def test_claims_are_exclusive(store):
+    owners = []
+    threads = [threading.Thread(target=lambda n=n: owners.append(store.claim("audio", f"job-{n}"))) for n in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(owners)) == 1
+    owner = owners[0]
+    store.release("audio", "otro-job")
+    assert store.claim("audio", "job-nuevo") == owner
+
+    store.release("audio", owner)
+    assert store.claim("audio", "job-nuevo") == "job-nuevo"
+
+
+def test_expired_claims_not_yet_deleted_by_ttl_are_free():
+    dynamodb = FakeDynamoDB()
+    store = estado.DynamoDBJobStateStore(dynamodb, "tabla")
+    assert store.claim("audio", "job-viejo") == "job-viejo"
+    store.record("job-viejo", estado.FORMATEAR, estado.COMPLETED)
+
+    # El TTL de DynamoDB todavía no borró los items vencidos
+    for item in dynamodb.items.values():
+        item["expiresAt"] = {"N": "1"}
+
+    assert store.get("job-viejo") is None
+    assert store.claim("audio", "job-nuevo") == "job-nuevo"
+    assert store.claim("audio", "otro") == "job-nuevo"
+
+
+def test_store_from_env(monkeypatch):
+    monkeypatch.delenv("JOBS_TABLE", raising=False)
+    monkeypatch.delenv("JOB_STATE_BACKEND", raising=False)
+    assert estado.store_from_env() is None
+
+    monkeypatch.setenv("JOBS_TABLE", "tabla")
+    assert isinstance(estado.store_from_env(lambda service: FakeDynamoDB()), estado.DynamoDBJobStateStore)
+
+    monkeypatch.setenv("JOB_STATE_BACKEND", "memory")
+    assert isinstance(estado.store_from_env(), estado.MemoryJobStateStore)
+
+    monkeypatch.setenv("JOB_STATE_BACKEND", "redis")
+    with pytest.raises(ValueError):
+        estado.store_from_env()
+
+
+def test_record_safely_never_raises():
+    class Broken(estado.JobStateStore):
+        def record(self, *args, **kwargs):
+            raise ClientError({"Error": {"Code": "ProvisionedThroughputExceededException"}}, "UpdateItem")
+
+    estado.record_safely(Broken(), "job", estado.RESUMIR, estado.COMPLETED)
+    estado.record_safely(None, "job", estado.RESUMIR, estado.COMPLETED)
+
+
+# ---- Pipeline completo contra el mismo store ----
+
+class FakeTranscribe:
+    def __init__(self, status="IN_PROGRESS"):
+        self.status = status
+        self.calls = 0
+
+    def start_transcription_job(self, **kwargs):
+        pass
+
+    def get_transcription_job(self, TranscriptionJobName):
+        self.calls += 1
+        return {"TranscriptionJob": {"TranscriptionJobStatus": self.status, "FailureReason": "audio inválido"}}
+
+
+def _check(transcribir, job_name):
+    return json.loads(transcribir.lambda_handler({"checkStatus": {"job_name": job_name}}, None)["body"])
+
+
+def test_check_status_reads_the_store_instead_of_probing(monkeypatch, s3):
+    from tests.unit.test_formatear_handler import _transcript
+    from tests.unit.test_resumir_map_reduce import FakeBedrock
+
+    transcribir, formatear, resumir = (load_lambda(name) for name in ("transcribir", "formatear", "resumir"))
+    store = estado.DynamoDBJobStateStore(FakeDynamoDB(), "tabla")
+    s3.objects.update({"audios/reunion.mp3": b""})
+    transcribe = FakeTranscribe()
+    for module in (transcribir, formatear, resumir):
+        monkeypatch.setattr(module, "job_state", store)
+    monkeypatch.setattr(transcribir, "transcribe_client", transcribe)
+    monkeypatch.setattr(transcribir, "s3_client", s3)
+    monkeypatch.setattr(formatear, "s3_client", s3)
+    monkeypatch.setattr(resumir, "s3", s3)
+    monkeypatch.setattr(resumir, "bedrock", FakeBedrock())
+    monkeypatch.setattr(resumir, "summary_cache", None)
+
+    start = {"s3": {"bucketName": "bucket", "key": "audios/reunion.mp3"},
+             "transcribe": {"languageCode": "es-ES", "maxSpeakers": 2}}
+    job_name = json.loads(transcribir.lambda_handler(start, None)["body"])["jobName"]
+    assert _check(transcribir, job_name)["status"] == "IN_PROGRESS"
+
+    s3.objects[f"transcripciones/{job_name}.json"] = _transcript(["hola", "mundo"])
+    formatear._process_record("bucket", f"transcripciones/{job_name}.json")
+    resumir._process_record("bucket", f"transcripciones-formateadas/{job_name}.txt")
+
+    transcribe_calls, heads = transcribe.calls, s3.heads
+    body = _check(transcribir, job_name)
+    assert body["status"] == "COMPLETED"
+    assert body["formattedReady"] is True and body["summaryReady"] is True
+    assert body["failed"] is None
+    # Una vez que el job llegó a formatear, checkStatus es una sola lectura
+    assert transcribe.calls == transcribe_calls
+    assert s3.heads == heads
+
+
+def test_failures_are_reported_from_the_store(monkeypatch, s3):
+    transcribir, resumir = load_lambda("transcribir"), load_lambda("resumir")
+    store = estado.MemoryJobStateStore()
+    monkeypatch.setattr(transcribir, "job_state", store)
+    monkeypatch.setattr(resumir, "job_state", store)
+    monkeypatch.setattr(transcribir, "transcribe_client", FakeTranscribe(status="FAILED"))
+    monkeypatch.setattr(transcribir, "s3_client", s3)
+    monkeypatch.setattr(resumir, "s3", s3)
+
+    store.record("job-a", estado.TRANSCRIBIR, estado.IN_PROGRESS)
+    event = {"source": "aws.transcribe", "detail-type": "Transcribe Job State Change",
+             "detail": {"TranscriptionJobName": "job-a", "TranscriptionJobStatus": "FAILED"}}
+    assert transcribir.lambda_handler(event, None)["updated"] is True
+    body = _check(transcribir, "job-a")
+    assert body["status"] == "FAILED"
+    assert body["failed"] == {"stage": estado.TRANSCRIBIR, "detail": "audio inválido"}
+    assert store.get("job-a")["stages"][estado.TRANSCRIBIR]["status"] == estado.FAILED
+
+    # Los jobs de Transcribe ajenos al pipeline no crean registros
+    event["detail"]["TranscriptionJobName"] = "otro-sistema"
+    assert transcribir.lambda_handler(event, None) == {"updated": False}
+    assert store.get("otro-sistema") is None
+
+    store.record("job-b", estado.FORMATEAR, estado.COMPLETED)
+    resumir._write_failed_status("transcripciones-formateadas/job-b.txt",
+                                 {"status": "FAILED", "error": "BEDROCK_MODEL_ERROR", "detail": "ThrottlingException"})
+    body = _check(transcribir, "job-b")
+    assert body["summaryReady"] is False
+    assert body["failed"] == {"stage": estado.RESUMIR, "error": "BEDROCK_MODEL_ERROR", "detail": "ThrottlingException"}
+    assert "resumenes/job-b.txt_FAILED.json" in s3.objects
+
+
+def test_check_status_only_asks_transcribe_about_stale_records(monkeypatch, s3):
+    transcribir = load_lambda("transcribir")
+    store = estado.MemoryJobStateStore()
+    transcribe = FakeTranscribe()
+    monkeypatch.setattr(transcribir, "job_state", store)
+    monkeypatch.setattr(transcribir, "transcribe_client", transcribe)
+    monkeypatch.setattr(transcribir, "s3_client", s3)
+
+    store.record("job", estado.TRANSCRIBIR, estado.IN_PROGRESS, queuedFor=0)
+    for _ in range(3):
+        assert _check(transcribir, "job")["status"] == "IN_PROGRESS"
+    assert transcribe.calls == 0
+
+    # Sin novedades por más de STATUS_STALE_SECONDS se confirma y se vuelve a registrar
+    monkeypatch.setattr(transcribir, "STATUS_STALE_SECONDS", -1)
+    assert _check(transcribir, "job")["status"] == "IN_PROGRESS"
+    assert transcribe.calls == 1
+    monkeypatch.setattr(transcribir, "STATUS_STALE_SECONDS", 900)
+    assert _check(transcribir, "job")["status"] == "IN_PROGRESS"
+    assert transcribe.calls == 1
+    assert store.get("job")["stages"][estado.TRANSCRIBIR]["queuedFor"] == 0
+
+
+def test_check_status_falls_back_to_probing_without_record(monkeypatch, s3):
+    transcribir = load_lambda("transcribir")
+    s3.objects.update({"transcripciones-formateadas/viejo.txt": b"spk_0: hola"})
+    monkeypatch.setattr(transcribir, "job_state", estado.MemoryJobStateStore())
+    monkeypatch.setattr(transcribir, "transcribe_client", FakeTranscribe(status="COMPLETED"))
+    monkeypatch.setattr(transcribir, "s3_client", s3)
+
+    body = _check(transcribir, "viejo")
+    assert body["formattedReady"] is True and body["summaryReady"] is False
+    assert s3.heads == 2
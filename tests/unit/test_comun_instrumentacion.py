@@ -0,0 +1,152 @@
+import io
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import pytest
+
+from tests.unit.lambda_loader import load_lambda
+from tests.unit.test_formatear_handler import _transcript
+from tests.unit.test_resumir_map_reduce import FakeBedrock
+
+formatear = load_lambda("formatear")
+resumir = load_lambda("resumir")
+
+from comun import estado, instrumentacion  # noqa: E402
+
+
+def _emitted(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith('{"_aws"')]
+
+
+def test_job_emits_one_emf_line_with_all_metrics(capsys):
+    with instrumentacion.job("formatear", "job-1") as metrics:
+        with instrumentacion.timed("S3GetMs"):
+            pass
+        instrumentacion.count("BytesIn", 100, instrumentacion.BYTES)
+        instrumentacion.count("BytesIn", 20, instrumentacion.BYTES)
+
+    [line] = _emitted(capsys)
+    directive = line["_aws"]["CloudWatchMetrics"][0]
+    assert directive["Namespace"] == instrumentacion.NAMESPACE
+    assert directive["Dimensions"] == [["Stage"]]
+    assert {m["Name"]: m["Unit"] for m in directive["Metrics"]} == {
+        "S3GetMs": "Milliseconds", "BytesIn": "Bytes", "DurationMs": "Milliseconds",
+    }
+    # jobName es propiedad, no dimensión: no crea una métrica por job
+    assert line["Stage"] == "formatear" and line["jobName"] == "job-1" and line["status"] == "COMPLETED"
+    assert line["BytesIn"] == 120
+    assert metrics.values["S3GetMs"][0] >= 0
+
+
+def test_failures_and_nested_jobs(capsys):
+    with pytest.raises(ValueError):
+        with instrumentacion.job("resumir", "job-1"):
+            with instrumentacion.job("formatear", "job-1"):
+                instrumentacion.count("Items", 3)
+            instrumentacion.count("BedrockCalls")
+            raise ValueError("x")
+
+    inner, outer = _emitted(capsys)
+    assert inner["Stage"] == "formatear" and inner["Items"] == 3 and "BedrockCalls" not in inner
+    assert outer["Stage"] == "resumir" and outer["status"] == "FAILED" and outer["BedrockCalls"] == 1
+
+
+def test_metrics_are_noop_without_a_job(capsys):
+    with instrumentacion.timed("S3GetMs"):
+        instrumentacion.count("BytesIn", 10)
+    assert instrumentacion.bind(len) is len
+    assert capsys.readouterr().out == ""
+
+
+def test_bind_accumulates_work_done_in_other_threads(capsys):
+    with instrumentacion.job("resumir", "job-1"):
+        work = instrumentacion.bind(lambda _: instrumentacion.count("BedrockCalls"))
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(work, range(20)))
+    assert _emitted(capsys)[0]["BedrockCalls"] == 20
+
+
+def _at(seconds):
+    return datetime.fromtimestamp(1_700_000_000 + seconds, timezone.utc).isoformat(timespec="milliseconds")
+
+
+def test_timeline_phases_from_history_and_marks():
+    record = {"history": [
+        {"stage": "transcribir", "status": "QUEUED", "at": _at(2), "marks": {"uploaded": _at(0)}},
+        {"stage": "transcribir", "status": "IN_PROGRESS", "at": _at(10)},
+        {"stage": "transcribir", "status": "COMPLETED", "at": _at(71)},
+        {"stage": "formatear", "status": "IN_PROGRESS", "at": _at(71.5)},
+        {"stage": "formatear", "status": "COMPLETED", "at": _at(72), "marks": {"transcriptWritten": _at(70)}},
+        {"stage": "resumir", "status": "IN_PROGRESS", "at": _at(73)},
+        {"stage": "resumir", "status": "QUEUED", "at": _at(80)},
+        {"stage": "resumir", "status": "IN_PROGRESS", "at": _at(200)},
+        {"stage": "resumir", "status": "COMPLETED", "at": _at(210)},
+    ]}
+    result = instrumentacion.timeline(record)
+
+    assert result["events"][0] == {"event": "uploaded", "at": _at(0)}
+    assert result["phasesMs"] == {
+        "uploadToStartMs": 2000, "admissionWaitMs": 8000, "transcribeMs": 60000, "deliveryToFormatMs": 1500,
+        "formatMs": 500, "deliveryToSummaryMs": 1000, "summarizeMs": 137000,
+    }
+    assert result["totalMs"] == 210000
+    assert instrumentacion.timeline(None) == {"events": [], "phasesMs": {}, "totalMs": None}
+
+
+def test_log_payload_summarizes_and_samples(caplog):
+    event = {"Records": [{"eventSource": "aws:sqs", "body": "x" * 5000}] * 3}
+    with caplog.at_level(logging.INFO):
+        instrumentacion.log_payload("Received event", event, sample_rate=0.5, rng=lambda: 0.9)
+        instrumentacion.log_payload("Received event", event, sample_rate=0.5, rng=lambda: 0.1)
+
+    summary, sampled = (record.getMessage() for record in caplog.records)
+    assert '"records": 3' in summary and "muestra" not in summary and len(summary) < 200
+    assert "muestra=" in sampled and len(sampled) < instrumentacion.LOG_MAX_CHARS + 300
+
+
+def test_pipeline_handlers_emit_stage_and_timeline_metrics(monkeypatch, capsys):
+    class S3:
+        def __init__(self):
+            self.objects = {"transcripciones/job-1.json": _transcript(["hola", "mundo"])}
+
+        def get_object(self, Bucket, Key):
+            body = self.objects[Key]
+            return {"Body": io.BytesIO(body), "ContentLength": len(body),
+                    "LastModified": datetime.now(timezone.utc)}
+
+        def put_object(self, Bucket, Key, Body, **kwargs):
+            self.objects[Key] = Body
+
+    s3, store = S3(), estado.MemoryJobStateStore()
+    monkeypatch.setattr(formatear, "s3_client", s3)
+    for module in (formatear, resumir):
+        monkeypatch.setattr(module, "job_state", store)
+    for name, value in {"s3": s3, "bedrock": FakeBedrock(), "summary_cache": None,
+                        "SUMMARY_STREAMING": False}.items():
+        monkeypatch.setattr(resumir, name, value)
+
+    store.record("job-1", estado.TRANSCRIBIR, estado.IN_PROGRESS, marks={"uploaded": estado.iso(datetime.now(timezone.utc))})
+    formatear._process_record("bucket", "transcripciones/job-1.json")
+    resumir._process_record("bucket", "transcripciones-formateadas/job-1.txt")
+
+    by_stage = {line["Stage"]: line for line in _emitted(capsys)}
+    assert {"S3GetMs", "FormatMs", "S3PutMs", "BytesIn", "BytesOut"} <= set(by_stage["formatear"])
+    assert by_stage["formatear"]["BytesIn"] == len(s3.objects["transcripciones/job-1.json"])
+    assert {"S3GetMs", "BedrockMs", "BedrockCalls", "InputTokens", "OutputTokens", "S3PutMs"} <= set(by_stage["resumir"])
+    assert by_stage["pipeline"]["jobName"] == "job-1"
+    assert {"TranscribeMs", "FormatMs", "SummarizeMs", "EndToEndMs"} <= set(by_stage["pipeline"])
+
+
+def test_overhead_per_measurement_is_small(capsys):
+    n = 20000
+    with instrumentacion.job("bench", "job-1"):
+        start = time.perf_counter()
+        for _ in range(n):
+            with instrumentacion.timed("X"):
+                pass
+        per_call = (time.perf_counter() - start) / n
+    # Un job mide unas decenas de cosas: microsegundos frente a segundos de trabajo
+    assert per_call < 50e-6
@@ -0,0 +1,144 @@
+import json
+import threading
+import time
+
+from tests.unit import lambda_loader  # noqa: F401  (agrega la layer al path)
+
+from comun import registros
+from comun.registros import process_records
+
+
+def _event(*keys):
+    return {"Records": [
+        {"eventSource": "aws:s3", "s3": {"bucket": {"name": "bucket"}, "object": {"key": key}}}
+        for key in keys
+    ]}
+
+
+def test_every_record_is_processed_and_failures_are_isolated():
+    def handler(bucket, key):
+        if "malo" in key:
+            raise ValueError("json inválido")
+        return {"output": key.upper()}
+
+    result = process_records(_event("a.json", "malo.json", "c.json"), handler)
+
+    assert result["status"] == "PARTIAL"
+    by_key = {r["key"]: r for r in result["records"]}
+    assert by_key["a.json"] == {"bucket": "bucket", "key": "a.json", "status": "COMPLETED", "output": "A.JSON"}
+    assert by_key["malo.json"]["status"] == "FAILED"
+    assert by_key["malo.json"]["detail"] == "json inválido"
+    assert by_key["c.json"]["status"] == "COMPLETED"
+
+
+def test_handler_status_is_kept():
+    result = process_records(_event("x.txt"), lambda bucket, key: {"status": "FAILED", "error": "BEDROCK_MODEL_ERROR"})
+    assert result["status"] == "FAILED"
+    assert result["records"][0]["error"] == "BEDROCK_MODEL_ERROR"
+
+
+def test_keys_are_url_decoded():
+    seen = []
+    process_records(_event("transcripciones/mi+reuni%C3%B3n.json"), lambda b, k: seen.append(k))
+    assert seen == ["transcripciones/mi reunión.json"]
+
+
+def test_concurrency_is_bounded():
+    lock = threading.Lock()
+    active = [0, 0]
+
+    def handler(bucket, key):
+        with lock:
+            active[0] += 1
+            active[1] = max(active[1], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+
+    result = process_records(_event(*[f"{i}.json" for i in range(12)]), handler, max_workers=3)
+
+    assert result["status"] == "COMPLETED"
+    assert len(result["records"]) == 12
+    assert 1 < active[1] <= 3
+
+
+def test_empty_event():
+    assert process_records({"Records": []}, lambda b, k: None) == {"status": "COMPLETED", "records": []}
+
+
+def _sqs_event(*messages):
+    return {"Records": [
+        {"eventSource": "aws:sqs", "messageId": message_id, "body": json.dumps(body),
+         "attributes": {"ApproximateReceiveCount": "1"}}
+        for message_id, body in messages
+    ]}
+
+
+def test_sqs_messages_are_unwrapped_and_failures_reported_per_message():
+    def handler(bucket, key):
+        if "malo" in key:
+            raise ValueError("json inválido")
+        if "terminal" in key:
+            return {"status": "FAILED", "error": "BEDROCK_MODEL_ERROR"}
+        return {"output": key}
+
+    event = _sqs_event(
+        ("m-1", _event("a.json")),
+        ("m-2", _event("malo.json")),
+        ("m-3", {"Service": "Amazon S3", "Event": "s3:TestEvent"}),
+        ("m-4", _event("terminal.txt")),
+    )
+    result = process_records(event, handler)
+
+    assert [r["key"] for r in result["records"]] == ["a.json", "malo.json", "terminal.txt"]
+    assert result["status"] == "PARTIAL"
+    # Lo que ya informó su error (status FAILED devuelto) no se reentrega
+    assert result["batchItemFailures"] == [{"itemIdentifier": "m-2"}]
+
+
+def test_retry_later_and_final_attempt_follow_the_receive_count(monkeypatch):
+    monkeypatch.setattr(registros, "MAX_RECEIVE_COUNT", 2)
+    seen = []
+
+    def handler(bucket, key):
+        seen.append(registros.final_attempt())
+        raise registros.RetryLater("throttling")
+
+    event = _sqs_event(("m-1", _event("a.txt")))
+    result = process_records(event, handler)
+    assert result["records"][0]["status"] == registros.RETRY
+    assert result["batchItemFailures"] == [{"itemIdentifier": "m-1"}]
+
+    event["Records"][0]["attributes"]["ApproximateReceiveCount"] = "2"
+    process_records(event, handler)
+    # Directo desde S3 no hay reentrega: siempre es el último intento
+    process_records(_event("a.txt"), handler)
+    assert seen == [False, True, True]
+
+
+def test_retry_later_shortens_the_wait_with_a_growing_backoff(monkeypatch):
+    class FakeSQS:
+        def __init__(self):
+            self.changes = []
+
+        def change_message_visibility(self, QueueUrl, ReceiptHandle, VisibilityTimeout):
+            self.changes.append((QueueUrl, ReceiptHandle, VisibilityTimeout))
+
+    sqs = FakeSQS()
+    monkeypatch.setattr(registros, "_sqs", sqs)
+    monkeypatch.setattr(registros, "MAX_RECEIVE_COUNT", 10)
+    monkeypatch.setattr(registros, "RETRY_BASE_SECONDS", 30)
+    monkeypatch.setattr(registros, "RETRY_MAX_SECONDS", 200)
+
+    def handler(bucket, key):
+        raise registros.RetryLater("throttling")
+
+    event = _sqs_event(("m-1", _event("a.txt")))
+    event["Records"][0].update(receiptHandle="rh-1",
+                               eventSourceARN="arn:aws:sqs:us-east-1:123456789012:ColaEtapaResumir")
+    for receive_count in (1, 2, 3, 4):
+        event["Records"][0]["attributes"]["ApproximateReceiveCount"] = str(receive_count)
+        assert process_records(event, handler)["batchItemFailures"] == [{"itemIdentifier": "m-1"}]
+
+    url = "https://sqs.us-east-1.amazonaws.com/123456789012/ColaEtapaResumir"
+    assert sqs.changes == [(url, "rh-1", 30), (url, "rh-1", 60), (url, "rh-1", 120), (url, "rh-1", 200)]
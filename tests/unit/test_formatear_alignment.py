@@ -0,0 +1,71 @@
+import pytest
+
+from tests.unit.lambda_loader import load_lambda
+
+load_lambda("formatear")
+
+from comun.speaker_alignment import SpeakerAligner  # noqa: E402
+
+
+def _aligner(*segments):
+    aligner = SpeakerAligner()
+    for start, end, label in segments:
+        aligner.add({"start_time": str(start), "end_time": str(end), "speaker_label": label})
+    return aligner
+
+
+def test_exact_timestamps():
+    aligner = _aligner((0.0, 2.0, "spk_0"), (2.5, 4.0, "spk_1"))
+    assert aligner.speaker_for(0.0, 0.4) == "spk_0"
+    assert aligner.speaker_for(1.6, 2.0) == "spk_0"
+    assert aligner.speaker_for(2.5, 3.0) == "spk_1"
+
+
+def test_misaligned_word_uses_nearest_segment():
+    aligner = _aligner((0.0, 2.0, "spk_0"), (5.0, 8.0, "spk_1"))
+    # Empieza apenas antes del segmento: antes quedaba como "None:"
+    assert aligner.speaker_for(4.97, 5.3) == "spk_1"
+    # En el hueco entre segmentos, más cerca del primero
+    assert aligner.speaker_for(2.1, 2.3) == "spk_0"
+    # Antes del primero y después del último
+    assert _aligner((1.0, 2.0, "spk_0")).speaker_for(0.2, 0.5) == "spk_0"
+    assert aligner.speaker_for(9.0, 9.5) == "spk_1"
+
+
+def test_overlapping_segments_pick_largest_overlap():
+    aligner = _aligner((0.0, 3.0, "spk_0"), (2.8, 6.0, "spk_1"))
+    assert aligner.speaker_for(2.6, 2.9) == "spk_0"
+    assert aligner.speaker_for(2.85, 3.5) == "spk_1"
+    assert aligner.speaker_for(4.0, 4.5) == "spk_1"
+
+
+def test_nested_segment_inside_long_turn():
+    aligner = _aligner((0.0, 10.0, "spk_0"), (4.0, 5.0, "spk_1"), (6.0, 7.0, "spk_2"))
+    assert aligner.speaker_for(4.1, 4.3) == "spk_0"
+    assert aligner.speaker_for(8.0, 8.5) == "spk_0"
+
+
+def test_time_going_backwards_relocates_pointer():
+    aligner = _aligner((0.0, 1.0, "spk_0"), (1.0, 2.0, "spk_1"), (2.0, 3.0, "spk_2"))
+    assert aligner.speaker_for(2.2, 2.5) == "spk_2"
+    assert aligner.speaker_for(0.2, 0.5) == "spk_0"
+    assert aligner.speaker_for(1.2, 1.5) == "spk_1"
+
+
+def test_out_of_order_segments_are_sorted():
+    aligner = _aligner((2.0, 3.0, "spk_1"), (0.0, 1.0, "spk_0"))
+    assert aligner.speaker_for(0.2, 0.4) == "spk_0"
+    assert aligner.speaker_for(2.2, 2.4) == "spk_1"
+
+
+@pytest.mark.parametrize("item, expected", [
+    ({"start_time": "0.5", "end_time": "0.9"}, "spk_0"),
+    ({"start_time": "0.5", "speaker_label": "spk_7"}, "spk_7"),
+    ({"type": "punctuation"}, None),
+])
+def test_speaker_for_item(item, expected):
+    assert _aligner((0.0, 1.0, "spk_0")).speaker_for_item(item) == expected
+
+
+def test_no_segments_returns_none():
+    assert SpeakerAligner().speaker_for(1.0, 2.0) is None
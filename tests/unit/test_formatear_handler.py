@@ -0,0 +1,41 @@
+import json
+
+from tests.unit.lambda_loader import load_lambda
+
+formatear = load_lambda("formatear")
+
+
+def _record(key):
+    return {"s3": {"bucket": {"name": "bucket"}, "object": {"key": key}}}
+
+
+def _transcript(words):
+    items = [{"start_time": str(i), "end_time": str(i + 0.5), "type": "pronunciation",
+              "alternatives": [{"content": word}]} for i, word in enumerate(words)]
+    segments = [{"start_time": "0", "end_time": str(len(words)), "speaker_label": "spk_0", "items": []}]
+    return json.dumps({"results": {"speaker_labels": {"segments": segments}, "items": items}}).encode()
+
+
+def test_all_records_are_formatted_and_bad_ones_reported(monkeypatch, s3):
+    s3.objects.update({
+        "transcripciones/job-1.json": _transcript(["hola", "mundo"]),
+        "transcripciones/job-2.json": b'{"results": {"items": [',
+        "transcripciones/job-3.json": _transcript(["chau"]),
+    })
+    monkeypatch.setattr(formatear, "s3_client", s3)
+
+    event = {"Records": [_record(f"transcripciones/job-{i}.json") for i in (1, 2, 3)]
+             + [_record("audios/otro.mp3")]}
+    result = formatear.lambda_handler(event, None)
+
+    statuses = {r["key"]: r["status"] for r in result["records"]}
+    assert statuses == {
+        "transcripciones/job-1.json": "COMPLETED",
+        "transcripciones/job-2.json": "FAILED",
+        "transcripciones/job-3.json": "COMPLETED",
+        "audios/otro.mp3": "IGNORED",
+    }
+    assert result["status"] == "PARTIAL"
+    assert s3.objects["transcripciones-formateadas/job-1.txt"] == b"spk_0: hola mundo"
+    assert s3.objects["transcripciones-formateadas/job-3.txt"] == b"spk_0: chau"
+    assert "transcripciones-formateadas/job-2.txt" not in s3.objects
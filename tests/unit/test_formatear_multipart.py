@@ -0,0 +1,64 @@
+import pytest
+
+from tests.unit.conftest import FakeS3
+from tests.unit.lambda_loader import load_lambda
+
+load_lambda("formatear")
+
+from comun.s3_multipart import MIN_PART_SIZE, MultipartWriter  # noqa: E402
+
+
+class FailingPartS3(FakeS3):
+    """Falla al subir la parte `fail_on_part`."""
+
+    def __init__(self, fail_on_part):
+        super().__init__()
+        self._fail_on_part = fail_on_part
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        if PartNumber == self._fail_on_part:
+            raise RuntimeError("fallo simulado")
+        return super().upload_part(Bucket, Key, UploadId, PartNumber, Body)
+
+
+def test_small_text_uses_put_object(s3):
+    with MultipartWriter(s3, "bucket", "transcripciones-formateadas/job.txt") as writer:
+        writer.write("spk_0: ")
+        writer.write("hola ñandú")
+
+    assert s3.objects["transcripciones-formateadas/job.txt"] == "spk_0: hola ñandú".encode("utf-8")
+    assert not s3.uploads
+
+
+def test_large_text_is_uploaded_in_parts(s3):
+    piece = "palabra ñ " * 100
+    pieces = (2 * MIN_PART_SIZE + 12345) // len(piece) + 1
+
+    with MultipartWriter(s3, "bucket", "big.txt", part_size=1) as writer:
+        for _ in range(pieces):
+            writer.write(piece)
+
+    assert s3.objects["big.txt"] == (piece * pieces).encode("utf-8")
+    assert writer.bytes_written == len((piece * pieces).encode("utf-8"))
+    assert s3.max_concurrent_parts <= 2
+
+
+def test_failed_part_aborts_upload():
+    s3 = FailingPartS3(fail_on_part=2)
+    with pytest.raises(RuntimeError):
+        with MultipartWriter(s3, "bucket", "big.txt") as writer:
+            for _ in range(3 * MIN_PART_SIZE // 1000):
+                writer.write("x" * 1000)
+
+    assert s3.aborted == ["upload-0"]
+    assert "big.txt" not in s3.objects
+
+
+def test_error_while_formatting_aborts_upload(s3):
+    with pytest.raises(ValueError):
+        with MultipartWriter(s3, "bucket", "big.txt", part_size=MIN_PART_SIZE) as writer:
+            writer.write("x" * (MIN_PART_SIZE + 1))
+            raise ValueError("json inválido")
+
+    assert s3.aborted == ["upload-0"]
+    assert "big.txt" not in s3.objects
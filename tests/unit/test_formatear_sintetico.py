@@ -0,0 +1,52 @@
+import io
+import json
+
+import pytest
+
+from benchmarks.transcribe_sintetico import from_profile, generate
+from tests.unit.lambda_loader import load_lambda
+
+formatear = load_lambda("formatear")
+
+
+def _results(raw):
+    return json.loads(raw)["results"]
+
+
+def test_same_seed_same_bytes():
+    assert generate(2, seed=3) == generate(2, seed=3)
+    assert generate(2, seed=3) != generate(2, seed=4)
+
+
+def test_duration_speakers_and_layout():
+    results = _results(generate(10, speakers=4, turn_seconds=6))
+    segments = results["speaker_labels"]["segments"]
+    assert {s["speaker_label"] for s in segments} == {f"spk_{n}" for n in range(4)}
+    assert 9 * 60 < float(segments[-1]["end_time"]) <= 10 * 60
+    # Cada palabra está en algún segmento y dos turnos seguidos son de hablantes distintos
+    words = [i for i in results["items"] if i["type"] == "pronunciation"]
+    assert len(words) == sum(len(s["items"]) for s in segments)
+    assert all(a["speaker_label"] != b["speaker_label"] for a, b in zip(segments, segments[1:]))
+
+
+@pytest.mark.parametrize("density", [0.0, 0.3])
+def test_punctuation_density(density):
+    items = _results(generate(5, punctuation=density))["items"]
+    marks = sum(1 for i in items if i["type"] == "punctuation")
+    words = len(items) - marks
+    if density == 0:
+        assert marks == 0
+    else:
+        assert 0.25 < marks / words < 0.45
+
+
+def test_misaligned_items_still_get_a_speaker():
+    raw = from_profile("reunion", 5, misalignment=0.05)
+    text = "".join(formatear.format_transcript(io.BytesIO(raw)))
+    assert "None:" not in text
+    assert text.count("spk_") == len(_results(raw)["speaker_labels"]["segments"])
+
+
+def test_invalid_turn_distribution():
+    with pytest.raises(ValueError):
+        generate(1, turn_distribution="normal")
@@ -0,0 +1,196 @@
+import io
+import json
+import os
+import tracemalloc
+
+import pytest
+
+from tests.unit.lambda_loader import load_lambda
+
+formatear = load_lambda("formatear")
+
+from comun.transcript_stream import TranscriptStreamError, iter_transcript  # noqa: E402
+
+
+def _legacy_format(transcript_data):
+    """Formateo original (json.loads + speaker_map por start_time)."""
+    items = transcript_data['results']['items']
+    speaker_segments = transcript_data['results'].get('speaker_labels', {}).get('segments', [])
+
+    speaker_map = {}
+    for segment in speaker_segments:
+        for item in segment['items']:
+            speaker_map[item['start_time']] = segment['speaker_label']
+
+    output_text = ""
+    current_speaker = None
+    for item in items:
+        if item['type'] == 'punctuation':
+            output_text += item['alternatives'][0]['content']
+        else:
+            speaker = speaker_map.get(item.get('start_time'))
+            if speaker != current_speaker:
+                current_speaker = speaker
+                output_text += f"\n\n{speaker}: "
+            output_text += item['alternatives'][0]['content'] + " "
+    return output_text.strip()
+
+
+def _word(start, content, end=None):
+    return {
+        "start_time": f"{start:.2f}",
+        "end_time": f"{(end or start + 0.4):.2f}",
+        "alternatives": [{"confidence": "0.99", "content": content}],
+        "type": "pronunciation",
+    }
+
+
+def _punct(content):
+    return {"alternatives": [{"confidence": "0.0", "content": content}], "type": "punctuation"}
+
+
+def _small_transcript():
+    words = [
+        (0.0, "Hola", "spk_0"), (0.5, "¿qué", "spk_0"), (1.0, "tal", "spk_0"),
+        (2.0, "Bien", "spk_1"), (2.5, "\"gracias\"", "spk_1"),
+        (4.0, "Seguimos", "spk_0"), (4.5, "\\n", "spk_0"),
+    ]
+    items = []
+    for start, content, _ in words:
+        items.append(_word(start, content))
+        if content in ("Hola", "tal", "\"gracias\""):
+            items.append(_punct("," if content == "Hola" else "."))
+
+    segments = []
+    for start, content, speaker in words:
+        if segments and segments[-1]["speaker_label"] == speaker:
+            segments[-1]["end_time"] = f"{start + 0.4:.2f}"
+            segments[-1]["items"].append({"start_time": f"{start:.2f}", "speaker_label": speaker})
+        else:
+            segments.append({
+                "start_time": f"{start:.2f}",
+                "end_time": f"{start + 0.4:.2f}",
+                "speaker_label": speaker,
+                "items": [{"start_time": f"{start:.2f}", "speaker_label": speaker}],
+            })
+
+    return {
+        "jobName": "transcription-job-test",
+        "accountId": "123456789012",
+        "results": {
+            "transcripts": [{"transcript": "Hola, ¿qué tal. Bien \"gracias\". Seguimos \\n"}],
+            "speaker_labels": {"speakers": 2, "segments": segments},
+            "items": items,
+        },
+        "status": "COMPLETED",
+    }
+
+
+class _SyntheticTranscript(io.RawIOBase):
+    """
+    JSON de Transcribe generado al vuelo, de ~`size` bytes, sin
+    materializarlo nunca completo en memoria.
+    """
+
+    WORDS_PER_TURN = 25
+    BYTES_PER_WORD = 260
+
+    def __init__(self, size):
+        self.words = max(size // self.BYTES_PER_WORD, self.WORDS_PER_TURN)
+        self._parts = self._generate()
+        self._pending = b""
+
+    def _generate(self):
+        yield b'{"jobName":"transcription-job-synthetic","accountId":"1","results":{"transcripts":[{"transcript":"'
+        for _ in range(self.words // 100):
+            yield b"palabra " * 100
+        yield b'"}],"speaker_labels":{"speakers":2,"segments":['
+        for turn_start in range(0, self.words, self.WORDS_PER_TURN):
+            turn_end = min(turn_start + self.WORDS_PER_TURN, self.words)
+            speaker = f"spk_{(turn_start // self.WORDS_PER_TURN) % 2}"
+            segment_items = ",".join(
+                f'{{"start_time":"{w * 0.5:.2f}","end_time":"{w * 0.5 + 0.4:.2f}","speaker_label":"{speaker}"}}'
+                for w in range(turn_start, turn_end)
+            )
+            separator = "," if turn_start else ""
+            yield (
+                f'{separator}{{"start_time":"{turn_start * 0.5:.2f}","end_time":"{(turn_end - 1) * 0.5 + 0.4:.2f}",'
+                f'"speaker_label":"{speaker}","items":[{segment_items}]}}'
+            ).encode()
+        yield b']},"items":['
+        for w in range(self.words):
+            separator = "," if w else ""
+            yield (
+                f'{separator}{{"start_time":"{w * 0.5:.2f}","end_time":"{w * 0.5 + 0.4:.2f}",'
+                f'"alternatives":[{{"confidence":"0.987","content":"palabra{w % 50}"}}],"type":"pronunciation"}}'
+            ).encode()
+            if w % 12 == 11:
+                yield b',{"alternatives":[{"confidence":"0.0","content":"."}],"type":"punctuation"}'
+        yield b']},"status":"COMPLETED"}'
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while len(self._pending) < size:
+            part = next(self._parts, None)
+            if part is None:
+                break
+            self._pending += part
+        data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+
+@pytest.mark.parametrize("chunk_size", [7, 64, 64 * 1024])
+def test_stream_matches_legacy_format(chunk_size, monkeypatch):
+    document = _small_transcript()
+    raw = json.dumps(document, ensure_ascii=False, indent=1).encode("utf-8")
+    monkeypatch.setattr("comun.transcript_stream.CHUNK_SIZE", chunk_size)
+
+    events = list(iter_transcript(io.BytesIO(raw), chunk_size=chunk_size))
+    assert [kind for kind, _ in events].count("item") == len(document["results"]["items"])
+
+    streamed = "".join(formatear.format_transcript(io.BytesIO(raw)))
+    assert streamed == _legacy_format(document)
+
+
+def test_items_before_speaker_labels():
+    document = _small_transcript()
+    results = document["results"]
+    document["results"] = {"items": results["items"], "speaker_labels": results["speaker_labels"]}
+    raw = json.dumps(document).encode("utf-8")
+
+    assert "".join(formatear.format_transcript(io.BytesIO(raw))) == _legacy_format(document)
+
+
+def test_invalid_json_raises():
+    with pytest.raises(TranscriptStreamError):
+        list(iter_transcript(io.BytesIO(b'{"results": {"items": [{"type": ')))
+
+
+def test_synthetic_stream_matches_legacy_format():
+    raw = _SyntheticTranscript(200 * 1024).read(1 << 30)
+    expected = _legacy_format(json.loads(raw))
+    assert "".join(formatear.format_transcript(io.BytesIO(raw))) == expected
+
+
+def _peak_memory(size):
+    tracemalloc.start()
+    try:
+        for _ in formatear.format_transcript(_SyntheticTranscript(size)):
+            pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_peak_memory_stays_flat():
+    # FORMATEAR_MEMORY_TEST_SIZES_MB="1,16,100,500" para correr la escala completa
+    sizes_mb = [int(s) for s in os.environ.get("FORMATEAR_MEMORY_TEST_SIZES_MB", "1,16").split(",")]
+    peaks = {mb: _peak_memory(mb * 1024 * 1024) for mb in sizes_mb}
+
+    smallest, largest = min(sizes_mb), max(sizes_mb)
+    growth = peaks[largest] - peaks[smallest]
+    # Sólo crecen los intervalos de hablante (unos bytes por turno)
+    assert growth < (largest - smallest) * 1024 * 1024 * 0.01, peaks
+    assert peaks[largest] < 4 * 1024 * 1024 + largest * 1024 * 1024 * 0.01, peaks
@@ -0,0 +1,48 @@
+import time
+
+from benchmarks.bench_carga import StageQueue, compare, simulate
+
+
+def test_simulated_jobs_flow_through_every_stage():
+    results = simulate(jobs=6, minutes=(1, 3), scale=0.002, timeout_s=60)
+
+    assert results["completed"] == 6 and results["unfinished"] == 0
+    assert results["jobsPerMinute"] > 0
+    for phase in ("transcribeMs", "formatMs", "summarizeMs", "endToEndMs"):
+        stats = results["phasesMs"][phase]
+        assert stats["p50"] <= stats["p95"] <= stats["p99"]
+    assert {name: stats["count"] for name, stats in results["invocationsMs"].items()}["transcribir"] == 6
+    assert results["peakRssMb"] > 0
+
+
+def test_fused_mode_skips_formatear():
+    results = simulate(jobs=3, mode="fusionado", minutes=(1, 2), scale=0.002, timeout_s=60)
+    assert results["completed"] == 3
+    assert results["invocationsMs"]["formatear"]["count"] == 0
+    assert set(results["dlq"]) == {"resumir"}
+
+
+def test_stage_queue_redelivers_failures_and_then_dead_letters():
+    deliveries = []
+
+    def invoke(event):
+        deliveries.append([r["attributes"]["ApproximateReceiveCount"] for r in event["Records"]])
+        return {"batchItemFailures": [{"itemIdentifier": event["Records"][0]["messageId"]}]}
+
+    queue = StageQueue(invoke, {"batchSize": 10, "batchingWindowSeconds": 0, "maxConcurrency": 1,
+                                "maxReceiveCount": 3}, visibility_s=0.01)
+    queue.send("{}")
+    for _ in range(200):
+        if queue.dlq:
+            break
+        time.sleep(0.01)
+    queue.stop()
+
+    assert deliveries == [["1"], ["2"], ["3"]]
+    assert len(queue.dlq) == 1 and not queue.messages
+
+
+def test_compare_reports_relative_change():
+    rows = compare({"jobsPerMinute": 100.0, "phasesMs": {"formatMs": {"p95": 50}}},
+                   {"jobsPerMinute": 120.0, "phasesMs": {"formatMs": {"p95": 40}}, "extra": 1})
+    assert rows == [("jobsPerMinute", 100.0, 120.0, 0.2), ("phasesMs.formatMs.p95", 50, 40, -0.2)]
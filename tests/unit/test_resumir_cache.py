@@ -0,0 +1,105 @@
+import pytest
+from botocore.exceptions import ClientError
+
+from tests.unit.conftest import FakeS3
+from tests.unit.lambda_loader import load_lambda
+from tests.unit.test_resumir_map_reduce import FakeBedrock
+
+resumir = load_lambda("resumir")
+
+from comun import instrumentacion  # noqa: E402
+from retries import RateLimiter  # noqa: E402
+from summary_cache import CacheStats, FileCache, MemoryCache, S3Cache, cache_key  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fast_bedrock_limiter(monkeypatch):
+    # Sin esperas de tasa entre las llamadas al fake de Bedrock
+    monkeypatch.setattr(resumir, "bedrock_limiter", RateLimiter(rate=1000, burst=1000, max_in_flight=16))
+
+
+def test_cache_key_changes_with_every_input():
+    base = cache_key("texto", "modelo", "prompt {text}", {"temperature": 0.3})
+    assert base == cache_key("texto", "modelo", "prompt {text}", {"temperature": 0.3})
+    assert base != cache_key("texto.", "modelo", "prompt {text}", {"temperature": 0.3})
+    assert base != cache_key("texto", "otro", "prompt {text}", {"temperature": 0.3})
+    assert base != cache_key("texto", "modelo", "otro {text}", {"temperature": 0.3})
+    assert base != cache_key("texto", "modelo", "prompt {text}", {"temperature": 0.5})
+
+
+@pytest.mark.parametrize("make_cache", [
+    lambda tmp_path: MemoryCache(),
+    lambda tmp_path: FileCache(tmp_path / "cache"),
+    lambda tmp_path: S3Cache(FakeS3(), "bucket"),
+])
+def test_backends_roundtrip(make_cache, tmp_path):
+    cache = make_cache(tmp_path)
+    assert cache.get("abc") is None
+    cache.put("abc", "- resumen ñ")
+    assert cache.get("abc") == "- resumen ñ"
+
+
+def test_stats_are_counted_in_the_job_metrics(capsys):
+    stats = CacheStats()
+    with instrumentacion.job("resumir", "job") as metrics:
+        stats.record(hit=True)
+        stats.record(hit=False)
+        stats.record(hit=False)
+        # Nada se imprime por fuera de la línea EMF del job
+        assert capsys.readouterr().out == ""
+
+    assert (stats.hits, stats.misses) == (1, 2)
+    assert metrics.values["SummaryCacheHit"][0] == 1 and metrics.values["SummaryCacheMiss"][0] == 2
+    assert len(capsys.readouterr().out.strip().splitlines()) == 1
+
+
+def test_second_run_is_served_from_cache(monkeypatch, s3):
+    bedrock = FakeBedrock()
+    s3.objects.update({"transcripciones-formateadas/job.txt": b"spk_0: hola, esto es una prueba."})
+    monkeypatch.setattr(resumir, "bedrock", bedrock)
+    monkeypatch.setattr(resumir, "s3", s3)
+    monkeypatch.setattr(resumir, "summary_cache", S3Cache(s3, "bucket"))
+    monkeypatch.setattr(resumir, "cache_stats", CacheStats())
+
+    first = resumir._process_record("bucket", "transcripciones-formateadas/job.txt")
+    del s3.objects["resumenes/job_summary.txt"]
+    # Re-subida del mismo audio con otro nombre de job
+    s3.objects["transcripciones-formateadas/job-2.txt"] = s3.objects["transcripciones-formateadas/job.txt"]
+    second = resumir._process_record("bucket", "transcripciones-formateadas/job-2.txt")
+
+    assert first["cache"] == "MISS" and second["cache"] == "HIT"
+    assert len(bedrock.prompts) == 1
+    assert s3.objects["resumenes/job-2_summary.txt"] == b"- map 1"
+    assert any(k.startswith("cache-resumenes/") for k in s3.objects)
+    assert (resumir.cache_stats.hits, resumir.cache_stats.misses) == (1, 1)
+
+
+class BrokenCache:
+    def __init__(self, error):
+        self.error = error
+
+    def get(self, key):
+        raise self.error
+
+    def put(self, key, summary):
+        raise self.error
+
+
+@pytest.mark.parametrize("error", [
+    ClientError({"Error": {"Code": "SlowDown", "Message": ""}}, "PutObject"),
+    TimeoutError("read timeout"),
+    UnicodeDecodeError("utf-8", b"\xff", 0, 1, "invalid start byte"),
+])
+def test_cache_errors_never_fail_the_summary(monkeypatch, error, s3):
+    bedrock = FakeBedrock()
+    s3.objects.update({"transcripciones-formateadas/job.txt": b"spk_0: hola, esto es una prueba."})
+    monkeypatch.setattr(resumir, "bedrock", bedrock)
+    monkeypatch.setattr(resumir, "s3", s3)
+    monkeypatch.setattr(resumir, "summary_cache", BrokenCache(error))
+    monkeypatch.setattr(resumir, "cache_stats", CacheStats())
+
+    result = resumir._process_record("bucket", "transcripciones-formateadas/job.txt")
+
+    assert result["status"] == "COMPLETED" and result["cache"] == "MISS"
+    assert s3.objects["resumenes/job_summary.txt"] == b"- map 1"
+    assert not any(k.endswith("_FAILED.json") for k in s3.objects)
@@ -0,0 +1,105 @@
+import pytest
+
+from tests.unit.lambda_loader import load_lambda
+
+load_lambda("resumir")
+
+from compaction import DEFAULT_STAGES, compact, detect_language, stages_from_env  # noqa: E402
+from map_reduce import split_turns  # noqa: E402
+
+TRANSCRIPT_ES = "\n\n".join([
+    "spk_0: Eh, bueno, la idea es que revisemos el presupuesto del trimestre.",
+    "spk_1: Sí.",
+    "spk_0: O sea, tenemos que recortar los viajes y, eh, mmm, priorizar el equipo de datos.",
+    "spk_1: Claro, ok.",
+    "spk_2: Mmm.",
+    "spk_1: Yo me ocupo de hablar con finanzas el lunes.",
+    "spk_0: Perfecto.",
+])
+
+
+def test_default_pipeline():
+    result = compact(TRANSCRIPT_ES, language="es")
+
+    assert result.text == "\n".join([
+        "A: Bueno, la idea es que revisemos el presupuesto del trimestre. "
+        "Tenemos que recortar los viajes y, priorizar el equipo de datos.",
+        # "Claro, ok." abre el turno de spk_1 y "Perfecto." lo cierra: no interrumpen a nadie
+        "B: Claro, ok. Yo me ocupo de hablar con finanzas el lunes.",
+        "A: Perfecto.",
+    ])
+    assert result.tokens_after < result.tokens_before
+    assert 0 < result.saved_ratio < 1
+
+
+def test_stages_are_independent():
+    only_labels = compact(TRANSCRIPT_ES, stages=("labels",), language="es")
+    assert only_labels.text.splitlines()[1] == "B: Sí."
+    assert len(only_labels.text.splitlines()) == 7
+
+    no_labels = compact(TRANSCRIPT_ES, stages=("backchannel",), language="es")
+    assert "spk_1: Sí." not in no_labels.text
+    assert no_labels.text.split("\n\n")[3] == "spk_1: Yo me ocupo de hablar con finanzas el lunes."
+    assert "spk_2" not in no_labels.text
+
+
+def test_answers_to_questions_are_kept():
+    text = "\n\n".join([
+        "spk_0: ¿Aprobaron el presupuesto del trimestre?",
+        "spk_1: Sí.",
+        "spk_0: Entonces arrancamos el lunes.",
+    ])
+    result = compact(text, stages=("backchannel", "merge"), language="es")
+    assert result.text == text
+
+
+def test_no_stages_returns_text_untouched():
+    result = compact(TRANSCRIPT_ES, stages=())
+    assert result.text == TRANSCRIPT_ES and result.saved_ratio == 0
+
+
+def test_fillers_do_not_eat_words():
+    text = "spk_0: Um, I mean the umbrella budget, you know, is over. Hmm."
+    assert compact(text, stages=("fillers",), language="en").text == "spk_0: The umbrella budget, is over."
+
+
+def test_compacted_text_still_splits_into_turns():
+    result = compact(TRANSCRIPT_ES, language="es")
+    assert split_turns(result.text) == result.text.split("\n")
+
+
+@pytest.mark.parametrize("text, language", [
+    (TRANSCRIPT_ES, "es"),
+    ("spk_0: We need to finish the report and send it to the client.", "en"),
+    ("spk_0: Você não acha que isso está muito caro para uma empresa?", "pt"),
+])
+def test_detect_language(text, language):
+    assert detect_language(text) == language
+
+
+def test_stages_from_env():
+    assert stages_from_env(None) == DEFAULT_STAGES
+    assert stages_from_env("none") == ()
+    assert stages_from_env("labels, merge") == ("labels", "merge")
+    with pytest.raises(ValueError):
+        stages_from_env("labels,resumir")
+
+
+def test_handler_sends_compacted_text_and_reports_tokens(monkeypatch, s3):
+    from tests.unit.test_resumir_map_reduce import FakeBedrock
+    from retries import RateLimiter
+
+    resumir = load_lambda("resumir")
+    bedrock = FakeBedrock()
+    s3.objects.update({"transcripciones-formateadas/job.txt": TRANSCRIPT_ES.encode()})
+    monkeypatch.setattr(resumir, "bedrock", bedrock)
+    monkeypatch.setattr(resumir, "s3", s3)
+    monkeypatch.setattr(resumir, "summary_cache", None)
+    monkeypatch.setattr(resumir, "bedrock_limiter", RateLimiter(rate=1000, burst=1000, max_in_flight=16))
+    monkeypatch.setattr(resumir, "COMPACTION_LANGUAGE", "es")
+
+    result = resumir._process_record("bucket", "transcripciones-formateadas/job.txt")
+
+    assert result["inputTokens"]["after"] < result["inputTokens"]["before"]
+    assert "B: Claro, ok. Yo me ocupo" in bedrock.prompts[0]
+    assert "spk_" not in bedrock.prompts[0]
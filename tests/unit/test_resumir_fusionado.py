@@ -0,0 +1,66 @@
+import pytest
+
+from benchmarks.bench_modo_pipeline import SimBedrock, SimS3, simulate
+from tests.unit.lambda_loader import load_lambda
+from tests.unit.test_formatear_handler import _transcript
+
+resumir = load_lambda("resumir")
+
+from comun import estado  # noqa: E402
+
+KEY = "transcripciones/job-1.json"
+
+
+class CountingS3(SimS3):
+    def __init__(self, objects):
+        super().__init__(objects)
+        self.gets = []
+
+    def get_object(self, Bucket, Key):
+        self.gets.append(Key)
+        return super().get_object(Bucket, Key)
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    fake = CountingS3({KEY: _transcript(["hola", "mundo"]), "transcripciones/roto.json": b'{"results": {"items": ['})
+    store = estado.MemoryJobStateStore()
+    for name, value in {"s3": fake, "bedrock": SimBedrock(), "job_state": store, "summary_cache": None,
+                        "SUMMARY_STREAMING": False}.items():
+        monkeypatch.setattr(resumir, name, value)
+    return fake
+
+
+def test_fused_mode_formats_and_summarizes_without_reading_the_txt_back(s3):
+    result = resumir.lambda_handler({"Records": [
+        {"s3": {"bucket": {"name": "bucket"}, "object": {"key": KEY}}}
+    ]}, None)
+
+    record = result["records"][0]
+    assert result["status"] == "COMPLETED"
+    assert record["formatted"] == "transcripciones-formateadas/job-1.txt"
+    assert record["output"] == "resumenes/job-1_summary.txt"
+    # El .txt queda para getResults pero no se vuelve a leer
+    assert s3.objects["transcripciones-formateadas/job-1.txt"] == b"spk_0: hola mundo"
+    assert s3.gets == [KEY]
+
+    stages = resumir.job_state.get("job-1")["stages"]
+    assert {stage: stages[stage]["status"] for stage in stages} == {
+        estado.TRANSCRIBIR: estado.COMPLETED, estado.FORMATEAR: estado.COMPLETED, estado.RESUMIR: estado.COMPLETED,
+    }
+
+
+def test_fused_format_errors_are_recorded_on_the_format_stage(s3):
+    result = resumir.lambda_handler({"Records": [
+        {"s3": {"bucket": {"name": "bucket"}, "object": {"key": "transcripciones/roto.json"}}}
+    ]}, None)
+
+    assert result["status"] == "FAILED"
+    assert resumir.job_state.get("roto")["stages"][estado.FORMATEAR]["status"] == estado.FAILED
+    assert not any(key.startswith("resumenes/") for key in s3.objects)
+
+
+def test_fused_mode_is_faster_end_to_end():
+    results = simulate(2000, jobs=3, cold_ratio=1.0, startup={"formatear": 300, "resumir": 300})
+    # Una notificación, un cold start, un PUT y un GET menos
+    assert results["fusionado"]["p50"] < results["dos-etapas"]["p50"] - 500
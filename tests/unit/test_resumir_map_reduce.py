@@ -0,0 +1,120 @@
+import io
+import json
+import threading
+
+import pytest
+
+from tests.unit.lambda_loader import load_lambda
+
+resumir = load_lambda("resumir")
+
+from map_reduce import (  # noqa: E402
+    MAP_PROMPT, REDUCE_PROMPT, chunk_turns, estimate_tokens, map_reduce_summary, split_turns,
+)
+from retries import RateLimiter  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fast_bedrock_limiter(monkeypatch):
+    # Sin esperas de tasa entre las llamadas al fake de Bedrock
+    monkeypatch.setattr(resumir, "bedrock_limiter", RateLimiter(rate=1000, burst=1000, max_in_flight=16))
+
+
+class FakeBedrock:
+    """Fake local de bedrock-runtime.invoke_model."""
+
+    def __init__(self):
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def invoke_model(self, modelId, contentType, accept, body):
+        prompt = json.loads(body)["prompt"]
+        with self._lock:
+            self.prompts.append(prompt)
+            n = len(self.prompts)
+        kind = "reduce" if "PARTIAL SUMMARIES START" in prompt else "map"
+        generation = f"- {kind} {n}"
+        return {"body": io.BytesIO(json.dumps({"generation": generation}).encode())}
+
+
+def _transcript(turns, words_per_turn):
+    return "\n\n".join(
+        f"spk_{t % 2}: " + " ".join(f"palabra{t}_{w}" for w in range(words_per_turn)) + "."
+        for t in range(turns)
+    )
+
+
+def test_chunks_follow_turn_boundaries_and_budget():
+    text = _transcript(40, 30)
+    chunks = chunk_turns(split_turns(text), max_tokens=400)
+
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 400 for chunk in chunks)
+    assert all(chunk.startswith("spk_") for chunk in chunks)
+    assert "\n\n".join(chunks) == text
+
+
+def test_turn_longer_than_budget_is_split():
+    text = "spk_0: " + " ".join(f"Oración número {i} bastante larga." for i in range(200))
+    chunks = chunk_turns(split_turns(text), max_tokens=100)
+
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 100 for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_long_transcript_uses_map_reduce(monkeypatch, s3):
+    bedrock = FakeBedrock()
+    text = _transcript(60, 40)
+    s3.objects.update({"transcripciones-formateadas/job.txt": text.encode()})
+    monkeypatch.setattr(resumir, "bedrock", bedrock)
+    monkeypatch.setattr(resumir, "s3", s3)
+    monkeypatch.setattr(resumir, "CHUNK_TOKENS", 500)
+    monkeypatch.setattr(resumir, "summary_cache", None)
+    monkeypatch.setattr(resumir, "COMPACTION_STAGES", ())
+
+    result = resumir._process_record("bucket", "transcripciones-formateadas/job.txt")
+
+    assert result["status"] == "COMPLETED"
+    assert result["output"] == "resumenes/job_summary.txt"
+    map_prompts = [p for p in bedrock.prompts if "PARTIAL SUMMARIES START" not in p]
+    reduce_prompts = [p for p in bedrock.prompts if "PARTIAL SUMMARIES START" in p]
+    assert len(map_prompts) > 1
+    assert reduce_prompts
+    # Todo el texto llega a algún prompt de map, y ningún prompt supera el presupuesto
+    for turn in split_turns(text):
+        assert any(turn in prompt for prompt in map_prompts)
+    assert all(estimate_tokens(p) <= 500 + estimate_tokens(MAP_PROMPT) for p in map_prompts)
+    assert s3.objects["resumenes/job_summary.txt"].decode().startswith("- reduce")
+
+
+def test_reduce_runs_in_levels_when_partials_do_not_fit():
+    partials = [f"- punto {i} " + "x" * 40 for i in range(30)]
+
+    calls = []
+
+    def invoke(prompt):
+        calls.append(prompt)
+        if "PARTIAL SUMMARIES START" in prompt:
+            return "- combinado " + "y" * 40
+        return partials[len(calls) % len(partials)]
+
+    summary = map_reduce_summary(_transcript(30, 30), invoke, chunk_tokens=80, max_workers=3)
+
+    assert summary.startswith("- combinado")
+    assert sum("PARTIAL SUMMARIES START" in c for c in calls) > 1
+    assert REDUCE_PROMPT.split("\n")[0] in calls[-1]
+
+
+def test_short_transcript_uses_single_prompt(monkeypatch, s3):
+    bedrock = FakeBedrock()
+    s3.objects.update({"transcripciones-formateadas/job.txt": b"spk_0: hola."})
+    monkeypatch.setattr(resumir, "bedrock", bedrock)
+    monkeypatch.setattr(resumir, "s3", s3)
+    monkeypatch.setattr(resumir, "summary_cache", None)
+    monkeypatch.setattr(resumir, "COMPACTION_STAGES", ())
+
+    resumir._process_record("bucket", "transcripciones-formateadas/job.txt")
+
+    assert len(bedrock.prompts) == 1
+    assert bedrock.prompts[0] == resumir.PROMPT_TEMPLATE.format(text="spk_0: hola.")
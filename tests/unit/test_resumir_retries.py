@@ -0,0 +1,250 @@
+import io
+import json
+import threading
+
+import pytest
+from botocore.exceptions import ClientError, ConnectTimeoutError, EndpointConnectionError, ReadTimeoutError
+
+from tests.unit.lambda_loader import load_lambda
+
+resumir = load_lambda("resumir")
+
+from retries import (  # noqa: E402
+    FATAL, THROTTLED, TRANSIENT, RateLimiter, RetryBudgetExceeded, call_with_retries, classify,
+)
+
+
+def _error(code):
+    return ClientError({"Error": {"Code": code, "Message": code}}, "InvokeModel")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class ScriptedBedrock:
+    """Devuelve los errores del guion en orden y después respuestas válidas."""
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.calls = 0
+
+    def invoke_model(self, **kwargs):
+        self.calls += 1
+        if self.script:
+            raise _error(self.script.pop(0))
+        return {"body": io.BytesIO(json.dumps({"generation": "- ok"}).encode())}
+
+
+def _limiter(clock, rate=100.0, burst=100, max_in_flight=4):
+    return RateLimiter(rate=rate, burst=burst, max_in_flight=max_in_flight, clock=clock, sleep=clock.sleep)
+
+
+@pytest.mark.parametrize("code, kind", [
+    ("ThrottlingException", THROTTLED),
+    ("throttlingException", THROTTLED),
+    ("ModelNotReadyException", TRANSIENT),
+    ("ServiceUnavailableException", TRANSIENT),
+    ("ValidationException", FATAL),
+    ("AccessDeniedException", FATAL),
+])
+def test_classify(code, kind):
+    assert classify(_error(code)) == kind
+
+
+@pytest.mark.parametrize("error", [
+    ReadTimeoutError(endpoint_url="https://bedrock-runtime"),
+    ConnectTimeoutError(endpoint_url="https://bedrock-runtime"),
+    EndpointConnectionError(endpoint_url="https://bedrock-runtime"),
+])
+def test_network_errors_are_transient(error):
+    assert classify(error) == TRANSIENT
+    assert classify(ValueError("otra cosa")) == FATAL
+
+
+def test_throttles_are_retried_with_growing_jittered_backoff():
+    clock = FakeClock()
+    bedrock = ScriptedBedrock(["ThrottlingException"] * 3)
+    limiter = _limiter(clock)
+
+    result = call_with_retries(lambda: bedrock.invoke_model(), limiter, deadline=100,
+                               base_delay=1, clock=clock, sleep=clock.sleep, rng=lambda: 1.0)
+
+    assert result["body"].read() == b'{"generation": "- ok"}'
+    assert bedrock.calls == 4
+    assert [s for s in clock.sleeps] == [1, 2, 4]
+    # Cada throttle baja la tasa a la mitad; los éxitos la recuperan de a poco
+    assert limiter.rate == pytest.approx(100 / 8 + 5)
+
+
+def test_fatal_errors_are_not_retried():
+    clock = FakeClock()
+    bedrock = ScriptedBedrock(["ValidationException"])
+    with pytest.raises(ClientError):
+        call_with_retries(lambda: bedrock.invoke_model(), _limiter(clock), deadline=100,
+                          clock=clock, sleep=clock.sleep)
+    assert bedrock.calls == 1
+
+
+def test_retries_stop_at_the_deadline():
+    clock = FakeClock()
+    bedrock = ScriptedBedrock(["ModelNotReadyException"] * 50)
+    with pytest.raises(ClientError):
+        call_with_retries(lambda: bedrock.invoke_model(), _limiter(clock), deadline=10,
+                          max_attempts=50, base_delay=1, clock=clock, sleep=clock.sleep, rng=lambda: 1.0)
+    assert clock.now < 10
+    assert bedrock.calls == 4  # esperas 1 + 2 + 4 = 7s; la siguiente (8s) no entra
+
+
+def test_slow_attempts_count_against_the_deadline():
+    clock = FakeClock()
+    calls = []
+
+    def slow_timeout():
+        calls.append(clock.now)
+        clock.now += 4  # cada intento tarda 4s antes de cortar por timeout
+        raise ReadTimeoutError(endpoint_url="https://bedrock-runtime")
+
+    with pytest.raises(ReadTimeoutError):
+        call_with_retries(slow_timeout, _limiter(clock), deadline=12, base_delay=1,
+                          clock=clock, sleep=clock.sleep, rng=lambda: 1.0)
+    # Tras el segundo intento (t=9) quedan 3s: no entran 2s de espera + 4s de otro intento
+    assert calls == [0, 5]
+    assert clock.sleeps == [1]
+
+
+def test_token_bucket_paces_calls_and_respects_deadline():
+    clock = FakeClock()
+    limiter = _limiter(clock, rate=2, burst=2)
+    for _ in range(4):
+        limiter.acquire(deadline=100)
+    assert clock.now == pytest.approx(1.0)
+
+    with pytest.raises(RetryBudgetExceeded):
+        limiter.acquire(deadline=clock.now + 0.1)
+
+
+def test_in_flight_limit_is_shared_across_threads():
+    limiter = RateLimiter(rate=1000, burst=1000, max_in_flight=2)
+    lock = threading.Lock()
+    active, peak = [0], [0]
+    release = threading.Event()
+
+    def call():
+        with limiter.slot(deadline=float("inf")):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            release.wait(0.05)
+            with lock:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=call) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 2
+
+
+def test_handler_recovers_from_scripted_throttles(monkeypatch):
+    bedrock = ScriptedBedrock(["ThrottlingException", "ModelNotReadyException"])
+    monkeypatch.setattr(resumir, "bedrock", bedrock)
+    monkeypatch.setattr(resumir, "bedrock_limiter", RateLimiter(rate=1000, burst=1000, max_in_flight=4))
+    monkeypatch.setattr("retries.time.sleep", lambda seconds: None)
+
+    assert resumir._invoke_model("prompt") == "- ok"
+    assert bedrock.calls == 3
+
+
+def test_handler_reports_failure_when_budget_is_exhausted(monkeypatch, s3):
+    class Context:
+        def get_remaining_time_in_millis(self):
+            return 16_000  # 1s útil después del margen
+
+    s3.objects["transcripciones-formateadas/job.txt"] = b"spk_0: hola."
+    monkeypatch.setattr(resumir, "s3", s3)
+    monkeypatch.setattr(resumir, "bedrock", ScriptedBedrock(["ThrottlingException"] * 100))
+    monkeypatch.setattr(resumir, "summary_cache", None)
+    monkeypatch.setattr(resumir, "SUMMARY_STREAMING", False)
+    # lambda_handler recalcula el deadline; monkeypatch lo restaura al terminar
+    monkeypatch.setattr(resumir, "invocation_deadline", float("inf"))
+    monkeypatch.setattr(resumir, "bedrock_limiter", RateLimiter(rate=1000, burst=1000, max_in_flight=4))
+
+    event = {"Records": [{"s3": {"bucket": {"name": "b"}, "object": {"key": "transcripciones-formateadas/job.txt"}}}]}
+    result = resumir.lambda_handler(event, Context())
+
+    record = result["records"][0]
+    assert record["status"] == "FAILED"
+    assert record["detail"] == "ThrottlingException"
+    assert "resumenes/job.txt_FAILED.json" in s3.objects
+
+
+def test_throttled_sqs_delivery_returns_to_the_queue_until_the_last_attempt(monkeypatch, s3):
+    from comun import estado, registros
+
+    s3.objects["transcripciones-formateadas/job.txt"] = b"spk_0: hola."
+    monkeypatch.setattr(resumir, "s3", s3)
+    monkeypatch.setattr(resumir, "bedrock", ScriptedBedrock(["ThrottlingException"] * 100))
+    monkeypatch.setattr(resumir, "summary_cache", None)
+    monkeypatch.setattr(resumir, "SUMMARY_STREAMING", False)
+    monkeypatch.setattr(resumir, "job_state", estado.MemoryJobStateStore())
+    monkeypatch.setattr(resumir, "BEDROCK_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(resumir, "bedrock_limiter", RateLimiter(rate=1000, burst=1000, max_in_flight=4))
+    monkeypatch.setattr("retries.time.sleep", lambda seconds: None)
+    monkeypatch.setattr(registros, "MAX_RECEIVE_COUNT", 3)
+
+    def delivery(receive_count):
+        s3_event = {"Records": [{"s3": {"bucket": {"name": "b"}, "object": {"key": "transcripciones-formateadas/job.txt"}}}]}
+        return {"Records": [{"eventSource": "aws:sqs", "messageId": "m-1", "body": json.dumps(s3_event),
+                             "attributes": {"ApproximateReceiveCount": str(receive_count)}}]}
+
+    result = resumir.lambda_handler(delivery(1), None)
+    assert result["batchItemFailures"] == [{"itemIdentifier": "m-1"}]
+    assert result["records"][0]["status"] == "RETRY"
+    assert "resumenes/job.txt_FAILED.json" not in s3.objects
+    assert resumir.job_state.get("job")["stages"]["resumir"]["status"] == estado.QUEUED
+
+    # La última entrega antes de la DLQ informa el error como siempre
+    result = resumir.lambda_handler(delivery(3), None)
+    assert result["batchItemFailures"] == []
+    assert result["records"][0]["status"] == "FAILED"
+    assert "resumenes/job.txt_FAILED.json" in s3.objects
+
+
+def test_network_timeouts_return_to_the_queue_instead_of_failing(monkeypatch, s3):
+    from comun import estado, registros
+
+    class TimingOutBedrock:
+        def invoke_model(self, **kwargs):
+            raise ReadTimeoutError(endpoint_url="https://bedrock-runtime")
+
+    s3.objects["transcripciones-formateadas/job.txt"] = b"spk_0: hola."
+    monkeypatch.setattr(resumir, "s3", s3)
+    monkeypatch.setattr(resumir, "bedrock", TimingOutBedrock())
+    monkeypatch.setattr(resumir, "summary_cache", None)
+    monkeypatch.setattr(resumir, "SUMMARY_STREAMING", False)
+    monkeypatch.setattr(resumir, "job_state", estado.MemoryJobStateStore())
+    monkeypatch.setattr(resumir, "BEDROCK_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(resumir, "bedrock_limiter", RateLimiter(rate=1000, burst=1000, max_in_flight=4))
+    monkeypatch.setattr("retries.time.sleep", lambda seconds: None)
+    monkeypatch.setattr(registros, "MAX_RECEIVE_COUNT", 3)
+
+    s3_event = {"Records": [{"s3": {"bucket": {"name": "b"}, "object": {"key": "transcripciones-formateadas/job.txt"}}}]}
+    event = {"Records": [{"eventSource": "aws:sqs", "messageId": "m-1", "body": json.dumps(s3_event),
+                          "attributes": {"ApproximateReceiveCount": "1"}}]}
+    result = resumir.lambda_handler(event, None)
+
+    assert result["batchItemFailures"] == [{"itemIdentifier": "m-1"}]
+    assert "resumenes/job.txt_FAILED.json" not in s3.objects
+    stage = resumir.job_state.get("job")["stages"]["resumir"]
+    assert stage["status"] == estado.QUEUED and stage["retryReason"] == "ReadTimeoutError"
@@ -0,0 +1,209 @@
+import io
+import json
+import time
+from contextlib import redirect_stdout
+
+import pytest
+from botocore.exceptions import ClientError
+
+from tests.unit.conftest import FakeS3
+from tests.unit.lambda_loader import load_lambda
+
+resumir = load_lambda("resumir")
+transcribir = load_lambda("transcribir")
+
+from comun import instrumentacion  # noqa: E402
+from retries import RateLimiter  # noqa: E402
+from streaming import PartialSummaryWriter, collect_stream  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fast_bedrock_limiter(monkeypatch):
+    # Sin esperas de tasa entre las llamadas al fake de Bedrock
+    monkeypatch.setattr(resumir, "bedrock_limiter", RateLimiter(rate=1000, burst=1000, max_in_flight=16))
+
+
+class HistoryS3(FakeS3):
+    """Además guarda el orden de los PUT y DELETE."""
+
+    def __init__(self, objects=None):
+        super().__init__(objects)
+        self.history = []
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        super().put_object(Bucket, Key, Body, **kwargs)
+        self.history.append(("put", Key, Body))
+
+    def delete_object(self, Bucket, Key):
+        super().delete_object(Bucket, Key)
+        self.history.append(("delete", Key, None))
+
+
+def _events(words, error_after=None):
+    for i, word in enumerate(words, start=1):
+        if error_after is not None and i > error_after:
+            yield {"throttlingException": {"message": "Too many requests"}}
+            return
+        payload = {"generation": word, "generation_token_count": i}
+        yield {"chunk": {"bytes": json.dumps(payload).encode()}}
+
+
+class FakeStreamingBedrock:
+    def __init__(self, words, error_after=None):
+        self.words = words
+        self.error_after = error_after
+        self.calls = 0
+
+    def invoke_model_with_response_stream(self, modelId, contentType, accept, body):
+        self.calls += 1
+        return {"body": _events(self.words, self.error_after)}
+
+
+def test_collect_stream_reports_progress():
+    seen = []
+    text = collect_stream(_events(["- uno", " dos", " tres"]), lambda p, t: seen.append(("".join(p), t)))
+    assert text == "- uno dos tres"
+    assert seen[-1] == ("- uno dos tres", 3)
+
+
+def test_checkpoints_by_tokens_and_time(s3):
+    now = [0.0]
+    writer = PartialSummaryWriter(s3, "b", "resumenes/job_summary.partial.txt",
+                                  every_tokens=10, every_seconds=5, clock=lambda: now[0])
+    writer.update(["a"], 3)
+    assert writer.checkpoints == 0
+    writer.update(["a", "b"], 10)
+    assert writer.checkpoints == 1
+    now[0] = 6.0
+    writer.update(["a", "b", "c"], 11)
+    assert writer.checkpoints == 2
+    assert s3.objects["resumenes/job_summary.partial.txt"] == b"abc"
+    assert s3.metadata["resumenes/job_summary.partial.txt"] == {"generated-tokens": "11"}
+
+
+def test_streaming_summary_writes_partials_then_final(monkeypatch):
+    words = [f" palabra{i}" for i in range(120)]
+    s3 = HistoryS3({"transcripciones-formateadas/job.txt": b"spk_0: hola."})
+    monkeypatch.setattr(resumir, "s3", s3)
+    monkeypatch.setattr(resumir, "bedrock", FakeStreamingBedrock(words))
+    monkeypatch.setattr(resumir, "summary_cache", None)
+    monkeypatch.setattr(resumir, "SUMMARY_STREAMING", True)
+    monkeypatch.setattr(resumir, "CHECKPOINT_TOKENS", 50)
+
+    result = resumir._process_record("bucket", "transcripciones-formateadas/job.txt")
+
+    assert result["status"] == "COMPLETED"
+    partial_key = "resumenes/job_summary.partial.txt"
+    partial_puts = [body for op, key, body in s3.history if op == "put" and key == partial_key]
+    assert len(partial_puts) == 2
+    assert all(b.decode() == "".join(words)[:len(b)] for b in partial_puts)
+    # El final se publica antes de borrar el parcial
+    ops = [(op, key) for op, key, _ in s3.history]
+    assert ops.index(("put", "resumenes/job_summary.txt")) < ops.index(("delete", partial_key))
+    assert s3.objects["resumenes/job_summary.txt"].decode() == "".join(words)
+    assert partial_key not in s3.objects
+
+
+def test_stream_error_marks_failed_and_cleans_partial(monkeypatch, s3):
+    s3.objects["transcripciones-formateadas/job.txt"] = b"spk_0: hola."
+    monkeypatch.setattr(resumir, "s3", s3)
+    monkeypatch.setattr(resumir, "bedrock", FakeStreamingBedrock(["x"] * 100, error_after=60))
+    monkeypatch.setattr(resumir, "BEDROCK_MAX_ATTEMPTS", 1)
+    monkeypatch.setattr(resumir, "summary_cache", None)
+    monkeypatch.setattr(resumir, "SUMMARY_STREAMING", True)
+    monkeypatch.setattr(resumir, "CHECKPOINT_TOKENS", 50)
+
+    result = resumir._process_record("bucket", "transcripciones-formateadas/job.txt")
+
+    assert result == {"status": "FAILED", "error": "BEDROCK_MODEL_ERROR", "detail": "ThrottlingException"}
+    assert "resumenes/job_summary.partial.txt" not in s3.objects
+    assert "resumenes/job.txt_FAILED.json" in s3.objects
+
+
+def test_failing_checkpoint_puts_do_not_abort_the_summary(monkeypatch):
+    class PartialPutFails(FakeS3):
+        def put_object(self, Bucket, Key, Body, Metadata=None, **kwargs):
+            if Key.endswith(".partial.txt"):
+                raise ClientError({"Error": {"Code": "SlowDown", "Message": Key}}, "PutObject")
+            super().put_object(Bucket, Key, Body, Metadata, **kwargs)
+
+    words = [f" palabra{i}" for i in range(120)]
+    s3 = PartialPutFails({"transcripciones-formateadas/job.txt": b"spk_0: hola."})
+    monkeypatch.setattr(resumir, "s3", s3)
+    monkeypatch.setattr(resumir, "bedrock", FakeStreamingBedrock(words))
+    monkeypatch.setattr(resumir, "summary_cache", None)
+    monkeypatch.setattr(resumir, "SUMMARY_STREAMING", True)
+    monkeypatch.setattr(resumir, "CHECKPOINT_TOKENS", 50)
+
+    result = resumir._process_record("bucket", "transcripciones-formateadas/job.txt")
+
+    assert result["status"] == "COMPLETED"
+    assert s3.objects["resumenes/job_summary.txt"].decode() == "".join(words)
+
+
+class FlakyStreamingBedrock(FakeStreamingBedrock):
+    """El primer stream se corta con throttling; los siguientes terminan bien."""
+
+    def invoke_model_with_response_stream(self, modelId, contentType, accept, body):
+        self.calls += 1
+        return {"body": _events(self.words, self.error_after if self.calls == 1 else None)}
+
+
+def test_retried_stream_restarts_its_checkpoints(monkeypatch):
+    words = [f" w{i}" for i in range(120)]
+    s3 = HistoryS3()
+    now = [0.0]
+    writer = PartialSummaryWriter(s3, "b", "resumenes/job_summary.partial.txt", every_tokens=50,
+                                  every_seconds=1000, clock=lambda: now[0])
+    monkeypatch.setattr(resumir, "bedrock", FlakyStreamingBedrock(words, error_after=70))
+    monkeypatch.setattr(resumir, "call_with_retries", _no_sleep_retries)
+
+    assert resumir._invoke_model_stream("prompt", writer) == "".join(words)
+
+    puts = [body.decode() for op, _, body in s3.history if op == "put"]
+    # Intento 1: checkpoint a los 50 tokens; intento 2: de nuevo a los 50 y a los 100
+    assert puts == ["".join(words[:50]), "".join(words[:50]), "".join(words[:100])]
+
+
+def _no_sleep_retries(fn, limiter, deadline, max_attempts=6, **kwargs):
+    from retries import call_with_retries
+    return call_with_retries(fn, limiter, deadline, max_attempts, sleep=lambda s: None, **kwargs)
+
+
+def test_checkpoint_writes_are_not_counted_as_bedrock_latency(monkeypatch):
+    class SlowS3(FakeS3):
+        def put_object(self, **kwargs):
+            time.sleep(0.05)
+            super().put_object(**kwargs)
+
+    writer = PartialSummaryWriter(SlowS3(), "b", "resumenes/job_summary.partial.txt", every_tokens=10)
+    monkeypatch.setattr(resumir, "bedrock", FakeStreamingBedrock([" x"] * 30))
+    with redirect_stdout(io.StringIO()), instrumentacion.job("resumir", "job") as metrics:
+        resumir._invoke_model_stream("prompt", writer)
+
+    assert writer.checkpoints == 3
+    assert metrics.values["PartialWriteMs"][0] >= 150
+    assert metrics.values["BedrockMs"][0] < 50
+
+
+class FakeTranscribe:
+    def get_transcription_job(self, TranscriptionJobName):
+        return {"TranscriptionJob": {"TranscriptionJobStatus": "COMPLETED"}}
+
+
+def test_check_status_exposes_partial_summary(monkeypatch, s3):
+    s3.put_object(Bucket="b", Key="transcripciones-formateadas/job.txt", Body=b"spk_0: hola.")
+    s3.put_object(Bucket="b", Key="resumenes/job_summary.partial.txt", Body=b"- primeros puntos",
+                  Metadata={"generated-tokens": "42"})
+    monkeypatch.setattr(transcribir, "s3_client", s3)
+    monkeypatch.setattr(transcribir, "transcribe_client", FakeTranscribe())
+
+    response = transcribir.lambda_handler({"body": json.dumps({"checkStatus": {"job_name": "job"}})}, None)
+    body = json.loads(response["body"])
+
+    assert body["summaryReady"] is False
+    assert body["summaryProgress"] == {"text": "- primeros puntos", "tokens": 42}
+
+    s3.put_object(Bucket="b", Key="resumenes/job_summary.txt", Body=b"- final")
+    body = json.loads(transcribir.lambda_handler({"body": json.dumps({"checkStatus": {"job_name": "job"}})}, None)["body"])
+    assert body["summaryReady"] is True and body["summaryProgress"] is None
@@ -0,0 +1,149 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.bench_admision import Clock, SimS3, SimSQS, SimTranscribe, simulate
+from tests.unit.lambda_loader import load_lambda
+
+transcribir = load_lambda("transcribir")
+
+import admission  # noqa: E402
+from comun import estado  # noqa: E402
+
+
+def _items(*identities):
+    return [{"identity": who, "n": n} for n, who in enumerate(identities)]
+
+
+def test_round_robin_between_identities():
+    share = admission.FairShare(burst=10, rate=0)
+    selected = share.select(_items("a", "a", "a", "a", "b", "c"), slots=4, now=0)
+    assert [item["identity"] for item in selected] == ["a", "b", "c", "a"]
+
+
+def test_token_buckets_limit_bursts_but_spare_capacity_is_used():
+    share = admission.FairShare(burst=2, rate=1 / 60)
+    first = share.select(_items("a", "a", "a", "b"), slots=3, now=0)
+    assert [item["identity"] for item in first] == ["a", "b", "a"]
+
+    # "a" se quedó sin tokens: con otro esperando, el lugar es para el otro
+    second = share.select(_items("a", "c"), slots=1, now=1)
+    assert [item["identity"] for item in second] == ["c"]
+    # Si nadie más espera, la capacidad libre no se desperdicia
+    assert len(share.select(_items("a", "a"), slots=2, now=2)) == 2
+
+
+def test_bucket_state_round_trips_and_drops_full_buckets():
+    share = admission.FairShare(burst=2, rate=1)
+    share.select(_items("a", "a", "b"), slots=3, now=0)
+    state = json.loads(json.dumps(share.to_dict(now=0.5)))
+    assert set(state) == {"a", "b"}
+
+    restored = admission.FairShare.from_dict(state, burst=2, rate=1)
+    assert restored.to_dict(now=10) == {}
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    clock = Clock()
+    sqs = SimSQS(clock)
+    transcribe = SimTranscribe(clock, capacity=1, durations={"s3://bucket/audios/user-a/a.mp3": 60,
+                                                             "s3://bucket/audios/user-a/b.mp3": 60})
+    store = estado.MemoryJobStateStore()
+    for name, value in {"sqs_client": sqs, "transcribe_client": transcribe, "s3_client": SimS3(),
+                        "job_state": store, "ADMISSION_QUEUE_URL": "sim://cola",
+                        "TRANSCRIBE_MAX_CONCURRENT": 1, "time": SimpleNamespace(time=clock.time)}.items():
+        monkeypatch.setattr(transcribir, name, value)
+    return clock, sqs, transcribe
+
+
+def _start(key):
+    body = {"s3": {"bucketName": "bucket", "key": key}, "transcribe": {"languageCode": "es-ES", "maxSpeakers": 2}}
+    response = transcribir.lambda_handler({"body": json.dumps(body)}, None)
+    return response["statusCode"], json.loads(response["body"])
+
+
+def _check(job_name):
+    return json.loads(transcribir.lambda_handler({"checkStatus": {"job_name": job_name}}, None)["body"])
+
+
+def test_segments_take_their_turn_without_tokens():
+    share = admission.FairShare(burst=1, rate=0)
+    pending = [{"identity": "a", "parent": "largo"}] * 3 + _items("a", "b")
+    selected = share.select(pending, slots=4, now=0, exempt=lambda item: item.get("parent") is not None)
+    # Los segmentos de "a" no gastan su token, pero "b" igual entra en la primera vuelta
+    assert [item["identity"] for item in selected] == ["a", "b", "a", "a"]
+    assert share.bucket("a", 0).tokens == 1
+
+
+def test_idle_start_is_not_queued(queue):
+    _, sqs, transcribe = queue
+    code, body = _start("audios/user-a/a.mp3")
+
+    assert code == 200 and sqs.messages == []
+    assert body["jobName"] in transcribe.jobs
+    assert _check(body["jobName"])["status"] == "IN_PROGRESS"
+    # El inicio directo gasta un token del usuario
+    tokens, _ = json.loads(transcribir.s3_client.objects[transcribir.ADMISSION_STATE_KEY])["user-a"]
+    assert tokens == pytest.approx(transcribir.ADMISSION_USER_BURST - 1)
+
+
+def test_users_without_tokens_are_queued_even_with_capacity(queue, monkeypatch):
+    _, sqs, transcribe = queue
+    monkeypatch.setattr(transcribir, "ADMISSION_USER_BURST", 1)
+    monkeypatch.setattr(transcribe, "capacity", 5)
+    monkeypatch.setattr(transcribir, "TRANSCRIBE_MAX_CONCURRENT", 5)
+    assert _start("audios/user-a/a.mp3")[0] == 200
+
+    code, second = _start("audios/user-a/b.mp3")
+    assert code == 202 and second["status"] == "QUEUED" and len(sqs.messages) == 1
+    # Sin nadie más esperando, el scheduler le da el lugar libre
+    assert transcribir._drain_queue(now=0)["started"] == 1
+
+
+def test_queued_jobs_start_when_capacity_frees(queue):
+    clock, sqs, transcribe = queue
+    code, first = _start("audios/user-a/a.mp3")
+    code_second, second = _start("audios/user-a/b.mp3")
+
+    # El primero entra directo; el segundo choca con el tope y espera en el queue
+    assert code == 200 and code_second == 202 and second["status"] == "QUEUED"
+    assert _check(second["jobName"])["status"] == "QUEUED"
+
+    # Sin lugar no se lee el queue; el segundo sigue encolado
+    assert transcribir._drain_queue(now=10) == {"slots": 0, "received": 0, "started": 0, "failed": 0}
+    assert _check(second["jobName"])["status"] == "QUEUED"
+
+    clock.now = 61
+    assert transcribir._drain_queue(now=61)["started"] == 1
+    assert sqs.messages == []
+    assert transcribir.job_state.get(second["jobName"])["stages"]["transcribir"]["queuedSeconds"] == 61
+
+
+def test_limit_exceeded_returns_the_job_to_the_queue(queue, monkeypatch):
+    _, sqs, transcribe = queue
+    monkeypatch.setattr(transcribir, "TRANSCRIBE_MAX_CONCURRENT", 5)  # el tope real es menor
+    _start("audios/user-a/a.mp3")
+    _, second = _start("audios/user-a/b.mp3")
+
+    result = transcribir._drain_queue(now=0)
+    assert result["received"] == 1 and result["started"] == 0 and result["failed"] == 0
+    assert len(sqs.messages) == 1 and sqs.messages[0]["visible_at"] == 0
+    assert _check(second["jobName"])["status"] == "QUEUED"
+
+
+def test_burst_of_1000_submissions():
+    fair = simulate(submissions=1000, users=100, capacity=100)
+    fifo = simulate(submissions=1000, users=100, capacity=100, mode="fifo")
+    direct = simulate(submissions=1000, users=100, capacity=100, mode="direct")
+
+    # Sin admisión, lo que excede el tope falla; con admisión todo se inicia sin pasarse
+    assert direct["rejected"] == 900
+    assert fair["started"] == 1000 and fair["rejected"] == 0 and fair["peak"] == 100
+    # El throughput lo pone el tope de Transcribe: unos 100 jobs cada ~6 min
+    assert fair["throughput_per_min"] == pytest.approx(fifo["throughput_per_min"], rel=0.05)
+    assert fair["throughput_per_min"] > 14
+    # Los usuarios con pocos audios no esperan detrás del que subió 500
+    assert fair["light_p95"] < 0.6 * fifo["light_p95"]
+    assert fair["light_p50"] < fair["heavy_p50"]
@@ -0,0 +1,111 @@
+import json
+import threading
+
+import pytest
+from botocore.exceptions import ClientError
+
+from tests.unit.lambda_loader import load_lambda
+
+transcribir = load_lambda("transcribir")
+
+from comun import estado  # noqa: E402
+
+AUDIO = b"ID3 audio de prueba"
+
+
+class CountingTranscribe:
+    def __init__(self, fail=False):
+        self.started = []
+        self.fail = fail
+        self._lock = threading.Lock()
+
+    def start_transcription_job(self, TranscriptionJobName, **kwargs):
+        if self.fail:
+            raise ClientError({"Error": {"Code": "LimitExceededException", "Message": ""}}, "StartTranscriptionJob")
+        with self._lock:
+            self.started.append(TranscriptionJobName)
+
+
+@pytest.fixture
+def env(monkeypatch, s3):
+    store = estado.MemoryJobStateStore()
+    transcribe = CountingTranscribe()
+    s3.objects.update({"audios/user-a/reunion.mp3": AUDIO, "audios/user-b/copia.mp3": AUDIO})
+    monkeypatch.setattr(transcribir, "job_state", store)
+    monkeypatch.setattr(transcribir, "transcribe_client", transcribe)
+    monkeypatch.setattr(transcribir, "s3_client", s3)
+    return store, transcribe
+
+
+def _start(key="audios/user-a/reunion.mp3", language="es-ES", speakers=2):
+    body = {"s3": {"bucketName": "bucket", "key": key}, "transcribe": {"languageCode": language, "maxSpeakers": speakers}}
+    response = transcribir.lambda_handler({"body": json.dumps(body)}, None)
+    return response["statusCode"], json.loads(response["body"])
+
+
+def test_repeat_request_returns_the_existing_job(env):
+    _, transcribe = env
+    _, first = _start()
+    _, second = _start()
+
+    assert first["deduplicated"] is False and second["deduplicated"] is True
+    assert second["jobName"] == first["jobName"]
+    assert second["outputLocation"] == first["outputLocation"]
+    assert transcribe.started == [first["jobName"]]
+
+
+def test_configuration_and_owner_are_part_of_the_key(env):
+    _, transcribe = env
+    jobs = {
+        _start()[1]["jobName"],
+        _start(language="en-US")[1]["jobName"],
+        _start(speakers=3)[1]["jobName"],
+        # Mismo contenido subido por otro usuario: no comparte el job
+        _start(key="audios/user-b/copia.mp3")[1]["jobName"],
+    }
+    assert len(jobs) == 4 and len(transcribe.started) == 4
+
+
+def test_concurrent_duplicates_start_one_job(env):
+    _, transcribe = env
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(_start()[1])) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(transcribe.started) == 1
+    assert {r["jobName"] for r in results} == set(transcribe.started)
+    assert sum(not r["deduplicated"] for r in results) == 1
+
+
+def test_failed_jobs_are_not_reused(env):
+    store, transcribe = env
+    _, first = _start()
+    store.record(first["jobName"], estado.RESUMIR, estado.FAILED, error="BEDROCK_MODEL_ERROR")
+
+    _, second = _start()
+    assert second["deduplicated"] is False and second["jobName"] != first["jobName"]
+    assert _start()[1]["jobName"] == second["jobName"]
+
+
+def test_start_failure_releases_the_claim(env, monkeypatch):
+    store, _ = env
+    monkeypatch.setattr(transcribir, "transcribe_client", CountingTranscribe(fail=True))
+    status, _ = _start()
+    assert status == 500
+
+    transcribe = CountingTranscribe()
+    monkeypatch.setattr(transcribir, "transcribe_client", transcribe)
+    status, body = _start()
+    assert status == 200 and body["deduplicated"] is False
+    assert transcribe.started == [body["jobName"]]
+
+
+def test_without_store_every_request_starts_a_job(env, monkeypatch):
+    _, transcribe = env
+    monkeypatch.setattr(transcribir, "job_state", None)
+    _start()
+    _start()
+    assert len(transcribe.started) == 2
@@ -0,0 +1,87 @@
+import io
+
+import pytest
+
+from tests.unit.lambda_loader import load_lambda
+
+load_lambda("transcribir")
+
+from mp3_frames import Mp3FormatError, parse_header, plan_segments, scan_frames  # noqa: E402
+
+# MPEG 1 Layer III, 128 kbps, 44.1 kHz, sin padding: 417 bytes y 1152 muestras por frame
+HEADER = b"\xff\xfb\x90\x00"
+FRAME_SIZE = 417
+FRAME_SECONDS = 1152 / 44100
+
+
+def frame(fill=b"\x00"):
+    return HEADER + fill * (FRAME_SIZE - 4)
+
+
+def mp3(frames, id3=True, info=True, trailer=True):
+    data = bytearray()
+    if id3:
+        # Tag ID3v2 de 20 bytes (tamaño en enteros de 7 bits)
+        data += b"ID3\x04\x00\x00\x00\x00\x00\x14" + b"\xff" * 20
+    if info:
+        data += HEADER + b"\x00" * 32 + b"Info" + b"\x00" * (FRAME_SIZE - 40)
+    data += frame() * frames
+    if trailer:
+        data += b"TAG" + b"\x00" * 125
+    return bytes(data)
+
+
+def test_parse_header():
+    assert parse_header(HEADER) == (FRAME_SIZE, FRAME_SECONDS)
+    assert parse_header(b"\xff\xfb\x92\x00")[0] == FRAME_SIZE + 1  # con padding
+    assert parse_header(b"\xff\xfb\xf0\x00") is None  # bitrate inválido
+    assert parse_header(b"TAG\x00") is None
+
+
+def test_scan_skips_tags_info_frame_and_garbage():
+    data = mp3(10) + b"\xff\xe0basura" + frame() * 5
+    frames = list(scan_frames(io.BytesIO(data)))
+
+    assert len(frames) == 15
+    assert frames[0].offset == 10 + 20 + FRAME_SIZE
+    assert all(f.size == FRAME_SIZE for f in frames)
+    # Los frames posteriores a la basura se encuentran en su offset real
+    assert data[frames[10].offset:frames[10].offset + 4] == HEADER
+
+
+def test_scan_streams_in_small_chunks():
+    data = mp3(300)
+    frames = list(scan_frames(io.BytesIO(data), chunk_size=1000))
+    assert frames == list(scan_frames(io.BytesIO(data)))
+    assert len(frames) == 300
+
+
+def test_plans_cover_the_audio_with_overlap():
+    frames = list(scan_frames(io.BytesIO(mp3(1600, trailer=False))))
+    total = len(frames) * FRAME_SECONDS  # ~41.8 s
+    plans = plan_segments(frames, segment_seconds=10, overlap_seconds=1)
+
+    # 41.8 s en segmentos de 10 s: el resto de 1.8 s se suma al último
+    assert len(plans) == 4
+    assert plans[0].start_offset == frames[0].offset and plans[0].start_time == 0
+    assert plans[-1].end_offset == frames[-1].offset + FRAME_SIZE
+    assert plans[-1].end_time == pytest.approx(total)
+
+    for previous, plan in zip(plans, plans[1:]):
+        assert plan.start_offset < previous.end_offset
+        assert previous.end_time - plan.start_time == pytest.approx(1, abs=FRAME_SECONDS)
+        # Las ventanas de stitching se tocan justo en la mitad del solapamiento
+        assert previous.keep_until == plan.keep_from
+        assert plan.start_time < plan.keep_from < previous.end_time
+    assert plans[0].keep_from == 0 and plans[-1].keep_until == float("inf")
+
+
+def test_short_audio_is_a_single_segment():
+    frames = list(scan_frames(io.BytesIO(mp3(100))))
+    plans = plan_segments(frames, segment_seconds=10, overlap_seconds=1)
+    assert len(plans) == 1 and plans[0].keep_until == float("inf")
+
+
+def test_non_mp3_is_rejected():
+    with pytest.raises(Mp3FormatError):
+        plan_segments(scan_frames(io.BytesIO(b"RIFF" + b"\x00" * 5000)), 10, 1)
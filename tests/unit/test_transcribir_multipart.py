@@ -0,0 +1,160 @@
+import hashlib
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+from tests.unit.lambda_loader import load_lambda
+
+transcribir = load_lambda("transcribir")
+
+import multipart  # noqa: E402
+from comun import estado  # noqa: E402
+
+MiB = 1024 * 1024
+KEY = "audios/user-a/reunion.mp3"
+
+
+class MultipartS3:
+    """Fake de S3 multipart: las URLs firmadas se "suben" con `put_part`."""
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+        self._ids = 0
+
+    def create_multipart_upload(self, Bucket, Key, ContentType):
+        self._ids += 1
+        upload_id = f"upload-{self._ids}"
+        self.uploads[upload_id] = {"key": Key, "parts": {}}
+        return {"UploadId": upload_id}
+
+    def _upload(self, UploadId):
+        if UploadId not in self.uploads:
+            raise ClientError({"Error": {"Code": "NoSuchUpload", "Message": ""}}, "Multipart")
+        return self.uploads[UploadId]
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn):
+        assert ClientMethod == "upload_part"
+        return f"https://s3/{Params['Key']}?uploadId={Params['UploadId']}&partNumber={Params['PartNumber']}"
+
+    def put_part(self, url, data):
+        query = dict(pair.split("=") for pair in url.split("?")[1].split("&"))
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        self._upload(query["uploadId"])["parts"][int(query["partNumber"])] = (etag, data)
+        return etag
+
+    def list_parts(self, Bucket, Key, UploadId, PartNumberMarker=0):
+        parts = sorted(self._upload(UploadId)["parts"].items())
+        page = [p for p in parts if p[0] > PartNumberMarker][:2]  # páginas chicas para probar el paginado
+        return {"Parts": [{"PartNumber": n, "ETag": etag} for n, (etag, _) in page],
+                "IsTruncated": bool(page) and page[-1][0] != parts[-1][0],
+                "NextPartNumberMarker": page[-1][0] if page else 0}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        upload = self._upload(UploadId)
+        numbers = [p["PartNumber"] for p in MultipartUpload["Parts"]]
+        assert numbers == sorted(numbers)
+        for part in MultipartUpload["Parts"]:
+            if upload["parts"].get(part["PartNumber"], (None,))[0] != part["ETag"]:
+                raise ClientError({"Error": {"Code": "InvalidPart", "Message": ""}}, "CompleteMultipartUpload")
+        self.objects[Key] = b"".join(upload["parts"][n][1] for n in numbers)
+        del self.uploads[UploadId]
+        return {"ETag": '"final-2"'}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self._upload(UploadId)
+        del self.uploads[UploadId]
+
+    def head_object(self, Bucket, Key):
+        return {"ETag": f'"{hashlib.md5(self.objects[Key]).hexdigest()}"', "ContentLength": len(self.objects[Key])}
+
+
+class StartedJobs:
+    def __init__(self):
+        self.started = []
+
+    def start_transcription_job(self, TranscriptionJobName, Media, **kwargs):
+        self.started.append(Media["MediaFileUri"])
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    fake = MultipartS3()
+    monkeypatch.setattr(transcribir, "s3_client", fake)
+    monkeypatch.setattr(transcribir, "transcribe_client", StartedJobs())
+    monkeypatch.setattr(transcribir, "job_state", estado.MemoryJobStateStore())
+    monkeypatch.setattr(transcribir, "UPLOAD_URLS_PER_CALL", 3)
+    return fake
+
+
+def _call(route, params, identity="user-a"):
+    event = {"body": json.dumps({route: params})}
+    if identity:
+        event["requestContext"] = {"identity": {"cognitoIdentityId": identity}}
+    response = transcribir.lambda_handler(event, None)
+    return response["statusCode"], json.loads(response["body"])
+
+
+def test_plan_parts():
+    assert multipart.plan_parts(100 * MiB, 16 * MiB) == (16 * MiB, 7)
+    assert multipart.plan_parts(1 * MiB, 1 * MiB) == (5 * MiB, 1)  # mínimo de S3
+    # Con archivos enormes el tamaño de parte crece para no pasar de 10.000 partes
+    part_size, count = multipart.plan_parts(200_000 * MiB, 16 * MiB)
+    assert count <= 10000 and part_size * count >= 200_000 * MiB
+    with pytest.raises(multipart.UploadError):
+        multipart.plan_parts(0, 16 * MiB)
+
+
+def test_parallel_upload_and_complete_with_transcription(s3):
+    code, init = _call("uploadInit", {"key": KEY, "size": 70 * MiB})
+    assert code == 200 and init["partCount"] == 5 and init["partSize"] == 16 * MiB
+    assert [u["partNumber"] for u in init["urls"]] == [1, 2, 3]
+
+    _, more = _call("uploadParts", {"key": KEY, "uploadId": init["uploadId"], "partNumbers": [4, 5]})
+    urls = init["urls"] + more["urls"]
+    chunks = [bytes([n]) * 10 for n in range(5)]
+    # Las partes llegan en cualquier orden
+    etags = {u["partNumber"]: s3.put_part(u["url"], chunks[u["partNumber"] - 1]) for u in reversed(urls)}
+
+    code, done = _call("uploadComplete", {
+        "key": KEY, "uploadId": init["uploadId"],
+        "parts": [{"partNumber": n, "etag": etag} for n, etag in etags.items()],
+        "transcribe": {"languageCode": "es-ES", "maxSpeakers": 2},
+    })
+    assert code == 200 and done["upload"]["parts"] == 5
+    assert s3.objects[KEY] == b"".join(chunks)
+    assert done["jobName"].startswith("transcription-job-")
+    assert transcribir.transcribe_client.started == [f"s3://{transcribir.output_bucket}/{KEY}"]
+
+
+def test_complete_without_etags_lists_the_parts(s3):
+    _, init = _call("uploadInit", {"key": KEY, "size": 40 * MiB})
+    for url in init["urls"]:
+        s3.put_part(url["url"], b"x")
+
+    code, done = _call("uploadComplete", {"key": KEY, "uploadId": init["uploadId"]})
+    assert code == 200 and done["upload"]["parts"] == 3 and "jobName" not in done
+
+
+def test_abort_and_errors(s3):
+    _, init = _call("uploadInit", {"key": KEY, "size": 12 * MiB})
+    assert _call("uploadAbort", {"key": KEY, "uploadId": init["uploadId"]}) == (200, {"aborted": True, "key": KEY})
+    assert _call("uploadComplete", {"key": KEY, "uploadId": init["uploadId"]})[0] == 404
+
+    assert _call("uploadInit", {"key": "otra/carpeta.mp3", "size": 1})[0] == 400
+    assert _call("uploadInit", {"key": KEY, "size": 1}, identity="user-b")[0] == 403
+    assert _call("uploadParts", {"key": KEY, "uploadId": "x", "partNumbers": [1, 2, 3, 4]})[0] == 400
+    assert _call("uploadParts", {"key": KEY, "uploadId": "x", "partNumbers": [0]})[0] == 400
+
+
+@pytest.mark.parametrize("route, params", [
+    ("uploadInit", {"key": KEY, "size": 12 * MiB}),
+    ("uploadParts", {"key": KEY, "uploadId": "x", "partNumbers": [1]}),
+    ("uploadComplete", {"key": KEY, "uploadId": "x"}),
+    ("uploadAbort", {"key": KEY, "uploadId": "x"}),
+])
+def test_anonymous_upload_requests_are_rejected(s3, route, params):
+    # Por /transcribir (sin authorizer) requestContext no trae identidad
+    assert _call(route, params, identity=None)[0] == 401
+    assert s3.uploads == {} and not s3.objects
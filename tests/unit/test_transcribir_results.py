@@ -0,0 +1,161 @@
+import base64
+import gzip
+import io
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+from tests.unit.lambda_loader import load_lambda
+
+transcribir = load_lambda("transcribir")
+
+from comun import estado  # noqa: E402
+from results_delivery import accepts_gzip  # noqa: E402
+
+
+class RangeS3:
+    """Fake de S3 con GET por rangos y URLs prefirmadas."""
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.ranges = []
+
+    def get_object(self, Bucket, Key, Range=None):
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": ""}}, "GetObject")
+        data = self.objects[Key]
+        if Range is None:
+            return {"Body": io.BytesIO(data)}
+        self.ranges.append(Range)
+        start, end = (int(n) for n in Range[len("bytes="):].split("-"))
+        if start >= len(data):
+            raise ClientError({"Error": {"Code": "InvalidRange", "Message": ""}}, "GetObject")
+        end = min(end, len(data) - 1)
+        return {"Body": io.BytesIO(data[start:end + 1]), "ContentRange": f"bytes {start}-{end}/{len(data)}"}
+
+    def head_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "404", "Message": ""}}, "HeadObject")
+        return {}
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn):
+        return f"https://{Params['Bucket']}.s3.amazonaws.com/{Params['Key']}?X-Amz-Expires={ExpiresIn}"
+
+
+TEXT = "\n\n".join(f"spk_{i % 2}: Señoría, acción número {i} — año 2025 ✓." for i in range(400))
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    fake = RangeS3({
+        "transcripciones-formateadas/job.txt": TEXT.encode("utf-8"),
+        "resumenes/job_summary.txt": "- resumen".encode("utf-8"),
+    })
+    monkeypatch.setattr(transcribir, "s3_client", fake)
+    monkeypatch.setattr(transcribir, "job_state", None)
+    return fake
+
+
+def _get(params, headers=None):
+    event = {"body": json.dumps({"getResults": {"job_name": "job", **params}}), "headers": headers}
+    return transcribir.lambda_handler(event, None)
+
+
+def _json(response):
+    body = response["body"]
+    if response.get("isBase64Encoded"):
+        body = gzip.decompress(base64.b64decode(body)).decode("utf-8")
+    return json.loads(body)
+
+
+def test_inline_default_is_unchanged(s3):
+    response = _get({})
+    assert "isBase64Encoded" not in response
+    assert json.loads(response["body"]) == {"transcription": TEXT, "summary": "- resumen"}
+
+
+def test_inline_is_gzipped_when_accepted(s3):
+    response = _get({}, headers={"accept": "application/gzip, application/json"})
+
+    assert response["isBase64Encoded"] is True
+    assert response["headers"]["Content-Type"] == "application/gzip"
+    assert "Content-Encoding" not in response["headers"]
+    assert _json(response) == {"transcription": TEXT, "summary": "- resumen"}
+    assert len(response["body"]) < len(json.dumps({"transcription": TEXT}))
+
+
+def test_small_payloads_are_not_compressed(s3):
+    s3.objects["transcripciones-formateadas/job.txt"] = b"spk_0: hola"
+    response = _get({}, headers={"Accept": "application/gzip"})
+    assert "isBase64Encoded" not in response
+
+
+def test_accept_encoding_alone_does_not_return_binary(s3):
+    # Sin Accept: application/gzip, API Gateway devolvería el base64 como texto
+    response = _get({}, headers={"Accept-Encoding": "gzip, deflate, br", "Accept": "*/*"})
+    assert "isBase64Encoded" not in response
+
+
+def test_url_delivery_only_signs_ready_objects(s3, monkeypatch):
+    body = _json(_get({"delivery": "url"}))
+    assert body["transcriptionUrl"].endswith("transcripciones-formateadas/job.txt?X-Amz-Expires=300")
+    assert body["summaryUrl"] is not None and body["expiresIn"] == 300
+
+    store = estado.MemoryJobStateStore()
+    store.record("job", estado.FORMATEAR, estado.COMPLETED)
+    store.record("job", estado.RESUMIR, estado.IN_PROGRESS)
+    monkeypatch.setattr(transcribir, "job_state", store)
+    body = _json(_get({"delivery": "url"}))
+    assert body["transcriptionUrl"] is not None and body["summaryUrl"] is None
+
+
+def test_pages_rebuild_the_transcript_without_splitting_characters(s3):
+    pieces, offset, pages = [], 0, 0
+    while offset is not None:
+        body = _json(_get({"offset": offset, "maxBytes": 1024}))
+        if pages == 0:
+            assert body["summary"] == "- resumen"
+        else:
+            assert body["summary"] is None
+        pieces.append(body["transcription"])
+        assert body["transcriptionRange"]["totalBytes"] == len(TEXT.encode("utf-8"))
+        offset = body["transcriptionRange"]["nextOffset"]
+        pages += 1
+
+    assert "".join(pieces) == TEXT
+    assert pages > 10
+    assert all(r.startswith("bytes=") for r in s3.ranges)
+
+
+def test_page_cuts_never_split_utf8(s3):
+    s3.objects["transcripciones-formateadas/job.txt"] = ("ñ" * 600 + "✓" * 600).encode("utf-8")
+    pieces, offset = [], 0
+    while offset is not None:
+        body = _json(_get({"offset": offset, "maxBytes": 1025}))
+        pieces.append(body["transcription"])
+        offset = body["transcriptionRange"]["nextOffset"]
+    assert "".join(pieces) == "ñ" * 600 + "✓" * 600
+
+
+def test_missing_transcript_and_invalid_pages(s3):
+    del s3.objects["transcripciones-formateadas/job.txt"]
+    body = _json(_get({"offset": 0, "maxBytes": 4096}))
+    assert body["transcription"] is None and body["transcriptionRange"] is None
+
+    assert _get({"maxBytes": 10})["statusCode"] == 400
+    assert _get({"maxBytes": 4096, "checkpoint": [-1, 0]})["statusCode"] == 400
+    assert _get({"maxBytes": 4096, "checkpoint": "10:0"})["statusCode"] == 400
+    assert _get({"delivery": "ftp"})["statusCode"] == 400
+
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"Accept": "application/gzip"}, True),
+    ({"accept": "application/gzip;q=1.0, application/json;q=0.8"}, True),
+    ({"Accept": "application/json, application/gzip"}, False),
+    ({"Accept": "application/gzip;q=0, application/json"}, False),
+    ({"Accept-Encoding": "gzip"}, False),
+    (None, False),
+])
+def test_accepts_gzip(headers, expected):
+    assert accepts_gzip(headers) is expected
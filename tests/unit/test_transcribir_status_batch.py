@@ -0,0 +1,110 @@
+import json
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+from tests.unit.lambda_loader import load_lambda
+
+transcribir = load_lambda("transcribir")
+
+
+class StubTranscribe:
+    def __init__(self, latency=0.0, slow=(), missing=()):
+        self.latency = latency
+        self.slow = set(slow)
+        self.missing = set(missing)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get_transcription_job(self, TranscriptionJobName):
+        with self._lock:
+            self.calls += 1
+        time.sleep(1.5 if TranscriptionJobName in self.slow else self.latency)
+        if TranscriptionJobName in self.missing:
+            raise ClientError({"Error": {"Code": "BadRequestException", "Message": "no existe"}},
+                              "GetTranscriptionJob")
+        return {"TranscriptionJob": {"TranscriptionJobStatus": "COMPLETED"}}
+
+
+class StubS3:
+    def __init__(self, keys, latency=0.0):
+        self.keys = set(keys)
+        self.latency = latency
+
+    def head_object(self, Bucket, Key):
+        time.sleep(self.latency)
+        if Key not in self.keys:
+            raise ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, "HeadObject")
+        return {}
+
+    def get_object(self, Bucket, Key):
+        raise ClientError({"Error": {"Code": "NoSuchKey", "Message": ""}}, "GetObject")
+
+
+def _batch(job_names, context=None):
+    event = {"body": json.dumps({"checkStatusBatch": {"job_names": job_names}})}
+    return transcribir.lambda_handler(event, context)
+
+
+def test_batch_matches_single_status(monkeypatch):
+    monkeypatch.setattr(transcribir, "transcribe_client", StubTranscribe())
+    monkeypatch.setattr(transcribir, "s3_client", StubS3({
+        "transcripciones-formateadas/a.txt", "resumenes/a_summary.txt", "transcripciones-formateadas/b.txt",
+    }))
+
+    body = json.loads(_batch(["a", "b", "c"])["body"])
+
+    assert body["complete"] is True and body["timedOut"] == 0
+    assert [job["jobName"] for job in body["jobs"]] == ["a", "b", "c"]
+    for job in body["jobs"]:
+        single = transcribir.lambda_handler({"checkStatus": {"job_name": job["jobName"]}}, None)
+        assert job == {"jobName": job["jobName"], **json.loads(single["body"])}
+
+
+def test_batch_runs_lookups_concurrently(monkeypatch):
+    monkeypatch.setattr(transcribir, "transcribe_client", StubTranscribe(latency=0.05))
+    monkeypatch.setattr(transcribir, "s3_client", StubS3((), latency=0.05))
+    monkeypatch.setattr(transcribir, "BATCH_MAX_WORKERS", 16)
+
+    start = time.perf_counter()
+    body = json.loads(_batch([f"job-{i}" for i in range(16)])["body"])
+    elapsed = time.perf_counter() - start
+
+    assert len(body["jobs"]) == 16
+    # En serie serían 16 x 150 ms
+    assert elapsed < 1.0
+
+
+def test_slow_and_failing_jobs_do_not_block_the_rest(monkeypatch):
+    transcribe = StubTranscribe(slow={"colgado"}, missing={"inexistente"})
+    monkeypatch.setattr(transcribir, "transcribe_client", transcribe)
+    monkeypatch.setattr(transcribir, "s3_client", StubS3(()))
+    monkeypatch.setattr(transcribir, "BATCH_TIMEOUT_SECONDS", 0.3)
+
+    start = time.perf_counter()
+    body = json.loads(_batch(["ok", "colgado", "inexistente", "ok"])["body"])
+
+    assert time.perf_counter() - start < 2
+    assert transcribe.calls == 3  # los repetidos se consultan una vez
+    assert body["complete"] is False and body["timedOut"] == 1
+    statuses = {job["jobName"]: job for job in body["jobs"]}
+    assert statuses["ok"]["status"] == "COMPLETED"
+    assert statuses["colgado"] == {"jobName": "colgado", "status": "TIMEOUT"}
+    assert statuses["inexistente"] == {"jobName": "inexistente", "status": "ERROR", "error": "BadRequestException"}
+
+
+def test_batch_respects_remaining_lambda_time():
+    class Context:
+        def get_remaining_time_in_millis(self):
+            return 3000
+
+    assert transcribir._batch_timeout(Context()) == 2
+    assert transcribir._batch_timeout(None) == transcribir.BATCH_TIMEOUT_SECONDS
+
+
+def test_batch_rejects_invalid_requests(monkeypatch):
+    monkeypatch.setattr(transcribir, "BATCH_MAX_JOBS", 2)
+
+    assert _batch(["a", "b", "c"])["statusCode"] == 400
+    assert _batch("a")["statusCode"] == 400
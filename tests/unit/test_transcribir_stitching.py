@@ -0,0 +1,238 @@
+import gzip
+import io
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+from benchmarks.bench_admision import Clock, SimSQS
+from tests.unit.lambda_loader import load_lambda
+from tests.unit.test_transcribir_mp3 import FRAME_SECONDS, mp3
+
+formatear = load_lambda("formatear")
+transcribir = load_lambda("transcribir")
+
+from comun import compresion, estado  # noqa: E402
+from stitching import stitch  # noqa: E402
+
+WORD_SECONDS = 0.5
+TURN_WORDS = 5
+
+
+def _script(words):
+    """Palabras (inicio, texto, hablante) del audio completo; cada turno termina en punto."""
+    return [(i * WORD_SECONDS, f"w{i}", f"spk_{(i // TURN_WORDS) % 2}") for i in range(words)]
+
+
+def _transcript(script, start=0.0, end=float("inf"), relabel=None):
+    """JSON de Transcribe de lo que se escucha entre `start` y `end`, con tiempos locales."""
+    relabel = relabel or {}
+    items, segments = [], []
+    heard = [(t, word, speaker) for t, word, speaker in script if start <= t < end]
+    for n, (t, word, speaker) in enumerate(heard):
+        label = relabel.get(speaker, speaker)
+        local = t - start
+        items.append({"start_time": f"{local:.3f}", "end_time": f"{local + 0.4:.3f}", "type": "pronunciation",
+                      "alternatives": [{"content": word}], "speaker_label": label})
+        if n + 1 == len(heard) or heard[n + 1][2] != speaker:
+            items.append({"type": "punctuation", "alternatives": [{"content": "."}], "speaker_label": label})
+        if segments and segments[-1]["speaker_label"] == label:
+            segments[-1]["end_time"] = f"{local + 0.4:.3f}"
+        else:
+            segments.append({"start_time": f"{local:.3f}", "end_time": f"{local + 0.4:.3f}",
+                             "speaker_label": label, "items": []})
+    return {"results": {"transcripts": [{"transcript": ""}], "speaker_labels": {"segments": segments},
+                        "items": items}}
+
+
+def _formatted(transcript):
+    return "".join(formatear.format_transcript(io.BytesIO(json.dumps(transcript).encode())))
+
+
+def _parts(script, bounds, overlap):
+    """Segmentos como los planifica mp3_frames: cada uno arranca `overlap` antes del límite."""
+    parts = []
+    for index, nominal in enumerate(bounds[:-1]):
+        start = nominal - overlap if index else 0.0
+        parts.append({"start_time": start, "end_time": bounds[index + 1]})
+    for index, part in enumerate(parts):
+        part["keep_from"] = 0.0 if index == 0 else (part["start_time"] + parts[index - 1]["end_time"]) / 2
+        part["keep_until"] = (float("inf") if index + 1 == len(parts)
+                              else (parts[index + 1]["start_time"] + part["end_time"]) / 2)
+        # Transcribe numera los hablantes por segmento: en los impares quedan invertidos
+        relabel = {"spk_0": "spk_1", "spk_1": "spk_0"} if index % 2 else None
+        part["transcript"] = _transcript(script, part["start_time"], part["end_time"], relabel)
+    return parts
+
+
+def test_stitched_transcript_matches_a_single_job():
+    script = _script(120)  # 60 s
+    stitched = stitch(_parts(script, [0, 20, 40, 60], overlap=4), "largo")
+
+    words = [item["alternatives"][0]["content"] for item in stitched["results"]["items"]
+             if item["type"] == "pronunciation"]
+    assert words == [word for _, word, _ in script]
+    assert stitched["results"]["items"][-3]["start_time"] == f"{script[-2][0]:.3f}"
+    assert stitched["results"]["speaker_labels"]["speakers"] == 2
+    assert _formatted(stitched) == _formatted(_transcript(script))
+
+
+def test_unmatched_speakers_get_new_labels():
+    script = _script(40)
+    parts = _parts(script, [0, 10, 20], overlap=4)
+    # En el segundo segmento aparece alguien que no habló en el solapamiento
+    for item in parts[1]["transcript"]["results"]["items"]:
+        if 5 < float(item.get("start_time", 0)) < 9:
+            item["speaker_label"] = "spk_7"
+    parts[1]["transcript"]["results"]["speaker_labels"]["segments"].append(
+        {"start_time": "5.500", "end_time": "8.900", "speaker_label": "spk_7", "items": []})
+
+    stitched = stitch(parts, "nuevo")
+    labels = {item["alternatives"][0]["content"]: item["speaker_label"] for item in stitched["results"]["items"]}
+    assert set(labels.values()) == {"spk_0", "spk_1", "spk_2"}
+    assert labels["w26"] == "spk_2"  # 13 s: el hablante nuevo
+    assert labels["w20"] == labels["w0"] and labels["w39"] == labels["w5"]
+
+
+class SegmentS3:
+    def __init__(self, objects):
+        self.objects = objects
+        self.headers = {}
+
+    def get_object(self, Bucket, Key, Range=None):
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": ""}}, "GetObject")
+        data = self.objects[Key]
+        if Range is not None:
+            start, end = (int(n) for n in Range[len("bytes="):].split("-"))
+            data = data[start:end + 1]
+        return {"Body": io.BytesIO(data), **self.headers.get(Key, {})}
+
+    def put_object(self, Bucket, Key, Body, ContentType=None, **kwargs):
+        self.objects[Key] = Body
+        self.headers[Key] = kwargs
+
+    def head_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "404", "Message": ""}}, "HeadObject")
+        return {"ETag": '"etag"', "ContentLength": len(self.objects[Key])}
+
+
+class SegmentTranscribe:
+    def __init__(self):
+        self.jobs = {}
+
+    def start_transcription_job(self, TranscriptionJobName, OutputKey, **kwargs):
+        self.jobs[TranscriptionJobName] = {"OutputKey": OutputKey, "status": "IN_PROGRESS", **kwargs}
+
+    def list_transcription_jobs(self, JobNameContains, MaxResults, NextToken=None):
+        summaries = [{"TranscriptionJobName": name, "TranscriptionJobStatus": job["status"],
+                      "FailureReason": "audio inválido"}
+                     for name, job in sorted(self.jobs.items()) if JobNameContains in name]
+        return {"TranscriptionJobSummaries": summaries}
+
+    def get_transcription_job(self, TranscriptionJobName):
+        job = self.jobs[TranscriptionJobName]
+        return {"TranscriptionJob": {"TranscriptionJobStatus": job["status"], "FailureReason": "audio inválido"}}
+
+
+@pytest.fixture
+def long_audio(monkeypatch):
+    s3 = SegmentS3({"audios/user-a/largo.mp3": mp3(1600)})
+    transcribe = SegmentTranscribe()
+    monkeypatch.setattr(transcribir, "s3_client", s3)
+    monkeypatch.setattr(transcribir, "transcribe_client", transcribe)
+    monkeypatch.setattr(transcribir, "job_state", estado.MemoryJobStateStore())
+    monkeypatch.setattr(transcribir, "SEGMENT_SECONDS", 10)
+    monkeypatch.setattr(transcribir, "SEGMENT_OVERLAP_SECONDS", 1)
+
+    body = {"s3": {"bucketName": "bucket", "key": "audios/user-a/largo.mp3"},
+            "transcribe": {"languageCode": "es-ES", "maxSpeakers": 2, "longAudio": True}}
+    response = json.loads(transcribir.lambda_handler({"body": json.dumps(body)}, None)["body"])
+    return s3, transcribe, response["jobName"], response
+
+
+def _segment_done(s3, transcribe, part, script):
+    job = transcribe.jobs[part["jobName"]]
+    job["status"] = "COMPLETED"
+    s3.objects[job["OutputKey"]] = json.dumps(_transcript(script, part["startTime"], part["endTime"])).encode()
+    event = {"Records": [{"s3": {"bucket": {"name": "bucket"}, "object": {"key": job["OutputKey"]}}}]}
+    return transcribir.lambda_handler(event, None)["records"][0]
+
+
+def test_long_audio_is_split_transcribed_and_stitched(long_audio):
+    s3, transcribe, job_name, response = long_audio
+    assert response["segmented"] is True
+
+    manifest = json.loads(s3.objects[f"transcripciones-segmentos/{job_name}/manifest.json"])
+    parts = manifest["parts"]
+    assert len(parts) == 4 and sorted(transcribe.jobs) == [p["jobName"] for p in parts]
+    # Cada segmento es un MP3 hecho de frames completos del original
+    assert all(len(s3.objects[p["media"]]) % 417 == 0 for p in parts)
+    assert sum(len(s3.objects[p["media"]]) for p in parts) > 1600 * 417
+
+    script = [(t, word, speaker) for t, word, speaker in _script(80) if t < 1600 * FRAME_SECONDS]
+    results = [_segment_done(s3, transcribe, part, script) for part in parts]
+
+    assert [r["status"] for r in results] == ["WAITING"] * 3 + ["COMPLETED"]
+    stitched = json.loads(s3.objects[f"transcripciones/{job_name}.json"])
+    words = [i["alternatives"][0]["content"] for i in stitched["results"]["items"] if i["type"] == "pronunciation"]
+    assert words == [word for _, word, _ in script]
+
+
+def test_stitched_transcript_can_be_stored_compressed(long_audio, monkeypatch):
+    s3, transcribe, job_name, _ = long_audio
+    monkeypatch.setattr(compresion, "ENCODING", compresion.GZIP)
+
+    parts = json.loads(s3.objects[f"transcripciones-segmentos/{job_name}/manifest.json"])["parts"]
+    script = [(t, word, speaker) for t, word, speaker in _script(80) if t < 1600 * FRAME_SECONDS]
+    results = [_segment_done(s3, transcribe, part, script) for part in parts]
+
+    assert results[-1]["status"] == "COMPLETED"
+    key = f"transcripciones/{job_name}.json"
+    stitched = gzip.decompress(s3.objects[key])
+    assert s3.headers[key] == {"ContentEncoding": "gzip", "Metadata": {"uncompressed-bytes": str(len(stitched))}}
+    words = [i["alternatives"][0]["content"] for i in json.loads(stitched)["results"]["items"]
+             if i["type"] == "pronunciation"]
+    assert words == [word for _, word, _ in script]
+
+
+def test_failed_segment_fails_the_job(long_audio):
+    _, transcribe, job_name, _ = long_audio
+    transcribe.jobs[f"{job_name}-parte-002"]["status"] = "FAILED"
+    # El fallo llega por EventBridge; checkStatus responde desde la tabla
+    event = {"source": "aws.transcribe", "detail-type": "Transcribe Job State Change",
+             "detail": {"TranscriptionJobName": f"{job_name}-parte-002", "TranscriptionJobStatus": "FAILED"}}
+    assert transcribir.lambda_handler(event, None) == {"updated": True, "jobName": job_name}
+
+    status = json.loads(transcribir.lambda_handler({"checkStatus": {"job_name": job_name}}, None)["body"])
+    assert status["status"] == "FAILED"
+    assert status["failed"]["stage"] == estado.TRANSCRIBIR
+    assert f"{job_name}-parte-002" in status["failed"]["detail"]
+
+
+def test_segments_start_directly_and_only_the_overflow_is_queued(monkeypatch):
+    class LimitedTranscribe(SegmentTranscribe):
+        def start_transcription_job(self, TranscriptionJobName, OutputKey, **kwargs):
+            if len(self.jobs) >= 2:
+                raise ClientError({"Error": {"Code": "LimitExceededException", "Message": ""}}, "StartTranscriptionJob")
+            super().start_transcription_job(TranscriptionJobName, OutputKey, **kwargs)
+
+    s3 = SegmentS3({"audios/user-a/largo.mp3": mp3(1600)})
+    transcribe, sqs = LimitedTranscribe(), SimSQS(Clock())
+    for name, value in {"s3_client": s3, "transcribe_client": transcribe, "sqs_client": sqs,
+                        "job_state": estado.MemoryJobStateStore(), "ADMISSION_QUEUE_URL": "sim://cola",
+                        "SEGMENT_SECONDS": 10, "SEGMENT_OVERLAP_SECONDS": 1}.items():
+        monkeypatch.setattr(transcribir, name, value)
+
+    body = {"s3": {"bucketName": "bucket", "key": "audios/user-a/largo.mp3"},
+            "transcribe": {"languageCode": "es-ES", "maxSpeakers": 2, "longAudio": True}}
+    job_name = json.loads(transcribir.lambda_handler({"body": json.dumps(body)}, None)["body"])["jobName"]
+
+    assert len(transcribe.jobs) == 2
+    queued = [json.loads(m["Body"]) for m in sqs.messages]
+    assert sorted(q["jobName"] for q in queued) == [f"{job_name}-parte-002", f"{job_name}-parte-003"]
+    assert all(q["parent"] == job_name for q in queued)
+    # El audio gastó un solo token, no uno por segmento
+    tokens, _ = json.loads(s3.objects[transcribir.ADMISSION_STATE_KEY])["user-a"]
+    assert tokens == transcribir.ADMISSION_USER_BURST - 1
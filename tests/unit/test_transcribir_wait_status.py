@@ -0,0 +1,123 @@
+import json
+import threading
+import time
+
+from tests.unit.conftest import FakeS3
+from tests.unit.lambda_loader import load_lambda
+from tests.unit.test_comun_estado import FakeTranscribe
+
+transcribir = load_lambda("transcribir")
+
+from comun import estado  # noqa: E402
+
+
+def _wait(job_name, since, timeout=2):
+    event = {"body": json.dumps({"waitStatus": {"job_name": job_name, "since": since, "timeout": timeout}})}
+    return json.loads(transcribir.lambda_handler(event, None)["body"])
+
+
+def _setup(monkeypatch, store):
+    monkeypatch.setattr(transcribir, "job_state", store)
+    monkeypatch.setattr(transcribir, "transcribe_client", FakeTranscribe())
+    monkeypatch.setattr(transcribir, "s3_client", FakeS3())
+
+
+def test_wait_returns_as_soon_as_the_job_changes(monkeypatch):
+    store = estado.MemoryJobStateStore()
+    _setup(monkeypatch, store)
+    store.record("job", estado.FORMATEAR, estado.IN_PROGRESS)
+    since = _wait("job", None)["version"]
+
+    timer = threading.Timer(0.1, store.record, ("job", estado.FORMATEAR, estado.COMPLETED))
+    timer.start()
+    start = time.perf_counter()
+    body = _wait("job", since, timeout=5)
+
+    assert time.perf_counter() - start < 1
+    assert body["changed"] is True and body["formattedReady"] is True
+    assert body["version"] == since + 1
+
+
+def test_wait_times_out_without_changes(monkeypatch):
+    store = estado.MemoryJobStateStore()
+    _setup(monkeypatch, store)
+    store.record("job", estado.RESUMIR, estado.IN_PROGRESS)
+    since = estado.version(store.get("job"))
+
+    start = time.perf_counter()
+    body = _wait("job", since, timeout=0.2)
+
+    assert 0.2 <= time.perf_counter() - start < 1
+    assert body["changed"] is False and body["version"] == since
+
+
+def test_finished_jobs_answer_immediately(monkeypatch):
+    store = estado.MemoryJobStateStore()
+    _setup(monkeypatch, store)
+    store.record("job", estado.RESUMIR, estado.FAILED, error="BEDROCK_MODEL_ERROR")
+    since = estado.version(store.get("job"))
+
+    start = time.perf_counter()
+    body = _wait("job", since, timeout=5)
+
+    assert time.perf_counter() - start < 0.5
+    assert body["changed"] is False and body["failed"]["stage"] == estado.RESUMIR
+
+
+def test_polling_backends_reread_until_change():
+    store = estado.SQLiteJobStateStore()
+    store.record("job", estado.FORMATEAR, estado.IN_PROGRESS)
+    since = estado.version(store.get("job"))
+    now = [0.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+        if now[0] >= 3:
+            store.record("job", estado.FORMATEAR, estado.COMPLETED)
+
+    record = store.wait_for_change("job", since, timeout=10, poll_interval=1, clock=lambda: now[0], sleep=sleep)
+    assert record["stages"][estado.FORMATEAR]["status"] == estado.COMPLETED
+    assert now[0] == 3
+
+
+def test_many_subscribers_need_one_request_per_change(monkeypatch):
+    store = estado.MemoryJobStateStore()
+    _setup(monkeypatch, store)
+    jobs = [f"job-{i}" for i in range(40)]
+    for job in jobs:
+        store.record(job, estado.FORMATEAR, estado.IN_PROGRESS)
+    requests = {}
+
+    def subscriber(job):
+        count, since = 0, estado.version(store.get(job))
+        while True:
+            count += 1
+            body = _wait(job, since, timeout=5)
+            if body["summaryReady"]:
+                requests[job] = count
+                return
+            since = body["version"]
+
+    threads = [threading.Thread(target=subscriber, args=(job,)) for job in jobs]
+    for thread in threads:
+        thread.start()
+    for stage, status in ((estado.FORMATEAR, estado.COMPLETED), (estado.RESUMIR, estado.COMPLETED)):
+        time.sleep(0.2)
+        for job in jobs:
+            store.record(job, stage, status)
+    for thread in threads:
+        thread.join(timeout=10)
+
+    # Dos transiciones por job: dos requests, sin ticks de polling en el medio
+    assert requests == {job: 2 for job in jobs}
+
+
+def test_transitions_in_the_same_millisecond_are_seen(monkeypatch):
+    store = estado.MemoryJobStateStore()
+    monkeypatch.setattr(estado, "_now", lambda: "2025-01-01T12:00:00.000+00:00")
+    store.record("job", estado.TRANSCRIBIR, estado.COMPLETED)
+    since = estado.version(store.get("job"))
+    store.record("job", estado.FORMATEAR, estado.IN_PROGRESS)
+
+    record = store.wait_for_change("job", since, timeout=0)
+    assert estado.version(record) == since + 1
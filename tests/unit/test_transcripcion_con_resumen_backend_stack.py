@@ -1,15 +1,188 @@
+import json
+
 import aws_cdk as core
 import aws_cdk.assertions as assertions
+import pytest
 
 from transcripcion_con_resumen_backend.transcripcion_con_resumen_backend_stack import TranscripcionConResumenBackendStack
 
-# example tests. To run these tests, uncomment this file along with the example
-# resource in transcripcion_con_resumen_backend/transcripcion_con_resumen_backend_stack.py
-def test_sqs_queue_created():
-    app = core.App()
+FORMATEAR = "proyecto1-formatear-transcripcion"
+RESUMIR = "proyecto1-resumir-transcripciones"
+
+
+def _template(context=None):
+    app = core.App(context=context or {})
     stack = TranscripcionConResumenBackendStack(app, "transcripcion-con-resumen-backend")
-    template = assertions.Template.from_stack(stack)
+    return assertions.Template.from_stack(stack)
+
+
+def _function_names(template):
+    functions = template.find_resources("AWS::Lambda::Function")
+    return {logical_id: props["Properties"].get("FunctionName") for logical_id, props in functions.items()}
+
+
+def _stage_queues(template):
+    """{nombre de función: (queue, propiedades del event source mapping)} de los triggers SQS."""
+    names = _function_names(template)
+    queues = template.find_resources("AWS::SQS::Queue")
+    stages = {}
+    for mapping in template.find_resources("AWS::Lambda::EventSourceMapping").values():
+        props = mapping["Properties"]
+        queue_id = props["EventSourceArn"]["Fn::GetAtt"][0]
+        stages[names[props["FunctionName"]["Ref"]]] = (queue_id, queues[queue_id]["Properties"], props)
+    return stages
+
+
+def _notifications(template):
+    """(prefijo, sufijo, destino) de cada notificación del bucket; destino = función o función detrás del queue."""
+    config = next(iter(template.find_resources("Custom::S3BucketNotifications").values()))
+    names = _function_names(template)
+    queue_owner = {queue_id: function for function, (queue_id, _, _) in _stage_queues(template).items()}
+    targets = []
+    notifications = config["Properties"]["NotificationConfiguration"]
+    for kind, arn_field in (("LambdaFunctionConfigurations", "LambdaFunctionArn"), ("QueueConfigurations", "QueueArn")):
+        for notification in notifications.get(kind, []):
+            rules = {r["Name"]: r["Value"] for r in notification["Filter"]["Key"]["FilterRules"]}
+            target_id = notification[arn_field]["Fn::GetAtt"][0]
+            target = names[target_id] if kind.startswith("Lambda") else f"sqs:{queue_owner[target_id]}"
+            targets.append((rules["prefix"], rules["suffix"], target))
+    return sorted(targets)
+
+
+def test_two_stage_pipeline_by_default():
+    template = _template()
+    targets = _notifications(template)
+    assert ("transcripciones/", ".json", f"sqs:{FORMATEAR}") in targets
+    assert ("transcripciones-formateadas/", ".txt", f"sqs:{RESUMIR}") in targets
+    # Los segmentos de audios largos siguen yendo directo a transcribir
+    assert ("transcripciones-segmentos/", ".json", "proyecto1-transcribir-audios") in targets
+
+
+def test_api_only_treats_gzip_responses_as_binary():
+    template = _template()
+    template.has_resource_properties("AWS::ApiGateway::RestApi", {"BinaryMediaTypes": ["application/gzip"]})
+    # El mock del preflight recibe los pedidos como texto sin conversión
+    options = template.find_resources("AWS::ApiGateway::Method", {"Properties": {"HttpMethod": "OPTIONS"}})
+    assert all("ContentHandling" not in m["Properties"]["Integration"] for m in options.values())
+
+
+def test_upload_routes_require_identity_pool_credentials():
+    template = _template()
+    posts = template.find_resources("AWS::ApiGateway::Method", {"Properties": {"HttpMethod": "POST"}})
+    auth = sorted(m["Properties"]["AuthorizationType"] for m in posts.values())
+    # /transcribir sigue abierto; /subidas (URLs prefirmadas) exige SigV4 del rol autenticado
+    assert auth == ["AWS_IAM", "NONE"]
+    statements = [statement for policy in template.find_resources("AWS::IAM::Policy").values()
+                  for statement in policy["Properties"]["PolicyDocument"]["Statement"]]
+    assert any(statement.get("Sid") == "InvokeUploadRoutes" for statement in statements)
+
+
+def test_transcribe_failures_reach_transcribir_through_eventbridge():
+    template = _template()
+    template.has_resource_properties("AWS::Events::Rule", {
+        "EventPattern": {
+            "source": ["aws.transcribe"],
+            "detail-type": ["Transcribe Job State Change"],
+            "detail": {"TranscriptionJobStatus": ["FAILED"]},
+        },
+    })
+
+
+def test_fused_pipeline_sends_transcripts_straight_to_resumir():
+    template = _template({"pipelineMode": "fusionado"})
+    targets = _notifications(template)
+    assert ("transcripciones/", ".json", f"sqs:{RESUMIR}") in targets
+    # Sin notificación del .txt: resumir lo escribe y lo resumiría dos veces
+    assert not any(prefix == "transcripciones-formateadas/" for prefix, _, _ in targets)
+    assert FORMATEAR not in _function_names(template).values()
+    assert set(_stage_queues(template)) == {RESUMIR}
+
+
+def test_artifact_encoding_keeps_keys_and_notification_filters():
+    plain, compressed = _template(), _template({"artifactEncoding": "gzip"})
+    assert _notifications(compressed) == _notifications(plain)
+    for function in _function_names(compressed).values():
+        if function in ("proyecto1-transcribir-audios", FORMATEAR, RESUMIR):
+            compressed.has_resource_properties("AWS::Lambda::Function", {
+                "FunctionName": function,
+                "Environment": {"Variables": assertions.Match.object_like({"ARTIFACT_ENCODING": "gzip"})},
+            })
+    assert "ARTIFACT_ENCODING" not in json.dumps(plain.to_json())
+
+    with pytest.raises(ValueError, match="artifactEncoding"):
+        _template({"artifactEncoding": "brotli"})
+
+
+@pytest.mark.parametrize("mode", ["dos-etapas", "fusionado"])
+def test_formatting_stage_can_write_columns_without_triggering_anything(mode):
+    template = _template({"pipelineMode": mode})
+    formatting = RESUMIR if mode == "fusionado" else FORMATEAR
+    role = next(props["Properties"]["Role"]["Fn::GetAtt"][0]
+                for props in template.find_resources("AWS::Lambda::Function").values()
+                if props["Properties"].get("FunctionName") == formatting)
+    statements = [statement for policy in template.find_resources("AWS::IAM::Policy").values()
+                  if {"Ref": role} in policy["Properties"]["Roles"]
+                  for statement in policy["Properties"]["PolicyDocument"]["Statement"]]
+    assert any(statement["Action"] == "s3:PutObject" and "transcripciones-columnas/*" in json.dumps(statement)
+               for statement in statements)
+    assert not any("transcripciones-columnas/".startswith(prefix) for prefix, _, _ in _notifications(template))
+
+
+def test_stage_queues_have_dlq_batching_and_bounded_concurrency():
+    template = _template()
+    stages = _stage_queues(template)
+    assert set(stages) == {FORMATEAR, RESUMIR}
+
+    _, queue, mapping = stages[RESUMIR]
+    assert mapping["BatchSize"] == 4
+    assert mapping["MaximumBatchingWindowInSeconds"] == 10
+    assert mapping["ScalingConfig"] == {"MaximumConcurrency": 2}
+    assert mapping["FunctionResponseTypes"] == ["ReportBatchItemFailures"]
+    assert queue["RedrivePolicy"]["maxReceiveCount"] == 5
+    # 6 veces el timeout de 5 minutos de la función
+    assert queue["VisibilityTimeout"] == 1800
+
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "FunctionName": RESUMIR,
+        "Environment": {"Variables": assertions.Match.object_like({"STAGE_MAX_RECEIVE_COUNT": "5"})},
+    })
+
+
+def test_stage_queue_settings_come_from_context():
+    template = _template({"stageQueues": {"resumir": {"batchSize": 1, "maxConcurrency": 3, "maxReceiveCount": 2}}})
+    _, queue, mapping = _stage_queues(template)[RESUMIR]
+    assert mapping["BatchSize"] == 1 and mapping["ScalingConfig"] == {"MaximumConcurrency": 3}
+    assert queue["RedrivePolicy"]["maxReceiveCount"] == 2
+    # Lo que no se pisa queda con el valor por defecto
+    assert mapping["MaximumBatchingWindowInSeconds"] == 10
+    assert _stage_queues(template)[FORMATEAR][2]["BatchSize"] == 10
+
+
+def test_bucket_can_send_to_the_stage_queues():
+    template = _template()
+    template.resource_properties_count_is("AWS::SQS::QueuePolicy", {
+        "PolicyDocument": {"Statement": assertions.Match.array_with([
+            assertions.Match.object_like({"Action": assertions.Match.array_with(["sqs:SendMessage"]),
+                                          "Principal": {"Service": "s3.amazonaws.com"}}),
+        ])},
+    }, 2)
+
+
+def test_load_simulator_wiring_matches_the_stack():
+    from benchmarks.bench_carga import FUNCTION_TIMEOUT_SECONDS, ROUTES, STAGE_QUEUES
+
+    functions = {"transcribir": "proyecto1-transcribir-audios", "formatear": FORMATEAR, "resumir": RESUMIR}
+    for mode, routes in ROUTES.items():
+        template = _template({"pipelineMode": mode})
+        stages = _stage_queues(template)
+        expected = sorted((prefix, suffix, f"sqs:{functions[stage]}" if functions[stage] in stages else functions[stage])
+                          for prefix, suffix, stage in routes)
+        assert _notifications(template) == expected
 
-#     template.has_resource_properties("AWS::SQS::Queue", {
-#         "VisibilityTimeout": 300
-#     })
+    for name, config in STAGE_QUEUES.items():
+        _, queue, mapping = _stage_queues(_template())[functions[name]]
+        assert mapping["BatchSize"] == config["batchSize"]
+        assert mapping["MaximumBatchingWindowInSeconds"] == config["batchingWindowSeconds"]
+        assert mapping["ScalingConfig"] == {"MaximumConcurrency": config["maxConcurrency"]}
+        assert queue["RedrivePolicy"]["maxReceiveCount"] == config["maxReceiveCount"]
+        assert queue["VisibilityTimeout"] == 6 * FUNCTION_TIMEOUT_SECONDS
@@ -1,11 +1,18 @@
+import os
+
 from aws_cdk import (
     Aws,
     Duration,
     Stack,
     aws_lambda as lambda_,
+    aws_lambda_event_sources as lambda_events,
     aws_s3 as s3,
     aws_iam as iam,
     aws_cognito as cognito,
+    aws_dynamodb as dynamodb,
+    aws_events as events,
+    aws_events_targets as targets,
+    aws_sqs as sqs,
     aws_apigateway as apigateway,
     aws_s3_notifications as s3n,
     RemovalPolicy,
@@ -16,6 +23,14 @@ from constructs import Construct
 # Días en los que se borran automáticamente los objetos alojados en el bucket de backend
 dias_de_expiracion = 3
 
+# Trigger por SQS de cada etapa (se pisa con el contexto "stageQueues").
+# maxConcurrency acota las Lambdas en paralelo (mínimo 2): con resumir es lo que
+# mantiene las llamadas a Bedrock dentro de la cuota durante una ráfaga
+colas_etapas_default = {
+    "formatear": {"batchSize": 10, "batchingWindowSeconds": 5, "maxConcurrency": 10, "maxReceiveCount": 3},
+    "resumir": {"batchSize": 4, "batchingWindowSeconds": 10, "maxConcurrency": 2, "maxReceiveCount": 5},
+}
+
 
 class TranscripcionConResumenBackendStack(Stack):
     def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
@@ -25,7 +40,11 @@ class TranscripcionConResumenBackendStack(Stack):
         self.PFX_AUDIOS = "audios/"
         self.PFX_TRANSCRIPCIONES = "transcripciones/"
         self.PFX_TRANSCRIPCIONES_FMT = "transcripciones-formateadas/"
+        self.PFX_COLUMNAS = "transcripciones-columnas/"  # datos por palabra en columnas (sin notificación)
         self.PFX_RESUMENES = "resumenes/"
+        self.PFX_CACHE_RESUMENES = "cache-resumenes/"
+        self.PFX_SEGMENTOS = "transcripciones-segmentos/"
+        self.PFX_COLA = "cola-transcripciones/"
 
         frontend_origins = self.node.try_get_context("frontendOrigins") or [
             "https://d11ahn26gyfe9q.cloudfront.net",
@@ -49,7 +68,9 @@ class TranscripcionConResumenBackendStack(Stack):
                     ],
                     allowed_origins=frontend_origins,
                     allowed_headers=["*", "authorization", "content-type", "x-amz-*"],
-                    exposed_headers=["etag", "x-amz-request-id", "x-amz-id-2"],
+                    # content-range/length: lectura por rangos de las URLs prefirmadas de getResults
+                    exposed_headers=["etag", "x-amz-request-id", "x-amz-id-2",
+                                     "content-range", "content-length", "accept-ranges"],
                     # Limito el origen permitido del CORS para que sólo mi CloudFront distribution pueda hacer API calls
                     # allowed_origins=["https://d11ahn26gyfe9q.cloudfront.net"],
                     # allowed_headers=["*"],
@@ -59,12 +80,34 @@ class TranscripcionConResumenBackendStack(Stack):
             removal_policy=RemovalPolicy.DESTROY,
             auto_delete_objects=True,  # elimina los objetos antes de borrar el bucket
             lifecycle_rules=[
-                s3.LifecycleRule(expiration=Duration.days(dias_de_expiracion))
+                s3.LifecycleRule(
+                    expiration=Duration.days(dias_de_expiracion),
+                    # Subidas multipart abandonadas (las partes se cobran aunque no se completen)
+                    abort_incomplete_multipart_upload_after=Duration.days(1),
+                )
             ],
         )
 
         # === Parametrización por contexto (cdk.json) ===
         identity_pool_name = self.node.try_get_context("identityPoolName") or "TranscripcionConResumenIdPool"
+        # "dos-etapas": formatear escribe el .txt y su notificación dispara resumir.
+        # "fusionado": resumir recibe el .json de Transcribe, formatea y resume en la
+        # misma invocación (un GET, una notificación y un cold start menos por job)
+        pipeline_mode = self.node.try_get_context("pipelineMode") or "dos-etapas"
+        if pipeline_mode not in ("dos-etapas", "fusionado"):
+            raise ValueError(f"pipelineMode inválido: {pipeline_mode} (dos-etapas | fusionado)")
+        self.fused = pipeline_mode == "fusionado"
+        # Content-Encoding de los artefactos intermedios (.json unido y .txt formateado):
+        # "" (sin comprimir), "gzip" o "zstd". Las claves no cambian, así que los
+        # filtros de las notificaciones tampoco
+        self.artifact_encoding = self.node.try_get_context("artifactEncoding") or ""
+        if self.artifact_encoding not in ("", "gzip", "zstd"):
+            raise ValueError(f"artifactEncoding inválido: {self.artifact_encoding} (gzip | zstd | vacío)")
+        if self.artifact_encoding == "zstd" and not os.path.isdir("lambda/comun/python/zstandard"):
+            # La layer se sube tal cual (sin bundling): el paquete tiene que estar adentro
+            raise ValueError("artifactEncoding=zstd requiere zstandard en la layer: "
+                             "pip install zstandard -t lambda/comun/python "
+                             "--platform manylinux2014_x86_64 --only-binary=:all:")
         
         # User Pool y User Pool Client
         user_pool = cognito.UserPool(
@@ -210,8 +253,44 @@ class TranscripcionConResumenBackendStack(Stack):
             # },
         )
 
+        # Estado de cada job: lo escriben las tres Lambdas y lo lee checkStatus
+        self.jobs_table = dynamodb.Table(
+            self,
+            "TablaEstadoJobs",
+            partition_key=dynamodb.Attribute(name="jobName", type=dynamodb.AttributeType.STRING),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            time_to_live_attribute="expiresAt",  # mismos días que los objetos del bucket
+            removal_policy=RemovalPolicy.DESTROY,
+        )
+
+        # Inicios de transcripción esperando lugar en Transcribe (control de admisión).
+        # Sin DLQ: el scheduler devuelve al queue lo que todavía no puede iniciar,
+        # así que las recepciones repetidas son normales
+        self.cola_transcripciones = sqs.Queue(
+            self,
+            "ColaTranscripciones",
+            visibility_timeout=Duration.minutes(1),
+            retention_period=Duration.days(dias_de_expiracion),
+            removal_policy=RemovalPolicy.DESTROY,
+        )
+
         # 2) Lambdas (guardar referencias)
-        common_env = {"BUCKET": self.bucket.bucket_name}
+        common_env = {
+            "BUCKET": self.bucket.bucket_name,
+            "JOBS_TABLE": self.jobs_table.table_name,
+            "JOBS_TTL_DAYS": str(dias_de_expiracion),
+        }
+        if self.artifact_encoding:
+            common_env["ARTIFACT_ENCODING"] = self.artifact_encoding
+
+        # Código compartido entre Lambdas (lambda/comun/python/comun)
+        self.layer_comun = lambda_.LayerVersion(
+            self,
+            "CapaComun",
+            code=lambda_.Code.from_asset("lambda/comun"),
+            compatible_runtimes=[lambda_.Runtime.PYTHON_3_12],
+            description="Módulos compartidos del pipeline de transcripción",
+        )
 
         self.fn_transcribir = lambda_.Function(
             self,
@@ -220,22 +299,34 @@ class TranscripcionConResumenBackendStack(Stack):
             runtime=lambda_.Runtime.PYTHON_3_12,
             handler="lambda_function.lambda_handler",
             code=lambda_.Code.from_asset("lambda/transcribir"),
-            environment=common_env,
+            layers=[self.layer_comun],
+            environment={
+                **common_env,
+                # Audios desde este tamaño se transcriben en segmentos paralelos
+                "LONG_AUDIO_MIN_MB": "60",
+                "ADMISSION_QUEUE_URL": self.cola_transcripciones.queue_url,
+                # Cuota de jobs de Transcribe en paralelo de la cuenta
+                "TRANSCRIBE_MAX_CONCURRENT": str(self.node.try_get_context("transcribeMaxConcurrent") or 100),
+            },
             timeout=Duration.minutes(5),
             memory_size=512,
         )
 
-        self.fn_formatear = lambda_.Function(
-            self,
-            "proyecto1-formatear-transcripcion",
-            function_name="proyecto1-formatear-transcripcion",
-            runtime=lambda_.Runtime.PYTHON_3_12,
-            handler="lambda_function.lambda_handler",
-            code=lambda_.Code.from_asset("lambda/formatear"),
-            environment=common_env,
-            timeout=Duration.minutes(5),
-            memory_size=512,
-        )
+        # En modo fusionado no hay Lambda de formatear: lo hace resumir
+        self.fn_formatear = None
+        if not self.fused:
+            self.fn_formatear = lambda_.Function(
+                self,
+                "proyecto1-formatear-transcripcion",
+                function_name="proyecto1-formatear-transcripcion",
+                runtime=lambda_.Runtime.PYTHON_3_12,
+                handler="lambda_function.lambda_handler",
+                code=lambda_.Code.from_asset("lambda/formatear"),
+                layers=[self.layer_comun],
+                environment=common_env,
+                timeout=Duration.minutes(5),
+                memory_size=512,
+            )
 
         self.fn_resumir = lambda_.Function(
             self,
@@ -244,11 +335,25 @@ class TranscripcionConResumenBackendStack(Stack):
             runtime=lambda_.Runtime.PYTHON_3_12,
             handler="lambda_function.lambda_handler",
             code=lambda_.Code.from_asset("lambda/resumir"),
-            environment=common_env,
+            layers=[self.layer_comun],
+            environment={
+                **common_env,
+                "SUMMARY_STREAMING": "true",
+                "SUMMARY_CACHE": "s3",
+                "SUMMARY_CACHE_PREFIX": self.PFX_CACHE_RESUMENES,
+            },
             timeout=Duration.minutes(5),
             memory_size=512,
         )
 
+        # Queue + DLQ delante de cada etapa que disparan las notificaciones S3
+        colas_contexto = self.node.try_get_context("stageQueues") or {}
+        self.stage_queues = {}
+        for nombre, fn in (("formatear", self.fn_formatear), ("resumir", self.fn_resumir)):
+            if fn is not None:
+                config = {**colas_etapas_default[nombre], **colas_contexto.get(nombre, {})}
+                self.stage_queues[nombre] = self._stage_queue(nombre, fn, config)
+
         # 3 Permisos de bucket más específicos
         # Transcribir: lee audios, escribe en transcripciones
         self.fn_transcribir.add_to_role_policy(
@@ -267,20 +372,61 @@ class TranscripcionConResumenBackendStack(Stack):
                 resources=[f"{self.bucket.bucket_arn}/{self.PFX_TRANSCRIPCIONES}*"],
             )
         )
+        # Subida multipart de audios: crea la subida, firma las partes, completa y aborta
+        self.fn_transcribir.add_to_role_policy(
+            iam.PolicyStatement(
+                actions=["s3:PutObject", "s3:AbortMultipartUpload", "s3:ListMultipartUploadParts"],
+                resources=[f"{self.bucket.bucket_arn}/{self.PFX_AUDIOS}*"],
+            )
+        )
+        # Audios largos: segmentos, manifiesto y salida de Transcribe por segmento
+        self.fn_transcribir.add_to_role_policy(
+            iam.PolicyStatement(
+                actions=["s3:GetObject", "s3:PutObject"],
+                resources=[f"{self.bucket.bucket_arn}/{self.PFX_SEGMENTOS}*"],
+            )
+        )
+        # Estado de los token buckets del control de admisión
+        self.fn_transcribir.add_to_role_policy(
+            iam.PolicyStatement(
+                actions=["s3:GetObject", "s3:PutObject"],
+                resources=[f"{self.bucket.bucket_arn}/{self.PFX_COLA}*"],
+            )
+        )
+        self.cola_transcripciones.grant_send_messages(self.fn_transcribir)
+        self.cola_transcripciones.grant_consume_messages(self.fn_transcribir)
+        # El corte de audios largos sigue en una invocación asíncrona de sí misma
+        # (ARN armado a mano: referenciar la función en su propia policy es circular)
+        self.fn_transcribir.add_to_role_policy(
+            iam.PolicyStatement(
+                actions=["lambda:InvokeFunction"],
+                resources=[
+                    f"arn:aws:lambda:{self.region}:{self.account}:function:proyecto1-transcribir-audios"
+                ],
+            )
+        )
 
-        # Formatear: lee transcripciones, escribe formateadas
-        self.fn_formatear.add_to_role_policy(
+        # Formatear (o resumir en modo fusionado): lee transcripciones, escribe formateadas y columnas
+        fn_formateo = self.fn_resumir if self.fused else self.fn_formatear
+        fn_formateo.add_to_role_policy(
             iam.PolicyStatement(
                 actions=["s3:GetObject"],
                 resources=[f"{self.bucket.bucket_arn}/{self.PFX_TRANSCRIPCIONES}*"],
             )
         )
-        self.fn_formatear.add_to_role_policy(
+        fn_formateo.add_to_role_policy(
             iam.PolicyStatement(
-                actions=["s3:PutObject"],
+                # Multipart upload para transcripciones largas
+                actions=["s3:PutObject", "s3:AbortMultipartUpload"],
                 resources=[f"{self.bucket.bucket_arn}/{self.PFX_TRANSCRIPCIONES_FMT}*"],
             )
         )
+        fn_formateo.add_to_role_policy(
+            iam.PolicyStatement(
+                actions=["s3:PutObject"],
+                resources=[f"{self.bucket.bucket_arn}/{self.PFX_COLUMNAS}*"],
+            )
+        )
 
         # Resumir: lee formateadas, escribe resúmenes
         self.fn_resumir.add_to_role_policy(
@@ -291,10 +437,25 @@ class TranscripcionConResumenBackendStack(Stack):
         )
         self.fn_resumir.add_to_role_policy(
             iam.PolicyStatement(
-                actions=["s3:PutObject"],
+                # DeleteObject: borra el resumen parcial al publicar el final
+                actions=["s3:PutObject", "s3:DeleteObject"],
                 resources=[f"{self.bucket.bucket_arn}/{self.PFX_RESUMENES}*"],
             )
         )
+        # Cache de resúmenes por contenido (la expira el lifecycle del bucket)
+        self.fn_resumir.add_to_role_policy(
+            iam.PolicyStatement(
+                actions=["s3:GetObject", "s3:PutObject"],
+                resources=[f"{self.bucket.bucket_arn}/{self.PFX_CACHE_RESUMENES}*"],
+            )
+        )
+
+        # Tabla de estado: las etapas registran transiciones, transcribir además las lee
+        self.jobs_table.grant_read_write_data(self.fn_transcribir)
+        if self.fn_formatear is not None:
+            self.jobs_table.grant_write_data(self.fn_formatear)
+        # resumir además lee el registro al terminar para emitir la línea de tiempo del job
+        self.jobs_table.grant_read_write_data(self.fn_resumir)
 
         # 4 Permisos específicos de servicio
         # Transcribe para la Lambda de transcribir
@@ -326,20 +487,55 @@ class TranscripcionConResumenBackendStack(Stack):
         )
 
         # 5 Notificaciones S3 → Lambdas (prefijos correctos)
-        # Cuando aparece un .json en transcripciones/ => formatear
+        # Cuando aparece un .json en transcripciones/ => queue de formatear (o de resumir en modo fusionado)
         self.bucket.add_event_notification(
             s3.EventType.OBJECT_CREATED,
-            s3n.LambdaDestination(self.fn_formatear),
+            s3n.SqsDestination(self.stage_queues["resumir" if self.fused else "formatear"]),
             s3.NotificationKeyFilter(prefix=self.PFX_TRANSCRIPCIONES, suffix=".json"),
         )
 
-        # Cuando aparece un .txt en transcripciones-formateadas/ => resumir
+        # Cuando Transcribe termina un segmento de un audio largo => transcribir lo une
         self.bucket.add_event_notification(
             s3.EventType.OBJECT_CREATED,
-            s3n.LambdaDestination(self.fn_resumir),
-            s3.NotificationKeyFilter(
-                prefix=self.PFX_TRANSCRIPCIONES_FMT, suffix=".txt"
+            s3n.LambdaDestination(self.fn_transcribir),
+            s3.NotificationKeyFilter(prefix=self.PFX_SEGMENTOS, suffix=".json"),
+        )
+
+        # Cuando aparece un .txt en transcripciones-formateadas/ => queue de resumir.
+        # En modo fusionado el .txt lo escribe resumir: notificarlo lo resumiría dos veces
+        if not self.fused:
+            self.bucket.add_event_notification(
+                s3.EventType.OBJECT_CREATED,
+                s3n.SqsDestination(self.stage_queues["resumir"]),
+                s3.NotificationKeyFilter(
+                    prefix=self.PFX_TRANSCRIPCIONES_FMT, suffix=".txt"
+                ),
+            )
+
+        # Scheduler de la admisión: cada minuto libera lo encolado según la capacidad libre
+        events.Rule(
+            self,
+            "SchedulerAdmision",
+            schedule=events.Schedule.rate(Duration.minutes(1)),
+            targets=[
+                targets.LambdaFunction(
+                    self.fn_transcribir,
+                    event=events.RuleTargetInput.from_object({"drainQueue": {}}),
+                )
+            ],
+        )
+
+        # Fallos de Transcribe: actualizan la tabla de jobs para que checkStatus
+        # no tenga que consultar get_transcription_job (lo terminado llega por S3)
+        events.Rule(
+            self,
+            "FallosTranscribe",
+            event_pattern=events.EventPattern(
+                source=["aws.transcribe"],
+                detail_type=["Transcribe Job State Change"],
+                detail={"TranscriptionJobStatus": ["FAILED"]},
             ),
+            targets=[targets.LambdaFunction(self.fn_transcribir)],
         )
 
         # 6 API Gateway (solo para kick-off de transcripción)
@@ -348,6 +544,9 @@ class TranscripcionConResumenBackendStack(Stack):
             "TranscripcionApi",
             rest_api_name="Transcripcion API",
             deploy_options=apigateway.StageOptions(stage_name="prod"),
+            # Sólo la respuesta gzip de getResults (Accept: application/gzip) es binaria;
+            # los pedidos y respuestas JSON siguen como texto
+            binary_media_types=["application/gzip"],
         )
         transcribir_res = api.root.add_resource("transcribir")
 
@@ -368,14 +567,58 @@ class TranscripcionConResumenBackendStack(Stack):
         )
 
         # Método OPTIONS (preflight CORS)
-        transcribir_res.add_method(
+        self._cors_preflight(transcribir_res, "'Content-Type'")
+
+        # Subida multipart de audios: con auth IAM (credenciales del Identity Pool) API Gateway
+        # informa la identidad y la Lambda compara la clave con la carpeta del usuario
+        subidas_res = api.root.add_resource("subidas")
+        subidas_post = subidas_res.add_method(
+            "POST",
+            apigateway.LambdaIntegration(self.fn_transcribir, proxy=True),
+            authorization_type=apigateway.AuthorizationType.IAM,
+            method_responses=[
+                apigateway.MethodResponse(
+                    status_code="200",
+                    response_parameters={
+                        "method.response.header.Access-Control-Allow-Origin": True,
+                        "method.response.header.Access-Control-Allow-Headers": True,
+                        "method.response.header.Access-Control-Allow-Methods": True,
+                    },
+                ),
+            ],
+        )
+        self._cors_preflight(subidas_res, "'Content-Type,Authorization,X-Amz-Date,X-Amz-Security-Token'")
+        auth_role.add_to_policy(
+            iam.PolicyStatement(
+                sid="InvokeUploadRoutes",
+                actions=["execute-api:Invoke"],
+                resources=[subidas_post.method_arn],
+            )
+        )
+
+        for nombre, cola in self.stage_queues.items():
+            CfnOutput(self, f"UrlDlqEtapa{nombre.capitalize()}", value=cola.dead_letter_queue.queue.queue_url)
+
+        # Declaro outputs para el deploy y para cablear el frontend
+        CfnOutput(self, "BackendBucketName", value=self.bucket.bucket_name)
+        CfnOutput(self, "IdentityPoolId", value=id_pool.ref)
+        CfnOutput(self, "IdentityProviderName", value=provider_base)
+        CfnOutput(self, "AuthenticatedRoleArn", value=auth_role.role_arn)
+        CfnOutput(self, "UserPoolId", value=user_pool.user_pool_id)
+        CfnOutput(self, "UserPoolClientId", value=user_pool_client.user_pool_client_id)
+        CfnOutput(self, "UserPoolDomain", value=f"{user_pool_domain.domain_name}.auth.{self.region}.amazoncognito.com")
+        
+
+    def _cors_preflight(self, resource, allowed_headers):
+        """Método OPTIONS (mock) para el preflight CORS de `resource`."""
+        resource.add_method(
             "OPTIONS",
             apigateway.MockIntegration(
                 integration_responses=[
                     {
                         "statusCode": "200",
                         "responseParameters": {
-                            "method.response.header.Access-Control-Allow-Headers": "'Content-Type'",
+                            "method.response.header.Access-Control-Allow-Headers": allowed_headers,
                             "method.response.header.Access-Control-Allow-Origin": "'https://d11ahn26gyfe9q.cloudfront.net'",
                             "method.response.header.Access-Control-Allow-Methods": "'OPTIONS,POST'",
                         },
@@ -397,12 +640,36 @@ class TranscripcionConResumenBackendStack(Stack):
             ],
         )
 
-        # Declaro outputs para el deploy y para cablear el frontend
-        CfnOutput(self, "BackendBucketName", value=self.bucket.bucket_name)
-        CfnOutput(self, "IdentityPoolId", value=id_pool.ref)
-        CfnOutput(self, "IdentityProviderName", value=provider_base)
-        CfnOutput(self, "AuthenticatedRoleArn", value=auth_role.role_arn)
-        CfnOutput(self, "UserPoolId", value=user_pool.user_pool_id)
-        CfnOutput(self, "UserPoolClientId", value=user_pool_client.user_pool_client_id)
-        CfnOutput(self, "UserPoolDomain", value=f"{user_pool_domain.domain_name}.auth.{self.region}.amazoncognito.com")
-        
\ No newline at end of file
+    def _stage_queue(self, nombre, fn, config):
+        """
+        Queue que recibe las notificaciones S3 de una etapa, con su DLQ y el
+        event source mapping que la consume con reporte de fallas parciales.
+        """
+        dlq = sqs.Queue(
+            self,
+            f"DlqEtapa{nombre.capitalize()}",
+            retention_period=Duration.days(14),
+            removal_policy=RemovalPolicy.DESTROY,
+        )
+        cola = sqs.Queue(
+            self,
+            f"ColaEtapa{nombre.capitalize()}",
+            # Lo recomendado para event sources: 6 veces el timeout de la función.
+            # Es también la espera antes de reintentar un mensaje devuelto
+            visibility_timeout=Duration.seconds(6 * fn.timeout.to_seconds()),
+            retention_period=Duration.days(dias_de_expiracion),
+            dead_letter_queue=sqs.DeadLetterQueue(max_receive_count=config["maxReceiveCount"], queue=dlq),
+            removal_policy=RemovalPolicy.DESTROY,
+        )
+        fn.add_event_source(
+            lambda_events.SqsEventSource(
+                cola,
+                batch_size=config["batchSize"],
+                max_batching_window=Duration.seconds(config["batchingWindowSeconds"]),
+                max_concurrency=config["maxConcurrency"],
+                report_batch_item_failures=True,
+            )
+        )
+        # La última entrega antes de la DLQ escribe el error en vez de devolver el mensaje
+        fn.add_environment("STAGE_MAX_RECEIVE_COUNT", str(config["maxReceiveCount"]))
+        return cola